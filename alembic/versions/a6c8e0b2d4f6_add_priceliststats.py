@@ -0,0 +1,62 @@
+"""add priceliststats (change statistics written at pricelist import)
+
+Сводка изменений прайса относительно предыдущего прайса конфигурации:
+общие/новые/ушедшие позиции, медиана изменения цены, доля изменившихся
+цен и гистограмма изменений. Пишется при загрузке прайса; для старых
+прайсов строк нет — дашборд для них считает пары по-старому.
+
+Revision ID: a6c8e0b2d4f6
+Revises: f4b6d8e0a2c3
+Create Date: 2026-10-17 16:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+revision: str = "a6c8e0b2d4f6"
+down_revision: Union[str, Sequence[str], None] = "f4b6d8e0a2c3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "priceliststats",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("pricelist_id", sa.Integer(), nullable=False),
+        sa.Column("previous_pricelist_id", sa.Integer(), nullable=True),
+        sa.Column("provider_config_id", sa.Integer(), nullable=False),
+        sa.Column("positions_count", sa.Integer(), nullable=False),
+        sa.Column("overlap_count", sa.Integer(), nullable=False),
+        sa.Column("added_count", sa.Integer(), nullable=False),
+        sa.Column("removed_count", sa.Integer(), nullable=False),
+        sa.Column("changed_count", sa.Integer(), nullable=False),
+        sa.Column("median_change_pct", sa.Float(), nullable=True),
+        sa.Column("changed_share_pct", sa.Float(), nullable=True),
+        sa.Column("price_change_histogram", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["pricelist_id"], ["pricelist.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(
+            ["previous_pricelist_id"], ["pricelist.id"], ondelete="SET NULL"
+        ),
+        sa.ForeignKeyConstraint(
+            ["provider_config_id"],
+            ["providerpricelistconfig.id"],
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("pricelist_id"),
+    )
+    op.create_index(
+        "ix_priceliststats_provider_config_id",
+        "priceliststats",
+        ["provider_config_id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_priceliststats_provider_config_id", table_name="priceliststats")
+    op.drop_table("priceliststats")
@@ -0,0 +1,69 @@
+"""add shipmentprofitdaily (daily gross profit rollup of posted shipments)
+
+Отчёт по валовой прибыли группирует дневной свод вместо загрузки всех
+накладных периода. Свод ведут проведение и отмена накладной; историю
+после миграции заполняет scripts/rebuild_shipment_profit_rollup.py.
+
+Revision ID: b8d0f2a4c6e8
+Revises: a6c8e0b2d4f6
+Create Date: 2026-10-17 18:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+revision: str = "b8d0f2a4c6e8"
+down_revision: Union[str, Sequence[str], None] = "a6c8e0b2d4f6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "shipmentprofitdaily",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("customer_id", sa.Integer(), nullable=False),
+        sa.Column("provider_id", sa.Integer(), nullable=False),
+        sa.Column("brand_id", sa.Integer(), nullable=False),
+        sa.Column("autopart_id", sa.Integer(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("revenue_total", sa.DECIMAL(16, 2), nullable=False),
+        sa.Column("cost_total", sa.DECIMAL(16, 2), nullable=False),
+        sa.Column("costed_quantity", sa.Integer(), nullable=False),
+        sa.Column("uncosted_quantity", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "day",
+            "customer_id",
+            "provider_id",
+            "brand_id",
+            "autopart_id",
+            name="uq_shipment_profit_daily_key",
+        ),
+    )
+    op.create_index(
+        "ix_shipment_profit_daily_provider_day",
+        "shipmentprofitdaily",
+        ["provider_id", "day"],
+    )
+    op.create_index(
+        "ix_shipment_profit_daily_customer_day",
+        "shipmentprofitdaily",
+        ["customer_id", "day"],
+    )
+    op.create_index(
+        "ix_shipment_profit_daily_autopart_day",
+        "shipmentprofitdaily",
+        ["autopart_id", "day"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_shipment_profit_daily_autopart_day", table_name="shipmentprofitdaily")
+    op.drop_index("ix_shipment_profit_daily_customer_day", table_name="shipmentprofitdaily")
+    op.drop_index("ix_shipment_profit_daily_provider_day", table_name="shipmentprofitdaily")
+    op.drop_table("shipmentprofitdaily")
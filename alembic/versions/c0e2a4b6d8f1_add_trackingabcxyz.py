@@ -0,0 +1,47 @@
+"""add trackingabcxyz (nightly ABC/XYZ classification of tracked OEMs)
+
+Помесячный ряд, CV/XYZ и накопленная доля/ABC по каждому OEM из истории
+наших заказов. Заполняется ночной задачей; пока таблица пуста, экраны и
+автозаказ считают классификацию по-старому.
+
+Revision ID: c0e2a4b6d8f1
+Revises: b8d0f2a4c6e8
+Create Date: 2026-10-17 20:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+revision: str = "c0e2a4b6d8f1"
+down_revision: Union[str, Sequence[str], None] = "b8d0f2a4c6e8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "trackingabcxyz",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("oem_number", sa.String(length=120), nullable=False),
+        sa.Column("series_month", sa.Date(), nullable=False),
+        sa.Column("monthly_qty", sa.JSON(), nullable=False),
+        sa.Column("annual_ordered_qty", sa.Integer(), nullable=False),
+        sa.Column("active_months", sa.Integer(), nullable=False),
+        sa.Column("monthly_cv", sa.Float(), nullable=True),
+        sa.Column("xyz_class", sa.String(length=1), nullable=True),
+        sa.Column("market_qty", sa.Integer(), nullable=False),
+        sa.Column("cumulative_share_pct", sa.Float(), nullable=True),
+        sa.Column("abc_class", sa.String(length=1), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("oem_number"),
+    )
+    op.create_index("ix_trackingabcxyz_market_qty", "trackingabcxyz", ["market_qty"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_trackingabcxyz_market_qty", table_name="trackingabcxyz")
+    op.drop_table("trackingabcxyz")
@@ -0,0 +1,73 @@
+"""add autopart price state (last known provider price per config)
+
+Текущее состояние позиции у конфигурации прайса поставщика:
+последние цена и остаток из AutoPartPriceHistory. Обновляется в той же
+транзакции, что и история. Миграция заполняет таблицу из последних
+событий истории; пересобрать позже — scripts/backfill_autopart_price_state.py.
+
+Revision ID: d8e1f3a5b7c9
+Revises: b6d4e8f2a901
+Create Date: 2026-10-17 10:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+revision: str = "d8e1f3a5b7c9"
+down_revision: Union[str, Sequence[str], None] = "b6d4e8f2a901"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "autopartpricestate",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("provider_config_id", sa.Integer(), nullable=False),
+        sa.Column("autopart_id", sa.Integer(), nullable=False),
+        sa.Column("provider_id", sa.Integer(), nullable=False),
+        sa.Column("pricelist_id", sa.Integer(), nullable=False),
+        sa.Column("price", sa.DECIMAL(precision=10, scale=2), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["provider_config_id"],
+            ["providerpricelistconfig.id"],
+            ondelete="CASCADE",
+        ),
+        sa.ForeignKeyConstraint(["autopart_id"], ["autopart.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["provider_id"], ["provider.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "provider_config_id",
+            "autopart_id",
+            name="uq_autopart_price_state_config_autopart",
+        ),
+    )
+    op.create_index(
+        "ix_autopartpricestate_autopart_id",
+        "autopartpricestate",
+        ["autopart_id"],
+    )
+    op.execute(
+        """
+        INSERT INTO autopartpricestate (
+            provider_config_id, autopart_id, provider_id, pricelist_id,
+            price, quantity, updated_at
+        )
+        SELECT DISTINCT ON (provider_config_id, autopart_id)
+            provider_config_id, autopart_id, provider_id, pricelist_id,
+            price, quantity, created_at
+        FROM autopartpricehistory
+        WHERE provider_config_id IS NOT NULL
+        ORDER BY provider_config_id, autopart_id, created_at DESC, id DESC
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_autopartpricestate_autopart_id", table_name="autopartpricestate")
+    op.drop_table("autopartpricestate")
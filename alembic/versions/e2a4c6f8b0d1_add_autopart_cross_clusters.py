@@ -0,0 +1,70 @@
+"""add autopart cross clusters (linear storage of cross groups)
+
+Группа аналогов хранится кластером и строками членства вместо всех
+упорядоченных пар AutoPartCross. Таблица рёбер остаётся: читатели
+объединяют обе формы, перенос старых групп — по частям скриптом
+scripts/migrate_cross_edges_to_clusters.py.
+
+Revision ID: e2a4c6f8b0d1
+Revises: d8e1f3a5b7c9
+Create Date: 2026-10-17 12:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+revision: str = "e2a4c6f8b0d1"
+down_revision: Union[str, Sequence[str], None] = "d8e1f3a5b7c9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "autopartcrosscluster",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("source", sa.String(length=32), nullable=False),
+        sa.Column("external_key", sa.String(length=255), nullable=False),
+        sa.Column("comment", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("source", "external_key", name="uq_cross_cluster_key"),
+    )
+    op.create_table(
+        "autopartcrossclustermember",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("cluster_id", sa.Integer(), nullable=False),
+        sa.Column("autopart_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["cluster_id"], ["autopartcrosscluster.id"], ondelete="CASCADE"
+        ),
+        sa.ForeignKeyConstraint(["autopart_id"], ["autopart.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("cluster_id", "autopart_id", name="uq_cross_cluster_member"),
+    )
+    op.create_index(
+        "ix_autopartcrossclustermember_cluster_id",
+        "autopartcrossclustermember",
+        ["cluster_id"],
+    )
+    op.create_index(
+        "ix_autopartcrossclustermember_autopart_id",
+        "autopartcrossclustermember",
+        ["autopart_id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_autopartcrossclustermember_autopart_id",
+        table_name="autopartcrossclustermember",
+    )
+    op.drop_index(
+        "ix_autopartcrossclustermember_cluster_id",
+        table_name="autopartcrossclustermember",
+    )
+    op.drop_table("autopartcrossclustermember")
+    op.drop_table("autopartcrosscluster")
@@ -0,0 +1,35 @@
+"""add pg_trgm GIN index on autopart.oem_number for partial OEM search
+
+Поиск предложений по части OEM (/autoparts/offers/?partial=true) делает
+ILIKE '%…%' по autopart.oem_number — без индекса это полный просмотр
+таблицы. Номер хранится нормализованным (preprocess_oem_number), так что
+триграммный индекс строится прямо по колонке. Индекс создаётся
+CONCURRENTLY, чтобы не блокировать запись в autopart.
+
+Revision ID: f4b6d8e0a2c3
+Revises: e2a4c6f8b0d1
+Create Date: 2026-10-17 14:00:00.000000
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "f4b6d8e0a2c3"
+down_revision: Union[str, Sequence[str], None] = "e2a4c6f8b0d1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_autopart_oem_number_trgm "
+            "ON autopart USING gin (oem_number gin_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_autopart_oem_number_trgm")
@@ -14,7 +14,12 @@ from dz_fastapi.core.time import now_moscow
 from dz_fastapi.crud.partner import crud_pricelist
 from dz_fastapi.models.autopart import AutoPart, AutoPartPriceHistory
 from dz_fastapi.models.brand import Brand
-from dz_fastapi.models.partner import PriceList, PriceListAutoPartAssociation, Provider
+from dz_fastapi.models.partner import (
+    PriceList,
+    PriceListAutoPartAssociation,
+    PriceListStats,
+    Provider,
+)
 
 logger = logging.getLogger("dz_fastapi")
 
@@ -573,15 +578,19 @@ async def _maybe_alert_price_change(
     new_id = summary.get("latest_pricelist_id")
     if not prev_id or not new_id:
         return
-    try:
-        median_change = await _median_price_change_pct(
-            session,
-            prev_pricelist_id=int(prev_id),
-            new_pricelist_id=int(new_id),
-        )
-    except Exception as exc:  # pragma: no cover - defensive
-        logger.warning("Не удалось посчитать сдвиг цен для алерта: %s", exc)
-        return
+    if "median_change_pct" in summary:
+        # Сводка из PriceListStats: медиана уже посчитана при загрузке.
+        median_change = summary["median_change_pct"]
+    else:
+        try:
+            median_change = await _median_price_change_pct(
+                session,
+                prev_pricelist_id=int(prev_id),
+                new_pricelist_id=int(new_id),
+            )
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.warning("Не удалось посчитать сдвиг цен для алерта: %s", exc)
+            return
     if median_change is None or abs(median_change) < PRICE_ALERT_THRESHOLD_PCT:
         return
 
@@ -622,6 +631,41 @@ async def _maybe_alert_price_change(
         logger.warning("Не удалось отправить Telegram о сдвиге цен: %s", exc)
 
 
+async def _summary_from_pricelist_stats(
+    session: AsyncSession, new_pl: PriceList
+) -> Optional[dict[str, Any]]:
+    """
+    Сводка по строке PriceListStats, записанной при загрузке прайса,
+    или None, если строки нет либо сравнивать не с чем. Топ-списков в
+    ней нет — их даёт get_pricelist_change_summary.
+    """
+    stats = (
+        await session.execute(
+            select(PriceListStats).where(PriceListStats.pricelist_id == new_pl.id)
+        )
+    ).scalar_one_or_none()
+    if stats is None or stats.previous_pricelist_id is None:
+        return None
+    return {
+        "ready": True,
+        "note": None,
+        "latest_pricelist_id": new_pl.id,
+        "latest_pricelist_date": new_pl.date,
+        "previous_pricelist_id": stats.previous_pricelist_id,
+        "latest_positions_count": stats.positions_count,
+        "new_positions_count": stats.added_count,
+        "removed_positions_count": stats.removed_count,
+        "changed_price_count": stats.changed_count,
+        "median_change_pct": (
+            round(stats.median_change_pct, 2)
+            if stats.median_change_pct is not None
+            else None
+        ),
+        "changed_share_pct": stats.changed_share_pct,
+        "price_change_histogram": stats.price_change_histogram,
+    }
+
+
 async def analyze_new_pricelist(new_pl: PriceList, session: AsyncSession):
     """
     Сравнить новый прайс-лист (new_pl) с предыдущим для того же поставщика
@@ -629,10 +673,26 @@ async def analyze_new_pricelist(new_pl: PriceList, session: AsyncSession):
       - новые позиции (нет в старом)
       - изменение цены (в %)
       - изменение количества (в %)
+    Если при загрузке записана PriceListStats, сводка берётся из неё.
     """
     logger.debug("Зашли в функцию analyze_new_pricelist")
     provider_id = new_pl.provider_id
 
+    summary = await _summary_from_pricelist_stats(session, new_pl)
+    if summary is not None:
+        logger.info(
+            "Сводный анализ прайса provider_id=%s provider_config_id=%s: "
+            "новых=%s удаленных=%s изменено цен=%s медиана=%s%%",
+            new_pl.provider_id,
+            new_pl.provider_config_id,
+            summary["new_positions_count"],
+            summary["removed_positions_count"],
+            summary["changed_price_count"],
+            summary["median_change_pct"],
+        )
+        await _maybe_alert_price_change(session, new_pl=new_pl, summary=summary)
+        return summary
+
     summary = await get_pricelist_change_summary(
         session=session,
         provider_id=provider_id,
@@ -91,6 +91,7 @@ from dz_fastapi.services.crosses import (
     save_cross_relation,
 )
 from dz_fastapi.services.inventory_stock import ensure_default_warehouse
+from dz_fastapi.services.oem_search import oem_match_rank, partial_oem_filter
 from dz_fastapi.services.process import (
     assign_brand,
     check_start_and_finish_date,
@@ -167,18 +168,12 @@ async def get_autopart_offers(
             offers=[],
             historical_offers=[],
         )
-    startswith_pattern = f"{normalized_oem}%"
-    contains_pattern = f"%{normalized_oem}%"
     oem_filter = (
-        AutoPart.oem_number.ilike(contains_pattern)
+        await partial_oem_filter(session, normalized_oem)
         if partial
         else AutoPart.oem_number == normalized_oem
     )
-    oem_rank = case(
-        (AutoPart.oem_number == normalized_oem, 0),
-        (AutoPart.oem_number.ilike(startswith_pattern), 1),
-        else_=2,
-    )
+    oem_rank = oem_match_rank(AutoPart.oem_number, normalized_oem)
 
     partition_key = func.coalesce(
         PriceList.provider_config_id, PriceList.provider_id
@@ -316,14 +311,7 @@ async def get_autopart_offers(
         select(historical_subq)
         .where(historical_subq.c.history_rn == 1)
         .order_by(
-            case(
-                (historical_subq.c.oem_number == normalized_oem, 0),
-                (
-                    historical_subq.c.oem_number.ilike(startswith_pattern),
-                    1,
-                ),
-                else_=2,
-            ),
+            oem_match_rank(historical_subq.c.oem_number, normalized_oem),
             historical_subq.c.oem_number.asc(),
             historical_subq.c.provider_name.asc(),
             historical_subq.c.provider_config_name.asc().nullslast(),
@@ -22,6 +22,7 @@ from dz_fastapi.models.partner import (
     OrderItem,
     PriceList,
     PriceListAutoPartAssociation,
+    PriceListStats,
     Provider,
     ProviderPriceListConfig,
     SupplierOrder,
@@ -1034,6 +1035,41 @@ async def _load_pair_stats_batch(
     return result
 
 
+async def _load_ingest_pair_stats(
+    session: AsyncSession,
+    pairs: set[tuple[int, int]],
+) -> dict[tuple[int, int], tuple[int, Optional[float], Optional[float], int, int]]:
+    """Статистика пар из PriceListStats, записанной при загрузке прайса.
+
+    Строка подходит паре, только если при загрузке текущего прайса
+    предыдущим был именно prev_id. Возвращает (общие, медиана %, доля
+    изменившихся %, новые, ушедшие); пары без строки считает
+    _load_pair_stats_batch.
+    """
+    if not pairs:
+        return {}
+    rows = (
+        await session.execute(
+            select(PriceListStats).where(
+                PriceListStats.pricelist_id.in_({curr_id for _, curr_id in pairs})
+            )
+        )
+    ).scalars()
+    result = {}
+    for row in rows:
+        pair = (row.previous_pricelist_id, row.pricelist_id)
+        if pair not in pairs:
+            continue
+        result[pair] = (
+            int(row.overlap_count),
+            row.median_change_pct,
+            row.changed_share_pct,
+            int(row.added_count),
+            int(row.removed_count),
+        )
+    return result
+
+
 def _rolling_median(
     values: list[Optional[float]],
     window: int,
@@ -1255,7 +1291,13 @@ async def get_supplier_price_trends(
             latest_id = int(ordered_points[-1]["pricelist_id"])
             if base_pricelist_id != latest_id:
                 needed_pairs.add((base_pricelist_id, latest_id))
-    pair_stats = await _load_pair_stats_batch(session, needed_pairs)
+    # Соседние точки обычно покрыты PriceListStats; тяжёлое сопоставление
+    # прайсов остаётся для старых прайсов и пары база → последняя точка.
+    ingest_stats = await _load_ingest_pair_stats(session, needed_pairs)
+    pair_stats = {pair: value[:3] for pair, value in ingest_stats.items()}
+    pair_stats.update(
+        await _load_pair_stats_batch(session, needed_pairs - set(ingest_stats))
+    )
 
     series: list[SupplierPriceTrendSeries] = []
     for provider_config_id, ordered_points in ordered_by_provider.items():
@@ -1286,9 +1328,13 @@ async def get_supplier_price_trends(
                     )
                 )
                 curr_total = int(metric.get("total_sku_count", 0))
-                # Новые/ушедшие позиции — из уже загруженных total-счётчиков.
-                new_positions = max(curr_total - overlap_count, 0)
-                removed_positions = max(prev_total - overlap_count, 0)
+                ingest = ingest_stats.get((prev_pricelist_id, pricelist_id))
+                if ingest is not None:
+                    new_positions, removed_positions = ingest[3], ingest[4]
+                else:
+                    # Новые/ушедшие позиции — из уже загруженных total-счётчиков.
+                    new_positions = max(curr_total - overlap_count, 0)
+                    removed_positions = max(prev_total - overlap_count, 0)
                 if prev_total > 0:
                     coverage_pct = round(
                         (overlap_count / prev_total) * 100, 2
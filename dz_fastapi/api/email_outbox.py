@@ -1,7 +1,9 @@
 """API очереди исходящих писем (EmailOutbox).
 
 Контракт для внешнего скрипта-релея (машина с открытыми SMTP-портами):
-1. GET  /email-outbox/pending      — забрать письма к отправке;
+1. POST /email-outbox/claim?wait_seconds=N — захватить письма к отправке;
+   пустая очередь держит запрос до N секунд и отвечает сразу после
+   постановки нового письма (LISTEN/NOTIFY);
 2. отправить через smtp.yandex.ru:465 с нужного from-адреса;
 3. POST /email-outbox/{id}/mark-sent  или  /mark-error.
 Плюс GET /email-outbox — недавние письма для UI.
@@ -56,6 +58,12 @@ async def outbox_claim(
     worker: str = Query(..., min_length=1, max_length=128),
     limit: int = Query(default=25, ge=1, le=200),
     lease_seconds: int = Query(default=300, ge=30, le=3600),
+    wait_seconds: int = Query(
+        default=0,
+        ge=0,
+        le=60,
+        description="Long-poll: ждать новых записей до стольких секунд",
+    ),
     _: None = Depends(require_email_relay),
     session: AsyncSession = Depends(get_session),
 ):
@@ -64,6 +72,7 @@ async def outbox_claim(
         worker=worker,
         limit=limit,
         lease_seconds=lease_seconds,
+        wait_seconds=wait_seconds,
     )
     return [serialize_outbox_for_relay(row) for row in rows]
 
@@ -112,6 +112,8 @@ from dz_fastapi.schemas.inventory import (
     ShipmentProfitReportRow,
     ShipmentsExportOut,
     ShipmentSyncUpdate,
+    StockAvailabilityBatchRequest,
+    StockAvailabilityOut,
     StockByLocationOut,
     StockByLocationUpsert,
     StockDocumentCreate,
@@ -146,9 +148,8 @@ from dz_fastapi.services.inventory_stock import (
     confirm_return_from_customer,
     confirm_return_to_supplier,
     create_reserve,
-    get_available_quantity,
     get_lots_for_autopart,
-    get_reserved_quantity,
+    get_stock_availability,
     post_shipment_document,
     post_stock_document,
     reconcile_stock_absolute,
@@ -181,6 +182,7 @@ from dz_fastapi.services.production_waves import (
     schedule_production_wave,
     start_production_wave,
 )
+from dz_fastapi.services.shipment_profit import collect_shipment_profit_rows
 
 logger = logging.getLogger(__name__)
 MONEY_PRECISION = Decimal("0.01")
@@ -2590,10 +2592,22 @@ async def bulk_cancel_reserves(
     )
 
 
+def _availability_to_out(key, row) -> StockAvailabilityOut:
+    autopart_id, storage_location_id = key
+    return StockAvailabilityOut(
+        autopart_id=autopart_id,
+        storage_location_id=storage_location_id,
+        physical=row.physical,
+        reserved=row.reserved,
+        wave_reserved=row.wave_reserved,
+        available=row.available,
+    )
+
+
 @router.get(
     "/available/",
     summary="Свободный остаток по запчасти",
-    response_model=dict,
+    response_model=StockAvailabilityOut,
 )
 async def get_available_stock(
     autopart_id: int = Query(...),
@@ -2601,27 +2615,29 @@ async def get_available_stock(
     session: AsyncSession = Depends(get_session),
 ):
     """Возвращает физический, зарезервированный и свободный остатки."""
-    physical = await get_available_quantity(
-        session,
-        autopart_id=autopart_id,
-        storage_location_id=storage_location_id,
-    ) + await get_reserved_quantity(
-        session,
-        autopart_id=autopart_id,
-        storage_location_id=storage_location_id,
-    )
-    reserved = await get_reserved_quantity(
-        session,
-        autopart_id=autopart_id,
-        storage_location_id=storage_location_id,
+    key = (autopart_id, storage_location_id)
+    availability = await get_stock_availability(session, [key])
+    return _availability_to_out(key, availability[key])
+
+
+@router.post(
+    "/available/batch/",
+    summary="Свободные остатки по списку запчастей и ячеек",
+    response_model=List[StockAvailabilityOut],
+)
+async def get_available_stock_batch(
+    data: StockAvailabilityBatchRequest,
+    session: AsyncSession = Depends(get_session),
+):
+    """Остатки для множества пар (запчасть, ячейка) одним запросом.
+
+    Порядок ответа совпадает с порядком запроса.
+    """
+    keys = [(item.autopart_id, item.storage_location_id) for item in data.items]
+    availability = await get_stock_availability(
+        session, keys, warehouse_id=data.warehouse_id
     )
-    return {
-        "autopart_id": autopart_id,
-        "storage_location_id": storage_location_id,
-        "physical": physical,
-        "reserved": reserved,
-        "available": max(0, physical - reserved),
-    }
+    return [_availability_to_out(key, availability[key]) for key in keys]
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -2782,23 +2798,6 @@ def _shipment_to_list_item(doc: ShipmentDocument) -> ShipmentDocumentListItem:
     )
 
 
-def _shipment_profit_period_start(
-    dt_value: datetime,
-    period: str,
-) -> Optional[datetime]:
-    if period == "all":
-        return None
-    if period == "day":
-        return dt_value.replace(hour=0, minute=0, second=0, microsecond=0)
-    return dt_value.replace(
-        day=1,
-        hour=0,
-        minute=0,
-        second=0,
-        microsecond=0,
-    )
-
-
 async def _load_shipment(
     session: AsyncSession, doc_id: int
 ) -> ShipmentDocument:
@@ -3009,219 +3008,24 @@ async def _collect_shipment_profit_report_rows(
     date_from: Optional[datetime],
     date_to: Optional[datetime],
 ) -> list[ShipmentProfitReportRow]:
-    stmt = (
-        select(ShipmentDocument)
-        .where(ShipmentDocument.status == ShipmentDocumentStatus.POSTED)
-        .options(
-            selectinload(ShipmentDocument.customer),
-            selectinload(ShipmentDocument.items)
-            .selectinload(ShipmentDocumentItem.autopart)
-            .selectinload(AutoPart.brand),
-            selectinload(ShipmentDocument.items)
-            .selectinload(ShipmentDocumentItem.allocations)
-            .selectinload(ShipmentDocumentItemLotAllocation.provider),
-            selectinload(ShipmentDocument.items)
-            .selectinload(ShipmentDocumentItem.allocations)
-            .selectinload(ShipmentDocumentItemLotAllocation.stock_lot),
-        )
-        .order_by(ShipmentDocument.posted_at.desc(), ShipmentDocument.id.desc())
+    # GROUP BY по дневному своду ShipmentProfitDaily вместо загрузки
+    # всех накладных периода ORM-графами.
+    grouped_rows = await collect_shipment_profit_rows(
+        session,
+        period=period,
+        group_by_customer=group_by_customer,
+        group_by_provider=group_by_provider,
+        group_by_brand=group_by_brand,
+        group_by_autopart=group_by_autopart,
+        customer_id=customer_id,
+        provider_id=provider_id,
+        autopart_id=autopart_id,
+        date_from=date_from,
+        date_to=date_to,
     )
-    if customer_id is not None:
-        stmt = stmt.where(ShipmentDocument.customer_id == customer_id)
-    if date_from is not None:
-        stmt = stmt.where(ShipmentDocument.posted_at >= date_from)
-    if date_to is not None:
-        stmt = stmt.where(ShipmentDocument.posted_at <= date_to)
-
-    docs = (await session.execute(stmt)).scalars().all()
-    grouped: dict[
-        tuple[Optional[datetime], Optional[int], Optional[int], Optional[int], Optional[int]],
-        dict,
-    ] = {}
-
-    for doc in docs:
-        effective_dt = doc.posted_at or doc.doc_date
-        period_start = _shipment_profit_period_start(effective_dt, period)
-        current_customer_id = doc.customer_id if group_by_customer else None
-        current_customer_name = (
-            doc.customer.name
-            if group_by_customer and doc.customer is not None
-            else None
-        )
-
-        for item in doc.items or []:
-            if autopart_id is not None and item.autopart_id != autopart_id:
-                continue
-
-            sale_unit_price = (
-                Decimal(str(item.price)) if item.price is not None else None
-            )
-            autopart = item.autopart
-            brand_id = (
-                autopart.brand_id
-                if autopart is not None and group_by_brand
-                else None
-            )
-            brand_name = (
-                autopart.brand.name
-                if (
-                    autopart is not None
-                    and autopart.brand is not None
-                    and group_by_brand
-                )
-                else None
-            )
-            allocations = list(item.allocations or [])
-            allocated_quantity = 0
-
-            for allocation in allocations:
-                quantity_piece = int(allocation.quantity or 0)
-                if quantity_piece <= 0:
-                    continue
-                allocated_quantity += quantity_piece
-                current_provider_id = allocation.provider_id
-                if (
-                    provider_id is not None
-                    and current_provider_id != provider_id
-                ):
-                    continue
-
-                key = (
-                    period_start,
-                    current_customer_id,
-                    current_provider_id if group_by_provider else None,
-                    brand_id,
-                    item.autopart_id if group_by_autopart else None,
-                )
-                provider_name = (
-                    allocation.provider.name
-                    if allocation.provider is not None
-                    else None
-                )
-                row = grouped.setdefault(
-                    key,
-                    {
-                        "period_start": period_start,
-                        "customer_id": current_customer_id,
-                        "customer_name": current_customer_name,
-                        "provider_id": (
-                            current_provider_id if group_by_provider else None
-                        ),
-                        "provider_name": (
-                            provider_name if group_by_provider else None
-                        ),
-                        "brand_id": brand_id,
-                        "brand_name": brand_name,
-                        "autopart_id": (
-                            item.autopart_id if group_by_autopart else None
-                        ),
-                        "autopart_oem": (
-                            autopart.oem_number
-                            if group_by_autopart and autopart is not None
-                            else None
-                        ),
-                        "autopart_name": (
-                            autopart.name
-                            if group_by_autopart and autopart is not None
-                            else None
-                        ),
-                        "autopart_brand": (
-                            autopart.brand.name
-                            if (
-                                group_by_autopart
-                                and autopart is not None
-                                and autopart.brand is not None
-                            )
-                            else None
-                        ),
-                        "quantity": 0,
-                        "revenue_total": Decimal("0.00"),
-                        "cost_total": Decimal("0.00"),
-                        "gross_profit": None,
-                        "margin_percent": None,
-                        "costed_quantity": 0,
-                        "uncosted_quantity": 0,
-                    },
-                )
-                row["quantity"] += quantity_piece
-                if sale_unit_price is not None:
-                    row["revenue_total"] += sale_unit_price * Decimal(
-                        quantity_piece
-                    )
-                if allocation.total_cost_price is not None:
-                    row["cost_total"] += Decimal(
-                        str(allocation.total_cost_price)
-                    )
-                    row["costed_quantity"] += quantity_piece
-                else:
-                    row["uncosted_quantity"] += quantity_piece
-
-            remainder_quantity = max(
-                0,
-                int(item.quantity or 0) - allocated_quantity,
-            )
-            if remainder_quantity <= 0:
-                continue
-            if provider_id is not None:
-                continue
-
-            key = (
-                period_start,
-                current_customer_id,
-                None if group_by_provider else None,
-                brand_id,
-                item.autopart_id if group_by_autopart else None,
-            )
-            row = grouped.setdefault(
-                key,
-                {
-                    "period_start": period_start,
-                    "customer_id": current_customer_id,
-                    "customer_name": current_customer_name,
-                    "provider_id": None,
-                    "provider_name": None,
-                    "brand_id": brand_id,
-                    "brand_name": brand_name,
-                    "autopart_id": (
-                        item.autopart_id if group_by_autopart else None
-                    ),
-                    "autopart_oem": (
-                        autopart.oem_number
-                        if group_by_autopart and autopart is not None
-                        else None
-                    ),
-                    "autopart_name": (
-                        autopart.name
-                        if group_by_autopart and autopart is not None
-                        else None
-                    ),
-                    "autopart_brand": (
-                        autopart.brand.name
-                        if (
-                            group_by_autopart
-                            and autopart is not None
-                            and autopart.brand is not None
-                        )
-                        else None
-                    ),
-                    "quantity": 0,
-                    "revenue_total": Decimal("0.00"),
-                    "cost_total": Decimal("0.00"),
-                    "gross_profit": None,
-                    "margin_percent": None,
-                    "costed_quantity": 0,
-                    "uncosted_quantity": 0,
-                },
-            )
-            row["quantity"] += remainder_quantity
-            if sale_unit_price is not None:
-                row["revenue_total"] += sale_unit_price * Decimal(
-                    remainder_quantity
-                )
-            row["uncosted_quantity"] += remainder_quantity
 
     rows: list[ShipmentProfitReportRow] = []
-    for row in grouped.values():
+    for row in grouped_rows:
         row["revenue_total"] = _quantize_money(row["revenue_total"]) or Decimal(
             "0.00"
         )
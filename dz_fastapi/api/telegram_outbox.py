@@ -36,6 +36,12 @@ async def telegram_outbox_claim(
     worker: str = Query(..., min_length=1, max_length=128),
     limit: int = Query(default=25, ge=1, le=200),
     lease_seconds: int = Query(default=300, ge=30, le=3600),
+    wait_seconds: int = Query(
+        default=0,
+        ge=0,
+        le=60,
+        description="Long-poll: ждать новых записей до стольких секунд",
+    ),
     _: None = Depends(require_email_relay),
     session: AsyncSession = Depends(get_session),
 ):
@@ -44,6 +50,7 @@ async def telegram_outbox_claim(
         worker=worker,
         limit=limit,
         lease_seconds=lease_seconds,
+        wait_seconds=wait_seconds,
     )
     return [serialize_telegram_outbox_for_relay(row) for row in rows]
 
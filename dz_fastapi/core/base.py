@@ -2,6 +2,7 @@ from dz_fastapi.core.db import Base  # noqa
 from dz_fastapi.models.autopart import AutoPartPriceHistory  # noqa
 from dz_fastapi.models.autopart import (
     AutoPart,
+    AutoPartPriceState,
     AutoPartRestockDecision,
     AutoPartRestockDecisionSupplier,
     AutoPurchaseTopItem,
@@ -14,6 +15,8 @@ from dz_fastapi.models.autopart import (
 from dz_fastapi.models.brand import Brand, brand_synonyms  # noqa
 from dz_fastapi.models.cross import (  # noqa
     AutoPartCross,
+    AutoPartCrossCluster,
+    AutoPartCrossClusterMember,
     AutoPartInvalidCross,
     AutoPartSubstitution,
 )
@@ -51,6 +54,7 @@ from dz_fastapi.models.inventory import (  # noqa
     ShipmentDocument,
     ShipmentDocumentItem,
     ShipmentDocumentItemLotAllocation,
+    ShipmentProfitDaily,
     StockByLocation,
     StockDocument,
     StockDocumentItem,
@@ -97,6 +101,7 @@ from dz_fastapi.models.partner import (
     PriceList,
     PriceListAutoPartAssociation,
     PriceListMissingBrand,
+    PriceListStats,
     Provider,
     ProviderAbbreviation,
     ProviderConfigLastEmailUID,
@@ -121,6 +126,7 @@ from dz_fastapi.models.partner import (
     SupplierReceiptItem,
     SupplierResponseConfig,
     TelegramOutbox,
+    TrackingAbcXyz,
 )
 from dz_fastapi.models.price_control import (
     CustomerPriceListOverride,
@@ -173,6 +179,7 @@ __all__ = [
     "Provider",
     "PriceListAutoPartAssociation",
     "PriceListMissingBrand",
+    "PriceListStats",
     "CustomerPriceList",
     "CustomerPriceListAutoPartAssociation",
     "ProviderPriceListConfig",
@@ -192,6 +199,7 @@ __all__ = [
     "StockOrder",
     "StockOrderItem",
     "Order",
+    "TrackingAbcXyz",
     "OrderItem",
     "ProviderAbbreviation",
     "ProviderConfigLastEmailUID",
@@ -199,10 +207,13 @@ __all__ = [
     "ProviderInventoryRoleRule",
     "ProviderLastEmailUID",
     "AutoPartPriceHistory",
+    "AutoPartPriceState",
     "AutoPartRestockDecision",
     "AutoPartRestockDecisionSupplier",
     "AutoPurchaseTopItem",
     "AutoPartCross",
+    "AutoPartCrossCluster",
+    "AutoPartCrossClusterMember",
     "AutoPartInvalidCross",
     "AutoPartSubstitution",
     "ChatMessage",
@@ -257,6 +268,7 @@ __all__ = [
     "ShipmentDocument",
     "ShipmentDocumentItem",
     "ShipmentDocumentItemLotAllocation",
+    "ShipmentProfitDaily",
     "OneCExchangeEvent",
     "OneCExchangeBatch",
     "OneCExchangeBatchItem",
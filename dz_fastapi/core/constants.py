@@ -14,6 +14,8 @@ MAX_LIGHT_NAME_ENGINE = 256
 MAX_LEN_WEBSITE = 1056
 MAX_PRICE_LISTS = 10
 MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", 5 * 1024 * 1024))  # 5 МБ
+# Сколько дней храним AutoPartPriceHistory (cleanup_price_history_task).
+PRICE_HISTORY_RETENTION_DAYS = int(os.getenv("PRICE_HISTORY_RETENTION_DAYS", "365"))
 ERROR_MESSAGE_FORMAT_DATE = '{key} должен быть в формате "YYYY" или "MM.YYYY"'
 ERROR_MESSAGE_RANGE_DATE = (
     "{key} не может быть меньше " "1980 и больше текущей даты"
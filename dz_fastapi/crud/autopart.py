@@ -6,13 +6,14 @@ from decimal import Decimal
 from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi import HTTPException
-from sqlalchemy import and_, func, update
+from sqlalchemy import and_, func, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
 from dz_fastapi.api.validators import change_brand_name, change_string
-from dz_fastapi.core.constants import PERCENT_MIN_BALANS_FOR_ORDER
+from dz_fastapi.core.constants import MAX_LIGHT_OEM, PERCENT_MIN_BALANS_FOR_ORDER
 from dz_fastapi.core.db import AsyncSession
 from dz_fastapi.core.time import now_moscow
 from dz_fastapi.crud.base import CRUDBase
@@ -27,6 +28,8 @@ from dz_fastapi.models.autopart import (
     AutoPartRestockDecisionSupplier,
     Category,
     StorageLocation,
+    _truncate_if_needed,
+    autopart_barcode_variants,
     preprocess_oem_number,
 )
 from dz_fastapi.models.brand import Brand
@@ -46,6 +49,17 @@ from dz_fastapi.schemas.order import OrderPositionOut, SupplierOrderOut
 
 logger = logging.getLogger("dz_fastapi")
 
+# Размер пачки для пакетного создания/поиска автозапчастей из прайса.
+AUTOPART_BULK_CHUNK_SIZE = 1000
+# Поля AutoPartPricelist, которые попадают в новую автозапчасть.
+PRICE_AUTOPART_FIELDS = (
+    "multiplicity",
+    "purchase_price",
+    "retail_price",
+    "wholesale_price",
+    "comment",
+)
+
 
 def get_recursive_selectinloads(depth: int):
     def recursive_load(level):
@@ -339,6 +353,176 @@ class CRUDAutopart(CRUDBase[AutoPart, AutoPartCreate, AutoPartUpdate]):
             logger.exception(f"Error in create_autopart_from_price: {e}")
             return None
 
+    async def _price_autopart_row(
+        self, autopart_data: dict, brand_id: int
+    ) -> Optional[dict]:
+        """
+        Строка для пакетного INSERT в autopart — те же преобразования,
+        что делают AutoPartCreate и before_insert-хук при создании по одной.
+        """
+        oem_number = _truncate_if_needed(
+            preprocess_oem_number(str(autopart_data.get("oem_number") or "")),
+            MAX_LIGHT_OEM,
+            "oem_number",
+        )
+        name = autopart_data.get("name")
+        if not oem_number or name is None:
+            return None
+        row = {
+            "brand_id": brand_id,
+            "oem_number": oem_number,
+            "name": _truncate_if_needed(
+                await change_string(str(name)), MAX_LIGHT_OEM, "name"
+            ),
+        }
+        for field in PRICE_AUTOPART_FIELDS:
+            value = autopart_data.get(field)
+            if value is None:
+                # Как и ORM, вместо None берём значение по умолчанию колонки.
+                value = AutoPart.__table__.c[field].default.arg
+            row[field] = value
+        return row
+
+    async def _assign_price_barcodes(
+        self,
+        rows: List[dict],
+        brand_names: Dict[int, str],
+        session: AsyncSession,
+    ) -> None:
+        variants = [
+            autopart_barcode_variants(
+                row["brand_id"], brand_names[row["brand_id"]], row["oem_number"]
+            )
+            for row in rows
+        ]
+        candidates = sorted({candidate for candidate, _ in variants})
+        taken: set[str] = set()
+        for chunk_start in range(0, len(candidates), AUTOPART_BULK_CHUNK_SIZE):
+            chunk = candidates[chunk_start: chunk_start + AUTOPART_BULK_CHUNK_SIZE]
+            result = await session.execute(
+                select(AutoPart.barcode).where(AutoPart.barcode.in_(chunk))
+            )
+            taken.update(result.scalars().all())
+        for row, (candidate, fallback) in zip(rows, variants):
+            row["barcode"] = fallback if candidate in taken else candidate
+            taken.add(row["barcode"])
+
+    async def get_autopart_ids_by_oem_brand(
+        self,
+        pairs: List[Tuple[str, int]],
+        session: AsyncSession,
+    ) -> Dict[Tuple[str, int], int]:
+        """Пакетный поиск id автозапчастей по парам (oem_number, brand_id)."""
+        found: Dict[Tuple[str, int], int] = {}
+        unique_pairs = sorted(set(pairs))
+        for chunk_start in range(0, len(unique_pairs), AUTOPART_BULK_CHUNK_SIZE):
+            chunk = unique_pairs[chunk_start: chunk_start + AUTOPART_BULK_CHUNK_SIZE]
+            result = await session.execute(
+                select(AutoPart.id, AutoPart.oem_number, AutoPart.brand_id).where(
+                    tuple_(AutoPart.oem_number, AutoPart.brand_id).in_(chunk)
+                )
+            )
+            for autopart_id, oem_number, brand_id in result.all():
+                found[(oem_number, int(brand_id))] = int(autopart_id)
+        return found
+
+    async def bulk_create_from_price(
+        self,
+        items: List[Tuple[Brand, dict]],
+        session: AsyncSession,
+    ) -> Dict[Tuple[str, int], int]:
+        """
+        Пакетно создаёт автозапчасти для строк прайса, которых нет в базе:
+        INSERT ... ON CONFLICT (brand_id, oem_number) DO NOTHING RETURNING id
+        пачками по AUTOPART_BULK_CHUNK_SIZE, затем один пакетный поиск id
+        для пар, вставленных параллельным импортом.
+
+        items: (бренд, данные автозапчасти из прайса) с нормализованным OEM.
+        Возвращает {(oem_number, brand_id): autopart_id} по ключам items.
+        Пачка, упавшая на другом уникальном ограничении (штрихкод занят
+        параллельной вставкой), откатывается до savepoint и создаётся
+        по одной строке через create_autopart_from_price.
+        """
+        # Имена брендов нужны для штрихкодов. Откат savepoint экспайрит
+        # только объекты, изменённые внутри него, поэтому Brand из items
+        # остаются загруженными и для построчного запасного пути.
+        brand_names: Dict[int, str] = {}
+        pending: Dict[Tuple[str, int], dict] = {}
+        sources: Dict[Tuple[str, int], Tuple[Brand, dict]] = {}
+        for brand, autopart_data in items:
+            brand_id = int(brand.id)
+            brand_names[brand_id] = brand.name
+            key = (autopart_data["oem_number"], brand_id)
+            if key in pending:
+                continue
+            row = await self._price_autopart_row(autopart_data, brand_id)
+            if row is None:
+                logger.warning(
+                    "Skipping autopart creation for pricelist row: %s",
+                    autopart_data,
+                )
+                continue
+            pending[key] = row
+            sources[key] = (brand, autopart_data)
+        if not pending:
+            return {}
+
+        keys = list(pending)
+        rows = list(pending.values())
+        await self._assign_price_barcodes(rows, brand_names, session)
+        # OEM в базе может быть обрезан до MAX_LIGHT_OEM — сопоставляем
+        # сохранённую пару с исходным ключом строки прайса.
+        stored_keys = {
+            (row["oem_number"], row["brand_id"]): key
+            for key, row in zip(keys, rows)
+        }
+        resolved: Dict[Tuple[str, int], int] = {}
+        for chunk_start in range(0, len(rows), AUTOPART_BULK_CHUNK_SIZE):
+            chunk_keys = keys[chunk_start: chunk_start + AUTOPART_BULK_CHUNK_SIZE]
+            chunk_rows = rows[chunk_start: chunk_start + AUTOPART_BULK_CHUNK_SIZE]
+            stmt = (
+                pg_insert(AutoPart)
+                .values(chunk_rows)
+                .on_conflict_do_nothing(constraint="uq_brand_oem_number")
+                .returning(AutoPart.id, AutoPart.oem_number, AutoPart.brand_id)
+            )
+            try:
+                async with session.begin_nested():
+                    inserted = (await session.execute(stmt)).all()
+            except IntegrityError as e:
+                logger.warning(
+                    "Bulk autopart insert failed, falling back to per-row: %s", e
+                )
+                for key in chunk_keys:
+                    brand, autopart_data = sources[key]
+                    autopart = await self.create_autopart_from_price(
+                        new_autopart=AutoPartCreatePriceList(**autopart_data),
+                        session=session,
+                        default_brand=brand,
+                    )
+                    if autopart is not None:
+                        resolved[key] = int(autopart.id)
+                continue
+            for autopart_id, oem_number, brand_id in inserted:
+                resolved[stored_keys[(oem_number, int(brand_id))]] = int(autopart_id)
+
+        # Пары, пропущенные через ON CONFLICT, уже созданы кем-то ещё.
+        conflicted = [
+            (row["oem_number"], row["brand_id"])
+            for key, row in zip(keys, rows)
+            if key not in resolved
+        ]
+        if conflicted:
+            existing = await self.get_autopart_ids_by_oem_brand(conflicted, session)
+            for stored_key, autopart_id in existing.items():
+                resolved[stored_keys[stored_key]] = autopart_id
+        logger.debug(
+            "Bulk created autoparts from pricelist: %s requested, %s resolved",
+            len(keys),
+            len(resolved),
+        )
+        return resolved
+
     async def get_filtered(
         self,
         session: AsyncSession,
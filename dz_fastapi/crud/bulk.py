@@ -0,0 +1,106 @@
+import logging
+import os
+from typing import Iterable, Sequence
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dz_fastapi.core.db import Base
+
+logger = logging.getLogger("dz_fastapi")
+
+# Массовая запись через COPY (asyncpg copy_records_to_table) вместо
+# executemany по INSERT. На прайсах в 100к+ строк executemany был самым
+# медленным шагом после разбора файла.
+BULK_COPY_ENABLED = str(os.getenv("BULK_COPY_ENABLED", "1")).strip().lower() in {
+    "1",
+    "true",
+    "yes",
+    "on",
+}
+# На маленьких пачках COPY не даёт выигрыша — оставляем обычный INSERT.
+BULK_COPY_MIN_ROWS = max(1, int(os.getenv("BULK_COPY_MIN_ROWS", "500")))
+
+
+def _copy_columns(model: type[Base], rows: Sequence[dict]) -> list[str] | None:
+    """
+    Колонки для COPY или None, если COPY запишет не то же, что INSERT.
+
+    COPY пишет NULL в пропущенный ключ строки и не знает о Python-default
+    колонок (например, multiplicity=1), поэтому для строк с разным
+    набором ключей или без колонки с default остаётся обычный INSERT.
+    """
+    table = model.__table__
+    keys = set(rows[0].keys()) if rows else set()
+    unknown = keys - set(table.columns.keys())
+    if unknown:
+        raise ValueError(f"Unknown columns for {model.__tablename__}: {sorted(unknown)}")
+    if any(set(row.keys()) != keys for row in rows):
+        return None
+    for column in table.columns:
+        if column.name not in keys and column.default is not None:
+            return None
+    return [column.name for column in table.columns if column.name in keys]
+
+
+async def _get_asyncpg_connection(session: AsyncSession):
+    connection = await session.connection()
+    if connection.dialect.name != "postgresql" or connection.dialect.driver != "asyncpg":
+        return None
+    raw_connection = await connection.get_raw_connection()
+    return raw_connection.driver_connection
+
+
+async def copy_rows(
+    session: AsyncSession,
+    model: type[Base],
+    rows: Sequence[dict],
+    columns: Iterable[str] | None = None,
+) -> bool:
+    """
+    Записывает строки в таблицу модели через COPY в текущей транзакции
+    сессии. Возвращает False, если COPY недоступен (не asyncpg, например
+    SQLite в тестах) или не подходит для этих строк (см. _copy_columns) —
+    тогда строки нужно записать обычным INSERT.
+    """
+    column_names = list(columns) if columns is not None else _copy_columns(model, rows)
+    if column_names is None:
+        logger.debug("COPY skipped for %s: rows need column defaults", model.__tablename__)
+        return False
+    driver_connection = await _get_asyncpg_connection(session)
+    if driver_connection is None:
+        return False
+    records = [tuple(row.get(name) for name in column_names) for row in rows]
+    await driver_connection.copy_records_to_table(
+        model.__tablename__,
+        records=records,
+        columns=column_names,
+    )
+    return True
+
+
+async def bulk_insert_rows(
+    session: AsyncSession,
+    model: type[Base],
+    rows: Sequence[dict],
+    *,
+    use_copy: bool | None = None,
+) -> int:
+    """
+    Массовая вставка строк: COPY для больших пачек на Postgres/asyncpg,
+    иначе INSERT через executemany (прежний путь).
+    Строки без колонок с Python-default или с разным набором ключей
+    пишутся INSERT-ом, чтобы значения по умолчанию совпадали.
+    """
+    if not rows:
+        return 0
+    if use_copy is None:
+        use_copy = BULK_COPY_ENABLED and len(rows) >= BULK_COPY_MIN_ROWS
+    if use_copy:
+        # INSERT-ы, накопленные ORM, должны попасть в базу раньше COPY.
+        await session.flush()
+        if await copy_rows(session, model, rows):
+            logger.debug("COPY %s rows into %s", len(rows), model.__tablename__)
+            return len(rows)
+    await session.execute(insert(model), list(rows))
+    return len(rows)
@@ -1,28 +1,34 @@
 import asyncio
 import logging
+from datetime import timedelta
 from decimal import ROUND_HALF_UP, Decimal
 from math import ceil
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Union
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Union
 
+import numpy as np
 import pandas as pd
 from fastapi import HTTPException
 from pydantic import ValidationError
-from sqlalchemy import delete, func, insert, select, tuple_, update
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.orm import joinedload, lazyload, selectinload
 from sqlalchemy.sql import and_
 
 from dz_fastapi.api.validators import change_brand_name
-from dz_fastapi.core.constants import DEFAULT_PAGE_SIZE
+from dz_fastapi.core.constants import DEFAULT_PAGE_SIZE, PRICE_HISTORY_RETENTION_DAYS
 from dz_fastapi.core.db import AsyncSession
 from dz_fastapi.core.time import now_moscow
 from dz_fastapi.crud.autopart import crud_autopart
 from dz_fastapi.crud.base import CRUDBase
 from dz_fastapi.crud.brand import brand_crud
+from dz_fastapi.crud.bulk import bulk_insert_rows
+from dz_fastapi.crud.pricelist_frame_cache import pricelist_frame_cache
 from dz_fastapi.models.autopart import (
     AutoPart,
     AutoPartPriceHistory,
+    AutoPartPriceState,
     AutoPartRestockDecisionSupplier,
     preprocess_oem_number,
 )
@@ -43,6 +49,7 @@ from dz_fastapi.models.partner import (
     PriceList,
     PriceListAutoPartAssociation,
     PriceListMissingBrand,
+    PriceListStats,
     Provider,
     ProviderAbbreviation,
     ProviderConfigLastEmailUID,
@@ -55,7 +62,6 @@ from dz_fastapi.models.partner import (
     SupplierResponseConfig,
 )
 from dz_fastapi.models.settings import PriceListStaleAlert
-from dz_fastapi.schemas.autopart import AutoPartPricelist
 from dz_fastapi.schemas.partner import (
     CustomerCreate,
     CustomerExternalReferenceCreate,
@@ -106,6 +112,38 @@ def money(x) -> Decimal:
     return Decimal(str(x)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
 
+# Колонки кадра позиций прайса поставщика (transform_to_dataframe и
+# колоночная загрузка fetch_pricelist_frame).
+PRICELIST_FRAME_COLUMNS = [
+    "autopart_id",
+    "name",
+    "oem_number",
+    "brand_id",
+    "brand",
+    "provider_id",
+    "provider_config_id",
+    "pricelist_id",
+    "is_own_price",
+    "quantity",
+    "price",
+]
+
+# Границы корзин гистограммы изменения цены (%) в PriceListStats;
+# крайние корзины открыты: (-inf, -50) и [50, +inf).
+PRICE_CHANGE_HISTOGRAM_EDGES = [
+    -50.0, -20.0, -10.0, -5.0, -1.0, -0.01, 0.01, 1.0, 5.0, 10.0, 20.0, 50.0,
+]
+
+
+def _normalize_oem_filter(oem_numbers: Iterable[str]) -> set[str]:
+    normalized_oems = set()
+    for oem in oem_numbers:
+        normalized_oem = preprocess_oem_number(str(oem))
+        if normalized_oem:
+            normalized_oems.add(normalized_oem)
+    return normalized_oems
+
+
 def _derive_provider_is_vat_payer(
     type_prices: object,
     current_value: bool = False,
@@ -961,6 +999,11 @@ class CRUDProvider(CRUDBase[Provider, ProviderCreate, ProviderUpdate]):
                 .where(AutoPartPriceHistory.provider_id == source_provider_id)
                 .values(provider_id=target_provider_id)
             )
+            await session.execute(
+                update(AutoPartPriceState)
+                .where(AutoPartPriceState.provider_id == source_provider_id)
+                .values(provider_id=target_provider_id)
+            )
             await session.execute(
                 update(AutoPartRestockDecisionSupplier)
                 .where(AutoPartRestockDecisionSupplier.supplier_id == source_provider_id)
@@ -974,6 +1017,7 @@ class CRUDProvider(CRUDBase[Provider, ProviderCreate, ProviderUpdate]):
             # Удалить исходного поставщика
             await session.delete(source_provider)
             await session.commit()
+            pricelist_frame_cache.invalidate()
 
             logger.info(f"Merged provider {source_provider_id} " f"into {target_provider_id}")
             return True
@@ -1286,10 +1330,15 @@ class CRUDPriceList(CRUDBase[PriceList, PriceListCreate, PriceListUpdate]):
         provider_config_id: int | None = None,
     ) -> dict[int, dict]:
         """
-        Последнее известное состояние по каждой позиции данного провайдера
-        из таблицы AutoPartPriceHistory (events).
+        Последнее известное состояние по каждой позиции данного провайдера.
+        Для конфигурации прайса читается из AutoPartPriceState (индексный
+        поиск по provider_config_id), без конфигурации — DISTINCT ON
+        по AutoPartPriceHistory (events).
         Возвращает: {autopart_id: {'price': float, 'quantity': int}}
         """
+        if provider_config_id is not None:
+            return await self._get_price_state_snapshot(provider_config_id, session)
+
         stmt = (
             select(
                 AutoPartPriceHistory.autopart_id,
@@ -1305,8 +1354,6 @@ class CRUDPriceList(CRUDBase[PriceList, PriceListCreate, PriceListUpdate]):
                 AutoPartPriceHistory.id.desc(),
             )
         )
-        if provider_config_id is not None:
-            stmt = stmt.where(AutoPartPriceHistory.provider_config_id == provider_config_id)
         rows = (await session.execute(stmt)).all()
 
         return {
@@ -1317,6 +1364,119 @@ class CRUDPriceList(CRUDBase[PriceList, PriceListCreate, PriceListUpdate]):
             for r in rows
         }
 
+    async def _get_price_state_snapshot(
+        self, provider_config_id: int, session: AsyncSession
+    ) -> dict[int, dict]:
+        rows = (
+            await session.execute(
+                select(
+                    AutoPartPriceState.autopart_id,
+                    AutoPartPriceState.price,
+                    AutoPartPriceState.quantity,
+                    AutoPartPriceState.updated_at,
+                ).where(AutoPartPriceState.provider_config_id == provider_config_id)
+            )
+        ).all()
+        return {
+            r.autopart_id: {
+                "price": money(r.price),
+                "quantity": int(r.quantity),
+                "updated_at": r.updated_at,
+            }
+            for r in rows
+        }
+
+    async def _update_price_state(
+        self, session: AsyncSession, history_rows: list[dict]
+    ) -> None:
+        """Переносит новые события истории в AutoPartPriceState (upsert)."""
+        state_rows = [
+            {
+                "provider_config_id": row["provider_config_id"],
+                "autopart_id": row["autopart_id"],
+                "provider_id": row["provider_id"],
+                "pricelist_id": row["pricelist_id"],
+                "price": row["price"],
+                "quantity": row["quantity"],
+                "updated_at": row["created_at"],
+            }
+            for row in history_rows
+            if row["provider_config_id"] is not None
+        ]
+        if not state_rows:
+            return
+        stmt = pg_insert(AutoPartPriceState)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_autopart_price_state_config_autopart",
+            set_={
+                "provider_id": stmt.excluded.provider_id,
+                "pricelist_id": stmt.excluded.pricelist_id,
+                "price": stmt.excluded.price,
+                "quantity": stmt.excluded.quantity,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        await session.execute(stmt, state_rows)
+
+    async def backfill_price_state(
+        self,
+        session: AsyncSession,
+        provider_config_id: int | None = None,
+    ) -> int:
+        """
+        Строит AutoPartPriceState из последних событий AutoPartPriceHistory
+        (по всем конфигурациям или по одной). Без commit.
+        Возвращает число записанных строк.
+        """
+        latest = (
+            select(
+                AutoPartPriceHistory.provider_config_id,
+                AutoPartPriceHistory.autopart_id,
+                AutoPartPriceHistory.provider_id,
+                AutoPartPriceHistory.pricelist_id,
+                AutoPartPriceHistory.price,
+                AutoPartPriceHistory.quantity,
+                AutoPartPriceHistory.created_at,
+            )
+            .where(AutoPartPriceHistory.provider_config_id.is_not(None))
+            .distinct(
+                AutoPartPriceHistory.provider_config_id,
+                AutoPartPriceHistory.autopart_id,
+            )
+            .order_by(
+                AutoPartPriceHistory.provider_config_id,
+                AutoPartPriceHistory.autopart_id,
+                AutoPartPriceHistory.created_at.desc(),
+                AutoPartPriceHistory.id.desc(),
+            )
+        )
+        if provider_config_id is not None:
+            latest = latest.where(AutoPartPriceHistory.provider_config_id == provider_config_id)
+        stmt = pg_insert(AutoPartPriceState).from_select(
+            [
+                "provider_config_id",
+                "autopart_id",
+                "provider_id",
+                "pricelist_id",
+                "price",
+                "quantity",
+                "updated_at",
+            ],
+            latest,
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_autopart_price_state_config_autopart",
+            set_={
+                "provider_id": stmt.excluded.provider_id,
+                "pricelist_id": stmt.excluded.pricelist_id,
+                "price": stmt.excluded.price,
+                "quantity": stmt.excluded.quantity,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        result = await session.execute(stmt)
+        return int(result.rowcount or 0)
+
     async def cleanup_old_pricelists_keep_last_n(
         self,
         session: AsyncSession,
@@ -1378,6 +1538,412 @@ class CRUDPriceList(CRUDBase[PriceList, PriceListCreate, PriceListUpdate]):
         await session.commit()
         return len(ids)
 
+    async def _resolve_pricelist_rows(
+        self,
+        autoparts_data: Iterable[dict],
+        session: AsyncSession,
+        *,
+        brand_cache: dict[str, Optional[Brand]],
+        missing_brand_counts: dict[str, int],
+    ) -> list[tuple[int, int, Decimal, int]]:
+        """
+        Резолвит строки прайса в автозапчасти: бренды (с кэшем), пакетный
+        поиск существующих пар (oem, brand_id) и создание недостающих.
+        Возвращает (autopart_id, quantity, price, multiplicity) в порядке строк.
+        """
+        # Шаг 1: нормализуем строки и резолвим бренды (с кэшем),
+        # собираем пары (oem, brand_id) для пакетного поиска.
+        prepared_rows: list[dict] = []
+        for _row_idx, autopart_assoc_data in enumerate(autoparts_data):
+            # Каждые 500 строк отдаём управление event loop, чтобы
+            # большой прайс не подвешивал остальные запросы процесса.
+            if _row_idx % 500 == 0 and _row_idx > 0:
+                await asyncio.sleep(0)
+
+            autopart_data_dict = dict(autopart_assoc_data["autopart"])
+            quantity = autopart_assoc_data["quantity"]
+            price = autopart_assoc_data["price"]
+
+            item_default_brand = None
+            raw_brand_name = autopart_data_dict.get("brand")
+            if raw_brand_name:
+                normalized_brand_name = await change_brand_name(brand_name=str(raw_brand_name))
+                db_brand = brand_cache.get(normalized_brand_name)
+                if db_brand is None and (normalized_brand_name not in brand_cache):
+                    db_brand = await brand_crud.get_brand_by_name_or_none(
+                        brand_name=normalized_brand_name,
+                        session=session,
+                    )
+                    brand_cache[normalized_brand_name] = db_brand
+                if db_brand is None:
+                    missing_brand_counts[normalized_brand_name] = (
+                        missing_brand_counts.get(normalized_brand_name, 0) + 1
+                    )
+                    logger.debug(
+                        "Missing brand in pricelist row: %s",
+                        normalized_brand_name,
+                    )
+                    continue
+                item_default_brand = db_brand
+                autopart_data_dict["brand"] = None
+
+            if item_default_brand is None:
+                logger.warning(
+                    "Skipping pricelist row without brand: %s",
+                    autopart_data_dict,
+                )
+                continue
+
+            raw_oem = autopart_data_dict.get("oem_number")
+            if not raw_oem:
+                logger.warning(
+                    "Skipping pricelist row without oem_number: %s",
+                    autopart_data_dict,
+                )
+                continue
+            normalized_oem = preprocess_oem_number(str(raw_oem))
+            autopart_data_dict["oem_number"] = normalized_oem
+
+            prepared_rows.append(
+                {
+                    "oem_number": normalized_oem,
+                    "brand": item_default_brand,
+                    "autopart_data_dict": autopart_data_dict,
+                    "quantity": quantity,
+                    "price": price,
+                    "multiplicity": autopart_assoc_data.get("multiplicity"),
+                }
+            )
+
+        # Шаг 2: пакетно находим уже существующие автозапчасти.
+        # Раньше на каждую строку прайса выполнялся отдельный SELECT —
+        # на больших прайсах это десятки тысяч запросов и десятки минут.
+        existing_autopart_ids = await crud_autopart.get_autopart_ids_by_oem_brand(
+            [(row["oem_number"], int(row["brand"].id)) for row in prepared_rows],
+            session,
+        )
+
+        # Шаг 3: недостающие пары создаём пакетным
+        # INSERT ... ON CONFLICT DO NOTHING, а не по одной строке.
+        missing_items: dict[tuple[str, int], tuple[Brand, dict]] = {}
+        for row in prepared_rows:
+            lookup_key = (row["oem_number"], int(row["brand"].id))
+            if lookup_key not in existing_autopart_ids:
+                missing_items.setdefault(
+                    lookup_key, (row["brand"], row["autopart_data_dict"])
+                )
+        if missing_items:
+            existing_autopart_ids.update(
+                await crud_autopart.bulk_create_from_price(
+                    list(missing_items.values()), session
+                )
+            )
+
+        resolved_rows: list[tuple[int, int, Decimal, int]] = []
+        for row in prepared_rows:
+            lookup_key = (row["oem_number"], int(row["brand"].id))
+            autopart_id = existing_autopart_ids.get(lookup_key)
+            if autopart_id is None:
+                logger.warning(
+                    f"Failed to create or retrieve "
+                    f"AutoPart for data: {row['autopart_data_dict']}"
+                )
+                continue
+
+            resolved_rows.append(
+                (
+                    autopart_id,
+                    int(row["quantity"]),
+                    money(row["price"]),
+                    int(row.get("multiplicity") or 1),
+                )
+            )
+        return resolved_rows
+
+    @staticmethod
+    def _build_history_rows(
+        *,
+        current_positions: dict[int, dict],
+        last_history_map: dict[int, dict],
+        provider_id: int,
+        provider_config_id: int | None,
+        pricelist_id: int,
+        created_at,
+        stale_before=None,
+    ) -> list[dict]:
+        """
+        События для AutoPartPriceHistory: только изменения и исчезновения.
+        Неизменную позицию, чьё последнее событие старше stale_before
+        (его удалит cleanup_price_history_task), пишем заново, чтобы
+        в окне хранения истории у неё оставалась точка для графика.
+        """
+        bulk_insert_data_history = []
+
+        # 1. Проверяем изменения в текущих позициях
+        for autopart_id, current_data in current_positions.items():
+            last = last_history_map.get(autopart_id)
+            if last is not None:
+                price_changed = current_data["price"] != last["price"]
+                qty_changed = current_data["quantity"] != last["quantity"]
+                last_updated_at = last.get("updated_at")
+                expired = (
+                    stale_before is not None
+                    and last_updated_at is not None
+                    and last_updated_at < stale_before
+                )
+                if not (price_changed or qty_changed or expired):
+                    continue
+            # впервые видим эту позицию у этого провайдера, она изменилась
+            # либо её последнее событие выходит из окна хранения истории
+            bulk_insert_data_history.append(
+                {
+                    "autopart_id": autopart_id,
+                    "provider_id": provider_id,
+                    "provider_config_id": provider_config_id,
+                    "pricelist_id": pricelist_id,
+                    "created_at": created_at,
+                    "price": current_data["price"],
+                    "quantity": current_data["quantity"],
+                }
+            )
+
+        # 2. События исчезновения (qty=0)
+        # исчезли те, что были в last_history_map, но нет в current_positions
+        for autopart_id, last in last_history_map.items():
+            if not last or autopart_id in current_positions:
+                continue
+            # если уже было qty=0 — повторно не пишем
+            if last["quantity"] != 0:
+                bulk_insert_data_history.append(
+                    {
+                        "autopart_id": autopart_id,
+                        "provider_id": provider_id,
+                        "provider_config_id": provider_config_id,
+                        "pricelist_id": pricelist_id,
+                        "created_at": created_at,
+                        "price": last["price"],
+                        "quantity": 0,
+                    }
+                )
+        return bulk_insert_data_history
+
+    @staticmethod
+    def _build_pricelist_stats(
+        *,
+        current_positions: dict[int, dict],
+        last_history_map: dict[int, dict],
+    ) -> dict:
+        """
+        Сводка изменений для PriceListStats. Предыдущий прайс — позиции
+        снимка истории с ненулевым остатком (позиция с qty=0 в снимке
+        исчезла из прайса). Изменение цены считается как в дашборде:
+        (новая / прежняя - 1) * 100 по общим позициям с ненулевой
+        прежней ценой; «изменилась» — больше чем на 0.01%.
+        """
+        previous_ids = {
+            autopart_id
+            for autopart_id, last in last_history_map.items()
+            if last and last["quantity"] != 0
+        }
+        overlap_ids = [
+            autopart_id for autopart_id in current_positions if autopart_id in previous_ids
+        ]
+        current_prices = np.fromiter(
+            (float(current_positions[autopart_id]["price"]) for autopart_id in overlap_ids),
+            dtype=np.float64,
+            count=len(overlap_ids),
+        )
+        previous_prices = np.fromiter(
+            (float(last_history_map[autopart_id]["price"]) for autopart_id in overlap_ids),
+            dtype=np.float64,
+            count=len(overlap_ids),
+        )
+        valid = previous_prices != 0
+        changes = (current_prices[valid] / previous_prices[valid] - 1) * 100
+        changed_count = int(np.count_nonzero(np.abs(changes) > 0.01))
+        median_change_pct = None
+        changed_share_pct = None
+        histogram = None
+        if len(changes):
+            median_change_pct = float(np.median(changes))
+            changed_share_pct = round(changed_count / len(changes) * 100.0, 1)
+            # side="right": значение на границе попадает в корзину справа.
+            bins = np.searchsorted(PRICE_CHANGE_HISTOGRAM_EDGES, changes, side="right")
+            histogram = {
+                "edges": PRICE_CHANGE_HISTOGRAM_EDGES,
+                "counts": np.bincount(
+                    bins, minlength=len(PRICE_CHANGE_HISTOGRAM_EDGES) + 1
+                ).tolist(),
+            }
+        return {
+            "positions_count": len(current_positions),
+            "overlap_count": len(overlap_ids),
+            "added_count": len(current_positions) - len(overlap_ids),
+            "removed_count": len(previous_ids) - len(overlap_ids),
+            "changed_count": changed_count,
+            "median_change_pct": median_change_pct,
+            "changed_share_pct": changed_share_pct,
+            "price_change_histogram": histogram,
+        }
+
+    async def _start_pricelist(
+        self, obj_in: PriceListCreate, session: AsyncSession
+    ) -> tuple[PriceList, dict[int, dict]]:
+        """Создаёт PriceList и возвращает его вместе со снимком истории."""
+        obj_in_data = obj_in.model_dump()
+        obj_in_data.pop("autoparts", None)
+        db_obj = self.model(**obj_in_data)
+        session.add(db_obj)
+        await session.flush()
+
+        # Держим только актуальный срез отсутствующих брендов
+        # для текущей конфигурации прайса.
+        if db_obj.provider_config_id is not None:
+            await session.execute(
+                delete(PriceListMissingBrand).where(
+                    PriceListMissingBrand.provider_config_id == db_obj.provider_config_id
+                )
+            )
+
+        last_history_map = await self._get_last_history_snapshot(
+            session=session,
+            provider_id=db_obj.provider_id,
+            provider_config_id=db_obj.provider_config_id,
+        )
+        return db_obj, last_history_map
+
+    async def _finish_pricelist(
+        self,
+        db_obj: PriceList,
+        session: AsyncSession,
+        *,
+        current_positions: dict[int, dict],
+        last_history_map: dict[int, dict],
+        missing_brand_counts: dict[str, int],
+        created_at,
+        include_autoparts_response: bool,
+    ) -> PriceListResponse:
+        """История изменений, отсутствующие бренды, commit и ответ."""
+        # ===== ЗАПИСЬ ТОЛЬКО ИЗМЕНЕНИЙ В ИСТОРИЮ =====
+        bulk_insert_data_history = self._build_history_rows(
+            current_positions=current_positions,
+            last_history_map=last_history_map,
+            provider_id=db_obj.provider_id,
+            provider_config_id=db_obj.provider_config_id,
+            pricelist_id=db_obj.id,
+            created_at=created_at,
+            stale_before=created_at - timedelta(days=PRICE_HISTORY_RETENTION_DAYS),
+        )
+        if bulk_insert_data_history:
+            logger.debug(
+                f"Bulk inserting "
+                f"{len(bulk_insert_data_history)} "
+                f"records into AutoPartPriceHistory."
+            )
+            await bulk_insert_rows(session, AutoPartPriceHistory, bulk_insert_data_history)
+            await self._update_price_state(session, bulk_insert_data_history)
+
+        if db_obj.provider_config_id is not None:
+            # Снимок истории конфигурации — состояние после предыдущего
+            # загруженного прайса, он же и считается предыдущим.
+            previous_pricelist_id = (
+                await session.execute(
+                    select(PriceList.id)
+                    .where(
+                        PriceList.provider_config_id == db_obj.provider_config_id,
+                        PriceList.id < db_obj.id,
+                    )
+                    .order_by(PriceList.id.desc())
+                    .limit(1)
+                )
+            ).scalar_one_or_none()
+            stats = self._build_pricelist_stats(
+                current_positions=current_positions,
+                last_history_map=last_history_map,
+            )
+            await session.execute(
+                insert(PriceListStats).values(
+                    pricelist_id=db_obj.id,
+                    previous_pricelist_id=previous_pricelist_id,
+                    provider_config_id=db_obj.provider_config_id,
+                    created_at=created_at,
+                    **stats,
+                )
+            )
+
+        if db_obj.provider_config_id is not None and missing_brand_counts:
+            missing_rows = [
+                {
+                    "pricelist_id": db_obj.id,
+                    "provider_config_id": db_obj.provider_config_id,
+                    "brand_name": brand_name,
+                    "positions_count": positions_count,
+                    "created_at": created_at,
+                }
+                for brand_name, positions_count in missing_brand_counts.items()
+            ]
+            await session.execute(insert(PriceListMissingBrand), missing_rows)
+
+        await session.commit()
+        await session.refresh(db_obj)
+        if db_obj.provider_config_id is not None:
+            # Прежние прайсы конфигурации больше не последние.
+            pricelist_frame_cache.invalidate(
+                provider_config_id=db_obj.provider_config_id,
+                keep_pricelist_id=db_obj.id,
+            )
+
+        provider_obj = await session.get(Provider, db_obj.provider_id)
+        if not include_autoparts_response:
+            return PriceListResponse(
+                id=db_obj.id,
+                date=db_obj.date,
+                provider=provider_obj,
+                provider_config_id=db_obj.provider_config_id,
+                autoparts=[],
+            )
+
+        stmt = (
+            select(PriceList)
+            .where(PriceList.id == db_obj.id)
+            .options(
+                selectinload(PriceList.autopart_associations)
+                .selectinload(PriceListAutoPartAssociation.autopart)
+                .selectinload(AutoPart.categories),
+                selectinload(PriceList.autopart_associations)
+                .selectinload(PriceListAutoPartAssociation.autopart)
+                .selectinload(AutoPart.storage_locations),
+                selectinload(PriceList.config),
+            )
+        )
+        result = await session.execute(stmt)
+        db_obj = result.scalar_one()
+        logger.debug(
+            "Retrieved PriceList id=%s associations=%s",
+            db_obj.id,
+            len(getattr(db_obj, "autopart_associations", []) or []),
+        )
+
+        try:
+            return PriceListResponse(
+                id=db_obj.id,
+                date=db_obj.date,
+                provider=provider_obj,
+                provider_config_id=db_obj.provider_config_id,
+                autoparts=[
+                    PriceListAutoPartAssociationResponse(
+                        autopart=assoc.autopart,
+                        quantity=assoc.quantity,
+                        price=float(assoc.price),
+                        multiplicity=assoc.multiplicity,
+                    )
+                    for assoc in db_obj.autopart_associations
+                ],
+            )
+        except ValidationError as e:
+            logger.error(f"Validation error: {e.json()}")
+            raise HTTPException(status_code=500, detail=f"Validation error: {str(e)}")
+
     async def create(
         self, obj_in: PriceListCreate, session: AsyncSession, **kwargs
     ) -> PriceListResponse:
@@ -1387,162 +1953,35 @@ class CRUDPriceList(CRUDBase[PriceList, PriceListCreate, PriceListUpdate]):
             # без промежуточных pydantic-моделей (их валидация на 50к+ строк
             # занимала десятки секунд CPU в event loop).
             autoparts_payload = kwargs.pop("autoparts_payload", None)
-            obj_in_data = obj_in.model_dump()
-            autoparts_data = obj_in_data.pop("autoparts", [])
+            autoparts_data = obj_in.model_dump().get("autoparts", [])
             if autoparts_payload is not None:
                 autoparts_data = autoparts_payload
-            db_obj = self.model(**obj_in_data)
-            session.add(db_obj)
-            await session.flush()
-            default_brand = None
+            db_obj, last_history_map = await self._start_pricelist(obj_in, session)
             brand_cache: dict[str, Optional[Brand]] = {}
             missing_brand_counts: dict[str, int] = {}
-
-            bulk_insert_data: list[dict] = []
             bulk_insert_map: dict[int, dict] = {}
-
-            provider_id = db_obj.provider_id
-            provider_config_id = db_obj.provider_config_id
-            created_at_ts = now_moscow()
-
-            # Держим только актуальный срез отсутствующих брендов
-            # для текущей конфигурации прайса.
-            if provider_config_id is not None:
-                await session.execute(
-                    delete(PriceListMissingBrand).where(
-                        PriceListMissingBrand.provider_config_id == provider_config_id
-                    )
-                )
-
-            last_history_map = await self._get_last_history_snapshot(
-                session=session,
-                provider_id=provider_id,
-                provider_config_id=provider_config_id,
-            )
             current_positions: dict[int, dict] = {}
+            created_at_ts = now_moscow()
 
             # ===== ОБРАБОТКА ВХОДЯЩИХ ДАННЫХ =====
-            # Шаг 1: нормализуем строки и резолвим бренды (с кэшем),
-            # собираем пары (oem, brand_id) для пакетного поиска.
-            prepared_rows: list[dict] = []
-            for _row_idx, autopart_assoc_data in enumerate(autoparts_data):
-                # Каждые 500 строк отдаём управление event loop, чтобы
-                # большой прайс не подвешивал остальные запросы процесса.
-                if _row_idx % 500 == 0 and _row_idx > 0:
-                    await asyncio.sleep(0)
-
-                autopart_data_dict = dict(autopart_assoc_data["autopart"])
-                quantity = autopart_assoc_data["quantity"]
-                price = autopart_assoc_data["price"]
-
-                item_default_brand = default_brand
-                raw_brand_name = autopart_data_dict.get("brand")
-                if raw_brand_name:
-                    normalized_brand_name = await change_brand_name(brand_name=str(raw_brand_name))
-                    db_brand = brand_cache.get(normalized_brand_name)
-                    if db_brand is None and (normalized_brand_name not in brand_cache):
-                        db_brand = await brand_crud.get_brand_by_name_or_none(
-                            brand_name=normalized_brand_name,
-                            session=session,
-                        )
-                        brand_cache[normalized_brand_name] = db_brand
-                    if db_brand is None:
-                        missing_brand_counts[normalized_brand_name] = (
-                            missing_brand_counts.get(normalized_brand_name, 0) + 1
-                        )
-                        logger.debug(
-                            "Missing brand in pricelist row: %s",
-                            normalized_brand_name,
-                        )
-                        continue
-                    item_default_brand = db_brand
-                    autopart_data_dict["brand"] = None
-
-                if item_default_brand is None:
-                    logger.warning(
-                        "Skipping pricelist row without brand: %s",
-                        autopart_data_dict,
-                    )
-                    continue
-
-                raw_oem = autopart_data_dict.get("oem_number")
-                if not raw_oem:
-                    logger.warning(
-                        "Skipping pricelist row without oem_number: %s",
-                        autopart_data_dict,
-                    )
-                    continue
-                normalized_oem = preprocess_oem_number(str(raw_oem))
-                autopart_data_dict["oem_number"] = normalized_oem
-
-                prepared_rows.append(
-                    {
-                        "oem_number": normalized_oem,
-                        "brand": item_default_brand,
-                        "autopart_data_dict": autopart_data_dict,
-                        "quantity": quantity,
-                        "price": price,
-                        "multiplicity": autopart_assoc_data.get("multiplicity"),
-                    }
-                )
-
-            # Шаг 2: пакетно находим уже существующие автозапчасти.
-            # Раньше на каждую строку прайса выполнялся отдельный SELECT —
-            # на больших прайсах это десятки тысяч запросов и десятки минут.
-            existing_autopart_ids: dict[tuple[str, int], int] = {}
-            lookup_pairs = sorted(
-                {(row["oem_number"], int(row["brand"].id)) for row in prepared_rows}
-            )
-            LOOKUP_CHUNK_SIZE = 1000
-            for chunk_start in range(0, len(lookup_pairs), LOOKUP_CHUNK_SIZE):
-                chunk = lookup_pairs[chunk_start: chunk_start + LOOKUP_CHUNK_SIZE]
-                lookup_stmt = select(
-                    AutoPart.id,
-                    AutoPart.oem_number,
-                    AutoPart.brand_id,
-                ).where(tuple_(AutoPart.oem_number, AutoPart.brand_id).in_(chunk))
-                for ap_id, ap_oem, ap_brand_id in (await session.execute(lookup_stmt)).all():
-                    existing_autopart_ids[(ap_oem, int(ap_brand_id))] = int(ap_id)
-
-            # Шаг 3: собираем ассоциации; новые автозапчасти создаём
-            # только для пар, которых ещё нет в базе.
-            for _row_idx, row in enumerate(prepared_rows):
-                if _row_idx % 500 == 0 and _row_idx > 0:
-                    await asyncio.sleep(0)
-
-                lookup_key = (row["oem_number"], int(row["brand"].id))
-                autopart_id = existing_autopart_ids.get(lookup_key)
-                if autopart_id is None:
-                    autopart_data = AutoPartPricelist(**row["autopart_data_dict"])
-                    autopart = await crud_autopart.create_autopart_from_price(
-                        new_autopart=autopart_data,
-                        session=session,
-                        default_brand=row["brand"],
-                    )
-                    if not autopart:
-                        logger.warning(
-                            f"Failed to create or retrieve "
-                            f"AutoPart for data: {row['autopart_data_dict']}"
-                        )
-                        continue
-                    autopart_id = int(autopart.id)
-                    existing_autopart_ids[lookup_key] = autopart_id
-
-                qty = int(row["quantity"])
-                prc = money(row["price"])
-                mult = int(row.get("multiplicity") or 1)
+            resolved_rows = await self._resolve_pricelist_rows(
+                autoparts_data,
+                session,
+                brand_cache=brand_cache,
+                missing_brand_counts=missing_brand_counts,
+            )
+            for autopart_id, qty, prc, mult in resolved_rows:
                 existing_assoc = bulk_insert_map.get(autopart_id)
                 if existing_assoc and existing_assoc["price"] < prc:
                     continue
 
-                assoc_row = {
+                bulk_insert_map[autopart_id] = {
                     "pricelist_id": db_obj.id,
                     "autopart_id": autopart_id,
                     "quantity": qty,
                     "price": prc,
                     "multiplicity": mult,
                 }
-                bulk_insert_map[autopart_id] = assoc_row
 
                 # Запоминаем актуальную позицию для истории изменений.
                 current_positions[autopart_id] = {
@@ -1550,146 +1989,120 @@ class CRUDPriceList(CRUDBase[PriceList, PriceListCreate, PriceListUpdate]):
                     "quantity": qty,
                 }
 
+            # Шаг 4: Выполнение массовой вставки ассоциаций, если есть данные
             if bulk_insert_map:
                 bulk_insert_data = list(bulk_insert_map.values())
-
-            # Шаг 4: Выполнение массовой вставки ассоциаций, если есть данные
-            if bulk_insert_data:
                 logger.debug(f"Bulk inserting {len(bulk_insert_data)} associations.")
-                await session.execute(insert(PriceListAutoPartAssociation), bulk_insert_data)
-
-            # ===== ЗАПИСЬ ТОЛЬКО ИЗМЕНЕНИЙ В ИСТОРИЮ =====
-            bulk_insert_data_history = []
-
-            # 1. Проверяем изменения в текущих позициях
-            for autopart_id, current_data in current_positions.items():
-                last = last_history_map.get(autopart_id)
-                if last is None:
-                    # впервые видим эту позицию у этого провайдера
-                    bulk_insert_data_history.append(
-                        {
-                            "autopart_id": autopart_id,
-                            "provider_id": provider_id,
-                            "pricelist_id": db_obj.id,
-                            "provider_config_id": provider_config_id,
-                            "created_at": created_at_ts,
-                            "price": current_data["price"],
-                            "quantity": current_data["quantity"],
-                        }
-                    )
-                    continue
-                price_changed = current_data["price"] != last["price"]
-                qty_changed = current_data["quantity"] != last["quantity"]
-                if price_changed or qty_changed:
-                    bulk_insert_data_history.append(
-                        {
-                            "autopart_id": autopart_id,
-                            "provider_id": provider_id,
-                            "provider_config_id": provider_config_id,
-                            "pricelist_id": db_obj.id,
-                            "created_at": created_at_ts,
-                            "price": current_data["price"],
-                            "quantity": current_data["quantity"],
-                        }
-                    )
-
-            # 3) События исчезновения (qty=0)
-            # исчезли те, что были в last_history_map, но нет в current_ids
-            current_ids = set(current_positions.keys())
-            missing_ids = set(last_history_map.keys()) - current_ids
+                await bulk_insert_rows(session, PriceListAutoPartAssociation, bulk_insert_data)
+
+            return await self._finish_pricelist(
+                db_obj,
+                session,
+                current_positions=current_positions,
+                last_history_map=last_history_map,
+                missing_brand_counts=missing_brand_counts,
+                created_at=created_at_ts,
+                include_autoparts_response=include_autoparts_response,
+            )
+        except HTTPException:
+            raise
+        except IntegrityError as e:
+            logger.error(f"Integrity error occurred: {e}")
+            await session.rollback()
+            raise HTTPException(status_code=400, detail="Integrity error during creation")
+        except SQLAlchemyError as e:
+            logger.error(f"Database error occurred: {e}")
+            await session.rollback()
+            raise HTTPException(status_code=500, detail="Database error during creation")
+        except Exception as e:
+            logger.error(f"Unexpected error occurred: {e}")
+            await session.rollback()
+            raise HTTPException(status_code=500, detail="Unexpected error during creation")
 
-            for autopart_id in missing_ids:
-                last = last_history_map.get(autopart_id)
-                if not last:
-                    continue
-                # если уже было qty=0 — повторно не пишем
-                if last["quantity"] != 0:
-                    bulk_insert_data_history.append(
-                        {
-                            "autopart_id": autopart_id,
-                            "provider_id": provider_id,
-                            "provider_config_id": provider_config_id,
-                            "pricelist_id": db_obj.id,
-                            "created_at": created_at_ts,
-                            "price": last["price"],
-                            "quantity": 0,
-                        }
-                    )
-            if bulk_insert_data_history:
-                logger.debug(
-                    f"Bulk inserting "
-                    f"{len(bulk_insert_data_history)} "
-                    f"records into AutoPartPriceHistory."
+    async def create_from_chunks(
+        self,
+        obj_in: PriceListCreate,
+        session: AsyncSession,
+        chunks: AsyncIterator[list[dict]],
+        include_autoparts_response: bool = False,
+    ) -> PriceListResponse:
+        """
+        Потоковый вариант create: строки прайса приходят пачками и сразу
+        пишутся в PriceListAutoPartAssociation. В памяти между пачками
+        остаётся только компактный срез {autopart_id: price/quantity},
+        нужный для дедупликации по минимальной цене и истории изменений.
+        Всё выполняется в одной транзакции, как и в create.
+        """
+        try:
+            db_obj, last_history_map = await self._start_pricelist(obj_in, session)
+            brand_cache: dict[str, Optional[Brand]] = {}
+            missing_brand_counts: dict[str, int] = {}
+            current_positions: dict[int, dict] = {}
+            created_at_ts = now_moscow()
+            inserted_total = 0
+
+            async for chunk in chunks:
+                resolved_rows = await self._resolve_pricelist_rows(
+                    chunk,
+                    session,
+                    brand_cache=brand_cache,
+                    missing_brand_counts=missing_brand_counts,
                 )
-                await session.execute(insert(AutoPartPriceHistory), bulk_insert_data_history)
-
-            if provider_config_id is not None and missing_brand_counts:
-                missing_rows = [
-                    {
+                new_rows: dict[int, dict] = {}
+                replaced_rows: dict[int, dict] = {}
+                for autopart_id, qty, prc, mult in resolved_rows:
+                    existing = current_positions.get(autopart_id)
+                    if existing and existing["price"] < prc:
+                        continue
+                    assoc_row = {
                         "pricelist_id": db_obj.id,
-                        "provider_config_id": provider_config_id,
-                        "brand_name": brand_name,
-                        "positions_count": positions_count,
-                        "created_at": created_at_ts,
+                        "autopart_id": autopart_id,
+                        "quantity": qty,
+                        "price": prc,
+                        "multiplicity": mult,
+                    }
+                    # Дубль из уже записанной пачки с ценой не выше —
+                    # обновляем строку, а не вставляем вторую.
+                    if existing is None or autopart_id in new_rows:
+                        new_rows[autopart_id] = assoc_row
+                    else:
+                        replaced_rows[autopart_id] = assoc_row
+                    current_positions[autopart_id] = {
+                        "price": prc,
+                        "quantity": qty,
                     }
-                    for brand_name, positions_count in missing_brand_counts.items()
-                ]
-                await session.execute(insert(PriceListMissingBrand), missing_rows)
-
-            await session.commit()
-            await session.refresh(db_obj)
 
-            provider_obj = await session.get(Provider, db_obj.provider_id)
-            if not include_autoparts_response:
-                return PriceListResponse(
-                    id=db_obj.id,
-                    date=db_obj.date,
-                    provider=provider_obj,
-                    provider_config_id=db_obj.provider_config_id,
-                    autoparts=[],
-                )
+                if new_rows:
+                    await bulk_insert_rows(
+                        session,
+                        PriceListAutoPartAssociation,
+                        list(new_rows.values()),
+                    )
+                    inserted_total += len(new_rows)
+                if replaced_rows:
+                    await session.execute(
+                        update(PriceListAutoPartAssociation),
+                        list(replaced_rows.values()),
+                    )
+                del resolved_rows, new_rows, replaced_rows
 
-            stmt = (
-                select(PriceList)
-                .where(PriceList.id == db_obj.id)
-                .options(
-                    selectinload(PriceList.autopart_associations)
-                    .selectinload(PriceListAutoPartAssociation.autopart)
-                    .selectinload(AutoPart.categories),
-                    selectinload(PriceList.autopart_associations)
-                    .selectinload(PriceListAutoPartAssociation.autopart)
-                    .selectinload(AutoPart.storage_locations),
-                    selectinload(PriceList.config),
-                )
-            )
-            result = await session.execute(stmt)
-            db_obj = result.scalar_one()
             logger.debug(
-                "Retrieved PriceList id=%s associations=%s",
+                "Streamed %s associations into pricelist_id=%s",
+                inserted_total,
                 db_obj.id,
-                len(getattr(db_obj, "autopart_associations", []) or []),
             )
-
-            try:
-                response = PriceListResponse(
-                    id=db_obj.id,
-                    date=db_obj.date,
-                    provider=provider_obj,
-                    provider_config_id=db_obj.provider_config_id,
-                    autoparts=[
-                        PriceListAutoPartAssociationResponse(
-                            autopart=assoc.autopart,
-                            quantity=assoc.quantity,
-                            price=float(assoc.price),
-                            multiplicity=assoc.multiplicity,
-                        )
-                        for assoc in db_obj.autopart_associations
-                    ],
-                )
-                return response
-            except ValidationError as e:
-                logger.error(f"Validation error: {e.json()}")
-                raise HTTPException(status_code=500, detail=f"Validation error: {str(e)}")
+            return await self._finish_pricelist(
+                db_obj,
+                session,
+                current_positions=current_positions,
+                last_history_map=last_history_map,
+                missing_brand_counts=missing_brand_counts,
+                created_at=created_at_ts,
+                include_autoparts_response=include_autoparts_response,
+            )
+        except HTTPException:
+            await session.rollback()
+            raise
         except IntegrityError as e:
             logger.error(f"Integrity error occurred: {e}")
             await session.rollback()
@@ -1796,11 +2209,7 @@ class CRUDPriceList(CRUDBase[PriceList, PriceListCreate, PriceListUpdate]):
             .where(PriceListAutoPartAssociation.pricelist_id == pricelist_id)
         )
         if oem_numbers is not None:
-            normalized_oems = set()
-            for oem in oem_numbers:
-                normalized_oem = preprocess_oem_number(str(oem))
-                if normalized_oem:
-                    normalized_oems.add(normalized_oem)
+            normalized_oems = _normalize_oem_filter(oem_numbers)
             if not normalized_oems:
                 return []
             stmt = stmt.join(PriceListAutoPartAssociation.autopart).where(
@@ -1842,6 +2251,104 @@ class CRUDPriceList(CRUDBase[PriceList, PriceListCreate, PriceListUpdate]):
         # event loop, чтобы не блокировать другие запросы.
         return await asyncio.to_thread(_build_dataframe)
 
+    async def fetch_pricelist_frame(
+        self,
+        pricelist_id: int,
+        session: AsyncSession,
+        oem_numbers: Optional[Iterable[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Колоночная загрузка позиций прайса: те же колонки, что у
+        transform_to_dataframe, но без ORM-объектов. Запрос выбирает
+        только скаляры, а DataFrame строится из кортежей строк разом.
+        """
+        meta = (
+            await session.execute(
+                select(
+                    PriceList.provider_id,
+                    PriceList.provider_config_id,
+                    func.coalesce(Provider.is_own_price, False),
+                )
+                .outerjoin(Provider, Provider.id == PriceList.provider_id)
+                .where(PriceList.id == pricelist_id)
+            )
+        ).first()
+        if meta is None:
+            return pd.DataFrame(columns=PRICELIST_FRAME_COLUMNS)
+        stmt = (
+            select(
+                AutoPart.id,
+                AutoPart.name,
+                AutoPart.oem_number,
+                AutoPart.brand_id,
+                Brand.name,
+                PriceListAutoPartAssociation.quantity,
+                PriceListAutoPartAssociation.price,
+            )
+            .join(AutoPart, AutoPart.id == PriceListAutoPartAssociation.autopart_id)
+            .outerjoin(Brand, Brand.id == AutoPart.brand_id)
+            .where(PriceListAutoPartAssociation.pricelist_id == pricelist_id)
+        )
+        if oem_numbers is not None:
+            normalized_oems = _normalize_oem_filter(oem_numbers)
+            if not normalized_oems:
+                return pd.DataFrame(columns=PRICELIST_FRAME_COLUMNS)
+            stmt = stmt.where(AutoPart.oem_number.in_(normalized_oems))
+        rows = (await session.execute(stmt)).all()
+        provider_id, provider_config_id, is_own_price = meta
+
+        def _build_dataframe() -> pd.DataFrame:
+            df = pd.DataFrame.from_records(
+                rows,
+                columns=[
+                    "autopart_id",
+                    "name",
+                    "oem_number",
+                    "brand_id",
+                    "brand",
+                    "quantity",
+                    "price",
+                ],
+            )
+            df["provider_id"] = provider_id
+            df["provider_config_id"] = provider_config_id
+            df["pricelist_id"] = int(pricelist_id)
+            df["is_own_price"] = bool(is_own_price)
+            df["price"] = df["price"].astype(float)
+            return df[PRICELIST_FRAME_COLUMNS]
+
+        return await asyncio.to_thread(_build_dataframe)
+
+    async def get_pricelist_frame(
+        self,
+        pricelist_id: int,
+        session: AsyncSession,
+        oem_numbers: Optional[Iterable[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        DataFrame позиций прайса (fetch_pricelist_frame) через
+        общий кэш процесса. Вызывающий получает свою копию и может её менять.
+        С oem_numbers кадр фильтруется из кэша, а при промахе
+        читаются только нужные позиции — ради нескольких OEM весь прайс
+        не загружается и не кэшируется.
+        """
+        pricelist_id = int(pricelist_id)
+        if oem_numbers is not None:
+            normalized_oems = _normalize_oem_filter(oem_numbers)
+            if not normalized_oems:
+                return pd.DataFrame(columns=PRICELIST_FRAME_COLUMNS)
+            cached = pricelist_frame_cache.get(pricelist_id)
+            if cached is not None:
+                return cached[cached["oem_number"].isin(normalized_oems)].copy()
+            return await self.fetch_pricelist_frame(
+                pricelist_id, session, oem_numbers=normalized_oems
+            )
+
+        return await pricelist_frame_cache.get_or_load(
+            pricelist_id,
+            lambda: self.fetch_pricelist_frame(pricelist_id, session),
+        )
+
     async def get_pricelist_ids_by_provider(
         self, session: AsyncSession, provider_id: int
     ) -> List[int]:
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+import pandas as pd
+
+logger = logging.getLogger("dz_fastapi")
+
+# Кэш DataFrame позиций прайса поставщика по pricelist_id. Прайс после
+# загрузки не меняется, поэтому рассылка прайсов клиентам и подбор
+# предложений для заказов строят кадр источника один раз на процесс,
+# а не для каждого клиента, у которого этот поставщик в источниках.
+PRICELIST_FRAME_CACHE_MAX_ROWS = max(
+    0,
+    int(os.getenv("PRICELIST_FRAME_CACHE_MAX_ROWS", "3000000")),
+)
+# TTL ограничивает устаревание после слияния брендов/автозапчастей
+# в другом процессе; 0 — выключить кэш.
+PRICELIST_FRAME_CACHE_TTL_SEC = max(
+    0,
+    int(os.getenv("PRICELIST_FRAME_CACHE_TTL_SEC", "1800")),
+)
+
+
+class PriceListFrameCache:
+    """
+    LRU-кэш кадров прайсов, ограниченный суммарным числом строк.
+
+    Хранимый кадр никому не отдаётся: get_or_load возвращает копию,
+    поэтому фильтры и наценки одного клиента не видны другим.
+    Параллельные промахи по одному прайсу ждут одну загрузку.
+    """
+
+    def __init__(self, max_rows: int, ttl_sec: int):
+        self.max_rows = max_rows
+        self.ttl_sec = ttl_sec
+        self._entries: OrderedDict[int, tuple[float, int | None, pd.DataFrame]] = (
+            OrderedDict()
+        )
+        self._rows = 0
+        self._loading: dict[int, asyncio.Future] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_rows > 0 and self.ttl_sec > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _pop(self, pricelist_id: int) -> None:
+        entry = self._entries.pop(pricelist_id, None)
+        if entry is not None:
+            self._rows -= len(entry[2])
+
+    def get(self, pricelist_id: int) -> pd.DataFrame | None:
+        entry = self._entries.get(pricelist_id)
+        if entry is None:
+            return None
+        created_at, _, frame = entry
+        if time.monotonic() - created_at > self.ttl_sec:
+            self._pop(pricelist_id)
+            return None
+        self._entries.move_to_end(pricelist_id)
+        return frame
+
+    def put(
+        self,
+        pricelist_id: int,
+        provider_config_id: int | None,
+        frame: pd.DataFrame,
+    ) -> None:
+        if not self.enabled or len(frame) > self.max_rows:
+            return
+        self._pop(pricelist_id)
+        self._entries[pricelist_id] = (time.monotonic(), provider_config_id, frame)
+        self._rows += len(frame)
+        while self._rows > self.max_rows and self._entries:
+            oldest_id = next(iter(self._entries))
+            self._pop(oldest_id)
+
+    def invalidate(
+        self,
+        *,
+        provider_config_id: int | None = None,
+        keep_pricelist_id: int | None = None,
+    ) -> None:
+        """Сбрасывает кадры конфигурации (или все, если она не указана)."""
+        if provider_config_id is None:
+            self._entries.clear()
+            self._rows = 0
+            return
+        stale_ids = [
+            pricelist_id
+            for pricelist_id, (_, config_id, _) in self._entries.items()
+            if config_id == provider_config_id and pricelist_id != keep_pricelist_id
+        ]
+        for pricelist_id in stale_ids:
+            self._pop(pricelist_id)
+
+    async def get_or_load(
+        self,
+        pricelist_id: int,
+        loader: Callable[[], Awaitable[pd.DataFrame]],
+    ) -> pd.DataFrame:
+        if not self.enabled:
+            return await loader()
+        frame = self.get(pricelist_id)
+        if frame is not None:
+            return frame.copy()
+
+        loop = asyncio.get_running_loop()
+        pending = self._loading.get(pricelist_id)
+        if pending is not None and pending.get_loop() is loop:
+            try:
+                frame = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                frame = None
+            except Exception:
+                # Загрузка в другой задаче упала — пробуем сами.
+                frame = None
+            if frame is not None:
+                return frame.copy()
+
+        future = loop.create_future()
+        self._loading[pricelist_id] = future
+        try:
+            frame = await loader()
+        except Exception as exc:
+            future.set_exception(exc)
+            # Исключение получит вызывающий; ожидающие загрузят кадр сами.
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(frame)
+        finally:
+            if self._loading.get(pricelist_id) is future:
+                del self._loading[pricelist_id]
+        if not frame.empty:
+            provider_config_id = None
+            if "provider_config_id" in frame.columns:
+                provider_config_id = frame["provider_config_id"].iloc[0]
+                provider_config_id = (
+                    None if pd.isna(provider_config_id) else int(provider_config_id)
+                )
+            self.put(pricelist_id, provider_config_id, frame)
+        return frame.copy()
+
+
+pricelist_frame_cache = PriceListFrameCache(
+    max_rows=PRICELIST_FRAME_CACHE_MAX_ROWS,
+    ttl_sec=PRICELIST_FRAME_CACHE_TTL_SEC,
+)
@@ -40,6 +40,9 @@ from dz_fastapi.core.config import settings
 from dz_fastapi.core.constants import get_upload_dir
 from dz_fastapi.core.db import dispose_engines, get_async_session
 from dz_fastapi.services.auth import ensure_admin_user
+from dz_fastapi.services.cpu_pool import shutdown_cpu_pool
+from dz_fastapi.services.imap_pool import close_imap_pool
+from dz_fastapi.services.outbox_notify import close_outbox_listener
 from dz_fastapi.services.scheduler import start_scheduler
 from dz_fastapi.services.telegram_bot import start_telegram_bot
 
@@ -136,6 +139,12 @@ async def lifespan(app: FastAPI):
         # Отменяем задачу бота
         if bot_task:
             bot_task.cancel()
+        shutdown_cpu_pool()
+        close_imap_pool()
+        try:
+            await close_outbox_listener()
+        except Exception as e:
+            logger.exception(f"Outbox listener shutdown error: {e}")
         try:
             await dispose_engines()
         except Exception as e:
@@ -35,20 +35,30 @@ from dz_fastapi.core.time import now_moscow
 logger = logging.getLogger("dz_fastapi")
 
 
-def _build_autopart_barcode(connection, target, brand_name: str) -> str:
-    base = f"{brand_name}{target.oem_number}"
+def autopart_barcode_variants(
+    brand_id: int, brand_name: str, oem_number: str
+) -> tuple[str, str]:
+    """
+    Штрихкод автозапчасти (бренд + OEM) и запасной вариант
+    с хэшем пары brand_id/OEM на случай коллизии.
+    """
+    base = f"{brand_name}{oem_number}"
     candidate = _truncate_if_needed(base, MAX_LIGHT_BARCODE, "barcode")
+    digest = sha1(f"{brand_id}:{oem_number}".encode("utf-8")).hexdigest()[:10]
+    suffix = f"~{brand_id:x}-{digest}"
+    return candidate, f"{base[:MAX_LIGHT_BARCODE - len(suffix)]}{suffix}"
+
+
+def _build_autopart_barcode(connection, target, brand_name: str) -> str:
+    candidate, fallback = autopart_barcode_variants(
+        target.brand_id, brand_name, target.oem_number
+    )
     collision = connection.execute(
         select(AutoPart.id).where(AutoPart.barcode == candidate).limit(1)
     ).first()
     if collision is None:
         return candidate
-
-    digest = sha1(
-        f"{target.brand_id}:{target.oem_number}".encode("utf-8")
-    ).hexdigest()[:10]
-    suffix = f"~{target.brand_id:x}-{digest}"
-    return f"{base[:MAX_LIGHT_BARCODE - len(suffix)]}{suffix}"
+    return fallback
 
 
 @unique
@@ -489,6 +499,46 @@ class AutoPartPriceHistory(Base):
     )
 
 
+class AutoPartPriceState(Base):
+    """
+    Последнее известное состояние позиции у конфигурации прайса поставщика
+    (цена и остаток из последнего события AutoPartPriceHistory).
+    Обновляется в той же транзакции, что и история, — загрузка прайса
+    сравнивает позиции с этой таблицей, а не со всей историей.
+    """
+
+    provider_config_id = Column(
+        Integer,
+        ForeignKey("providerpricelistconfig.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    autopart_id = Column(
+        Integer,
+        ForeignKey("autopart.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    provider_id = Column(
+        Integer, ForeignKey("provider.id", ondelete="CASCADE"), nullable=False
+    )
+    pricelist_id = Column(Integer, nullable=False)
+    price = Column(DECIMAL(10, 2), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=now_moscow,
+        nullable=False,
+    )
+
+    __table_args__ = (
+        UniqueConstraint(
+            "provider_config_id",
+            "autopart_id",
+            name="uq_autopart_price_state_config_autopart",
+        ),
+    )
+
+
 class AutoPartRestockDecision(Base):
     autopart_id = Column(Integer, ForeignKey("autopart.id"), index=True)
     required_quantity = Column(Integer, nullable=False)
@@ -2,6 +2,7 @@ from sqlalchemy import (
     Boolean,
     CheckConstraint,
     Column,
+    DateTime,
     ForeignKey,
     Integer,
     String,
@@ -11,6 +12,7 @@ from sqlalchemy import (
 from sqlalchemy.orm import relationship
 
 from dz_fastapi.core.db import Base
+from dz_fastapi.core.time import now_moscow
 
 
 class AutoPartCross(Base):
@@ -81,6 +83,56 @@ class AutoPartCross(Base):
     )
 
 
+class AutoPartCrossCluster(Base):
+    """
+    Группа взаимозаменяемых позиций: все члены — взаимные кроссы друг
+    друга. Группа из N позиций занимает N строк членства вместо
+    N·(N-1) строк AutoPartCross. Читатели кроссов объединяют кластеры
+    с рёбрами AutoPartCross, поэтому обе формы живут одновременно.
+
+    Пример: группа аналогов из выгрузки 1С (source="1c_import",
+    external_key — идентификатор группы).
+    """
+
+    source = Column(String(32), nullable=False)
+    external_key = Column(String(255), nullable=False)
+    comment = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), default=now_moscow, nullable=False)
+
+    members = relationship(
+        "AutoPartCrossClusterMember",
+        back_populates="cluster",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
+    __table_args__ = (
+        UniqueConstraint("source", "external_key", name="uq_cross_cluster_key"),
+    )
+
+
+class AutoPartCrossClusterMember(Base):
+    cluster_id = Column(
+        Integer,
+        ForeignKey("autopartcrosscluster.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    autopart_id = Column(
+        Integer,
+        ForeignKey("autopart.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+
+    cluster = relationship("AutoPartCrossCluster", back_populates="members")
+    autopart = relationship("AutoPart")
+
+    __table_args__ = (
+        UniqueConstraint("cluster_id", "autopart_id", name="uq_cross_cluster_member"),
+    )
+
+
 class AutoPartSubstitution(Base):
     """
     Таблица подмены для прайс-листов.
@@ -2148,6 +2148,43 @@ class ShipmentDocumentItemLotAllocation(Base):
     )
 
 
+class ShipmentProfitDaily(Base):
+    """Дневной свод выручки и себестоимости проведённых отгрузок.
+
+    Ключ — (день по Москве, клиент, поставщик партии, бренд, запчасть);
+    0 в customer_id/provider_id/brand_id означает «не указан». Проведение
+    накладной прибавляет её вклад, отмена — вычитает (services.shipment_profit).
+    Отчёт по валовой прибыли — GROUP BY по этой таблице.
+    """
+
+    __tablename__ = "shipmentprofitdaily"
+
+    day = Column(Date, nullable=False)
+    customer_id = Column(Integer, nullable=False, default=0)
+    provider_id = Column(Integer, nullable=False, default=0)
+    brand_id = Column(Integer, nullable=False, default=0)
+    autopart_id = Column(Integer, nullable=False)
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue_total = Column(DECIMAL(16, 2), nullable=False, default=Decimal("0.00"))
+    cost_total = Column(DECIMAL(16, 2), nullable=False, default=Decimal("0.00"))
+    costed_quantity = Column(Integer, nullable=False, default=0)
+    uncosted_quantity = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "day",
+            "customer_id",
+            "provider_id",
+            "brand_id",
+            "autopart_id",
+            name="uq_shipment_profit_daily_key",
+        ),
+        Index("ix_shipment_profit_daily_provider_day", "provider_id", "day"),
+        Index("ix_shipment_profit_daily_customer_day", "customer_id", "day"),
+        Index("ix_shipment_profit_daily_autopart_day", "autopart_id", "day"),
+    )
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # Возвраты
 # ═══════════════════════════════════════════════════════════════════════════════
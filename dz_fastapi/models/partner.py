@@ -533,6 +533,51 @@ class PriceListMissingBrand(Base):
     )
 
 
+class PriceListStats(Base):
+    """
+    Сводка изменений прайса относительно предыдущего прайса той же
+    конфигурации. Пишется при загрузке (CRUDPriceList) из уже собранных
+    в памяти позиций — дашборд и алерты читают одну строку вместо
+    сопоставления двух прайсов целиком.
+    """
+
+    pricelist_id = Column(
+        Integer,
+        ForeignKey("pricelist.id", ondelete="CASCADE"),
+        nullable=False,
+        unique=True,
+    )
+    previous_pricelist_id = Column(
+        Integer,
+        ForeignKey("pricelist.id", ondelete="SET NULL"),
+        nullable=True,
+    )
+    provider_config_id = Column(
+        Integer,
+        ForeignKey("providerpricelistconfig.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    positions_count = Column(Integer, nullable=False, default=0)
+    overlap_count = Column(Integer, nullable=False, default=0)
+    added_count = Column(Integer, nullable=False, default=0)
+    removed_count = Column(Integer, nullable=False, default=0)
+    # По общим позициям с ненулевой прежней ценой.
+    changed_count = Column(Integer, nullable=False, default=0)
+    median_change_pct = Column(Float, nullable=True)
+    changed_share_pct = Column(Float, nullable=True)
+    # {"edges": [...], "counts": [...]}: counts на одну больше, чем edges,
+    # крайние корзины открыты.
+    price_change_histogram = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), default=now_moscow)
+
+    __table_args__ = (
+        Index(
+            "ix_priceliststats_provider_config_id",
+            "provider_config_id",
+        ),
+    )
+
+
 class CustomerPriceListAutoPartAssociation(Base):
     id = None
     customerpricelist_id = Column(Integer, ForeignKey("customerpricelist.id"), primary_key=True)
@@ -1683,6 +1728,38 @@ class OrderItem(Base):
     )
 
 
+class TrackingAbcXyz(Base):
+    """ABC/XYZ-классификация OEM по истории наших заказов из поиска.
+
+    Пересчитывается ночной задачей (placed_orders.refresh_tracking_abc_xyz)
+    по заказам за TRACKING_HISTORY_DAYS: помесячный ряд за 12 месяцев,
+    заканчивающихся series_month, CV и класс XYZ, объём за окно,
+    накопленная доля рынка и класс ABC. Экраны истории заказов и
+    автозаказ читают строки вместо ранжирования всего рынка на запрос.
+    """
+
+    __tablename__ = "trackingabcxyz"
+
+    oem_number = Column(String(120), nullable=False, unique=True)
+    # Первое число последнего месяца ряда monthly_qty.
+    series_month = Column(Date, nullable=False)
+    monthly_qty = Column(JSON, nullable=False)
+    annual_ordered_qty = Column(Integer, nullable=False, default=0)
+    active_months = Column(Integer, nullable=False, default=0)
+    monthly_cv = Column(Float, nullable=True)
+    xyz_class = Column(String(1), nullable=True)
+    market_qty = Column(Integer, nullable=False, default=0)
+    cumulative_share_pct = Column(Float, nullable=True)
+    abc_class = Column(String(1), nullable=True)
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=now_moscow,
+        onupdate=now_moscow,
+    )
+
+    __table_args__ = (Index("ix_trackingabcxyz_market_qty", "market_qty"),)
+
+
 class SalesHistoryMonthly(Base):
     """Месячная история продаж, загруженная из 1С (разовый импорт).
 
@@ -382,6 +382,8 @@ class CrossImportResult(BaseModel):
     crosses_created: int = 0
     crosses_already_existed: int = 0
     crosses_skipped_invalid: int = 0
+    clusters_created: int = 0
+    cluster_members_added: int = 0
     unmatched_sample: List[str] = Field(default_factory=list)
 
 
@@ -741,6 +741,26 @@ class StockReserveCancelResult(BaseModel):
     already_inactive: List[int] = Field(default_factory=list)
 
 
+class StockAvailabilityKey(BaseModel):
+    autopart_id: int
+    storage_location_id: Optional[int] = Field(
+        None,
+        description="Конкретная ячейка; None = по всему складу",
+    )
+
+
+class StockAvailabilityBatchRequest(BaseModel):
+    items: List[StockAvailabilityKey] = Field(..., min_length=1, max_length=20000)
+    warehouse_id: Optional[int] = None
+
+
+class StockAvailabilityOut(StockAvailabilityKey):
+    physical: int
+    reserved: int
+    wave_reserved: int
+    available: int
+
+
 # ─── ShipmentDocument ─────────────────────────────────────────────────────────
 
 
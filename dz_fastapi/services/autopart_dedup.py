@@ -3,19 +3,25 @@ from collections import defaultdict
 from decimal import Decimal
 from typing import Any, DefaultDict
 
-from sqlalchemy import select, update
+from sqlalchemy import delete, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from dz_fastapi.crud.brand import brand_crud
+from dz_fastapi.crud.pricelist_frame_cache import pricelist_frame_cache
 from dz_fastapi.models.autopart import (
     AutoPart,
     AutoPartPriceHistory,
+    AutoPartPriceState,
     AutoPartRestockDecision,
     Photo,
     autopart_category_association,
     autopart_storage_association,
 )
-from dz_fastapi.models.cross import AutoPartCross, AutoPartSubstitution
+from dz_fastapi.models.cross import (
+    AutoPartCross,
+    AutoPartCrossClusterMember,
+    AutoPartSubstitution,
+)
 from dz_fastapi.models.partner import (
     CustomerOrderItem,
     CustomerPriceListAutoPartAssociation,
@@ -25,6 +31,7 @@ from dz_fastapi.models.partner import (
     SupplierOrderItem,
 )
 from dz_fastapi.models.price_control import CustomerPriceListOverride, PriceControlRecommendation
+from dz_fastapi.services.cross_graph import queue_cross_removal
 
 logger = logging.getLogger("dz_fastapi")
 
@@ -199,6 +206,42 @@ async def _merge_customer_pricelist_overrides(
         summary["override_deleted"] += 1
 
 
+async def _merge_price_state(
+    session: AsyncSession,
+    source_autopart_id: int,
+    target_autopart_id: int,
+    summary: DefaultDict[str, int],
+) -> None:
+    rows = (
+        (
+            await session.execute(
+                select(AutoPartPriceState).where(
+                    AutoPartPriceState.autopart_id.in_(
+                        [source_autopart_id, target_autopart_id]
+                    )
+                )
+            )
+        )
+        .scalars()
+        .all()
+    )
+
+    target_configs = {
+        row.provider_config_id
+        for row in rows
+        if row.autopart_id == target_autopart_id
+    }
+    for source_row in rows:
+        if source_row.autopart_id != source_autopart_id:
+            continue
+        if source_row.provider_config_id in target_configs:
+            await session.delete(source_row)
+            summary["price_state_deleted"] += 1
+            continue
+        source_row.autopart_id = target_autopart_id
+        summary["price_state_moved"] += 1
+
+
 async def _merge_link_table(
     session: AsyncSession,
     table,
@@ -311,6 +354,27 @@ async def _merge_crosses(
         row.cross_autopart_id = target_autopart_id
         summary["cross_ref_updated"] += 1
 
+    # Членство в кластерах кроссов переходит к целевой позиции.
+    target_cluster_ids = select(AutoPartCrossClusterMember.cluster_id).where(
+        AutoPartCrossClusterMember.autopart_id == target_autopart_id
+    )
+    moved = await session.execute(
+        update(AutoPartCrossClusterMember)
+        .where(
+            AutoPartCrossClusterMember.autopart_id == source_autopart_id,
+            AutoPartCrossClusterMember.cluster_id.not_in(target_cluster_ids),
+        )
+        .values(autopart_id=target_autopart_id)
+        .execution_options(synchronize_session=False)
+    )
+    summary["cross_cluster_moved"] += moved.rowcount or 0
+    await session.execute(
+        delete(AutoPartCrossClusterMember)
+        .where(AutoPartCrossClusterMember.autopart_id == source_autopart_id)
+        .execution_options(synchronize_session=False)
+    )
+    queue_cross_removal(session)
+
 
 async def _merge_substitutions(
     session: AsyncSession,
@@ -394,6 +458,9 @@ async def merge_autopart_into_target(
     await _merge_customer_pricelist_overrides(
         session, source_autopart_id, target_autopart_id, summary
     )
+    await _merge_price_state(
+        session, source_autopart_id, target_autopart_id, summary
+    )
     await _merge_link_table(
         session,
         autopart_storage_association,
@@ -439,6 +506,8 @@ async def merge_autopart_into_target(
     await session.delete(source_autopart)
     summary["autoparts_deleted"] += 1
     await session.flush()
+    # Закэшированные кадры прайсов ссылаются на удалённую автозапчасть.
+    pricelist_frame_cache.invalidate()
     return dict(summary)
 
 
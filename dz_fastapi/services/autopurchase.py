@@ -4,7 +4,6 @@ import asyncio
 import json
 import logging
 import os
-import time
 from datetime import date, datetime, timedelta
 from decimal import ROUND_HALF_UP, Decimal
 from math import ceil
@@ -66,6 +65,8 @@ from dz_fastapi.services.site_brand_search import (
     merge_site_offers,
     resolve_fallback_site_brand,
 )
+from dz_fastapi.services.site_offers import get_site_offers
+from dz_fastapi.services.snapshot_matrix import SnapshotMatrix
 
 AUTOPURCHASE_MODE_DRAFT_ONLY = "draft_only"
 AUTOPURCHASE_MODE_AUTO_APPROVE_SAFE = "auto_approve_safe"
@@ -221,15 +222,11 @@ AUTOPURCHASE_NO_SALES_MIN_STOCK_DAYS = 14
 AUTOPURCHASE_PRICE_HIGH_FACTOR = 1.2
 AUTOPURCHASE_DEMAND_SPIKE_FACTOR = 3.0
 AUTOPURCHASE_DEMAND_SPIKE_MIN_QTY = 10
-# Кэш предложений сайта между запусками (сек); 0 — выключить.
+# Допустимый возраст ответа сайта из общего кэша (сек); 0 — выключить.
 AUTOPURCHASE_SITE_CACHE_TTL_SEC = max(
     0,
     int(os.getenv("AUTOPURCHASE_SITE_CACHE_TTL_SEC", "3600")),
 )
-_SITE_OFFERS_CACHE: dict[
-    tuple[str, str, bool], tuple[float, list[dict[str, Any]]]
-] = {}
-_SITE_OFFERS_CACHE_MAX_ENTRIES = 20000
 # Сколько лучших предложений сайта сохраняем для ручного выбора.
 AUTOPURCHASE_TOP_OFFERS_LIMIT = max(
     1,
@@ -361,35 +358,13 @@ async def _get_site_offers_cached(
     without_cross: bool,
 ) -> list[dict[str, Any]]:
     """get_offers с TTL-кэшем: повторный пересчёт не бомбит сайт заново."""
-    cache_key = (
-        str(oem or "").strip().upper(),
-        str(brand or "").strip().upper(),
-        bool(without_cross),
-    )
-    if AUTOPURCHASE_SITE_CACHE_TTL_SEC > 0:
-        cached = _SITE_OFFERS_CACHE.get(cache_key)
-        if (
-            cached is not None
-            and (time.monotonic() - cached[0]) < AUTOPURCHASE_SITE_CACHE_TTL_SEC
-        ):
-            return [dict(item) for item in cached[1]]
-
-    offers = await client.get_offers(
+    return await get_site_offers(
+        client,
         oem=oem,
         brand=brand,
         without_cross=without_cross,
+        max_age_sec=AUTOPURCHASE_SITE_CACHE_TTL_SEC,
     )
-    normalized_offers = [
-        item for item in (offers or []) if isinstance(item, dict)
-    ]
-    if AUTOPURCHASE_SITE_CACHE_TTL_SEC > 0:
-        if len(_SITE_OFFERS_CACHE) >= _SITE_OFFERS_CACHE_MAX_ENTRIES:
-            _SITE_OFFERS_CACHE.clear()
-        _SITE_OFFERS_CACHE[cache_key] = (
-            time.monotonic(),
-            [dict(item) for item in normalized_offers],
-        )
-    return normalized_offers
 
 
 def _blend_average_daily(
@@ -3442,23 +3417,18 @@ async def get_autopurchase_preview(
         normalized_oem_numbers=normalized_oem_numbers,
         history_rows_by_oem=history_by_oem,
     )
-    snapshot_demand_by_window = {
-        days: _calculate_snapshot_sales(
-            snapshots,
-            normalized_oem_numbers,
-            days=days,
-            received_qty_by_oem_and_date=received_qty_by_oem_and_date,
-        )
-        for days in AUTOPURCHASE_DEMAND_WINDOWS
-    }
-    in_stock_days_by_window = {
-        days: _calculate_in_stock_days(
-            snapshots,
-            normalized_oem_numbers,
-            days=days,
-        )
-        for days in AUTOPURCHASE_DEMAND_WINDOWS
-    }
+    snapshot_matrix = SnapshotMatrix(
+        snapshots,
+        normalized_oem_numbers,
+        received_qty_by_oem_and_date=received_qty_by_oem_and_date,
+    )
+    snapshot_demand_by_window = snapshot_matrix.sales_by_window(
+        AUTOPURCHASE_DEMAND_WINDOWS
+    )
+    in_stock_days_by_window = snapshot_matrix.in_stock_days_by_window(
+        AUTOPURCHASE_DEMAND_WINDOWS
+    )
+    stockout_days_by_oem = snapshot_matrix.consecutive_stockout_days()
     customer_requested_by_window = await _load_customer_order_requested_by_oem_windows(
         session,
         normalized_oem_numbers,
@@ -3593,10 +3563,7 @@ async def get_autopurchase_preview(
         open_customer_backlog_qty = int(
             open_customer_backlog_by_oem.get(oem_number, 0)
         )
-        consecutive_stockout_days = _estimate_consecutive_stockout_days(
-            snapshots,
-            oem_number=oem_number,
-        )
+        consecutive_stockout_days = int(stockout_days_by_oem.get(oem_number, 0))
         avg_daily_blended = _blend_average_daily_horizons(
             avg_daily_30,
             avg_daily_90,
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable
+
+logger = logging.getLogger("dz_fastapi")
+
+# Пул процессов для pandas-этапов сборки прайсов. asyncio.to_thread
+# не спасает от GIL: 200к-строчный прайс в потоке тормозил HTTP-запросы
+# того же процесса. 0 — считать в потоке, как раньше.
+CPU_POOL_WORKERS = max(0, int(os.getenv("PRICELIST_BUILD_PROCESS_WORKERS", "2")))
+# Воркер перезапускается после стольких задач, чтобы не копить память.
+CPU_POOL_MAX_TASKS_PER_CHILD = max(
+    1, int(os.getenv("PRICELIST_BUILD_MAX_TASKS_PER_CHILD", "50"))
+)
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn, а не fork: дочерний процесс не должен наследовать
+        # event loop, соединения с БД и потоки планировщика.
+        _pool = ProcessPoolExecutor(
+            max_workers=CPU_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            max_tasks_per_child=CPU_POOL_MAX_TASKS_PER_CHILD,
+        )
+    return _pool
+
+
+def shutdown_cpu_pool() -> None:
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_cpu_bound(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Выполняет чистую функцию в пуле процессов. Функция и аргументы
+    должны сериализоваться pickle (DataFrame, dict, SimpleNamespace),
+    а не быть ORM-объектами. Без пула или после его падения функция
+    выполняется в потоке.
+    """
+    call = partial(func, *args, **kwargs)
+    if CPU_POOL_WORKERS <= 0:
+        return await asyncio.to_thread(call)
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_pool(), call)
+    except BrokenProcessPool:
+        logger.warning(
+            "CPU pool is broken, running %s in a thread",
+            getattr(func, "__name__", func),
+            exc_info=True,
+        )
+        shutdown_cpu_pool()
+        return await asyncio.to_thread(call)
@@ -0,0 +1,322 @@
+"""Индекс взаимных кроссов в памяти процесса.
+
+Граф взаимных кроссов (AutoPartCross.is_bidirectional) хранится
+компактно: autopart_id переводятся в плотные индексы, смежность — CSR
+(indptr/indices в numpy), компоненты — система непересекающихся
+множеств. Кластеры кроссов (AutoPartCrossCluster) — клики: их члены
+хранятся списком, а не N·(N-1) рёбрами. Состав компоненты по
+seed-позиции находится без запросов к БД.
+
+Индекс строится лениво при первом обращении и перестраивается по TTL
+(изменения из других процессов). Изменения этого процесса попадают в
+индекс после commit сессии: save_cross_relation и импорт добавляют рёбра,
+удаление кроссов помечает индекс устаревшим.
+"""
+
+import logging
+import os
+import time
+from itertools import chain
+from typing import Iterable, Optional
+
+import numpy as np
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from dz_fastapi.models.cross import AutoPartCross, AutoPartCrossClusterMember
+
+logger = logging.getLogger("dz_fastapi")
+
+# Через сколько секунд индекс перечитывается из БД целиком.
+CROSS_GRAPH_INDEX_TTL_SEC = max(0, int(os.getenv("CROSS_GRAPH_INDEX_TTL_SEC", "600")))
+_BUILD_PARTITION_ROWS = 100_000
+_PENDING_KEY = "cross_graph_pending"
+
+
+class CrossGraphIndex:
+    def __init__(self):
+        # Счётчик изменений: сборка, во время которой кроссы менялись,
+        # сразу считается устаревшей.
+        self._version = 0
+        self.clear()
+
+    def clear(self) -> None:
+        self._node_index: dict[int, int] = {}
+        self._node_ids: list[int] = []
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._indices = np.zeros(0, dtype=np.int32)
+        # Рёбра, добавленные после построения, до следующей перестройки.
+        self._extra: dict[int, set[int]] = {}
+        # cluster_id → узлы кластера и обратная карта узел → кластеры.
+        self._clusters: dict[int, list[int]] = {}
+        self._node_clusters: dict[int, list[int]] = {}
+        self._parent: list[int] = []
+        self._members: dict[int, list[int]] = {}
+        self._built_at: Optional[float] = None
+        self._stale = True
+
+    @property
+    def is_fresh(self) -> bool:
+        if self._stale or self._built_at is None:
+            return False
+        return time.monotonic() - self._built_at < CROSS_GRAPH_INDEX_TTL_SEC
+
+    def mark_stale(self) -> None:
+        self._stale = True
+        self._version += 1
+
+    def _find(self, node: int) -> int:
+        parent = self._parent
+        root = node
+        while parent[root] != root:
+            root = parent[root]
+        while parent[node] != root:
+            parent[node], node = root, parent[node]
+        return root
+
+    def _union(self, left: int, right: int) -> None:
+        left_root, right_root = self._find(left), self._find(right)
+        if left_root == right_root:
+            return
+        # Меньший список членов вливается в больший.
+        if len(self._members[left_root]) < len(self._members[right_root]):
+            left_root, right_root = right_root, left_root
+        self._parent[right_root] = left_root
+        self._members[left_root].extend(self._members.pop(right_root))
+
+    def _node(self, autopart_id: int) -> int:
+        node = self._node_index.get(autopart_id)
+        if node is None:
+            node = len(self._node_ids)
+            self._node_index[autopart_id] = node
+            self._node_ids.append(autopart_id)
+            self._parent.append(node)
+            self._members[node] = [node]
+        return node
+
+    def load_edges(
+        self,
+        sources: np.ndarray,
+        targets: np.ndarray,
+        cluster_ids: Optional[np.ndarray] = None,
+        member_ids: Optional[np.ndarray] = None,
+    ) -> None:
+        """
+        Полная перестройка по массивам концов рёбер и (необязательно)
+        парам (cluster_id, autopart_id) членства в кластерах.
+        """
+        self.clear()
+        keep = sources != targets
+        sources, targets = sources[keep], targets[keep]
+        if cluster_ids is None or member_ids is None:
+            cluster_ids = member_ids = np.zeros(0, dtype=np.int64)
+        node_ids, inverse = np.unique(
+            np.concatenate([sources, targets, member_ids]), return_inverse=True
+        )
+        left = inverse[: len(sources)]
+        right = inverse[len(sources): 2 * len(sources)]
+        member_nodes = inverse[2 * len(sources):]
+        # Граф неориентированный: каждое ребро хранится в обе стороны.
+        heads = np.concatenate([left, right])
+        tails = np.concatenate([right, left]).astype(np.int32)
+        order = np.argsort(heads, kind="stable")
+        self._indices = tails[order]
+        self._indptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(heads, minlength=len(node_ids)), out=self._indptr[1:])
+        self._node_ids = node_ids.tolist()
+        self._node_index = {autopart_id: node for node, autopart_id in enumerate(self._node_ids)}
+        self._parent = list(range(len(self._node_ids)))
+        self._members = {node: [node] for node in range(len(self._node_ids))}
+        for left_node, right_node in zip(left.tolist(), right.tolist()):
+            self._union(left_node, right_node)
+        if len(member_nodes):
+            order = np.argsort(cluster_ids, kind="stable")
+            sorted_clusters = cluster_ids[order]
+            sorted_nodes = member_nodes[order]
+            starts = np.flatnonzero(np.r_[True, sorted_clusters[1:] != sorted_clusters[:-1]])
+            for cluster_id, nodes in zip(
+                sorted_clusters[starts].tolist(), np.split(sorted_nodes, starts[1:])
+            ):
+                self._add_cluster_nodes(cluster_id, nodes.tolist())
+        self._built_at = time.monotonic()
+        self._stale = False
+
+    def add_edge(self, source_id: int, target_id: int) -> None:
+        if source_id == target_id:
+            return
+        left, right = self._node(int(source_id)), self._node(int(target_id))
+        self._extra.setdefault(left, set()).add(right)
+        self._extra.setdefault(right, set()).add(left)
+        self._union(left, right)
+
+    def _add_cluster_nodes(self, cluster_id: int, nodes: list[int]) -> None:
+        known = self._clusters.setdefault(cluster_id, [])
+        present = set(known)
+        for node in nodes:
+            if node in present:
+                continue
+            present.add(node)
+            known.append(node)
+            self._node_clusters.setdefault(node, []).append(cluster_id)
+            self._union(known[0], node)
+
+    def add_cluster(self, cluster_id: int, member_ids: Iterable[int]) -> None:
+        self._add_cluster_nodes(
+            int(cluster_id), [self._node(int(value)) for value in member_ids]
+        )
+
+    def _neighbors(self, node: int) -> Iterable[int]:
+        if node + 1 < len(self._indptr):
+            yield from self._indices[self._indptr[node]: self._indptr[node + 1]].tolist()
+        yield from self._extra.get(node, ())
+
+    def component_id(self, autopart_id: int) -> Optional[int]:
+        """autopart_id корня компоненты или None, если кроссов нет."""
+        node = self._node_index.get(int(autopart_id))
+        if node is None:
+            return None
+        return self._node_ids[self._find(node)]
+
+    def component_ids(
+        self,
+        seed_autopart_ids: Iterable[int],
+        excluded_autopart_ids: set[int],
+    ) -> set[int]:
+        seeds = {int(value) for value in seed_autopart_ids if value is not None}
+        seeds -= excluded_autopart_ids
+        result = set(seeds)
+        roots = {
+            self._find(self._node_index[seed]) for seed in seeds if seed in self._node_index
+        }
+        if not roots:
+            return result
+        members = [node for root in roots for node in self._members[root]]
+        if not excluded_autopart_ids or not any(
+            self._node_ids[node] in excluded_autopart_ids for node in members
+        ):
+            result.update(self._node_ids[node] for node in members)
+            return result
+        # Исключённые позиции разрывают пути — обходим граф в памяти.
+        excluded_nodes = {
+            self._node_index[value]
+            for value in excluded_autopart_ids
+            if value in self._node_index
+        }
+        visited = {self._node_index[seed] for seed in seeds if seed in self._node_index}
+        # Кластер — клика: его члены раскрываются один раз целиком.
+        seen_clusters: set[int] = set()
+        frontier = list(visited)
+        while frontier:
+            next_frontier = []
+            for node in frontier:
+                clusters = set(self._node_clusters.get(node, ())) - seen_clusters
+                seen_clusters |= clusters
+                cluster_nodes = [
+                    member for cluster_id in clusters for member in self._clusters[cluster_id]
+                ]
+                for neighbor in chain(self._neighbors(node), cluster_nodes):
+                    if neighbor not in visited and neighbor not in excluded_nodes:
+                        visited.add(neighbor)
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+        result.update(self._node_ids[node] for node in visited)
+        return result
+
+    async def build(self, session: AsyncSession) -> None:
+        version = self._version
+        started = time.perf_counter()
+        sources: list[np.ndarray] = []
+        targets: list[np.ndarray] = []
+        stream = await session.stream(
+            select(AutoPartCross.source_autopart_id, AutoPartCross.cross_autopart_id)
+            .where(
+                AutoPartCross.is_bidirectional.is_(True),
+                AutoPartCross.cross_autopart_id.is_not(None),
+            )
+            .execution_options(yield_per=_BUILD_PARTITION_ROWS)
+        )
+        async for partition in stream.partitions(_BUILD_PARTITION_ROWS):
+            chunk = np.asarray(partition, dtype=np.int64).reshape(-1, 2)
+            sources.append(chunk[:, 0])
+            targets.append(chunk[:, 1])
+        cluster_ids: list[np.ndarray] = []
+        member_ids: list[np.ndarray] = []
+        stream = await session.stream(
+            select(
+                AutoPartCrossClusterMember.cluster_id,
+                AutoPartCrossClusterMember.autopart_id,
+            ).execution_options(yield_per=_BUILD_PARTITION_ROWS)
+        )
+        async for partition in stream.partitions(_BUILD_PARTITION_ROWS):
+            chunk = np.asarray(partition, dtype=np.int64).reshape(-1, 2)
+            cluster_ids.append(chunk[:, 0])
+            member_ids.append(chunk[:, 1])
+        empty = np.zeros(0, dtype=np.int64)
+        self.load_edges(
+            np.concatenate(sources) if sources else empty,
+            np.concatenate(targets) if targets else empty,
+            np.concatenate(cluster_ids) if cluster_ids else empty,
+            np.concatenate(member_ids) if member_ids else empty,
+        )
+        if self._version != version:
+            # Кроссы менялись во время чтения — перестроим при следующем запросе.
+            self._stale = True
+        logger.info(
+            "Cross graph index built: nodes=%s edges=%s clusters=%s components=%s in %.2fs",
+            len(self._node_ids),
+            len(self._indices) // 2,
+            len(self._clusters),
+            len(self._members),
+            time.perf_counter() - started,
+        )
+
+
+cross_graph_index = CrossGraphIndex()
+
+
+def has_pending_cross_changes(session: AsyncSession) -> bool:
+    return bool(session.info.get(_PENDING_KEY))
+
+
+def queue_cross_edge(session: AsyncSession, source_id: int, target_id: int) -> None:
+    """Взаимное ребро попадёт в индекс после commit сессии."""
+    session.info.setdefault(_PENDING_KEY, []).append((int(source_id), int(target_id)))
+
+
+def queue_cross_cluster(
+    session: AsyncSession, cluster_id: int, member_ids: Iterable[int]
+) -> None:
+    """Члены кластера попадут в индекс после commit сессии."""
+    session.info.setdefault(_PENDING_KEY, []).append(
+        (int(cluster_id), [int(value) for value in member_ids])
+    )
+
+
+def queue_cross_removal(session: AsyncSession) -> None:
+    """Удаление ребра: union-find не умеет разъединять — индекс перестроится."""
+    session.info.setdefault(_PENDING_KEY, []).append(None)
+
+
+async def ensure_cross_graph_index(session: AsyncSession) -> CrossGraphIndex:
+    if not cross_graph_index.is_fresh:
+        await cross_graph_index.build(session)
+    return cross_graph_index
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_cross_changes(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    for change in pending or ():
+        if change is None or not cross_graph_index.is_fresh:
+            cross_graph_index.mark_stale()
+        elif isinstance(change[1], list):
+            cross_graph_index.add_cluster(*change)
+        else:
+            cross_graph_index.add_edge(*change)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_pending_cross_changes(session: Session, previous_transaction) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
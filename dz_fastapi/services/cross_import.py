@@ -9,21 +9,36 @@
 позиции связываются кроссами друг с другом. Номера, которых нет в нашей
 базе, в кроссы не превращаются (попадают в «не найдено» — повторный импорт
 после появления позиций их подхватит).
+
+Группа сохраняется кластером (AutoPartCrossCluster + строка членства на
+позицию) — линейно по размеру группы. Группы, где есть запрещённая пара
+(AutoPartInvalidCross), пишутся прежними направленными рёбрами с
+пропуском запрещённых.
 """
 from __future__ import annotations
 
 import asyncio
 import io
 import logging
+import os
 import zipfile
 from typing import Any
 
 import pandas as pd
-from sqlalchemy import insert, select
+from sqlalchemy import delete, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from dz_fastapi.models.autopart import AutoPart, preprocess_oem_number
-from dz_fastapi.models.cross import AutoPartCross
+from dz_fastapi.models.cross import (
+    AutoPartCross,
+    AutoPartCrossCluster,
+    AutoPartCrossClusterMember,
+)
+from dz_fastapi.services.cross_graph import (
+    queue_cross_cluster,
+    queue_cross_edge,
+    queue_cross_removal,
+)
 from dz_fastapi.services.crosses import _load_invalid_pair_keys
 
 logger = logging.getLogger("dz_fastapi")
@@ -33,6 +48,11 @@ OEM_HEADER_HINTS = ("каталог", "oem", "номер", "артикул", "nu
 CROSS_IMPORT_COMMENT = "1c_import"
 _INSERT_CHUNK = 5000
 _LOOKUP_CHUNK = 1000
+# 0 — группы пишутся попарными рёбрами AutoPartCross, как до кластеров.
+CROSS_IMPORT_USE_CLUSTERS = str(
+    os.getenv("CROSS_IMPORT_USE_CLUSTERS", "1")
+).strip().lower() in {"1", "true", "yes", "on"}
+_CLUSTER_KEY_MAX_LEN = 255
 
 
 def _normalize_oem(value: Any) -> str:
@@ -178,6 +198,51 @@ async def _load_existing_cross_keys(
     return existing
 
 
+async def _load_existing_clusters(
+    session: AsyncSession,
+    external_keys: list[str],
+) -> dict[str, tuple[int, set[int]]]:
+    """external_key → (cluster_id, autopart_id членов) для кластеров импорта."""
+    clusters: dict[str, tuple[int, set[int]]] = {}
+    unique = sorted(set(external_keys))
+    for start in range(0, len(unique), _LOOKUP_CHUNK):
+        chunk = unique[start:start + _LOOKUP_CHUNK]
+        rows = (
+            await session.execute(
+                select(
+                    AutoPartCrossCluster.external_key,
+                    AutoPartCrossCluster.id,
+                    AutoPartCrossClusterMember.autopart_id,
+                )
+                .outerjoin(
+                    AutoPartCrossClusterMember,
+                    AutoPartCrossClusterMember.cluster_id == AutoPartCrossCluster.id,
+                )
+                .where(
+                    AutoPartCrossCluster.source == CROSS_IMPORT_COMMENT,
+                    AutoPartCrossCluster.external_key.in_(chunk),
+                )
+            )
+        ).all()
+        for external_key, cluster_id, autopart_id in rows:
+            _, members = clusters.setdefault(external_key, (int(cluster_id), set()))
+            if autopart_id is not None:
+                members.add(int(autopart_id))
+    return clusters
+
+
+def _has_invalid_pair(
+    member_list: list[tuple[int, int, str]],
+    invalid_by_source: dict[int, set[tuple[int, str]]],
+) -> bool:
+    member_keys = {(brand_id, oem) for _ap_id, brand_id, oem in member_list}
+    for ap_id, brand_id, oem in member_list:
+        forbidden = invalid_by_source.get(ap_id)
+        if forbidden and (forbidden & member_keys) - {(brand_id, oem)}:
+            return True
+    return False
+
+
 async def import_crosses_from_file(
     session: AsyncSession,
     *,
@@ -206,6 +271,9 @@ async def import_crosses_from_file(
         session, list(involved_source_ids)
     )
     invalid_keys = await _load_invalid_pair_keys(session)
+    invalid_by_source: dict[int, set[tuple[int, str]]] = {}
+    for src_id, brand_id, oem in invalid_keys:
+        invalid_by_source.setdefault(src_id, set()).add((brand_id, oem))
 
     insert_rows: list[dict[str, Any]] = []
     seen_keys: set[tuple[int, int, str]] = set()
@@ -213,6 +281,8 @@ async def import_crosses_from_file(
     crosses_existing = 0
     crosses_skipped_invalid = 0
     groups_linked = 0
+    # external_key → autopart_id группы, которая пишется кластером.
+    cluster_groups: dict[str, list[int]] = {}
 
     def _add_directed(src: tuple[int, int, str], dst: tuple[int, int, str]) -> None:
         nonlocal crosses_created, crosses_existing, crosses_skipped_invalid
@@ -243,7 +313,7 @@ async def import_crosses_from_file(
             }
         )
 
-    for oems in groups.values():
+    for identifier, oems in groups.items():
         # Уникальные автозапчасти группы (один OEM может дать несколько
         # запчастей разных брендов).
         members: dict[int, tuple[int, int, str]] = {}
@@ -254,17 +324,64 @@ async def import_crosses_from_file(
         if len(member_list) < 2:
             continue
         groups_linked += 1
+        if (
+            CROSS_IMPORT_USE_CLUSTERS
+            and len(identifier) <= _CLUSTER_KEY_MAX_LEN
+            and not _has_invalid_pair(member_list, invalid_by_source)
+        ):
+            cluster_groups[identifier] = [ap_id for ap_id, _brand, _oem in member_list]
+            continue
         for i in range(len(member_list)):
             for j in range(i + 1, len(member_list)):
                 _add_directed(member_list[i], member_list[j])
                 _add_directed(member_list[j], member_list[i])
 
-    if not dry_run and insert_rows:
+    existing_clusters = await _load_existing_clusters(session, list(cluster_groups))
+    new_cluster_keys = [key for key in cluster_groups if key not in existing_clusters]
+    new_members: dict[str, list[int]] = {}
+    for key, member_ids in cluster_groups.items():
+        present = existing_clusters.get(key, (None, set()))[1]
+        added = [ap_id for ap_id in member_ids if ap_id not in present]
+        if added:
+            new_members[key] = added
+    clusters_created = len(new_cluster_keys)
+    cluster_members_added = sum(len(added) for added in new_members.values())
+
+    if not dry_run and (insert_rows or new_members):
         for start in range(0, len(insert_rows), _INSERT_CHUNK):
             await session.execute(
                 insert(AutoPartCross),
                 insert_rows[start:start + _INSERT_CHUNK],
             )
+        for row in insert_rows:
+            queue_cross_edge(session, row["source_autopart_id"], row["cross_autopart_id"])
+
+        cluster_id_by_key = {key: cluster_id for key, (cluster_id, _) in existing_clusters.items()}
+        for start in range(0, len(new_cluster_keys), _INSERT_CHUNK):
+            created = (
+                await session.execute(
+                    insert(AutoPartCrossCluster).returning(
+                        AutoPartCrossCluster.external_key, AutoPartCrossCluster.id
+                    ),
+                    [
+                        {"source": CROSS_IMPORT_COMMENT, "external_key": key}
+                        for key in new_cluster_keys[start:start + _INSERT_CHUNK]
+                    ],
+                )
+            ).all()
+            cluster_id_by_key.update({key: int(cluster_id) for key, cluster_id in created})
+        member_rows = [
+            {"cluster_id": cluster_id_by_key[key], "autopart_id": ap_id}
+            for key, added in new_members.items()
+            for ap_id in added
+        ]
+        for start in range(0, len(member_rows), _INSERT_CHUNK):
+            await session.execute(
+                insert(AutoPartCrossClusterMember),
+                member_rows[start:start + _INSERT_CHUNK],
+            )
+        for key in new_members:
+            queue_cross_cluster(session, cluster_id_by_key[key], cluster_groups[key])
         await session.commit()
 
     return {
@@ -278,5 +395,148 @@ async def import_crosses_from_file(
         "crosses_created": crosses_created,
         "crosses_already_existed": crosses_existing,
         "crosses_skipped_invalid": crosses_skipped_invalid,
+        "clusters_created": clusters_created,
+        "cluster_members_added": cluster_members_added,
         "unmatched_sample": sorted(list(unmatched_oems))[:50],
     }
+
+
+async def migrate_import_edges_to_clusters(
+    session: AsyncSession,
+    *,
+    dry_run: bool = True,
+    delete_edges: bool = False,
+) -> dict[str, Any]:
+    """
+    Перенос рёбер прежнего импорта (comment="1c_import") в кластеры.
+
+    Компонента взаимных рёбер становится кластером с external_key
+    "edges:<минимальный autopart_id>" — повторный запуск её не дублирует.
+    Компоненты с запрещённой парой внутри остаются рёбрами. Рёбра
+    удаляются только с delete_edges: до этого обе формы живут вместе и
+    читатели дают тот же результат.
+    """
+    parent: dict[int, int] = {}
+
+    def find(value: int) -> int:
+        parent.setdefault(value, value)
+        while parent[value] != value:
+            parent[value] = parent[parent[value]]
+            value = parent[value]
+        return value
+
+    stream = await session.stream(
+        select(AutoPartCross.source_autopart_id, AutoPartCross.cross_autopart_id)
+        .where(
+            AutoPartCross.comment == CROSS_IMPORT_COMMENT,
+            AutoPartCross.is_bidirectional.is_(True),
+            AutoPartCross.cross_autopart_id.is_not(None),
+        )
+        .execution_options(yield_per=_INSERT_CHUNK)
+    )
+    edges_total = 0
+    async for partition in stream.partitions(_INSERT_CHUNK):
+        for source_id, cross_id in partition:
+            edges_total += 1
+            left, right = find(int(source_id)), find(int(cross_id))
+            if left != right:
+                parent[right] = left
+
+    components: dict[int, list[int]] = {}
+    for autopart_id in parent:
+        components.setdefault(find(autopart_id), []).append(autopart_id)
+    candidates = {
+        f"edges:{min(member_ids)}": sorted(member_ids)
+        for member_ids in components.values()
+        if len(member_ids) >= 2
+    }
+    existing = await _load_existing_clusters(session, list(candidates))
+
+    invalid_by_source: dict[int, set[tuple[int, str]]] = {}
+    for src_id, brand_id, oem in await _load_invalid_pair_keys(session):
+        invalid_by_source.setdefault(src_id, set()).add((brand_id, oem))
+    keys_by_id: dict[int, tuple[int, str]] = {}
+    if invalid_by_source:
+        member_ids = [ap_id for ids in candidates.values() for ap_id in ids]
+        for start in range(0, len(member_ids), _LOOKUP_CHUNK):
+            rows = (
+                await session.execute(
+                    select(AutoPart.id, AutoPart.brand_id, AutoPart.oem_number).where(
+                        AutoPart.id.in_(member_ids[start:start + _LOOKUP_CHUNK])
+                    )
+                )
+            ).all()
+            for ap_id, brand_id, oem in rows:
+                keys_by_id[int(ap_id)] = (int(brand_id), _normalize_oem(oem))
+
+    to_create: dict[str, list[int]] = {}
+    skipped_invalid = 0
+    for key, member_ids in candidates.items():
+        if key in existing:
+            continue
+        member_list = [
+            (ap_id, *keys_by_id.get(ap_id, (0, ""))) for ap_id in member_ids
+        ]
+        if invalid_by_source and _has_invalid_pair(member_list, invalid_by_source):
+            skipped_invalid += 1
+            continue
+        to_create[key] = member_ids
+
+    converted = [key for key in candidates if key in existing or key in to_create]
+    edges_deleted = 0
+    if not dry_run:
+        keys = list(to_create)
+        for start in range(0, len(keys), _INSERT_CHUNK):
+            created = (
+                await session.execute(
+                    insert(AutoPartCrossCluster).returning(
+                        AutoPartCrossCluster.external_key, AutoPartCrossCluster.id
+                    ),
+                    [
+                        {
+                            "source": CROSS_IMPORT_COMMENT,
+                            "external_key": key,
+                            "comment": "migrated from AutoPartCross",
+                        }
+                        for key in keys[start:start + _INSERT_CHUNK]
+                    ],
+                )
+            ).all()
+            member_rows = [
+                {"cluster_id": int(cluster_id), "autopart_id": ap_id}
+                for key, cluster_id in created
+                for ap_id in to_create[key]
+            ]
+            for row_start in range(0, len(member_rows), _INSERT_CHUNK):
+                await session.execute(
+                    insert(AutoPartCrossClusterMember),
+                    member_rows[row_start:row_start + _INSERT_CHUNK],
+                )
+            for key, cluster_id in created:
+                queue_cross_cluster(session, cluster_id, to_create[key])
+        if delete_edges:
+            source_ids = [ap_id for key in converted for ap_id in candidates[key]]
+            for start in range(0, len(source_ids), _LOOKUP_CHUNK):
+                result = await session.execute(
+                    delete(AutoPartCross).where(
+                        AutoPartCross.comment == CROSS_IMPORT_COMMENT,
+                        AutoPartCross.is_bidirectional.is_(True),
+                        AutoPartCross.source_autopart_id.in_(
+                            source_ids[start:start + _LOOKUP_CHUNK]
+                        ),
+                    )
+                )
+                edges_deleted += result.rowcount or 0
+            if edges_deleted:
+                queue_cross_removal(session)
+        await session.commit()
+
+    return {
+        "dry_run": dry_run,
+        "edges_total": edges_total,
+        "components": len(candidates),
+        "clusters_existing": sum(1 for key in candidates if key in existing),
+        "clusters_created": len(to_create),
+        "components_skipped_invalid": skipped_invalid,
+        "edges_deleted": edges_deleted,
+    }
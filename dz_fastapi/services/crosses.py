@@ -5,11 +5,22 @@ from typing import Iterable, Optional
 
 from sqlalchemy import Select, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
 from dz_fastapi.core.constants import AUTO_OEM_CROSS_BRANDS
 from dz_fastapi.models.autopart import AutoPart, preprocess_oem_number
 from dz_fastapi.models.brand import Brand
-from dz_fastapi.models.cross import AutoPartCross, AutoPartInvalidCross
+from dz_fastapi.models.cross import (
+    AutoPartCross,
+    AutoPartCrossClusterMember,
+    AutoPartInvalidCross,
+)
+from dz_fastapi.services.cross_graph import (
+    ensure_cross_graph_index,
+    has_pending_cross_changes,
+    queue_cross_edge,
+    queue_cross_removal,
+)
 
 logger = logging.getLogger("dz_fastapi")
 
@@ -63,13 +74,35 @@ async def resolve_bidirectional_cross_component_ids(
     seed_autopart_ids: Iterable[int],
     excluded_autopart_ids: Optional[set[int]] = None,
 ) -> set[int]:
+    """
+    Компонента взаимных кроссов вокруг seed-позиций. Берётся из индекса
+    в памяти (cross_graph) без запросов; если сессия сама меняла кроссы
+    и ещё не закоммитила их, граф обходится по БД, как раньше.
+    """
     excluded_ids = {int(value) for value in (excluded_autopart_ids or set())}
+    if has_pending_cross_changes(session):
+        return await _resolve_component_ids_from_db(
+            session,
+            seed_autopart_ids=seed_autopart_ids,
+            excluded_ids=excluded_ids,
+        )
+    index = await ensure_cross_graph_index(session)
+    return index.component_ids(seed_autopart_ids, excluded_ids)
+
+
+async def _resolve_component_ids_from_db(
+    session: AsyncSession,
+    *,
+    seed_autopart_ids: Iterable[int],
+    excluded_ids: set[int],
+) -> set[int]:
     frontier = {
         int(value)
         for value in seed_autopart_ids
         if value is not None and int(value) not in excluded_ids
     }
     visited = set(frontier)
+    seen_cluster_ids: set[int] = set()
     while frontier:
         edge_rows = (
             await session.execute(
@@ -94,6 +127,24 @@ async def resolve_bidirectional_cross_component_ids(
                 next_frontier.add(int(cross_id))
             if cross_id in frontier and source_id not in visited and source_id not in excluded_ids:
                 next_frontier.add(int(source_id))
+        # Члены общего кластера — взаимные кроссы друг друга.
+        member_table = AutoPartCrossClusterMember
+        peer_table = aliased(AutoPartCrossClusterMember)
+        cluster_rows = (
+            await session.execute(
+                select(peer_table.cluster_id, peer_table.autopart_id)
+                .join(member_table, member_table.cluster_id == peer_table.cluster_id)
+                .where(
+                    member_table.autopart_id.in_(list(frontier)),
+                    peer_table.cluster_id.not_in(list(seen_cluster_ids)),
+                )
+                .distinct()
+            )
+        ).all()
+        for cluster_id, autopart_id in cluster_rows:
+            seen_cluster_ids.add(int(cluster_id))
+            if autopart_id not in visited and autopart_id not in excluded_ids:
+                next_frontier.add(int(autopart_id))
         visited.update(next_frontier)
         frontier = next_frontier
     return visited
@@ -210,6 +261,7 @@ async def _remove_reverse_counterpart_for_state(
     if reverse_row is None or not reverse_row.is_bidirectional:
         return False
     await session.delete(reverse_row)
+    queue_cross_removal(session)
     return True
 
 
@@ -238,6 +290,7 @@ async def save_cross_relation(
         cross_oem_number=normalized_oem,
     )
     created = False
+    previous_link = None
     if existing is None:
         existing = AutoPartCross(
             source_autopart_id=source_autopart.id,
@@ -251,6 +304,8 @@ async def save_cross_relation(
         session.add(existing)
         created = True
     else:
+        if existing.is_bidirectional and existing.cross_autopart_id:
+            previous_link = existing.cross_autopart_id
         existing.cross_autopart_id = cross_autopart_id
         existing.priority = priority
         if is_bidirectional and upgrade_existing_bidirectional:
@@ -294,6 +349,11 @@ async def save_cross_relation(
                 reverse.comment = comment
             elif comment and not reverse.comment:
                 reverse.comment = comment
+        queue_cross_edge(session, source_autopart.id, cross_autopart_id)
+    if previous_link is not None and (
+        not existing.is_bidirectional or previous_link != cross_autopart_id
+    ):
+        queue_cross_removal(session)
     return existing, created
 
 
@@ -333,6 +393,8 @@ async def delete_cross_relation(
     source_brand_id: int,
     source_oem_number: str,
 ) -> None:
+    if cross.is_bidirectional and cross.cross_autopart_id:
+        queue_cross_removal(session)
     if cross.is_bidirectional:
         await _remove_reverse_counterpart_for_state(
             session,
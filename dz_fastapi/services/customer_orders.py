@@ -18,10 +18,10 @@ import httpx
 import pandas as pd
 
 try:
-    from imap_tools import AND, MailBox, MailBoxSsl
+    from imap_tools import MailBox, MailBoxSsl, MailMessageFlags
     from imap_tools.errors import MailboxFolderSelectError
 except ImportError:  # pragma: no cover - fallback for older imap_tools
-    from imap_tools import AND, MailBox
+    from imap_tools import MailBox, MailMessageFlags
 
     MailBoxSsl = None
     try:
@@ -83,6 +83,13 @@ from dz_fastapi.models.partner import (
 from dz_fastapi.services.credit_control import assert_customer_credit_available
 from dz_fastapi.services.email import build_email_delivery_kwargs, send_email_with_attachment
 from dz_fastapi.services.google_oauth import refresh_google_access_token
+from dz_fastapi.services.mailbox_sync import (
+    ensure_full_message,
+    load_mail_message,
+    mailbox_account_key,
+    received_since,
+    sync_folder,
+)
 from dz_fastapi.services.notifications import create_admin_notifications
 from dz_fastapi.services.process import _apply_source_filters, _apply_source_markups
 from dz_fastapi.services.resend_api import fetch_received_emails_for_address
@@ -260,62 +267,52 @@ async def _fetch_order_messages(
             server_mail, port, ssl, timeout=CUSTOMER_ORDERS_IMAP_TIMEOUT_SEC
         ).login(email_account, email_password)
         try:
-            mailbox.folder.set(folder)
-            fetched = None
-            uid_sequence = [
-                str(int(uid))
-                for uid in sorted(additional_uids or set())
-                if int(uid) > 0
-            ]
-            if last_uid and int(last_uid) > 0:
-                uid_sequence.append(f"{int(last_uid) + 1}:*")
-            if uid_sequence:
-                uid_criteria = f"UID {','.join(uid_sequence)}"
-                try:
-                    fetched = mailbox.fetch(
-                        uid_criteria,
-                        mark_seen=mark_seen,
-                    )
-                except Exception as uid_exc:
-                    logger.warning(
-                        "UID fetch failed for order inbox %s "
-                        "(folder=%s, criteria=%s). Fallback to date search: %s",
-                        email_account,
-                        folder,
-                        uid_criteria,
-                        uid_exc,
-                    )
-            if fetched is None:
-                query_kwargs = {
-                    "date_gte": date_from,
-                    "all": True,
-                }
-                normalized_from = str(from_email or "").strip()
-                if normalized_from:
-                    query_kwargs["from_"] = normalized_from
-                fetched = mailbox.fetch(
-                    AND(**query_kwargs),
-                    mark_seen=mark_seen,
-                    charset="utf-8",
-                )
+            recovery_uids = {int(uid) for uid in (additional_uids or set()) if int(uid) > 0}
+            # Письма приходят из общего хранилища mailbox_sync: заказы,
+            # ответы поставщиков и прайсы не качают одно письмо заново.
+            entries = sync_folder(
+                mailbox,
+                account_key=mailbox_account_key(server_mail, email_account),
+                folder=folder,
+                since_date=date_from,
+                extra_uids=recovery_uids,
+            )
+            if recovery_uids or (last_uid and int(last_uid) > 0):
+                threshold = int(last_uid or 0)
+                selected = [
+                    entry
+                    for entry in entries
+                    if entry.uid in recovery_uids or (threshold and entry.uid > threshold)
+                ]
+            else:
+                normalized_from = str(from_email or "").strip().lower()
+                selected = [
+                    entry
+                    for entry in received_since(entries, date_from)
+                    if not normalized_from or normalized_from in entry.from_.lower()
+                ]
             messages = []
+            seen_uids = []
             remaining = max(int(limit or 0), 0)
             normalized_allowed = {
                 _extract_email(sender).lower()
                 for sender in (allowed_senders or set())
                 if _extract_email(sender)
             }
-            for message in fetched:
+            folder_name = normalize_imap_folder(folder)
+            for entry in selected:
+                seen_uids.append(str(entry.uid))
                 if normalized_allowed:
-                    sender = _extract_email(getattr(message, "from_", None))
+                    sender = _extract_email(entry.from_)
                     if sender.lower() not in normalized_allowed:
                         continue
+                message = load_mail_message(ensure_full_message(mailbox, entry))
+                setattr(message, "folder_name", folder_name)
                 messages.append(message)
                 if remaining and len(messages) >= remaining:
                     break
-            folder_name = normalize_imap_folder(folder)
-            for message in messages:
-                setattr(message, "folder_name", folder_name)
+            if mark_seen and seen_uids:
+                mailbox.flag(seen_uids, [MailMessageFlags.SEEN], True)
             return messages
         finally:
             with suppress(Exception):
@@ -1459,14 +1456,13 @@ async def _build_current_offers(
         )
         if not latest_pl:
             continue
-        associations = await crud_pricelist.fetch_pricelist_data(
+        df = await crud_pricelist.get_pricelist_frame(
             latest_pl.id,
             session,
             oem_numbers=required_oems,
         )
-        if not associations:
+        if df.empty:
             continue
-        df = await crud_pricelist.transform_to_dataframe(associations=associations, session=session)
         # For order matching we ignore price/quantity thresholds from the
         # outbound pricelist. A valid offer should still match even if it
         # would be hidden from the mailed pricelist by stock/price limits.
@@ -1763,18 +1759,11 @@ async def _diagnose_missing_offer_reason(
         )
         if not latest_pl:
             continue
-        associations = await crud_pricelist.fetch_pricelist_data(
+        raw_df = await crud_pricelist.get_pricelist_frame(
             latest_pl.id,
             session,
             oem_numbers={key[0]},
         )
-        if not associations:
-            continue
-
-        raw_df = await crud_pricelist.transform_to_dataframe(
-            associations=associations,
-            session=session,
-        )
         if raw_df.empty:
             continue
 
@@ -11,9 +11,10 @@ import unicodedata
 from dataclasses import dataclass
 from datetime import date, datetime, timedelta
 from email.message import EmailMessage
+from functools import partial
 from io import BytesIO
 from types import SimpleNamespace
-from typing import Optional
+from typing import Callable, Optional
 
 import aiofiles
 import httpx
@@ -21,15 +22,11 @@ import pandas as pd
 from fastapi import HTTPException
 
 try:
-    from imap_tools import AND, MailBox, MailBoxSsl
+    from imap_tools import MailBox, MailBoxSsl
 except ImportError:  # pragma: no cover - fallback for older imap_tools
-    from imap_tools import AND, MailBox
+    from imap_tools import MailBox
 
     MailBoxSsl = None
-try:
-    from imap_tools.errors import MailboxUidsError
-except ImportError:  # pragma: no cover - older imap_tools fallback
-    MailboxUidsError = Exception
 from jinja2 import Environment, FileSystemLoader
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -49,6 +46,16 @@ from dz_fastapi.crud.partner import (
 )
 from dz_fastapi.models.partner import Order, Provider, ProviderPriceListConfig
 from dz_fastapi.services.google_oauth import refresh_google_access_token_sync
+from dz_fastapi.services.imap_pool import imap_pool_key, run_with_imap_connection
+from dz_fastapi.services.mailbox_sync import (
+    MAILBOX_SYNC_FULL_BODY_MAX_BYTES,
+    StoredMessage,
+    download_part,
+    load_mail_message,
+    mailbox_account_key,
+    received_since,
+    sync_folder,
+)
 from dz_fastapi.services.resend_api import fetch_received_emails_for_address, send_email_via_resend
 from dz_fastapi.services.utils import normalize_str
 
@@ -69,6 +76,10 @@ GMAIL_API_TIMEOUT = int(os.getenv("GMAIL_API_TIMEOUT", 20))
 RESEND_API_KEY = os.getenv("RESEND_API_KEY")
 RESEND_TIMEOUT = int(os.getenv("RESEND_API_TIMEOUT", "20"))
 RESEND_FROM_EMAIL = os.getenv("RESEND_FROM_EMAIL")
+# Сколько ящиков prices_in get_emails опрашивает одновременно.
+PRICE_EMAIL_ACCOUNT_CONCURRENCY = max(
+    1, int(os.getenv("PRICE_EMAIL_ACCOUNT_CONCURRENCY", "3"))
+)
 
 DOWNLOAD_FOLDER = "uploads/pricelistprovider"
 PROCESSED_FOLDER = "processed"
@@ -196,6 +207,27 @@ class _FetchedAttachment:
     payload: bytes
 
 
+@dataclass
+class _RemoteAttachment:
+    """
+    Вложение большого письма, проиндексированного без тела: save_to()
+    качает с сервера только его MIME-часть, кусками прямо в файл.
+    """
+
+    filename: Optional[str]
+    entry: StoredMessage
+    part: dict
+    # run_with_imap_connection с ключом и логином ящика.
+    with_mailbox: Optional[Callable] = None
+
+    def save_to(self, filepath: str, mailbox=None) -> int:
+        if mailbox is not None:
+            return download_part(mailbox, self.entry, self.part, filepath)
+        return self.with_mailbox(
+            lambda opened: download_part(opened, self.entry, self.part, filepath)
+        )
+
+
 @dataclass
 class _FetchedInboxMessage:
     uid: Optional[str]
@@ -207,6 +239,36 @@ class _FetchedInboxMessage:
     email_account_id: Optional[int] = None
 
 
+def _message_from_entry(entry: StoredMessage, with_mailbox=None):
+    """
+    Письмо из индекса mailbox_sync: целиком из хранилища или, если оно
+    проиндексировано без тела, с вложениями-ссылками на MIME-части.
+    """
+    if not entry.is_partial:
+        return load_mail_message(entry)
+    return _FetchedInboxMessage(
+        uid=str(entry.uid),
+        from_=entry.from_,
+        subject=entry.subject,
+        attachments=[
+            _RemoteAttachment(part.get("filename"), entry, part, with_mailbox)
+            for part in entry.parts
+        ],
+        date=entry.received_at,
+        folder_name=entry.folder_name,
+    )
+
+
+def _login_mailbox(
+    server_mail: str,
+    port: int,
+    ssl: bool,
+    email_account: str,
+    email_password: str,
+):
+    return _create_mailbox(server_mail, port, ssl).login(email_account, email_password)
+
+
 def _message_sort_key(msg: _FetchedInboxMessage) -> tuple[int, float]:
     uid = _safe_uid_as_int(getattr(msg, "uid", None))
     if uid is not None:
@@ -367,142 +429,6 @@ def _message_matches_provider_header_filters(
     return True
 
 
-def _is_mailbox_uid_search_error(exc: Exception) -> bool:
-    if isinstance(exc, MailboxUidsError):
-        return True
-    text = str(exc).upper()
-    return "UID SEARCH" in text and "[UNAVAILABLE]" in text
-
-
-def _fetch_recent_mail_headers_for_fallback(
-    mailbox,
-    since_date: date,
-    max_emails: int,
-    provider_conf: ProviderPriceListConfig,
-    folder: str,
-):
-    attempts = [
-        (
-            AND(date_gte=since_date, all=True),
-            dict(
-                mark_seen=False,
-                reverse=True,
-                headers_only=True,
-                limit=max_emails,
-            ),
-            "date_gte",
-        ),
-        (
-            "ALL",
-            dict(
-                mark_seen=False,
-                reverse=True,
-                headers_only=True,
-                limit=max_emails,
-            ),
-            "all",
-        ),
-    ]
-    for criteria, kwargs, label in attempts:
-        try:
-            headers = list(mailbox.fetch(criteria, **kwargs))
-            logger.debug(
-                "Fetched %s mailbox headers via fallback=%s "
-                "for provider_config_id=%s folder=%s",
-                len(headers),
-                label,
-                provider_conf.id if provider_conf else None,
-                folder,
-            )
-            return headers
-        except Exception as fallback_exc:  # pragma: no cover - defensive
-            logger.warning(
-                "Fallback header fetch failed mode=%s "
-                "for provider_config_id=%s folder=%s: %s",
-                label,
-                provider_conf.id if provider_conf else None,
-                folder,
-                fallback_exc,
-            )
-    return []
-
-
-def _fetch_candidate_emails_with_uid_fallback(
-    mailbox,
-    provider: Provider,
-    provider_conf: ProviderPriceListConfig,
-    since_date: date,
-    max_emails: int,
-    last_uid: int,
-    folder: str,
-):
-    header_messages = _fetch_recent_mail_headers_for_fallback(
-        mailbox=mailbox,
-        since_date=since_date,
-        max_emails=max_emails,
-        provider_conf=provider_conf,
-        folder=folder,
-    )
-    matching_headers = [
-        msg
-        for msg in header_messages
-        if (_safe_uid_as_int(getattr(msg, "uid", None)) or 0) > last_uid
-        and _message_matches_provider_header_filters(
-            msg,
-            provider,
-            provider_conf,
-            since_date,
-        )
-    ]
-    matching_headers.sort(key=_message_sort_key, reverse=True)
-    if not matching_headers:
-        logger.debug(
-            "UID fallback found no matching headers "
-            "for provider_config_id=%s folder=%s",
-            provider_conf.id if provider_conf else None,
-            folder,
-        )
-        return []
-
-    full_messages = []
-    for header_msg in matching_headers:
-        uid = getattr(header_msg, "uid", None)
-        if not uid:
-            continue
-        try:
-            fetched_messages = list(
-                mailbox.fetch(
-                    f"UID {uid}",
-                    mark_seen=False,
-                )
-            )
-        except Exception as fetch_exc:  # pragma: no cover - defensive
-            logger.warning(
-                "UID fallback full fetch failed uid=%s "
-                "for provider_config_id=%s folder=%s: %s",
-                uid,
-                provider_conf.id if provider_conf else None,
-                folder,
-                fetch_exc,
-            )
-            continue
-        if not fetched_messages:
-            continue
-        full_msg = fetched_messages[0]
-        setattr(full_msg, "folder_name", folder)
-        if _message_matches_provider_config(full_msg, provider_conf):
-            full_messages.append(full_msg)
-
-    logger.debug(
-        "UID fallback produced %s candidate emails "
-        "for provider_config_id=%s folder=%s",
-        len(full_messages),
-        provider_conf.id if provider_conf else None,
-        folder,
-    )
-    return full_messages
-
-
 def _resolve_smtp_host(host: str) -> tuple[str, str]:
     try:
         addrinfo = socket.getaddrinfo(
@@ -901,197 +827,79 @@ def _imap_fetch_provider_attachment(
 
     ``ignore_last_uid=True`` (ручное «принудительно скачать») берёт свежее
     подходящее письмо из окна дат даже если оно уже скачивалось.
-    """
-    criteria_kwargs: dict = {"date_gte": since_date}
-    if email_incoming_price:
-        criteria_kwargs["from_"] = email_incoming_price
-    use_local_subject_filter = (
-        mailbox_host or ""
-    ).strip().lower() == "imap.gmail.com" and bool(name_mail)
-    if name_mail and not use_local_subject_filter:
-        criteria_kwargs["subject"] = name_mail
-    criteria = AND(**criteria_kwargs)
-    logger.debug(f"[thread] Using criteria: {criteria}")
-    if use_local_subject_filter:
-        logger.debug(
-            "[thread] Skipping IMAP SUBJECT search for Gmail "
-            "provider_conf_id=%s; local subject filter=%r",
-            provider_conf_id,
-            name_mail,
-        )
 
-    fetch_kwargs: dict = {}
-    if not use_local_subject_filter:
-        fetch_kwargs["charset"] = "utf-8"
+    Письма берутся через общий mailbox_sync: с сервера докачиваются только
+    новые, отправитель и тема проверяются по индексу заголовков, а тело
+    из хранилища читается лишь у подходящих писем. Серверный SEARCH
+    по FROM/SUBJECT больше не нужен — и его [UNAVAILABLE] у Yandex тоже.
+    Большие письма индексируются по BODYSTRUCTURE без тела: имя вложения
+    сверяется по структуре, и с сервера качается только нужная часть.
+    """
+    provider_filter = SimpleNamespace(
+        id=provider_id,
+        email_incoming_price=email_incoming_price,
+    )
+    conf_filter = SimpleNamespace(
+        id=provider_conf_id,
+        incoming_email_account_id=None,
+        name_mail=name_mail,
+        filename_pattern=filename_pattern,
+        name_price=filename_pattern,
+        file_url=None,
+    )
+    account_key = mailbox_account_key(mailbox_host, mailbox_login)
 
-    with _create_mailbox(mailbox_host, mailbox_port, True).login(
-        mailbox_login, mailbox_password
-    ) as mailbox:
-        logger.debug(
-            "[thread] Mailbox login successful for provider_conf_id=%s",
-            provider_conf_id,
-        )
+    def _fetch(mailbox):
         selected_msg = None
-        selected_folder = None
 
         for folder in mailbox_folders:
-            mailbox.folder.set(folder)
-            logger.debug(
-                "[thread] Mailbox folder selected=%s "
-                "for provider_conf_id=%s",
-                folder,
-                provider_conf_id,
+            entries = sync_folder(
+                mailbox,
+                account_key=account_key,
+                folder=folder,
+                since_date=since_date,
+                full_body_max_bytes=MAILBOX_SYNC_FULL_BODY_MAX_BYTES,
             )
-            # Отладочный fetch — защищён: при полном отказе SEARCH у
-            # провайдера он не должен ронять весь запрос (иначе 500).
-            try:
-                debug_emails = list(
-                    mailbox.fetch(
-                        AND(date_gte=date.today(), all=True),
-                        headers_only=True,
-                        limit=20,
-                        mark_seen=False,
-                        reverse=True,
-                    )
-                )
-                logger.debug(
-                    "[thread] Fetched %s recent headers for "
-                    "provider_conf_id=%s folder=%s",
-                    len(debug_emails),
-                    provider_conf_id,
-                    folder,
-                )
-                for msg in debug_emails:
-                    logger.debug(
-                        "Uid: %s, from: %s, date: %s, subject: %s",
-                        msg.uid,
-                        msg.from_,
-                        msg.date,
-                        msg.subject,
-                    )
-            except Exception as debug_exc:  # pragma: no cover - defensive
-                logger.debug(
-                    "[thread] Debug header fetch failed "
-                    "provider_conf_id=%s folder=%s: %s",
-                    provider_conf_id,
-                    folder,
-                    debug_exc,
-                )
-
             # В режиме «принудительно» порог UID обнуляем — берём свежее
             # подходящее письмо, даже если его уже скачивали.
             last_uid = 0 if ignore_last_uid else last_uids.get(folder, 0)
-            logger.debug(
-                "[thread] Last UID for folder %s: %s (ignore=%s)",
-                folder,
-                last_uid,
-                ignore_last_uid,
-            )
-
-            # Ретрай комбинированного SEARCH: [UNAVAILABLE] у Yandex/Mail.ru
-            # часто транзиентный и проходит со 2-3 попытки. Только потом
-            # уходим в локальный fallback по заголовкам.
-            email_list = None
-            search_error: Exception | None = None
-            for attempt in range(3):
-                try:
-                    email_list = list(
-                        mailbox.fetch(
-                            criteria, mark_seen=False, **fetch_kwargs
-                        )
-                    )
-                    search_error = None
-                    break
-                except Exception as exc:
-                    if not _is_mailbox_uid_search_error(exc):
-                        raise
-                    search_error = exc
-                    if attempt < 2:
-                        time.sleep(1.5 * (attempt + 1))
-            if email_list is None:
-                logger.warning(
-                    "[thread] IMAP UID SEARCH failed after retries; "
-                    "using UID fallback for provider_id=%s "
-                    "provider_conf_id=%s folder=%s: %s",
-                    provider_id,
-                    provider_conf_id,
-                    folder,
-                    search_error,
+            candidates = [
+                entry
+                for entry in entries
+                if entry.uid > last_uid
+                and _message_matches_provider_header_filters(
+                    entry,
+                    provider_filter,
+                    conf_filter,
+                    since_date,
                 )
-
-                email_list = _fetch_candidate_emails_with_uid_fallback(
-                    mailbox=mailbox,
-                    provider=SimpleNamespace(
-                        id=provider_id,
-                        email_incoming_price=email_incoming_price,
-                    ),
-                    provider_conf=SimpleNamespace(
-                        id=provider_conf_id,
-                        incoming_email_account_id=None,
-                        name_mail=name_mail,
-                        filename_pattern=filename_pattern,
-                        name_price=filename_pattern,
-                        file_url=None,
-                    ),
-                    since_date=since_date,
-                    max_emails=max_emails,
-                    last_uid=last_uid,
-                    folder=folder,
-                )
-
-            for msg in email_list:
-                setattr(msg, "folder_name", folder)
-
-            logger.debug(
-                "[thread] Fetched %s candidate emails "
-                "for provider_conf_id=%s folder=%s",
-                len(email_list),
-                provider_conf_id,
-                folder,
-            )
-
-            emails = [
-                msg
-                for msg in email_list
-                if (_safe_uid_as_int(getattr(msg, "uid", None)) or 0)
-                > last_uid
             ]
             logger.debug(
-                "[thread] %s emails with UID > %s in folder=%s.",
-                len(emails),
+                "[thread] %s indexed emails, %s candidates with UID > %s "
+                "for provider_conf_id=%s folder=%s",
+                len(entries),
+                len(candidates),
                 last_uid,
+                provider_conf_id,
                 folder,
             )
-
-            matching_emails = [
-                msg
-                for msg in emails
-                if _message_matches_provider_config(
-                    msg,
-                    SimpleNamespace(
-                        id=provider_conf_id,
-                        incoming_email_account_id=None,
-                        name_mail=name_mail,
-                        filename_pattern=filename_pattern,
-                        name_price=filename_pattern,
-                        file_url=None,
-                    ),
-                )
-            ]
-            if not matching_emails:
-                continue
-            candidate_msg = max(matching_emails, key=_message_sort_key)
-            if selected_msg is None or _message_sort_key(
-                candidate_msg
-            ) > _message_sort_key(selected_msg):
-                selected_msg = candidate_msg
-                selected_folder = folder
+            candidates.sort(key=lambda entry: entry.uid, reverse=True)
+            for entry in candidates[: max(int(max_emails or 0), 1)]:
+                msg = _message_from_entry(entry)
+                if not _message_matches_provider_config(msg, conf_filter):
+                    continue
+                if selected_msg is None or _message_sort_key(
+                    msg
+                ) > _message_sort_key(selected_msg):
+                    selected_msg = msg
+                break
 
         if selected_msg is None:
             logger.debug("[thread] No matching attachments found.")
             return None
 
         msg = selected_msg
+        selected_folder = getattr(msg, "folder_name", None)
         mailbox.folder.set(selected_folder or mailbox_folder)
         logger.debug(
             "[thread] Selected email uid=%s for provider_conf_id=%s "
@@ -1100,9 +908,6 @@ def _imap_fetch_provider_attachment(
             provider_conf_id,
             selected_folder,
         )
-        raw_subject = msg.obj.get("Subject")
-        if raw_subject is None:
-            logger.debug("[thread] No Subject found for this email.")
 
         for att in msg.attachments:
             logger.debug(f"[thread] Found attachment: {att.filename}")
@@ -1112,17 +917,32 @@ def _imap_fetch_provider_attachment(
             ):
                 filepath = os.path.join(DOWNLOAD_FOLDER, att.filename)
                 _ensure_parent_dir(filepath)
-                with open(filepath, "wb") as f:
-                    f.write(att.payload)
+                if isinstance(att, _RemoteAttachment):
+                    att.save_to(filepath, mailbox)
+                else:
+                    with open(filepath, "wb") as f:
+                        f.write(att.payload)
                 logger.debug(f"[thread] Downloaded attachment: {filepath}")
                 mailbox.flag(msg.uid, [r"\Seen"], True)
                 uid_to_set = _safe_uid_as_int(getattr(msg, "uid", None))
-                folder_name = getattr(msg, "folder_name", None)
-                return filepath, uid_to_set, folder_name
+                return filepath, uid_to_set, selected_folder
 
         logger.debug("[thread] No matching attachments found.")
         return None
 
+    return run_with_imap_connection(
+        imap_pool_key(account_key, mailbox_port),
+        partial(
+            _login_mailbox,
+            mailbox_host,
+            mailbox_port,
+            True,
+            mailbox_login,
+            mailbox_password,
+        ),
+        _fetch,
+    )
+
 
 async def download_price_provider(
     provider: Provider,
@@ -1568,8 +1388,11 @@ async def download_new_price_provider(
             filepath = os.path.join(DOWNLOAD_FOLDER, att.filename)
             try:
                 _ensure_parent_dir(filepath)
-                async with aiofiles.open(filepath, "wb") as f:
-                    await f.write(att.payload)
+                if isinstance(att, _RemoteAttachment):
+                    await asyncio.to_thread(att.save_to, filepath)
+                else:
+                    async with aiofiles.open(filepath, "wb") as f:
+                        await f.write(att.payload)
                 logger.debug("Скачано вложение: %s", filepath)
             except Exception as e:
                 logger.exception(f"Ошибка записи файла {filepath}: {e}")
@@ -1599,21 +1422,33 @@ def _fetch_mailbox_messages(
     port: int = IMAP_SERVER,
     ssl: bool = True,
 ):
-    with _create_mailbox(server_mail, port, ssl).login(
-        email_account, email_password
-    ) as mailbox:
-        mailbox.folder.set(main_box)
-        messages = list(
-            mailbox.fetch(
-                AND(date_gte=_scheduled_price_email_since_date(), all=True),
-                charset="utf-8",
-                mark_seen=False,
-            )
+    account_key = mailbox_account_key(server_mail, email_account)
+    # Соединение берётся из пула: папки и ящики одного цикла прайсов
+    # не логинятся заново, а вложения больших писем качаются потом
+    # через то же соединение.
+    with_mailbox = partial(
+        run_with_imap_connection,
+        imap_pool_key(account_key, port),
+        partial(_login_mailbox, server_mail, port, ssl, email_account, email_password),
+    )
+    since_date = _scheduled_price_email_since_date()
+    entries = with_mailbox(
+        lambda mailbox: sync_folder(
+            mailbox,
+            account_key=account_key,
+            folder=main_box,
+            since_date=since_date,
+            full_body_max_bytes=MAILBOX_SYNC_FULL_BODY_MAX_BYTES,
         )
-        folder_name = normalize_imap_folder(main_box)
-        for message in messages:
-            setattr(message, "folder_name", folder_name)
-        return messages
+    )
+    messages = [
+        _message_from_entry(entry, with_mailbox)
+        for entry in received_since(entries, since_date)
+    ]
+    folder_name = normalize_imap_folder(main_box)
+    for message in messages:
+        setattr(message, "folder_name", folder_name)
+    return messages
 
 
 def _safe_uid_as_int(value: str | None) -> int | None:
@@ -1660,13 +1495,89 @@ async def _fetch_resend_price_messages(
     return messages, last_received_at
 
 
+async def _poll_price_account(
+    account,
+    semaphore: asyncio.Semaphore,
+    *,
+    server_mail: str,
+    main_box: str,
+) -> tuple[list, Optional[datetime], dict]:
+    """
+    Письма одного ящика prices_in: (письма, курсор Resend, статистика
+    опроса). Ошибка ящика логируется и не мешает остальным.
+    """
+    stats = {
+        "account_id": getattr(account, "id", None),
+        "email": getattr(account, "email", None),
+        "transport": getattr(account, "transport", None),
+        "messages": 0,
+    }
+    messages: list = []
+    last_received_at = None
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            if (account.transport or "").strip().lower() == "resend_api":
+                if not account.resend_api_key:
+                    logger.warning(
+                        "Resend API key is missing for prices_in account id=%s",
+                        account.id,
+                    )
+                    stats["skipped"] = "no_resend_api_key"
+                else:
+                    messages, last_received_at = await _fetch_resend_price_messages(account)
+            else:
+                host = account.imap_host or server_mail
+                folders = resolve_imap_folders(
+                    account.imap_folder,
+                    getattr(account, "imap_additional_folders", None),
+                    default=main_box or DEFAULT_IMAP_FOLDER,
+                )
+                stats["folders"] = len(folders)
+                for folder in folders if host else []:
+                    folder_messages = await asyncio.to_thread(
+                        _fetch_mailbox_messages,
+                        host,
+                        account.email,
+                        account.password,
+                        folder,
+                        account.imap_port or IMAP_SERVER,
+                        True,
+                    )
+                    for msg in folder_messages:
+                        setattr(msg, "email_account_id", account.id)
+                    messages.extend(folder_messages)
+                messages = _dedupe_fetched_messages(messages)
+        except Exception as exc:
+            logger.error(
+                "Price inbox fetch failed for account id=%s email=%s "
+                "transport=%s host=%s: %s",
+                getattr(account, "id", None),
+                getattr(account, "email", None),
+                getattr(account, "transport", None),
+                getattr(account, "imap_host", None) or server_mail,
+                exc,
+                exc_info=True,
+            )
+            stats["error"] = str(exc)[:500]
+            messages, last_received_at = [], None
+        stats["latency_ms"] = int((time.perf_counter() - started) * 1000)
+    stats["messages"] = len(messages)
+    return messages, last_received_at, stats
+
+
 async def get_emails(
     session: AsyncSession,
     server_mail: str = EMAIL_HOST,
     email_account: str = EMAIL_NAME,
     email_password: str = EMAIL_PASSWORD,
     main_box: str = "INBOX",
+    trace_details: Optional[dict] = None,
 ) -> list[tuple[Provider, str]]:
+    """
+    Скачивает свежие прайсы из ящиков prices_in. В trace_details (детали
+    tracked_execution) пишется время опроса и число писем по ящикам.
+    """
     downloaded_files = []
     all_emails = []
     resend_cursors: dict[int, object] = {}
@@ -1719,60 +1630,28 @@ async def get_emails(
             accounts_by_id[normalized_account_id] = extra_account
 
     if accounts:
-        for account in accounts:
-            try:
-                if (account.transport or "").strip().lower() == "resend_api":
-                    if not account.resend_api_key:
-                        logger.warning(
-                            "Resend API key is missing "
-                            "for prices_in account id=%s",
-                            account.id,
-                        )
-                        continue
-                    (
-                        messages,
-                        last_received_at,
-                    ) = await _fetch_resend_price_messages(account)
-                    all_emails.extend(messages)
-                    if last_received_at is not None:
-                        resend_cursors[account.id] = last_received_at
-                    continue
-                host = account.imap_host or server_mail
-                if not host:
-                    continue
-                messages = []
-                folders = resolve_imap_folders(
-                    account.imap_folder,
-                    getattr(account, "imap_additional_folders", None),
-                    default=main_box or DEFAULT_IMAP_FOLDER,
-                )
-                for folder in folders:
-                    folder_messages = await asyncio.to_thread(
-                        _fetch_mailbox_messages,
-                        host,
-                        account.email,
-                        account.password,
-                        folder,
-                        account.imap_port or IMAP_SERVER,
-                        True,
-                    )
-                    for msg in folder_messages:
-                        setattr(msg, "email_account_id", account.id)
-                    messages.extend(folder_messages)
-                messages = _dedupe_fetched_messages(messages)
-                all_emails.extend(messages)
-            except Exception as exc:
-                logger.error(
-                    "Price inbox fetch failed for account id=%s email=%s "
-                    "transport=%s host=%s: %s",
-                    getattr(account, "id", None),
-                    getattr(account, "email", None),
-                    getattr(account, "transport", None),
-                    getattr(account, "imap_host", None) or server_mail,
-                    exc,
-                    exc_info=True,
+        # Ящики опрашиваются параллельно, папки одного ящика — по очереди
+        # через одно соединение из пула.
+        semaphore = asyncio.Semaphore(PRICE_EMAIL_ACCOUNT_CONCURRENCY)
+        polls = await asyncio.gather(
+            *(
+                _poll_price_account(
+                    account,
+                    semaphore,
+                    server_mail=server_mail,
+                    main_box=main_box,
                 )
-                continue
+                for account in accounts
+            )
+        )
+        account_stats = []
+        for account, (messages, last_received_at, stats) in zip(accounts, polls):
+            all_emails.extend(messages)
+            if last_received_at is not None:
+                resend_cursors[account.id] = last_received_at
+            account_stats.append(stats)
+        if trace_details is not None:
+            trace_details["mail_accounts"] = account_stats
     else:
         all_emails = _dedupe_fetched_messages(
             await asyncio.to_thread(
@@ -6,7 +6,7 @@
 их по HTTPS и отправляет через smtp.yandex.ru:465.
 
 Здесь — постановка письма в очередь и контракт для релея:
-list_pending / mark_sent / mark_error.
+list_pending / claim (с long-poll по NOTIFY) / mark_sent / mark_error.
 """
 import asyncio
 import base64
@@ -20,6 +20,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from dz_fastapi.core.time import now_moscow
 from dz_fastapi.models.partner import EMAIL_OUTBOX_STATUS, EmailOutbox
+from dz_fastapi.services.outbox_notify import (
+    EMAIL_OUTBOX_CHANNEL,
+    claim_with_long_poll,
+    notify_outbox,
+)
 from dz_fastapi.services.reclamation_audit import record_reclamation_event
 
 logger = logging.getLogger("dz_fastapi")
@@ -185,6 +190,7 @@ async def enqueue_email(
         attempts=0,
     )
     session.add(row)
+    await notify_outbox(session, EMAIL_OUTBOX_CHANNEL)
     if commit:
         await session.commit()
         await session.refresh(row)
@@ -229,11 +235,30 @@ async def claim_pending_outbox(
     worker: str,
     limit: int = 25,
     lease_seconds: int = DEFAULT_CLAIM_LEASE_SECONDS,
+    wait_seconds: float = 0,
 ) -> list[EmailOutbox]:
     """Атомарно «захватывает» pending-письма за воркером, чтобы несколько
     релеев не отправили одно письмо дважды. Берёт письма, у которых нет
     активного захвата (claimed_at пуст или аренда истекла), помечает их
-    claimed_by/claimed_at и возвращает. Использует SKIP LOCKED."""
+    claimed_by/claimed_at и возвращает. Использует SKIP LOCKED.
+    С wait_seconds пустая очередь ждёт NOTIFY о новом письме (long-poll)."""
+    return await claim_with_long_poll(
+        session,
+        channel=EMAIL_OUTBOX_CHANNEL,
+        claim=lambda: _claim_pending_outbox_once(
+            session, worker=worker, limit=limit, lease_seconds=lease_seconds
+        ),
+        wait_seconds=wait_seconds,
+    )
+
+
+async def _claim_pending_outbox_once(
+    session: AsyncSession,
+    *,
+    worker: str,
+    limit: int,
+    lease_seconds: int,
+) -> list[EmailOutbox]:
     now = now_moscow()
     cutoff = now - timedelta(seconds=max(30, int(lease_seconds)))
     limit = max(1, min(int(limit or 25), 200))
@@ -0,0 +1,146 @@
+import imaplib
+import logging
+import os
+import threading
+import time
+from contextlib import suppress
+from typing import Any, Callable
+
+logger = logging.getLogger("dz_fastapi")
+
+# Пул залогиненных IMAP-соединений по ящикам: утренний цикл прайсов
+# раньше тратил минуты на TLS-рукопожатия и LOGIN для каждой папки.
+# Соединение берётся в монопольное пользование и возвращается после
+# вызова; свободных на ящик держим не больше стольких.
+IMAP_POOL_MAX_IDLE_PER_ACCOUNT = max(
+    0, int(os.getenv("IMAP_POOL_MAX_IDLE_PER_ACCOUNT", "2"))
+)
+# Соединение, пролежавшее дольше, перед выдачей проверяется NOOP.
+IMAP_POOL_NOOP_AFTER_SEC = max(0.0, float(os.getenv("IMAP_POOL_NOOP_AFTER_SEC", "60")))
+# Свободное соединение старше этого закрывается: серверы рвут простаивающие
+# сессии через 10–30 минут.
+IMAP_POOL_MAX_IDLE_SEC = max(0.0, float(os.getenv("IMAP_POOL_MAX_IDLE_SEC", "900")))
+# Период задачи keepalive в планировщике.
+IMAP_POOL_KEEPALIVE_SEC = max(10, int(os.getenv("IMAP_POOL_KEEPALIVE_SEC", "120")))
+
+# Обрыв соединения: сокет, TLS, BYE сервера.
+_CONNECTION_ERRORS = (OSError, EOFError, imaplib.IMAP4.abort)
+
+_idle: dict[str, list[tuple[float, Any]]] = {}
+_lock = threading.Lock()
+
+
+def imap_pool_key(account_key: str, port: int) -> str:
+    return f"{account_key}:{int(port)}"
+
+
+def _close(mailbox) -> None:
+    with suppress(Exception):
+        mailbox.logout()
+
+
+def _is_alive(mailbox) -> bool:
+    try:
+        status, _ = mailbox.client.noop()
+    except Exception:
+        return False
+    return status == "OK"
+
+
+def _checkout(key: str):
+    while True:
+        with _lock:
+            stack = _idle.get(key)
+            if not stack:
+                return None
+            released_at, mailbox = stack.pop()
+        idle_sec = time.monotonic() - released_at
+        if idle_sec > IMAP_POOL_MAX_IDLE_SEC:
+            _close(mailbox)
+            continue
+        if idle_sec > IMAP_POOL_NOOP_AFTER_SEC and not _is_alive(mailbox):
+            _close(mailbox)
+            continue
+        return mailbox
+
+
+def _checkin(key: str, mailbox) -> None:
+    with _lock:
+        stack = _idle.setdefault(key, [])
+        if len(stack) < IMAP_POOL_MAX_IDLE_PER_ACCOUNT:
+            stack.append((time.monotonic(), mailbox))
+            return
+    _close(mailbox)
+
+
+def _call(key: str, mailbox, func: Callable[[Any], Any]) -> Any:
+    try:
+        result = func(mailbox)
+    except BaseException:
+        # Состояние сессии после ошибки неизвестно — в пул не возвращаем.
+        _close(mailbox)
+        raise
+    _checkin(key, mailbox)
+    return result
+
+
+def run_with_imap_connection(
+    key: str,
+    connect: Callable[[], Any],
+    func: Callable[[Any], Any],
+) -> Any:
+    """
+    func(mailbox) на соединении из пула; connect() логинится заново, если
+    свободного нет. Если переиспользованное соединение оборвалось (сервер
+    закрыл простаивающую сессию), func повторяется на новом.
+    Блокирующий вызов — запускать через asyncio.to_thread.
+    """
+    mailbox = _checkout(key)
+    if mailbox is not None:
+        try:
+            return _call(key, mailbox, func)
+        except _CONNECTION_ERRORS as exc:
+            logger.info("Pooled IMAP connection %s dropped, reconnecting: %s", key, exc)
+    return _call(key, connect(), func)
+
+
+def keepalive_imap_pool() -> int:
+    """
+    NOOP по свободным соединениям, давно не бывшим в работе; мёртвые и
+    просроченные закрываются. Возвращает число живых соединений.
+    """
+    with _lock:
+        snapshot = {key: list(stack) for key, stack in _idle.items()}
+        _idle.clear()
+    now = time.monotonic()
+    alive: dict[str, list[tuple[float, Any]]] = {}
+    for key, stack in snapshot.items():
+        for released_at, mailbox in stack:
+            idle_sec = now - released_at
+            if idle_sec > IMAP_POOL_MAX_IDLE_SEC:
+                _close(mailbox)
+            elif idle_sec <= IMAP_POOL_NOOP_AFTER_SEC or _is_alive(mailbox):
+                alive.setdefault(key, []).append((released_at, mailbox))
+            else:
+                _close(mailbox)
+    surplus = []
+    with _lock:
+        for key, stack in alive.items():
+            # Пока шла проверка, соединения могли вернуть в пул заново.
+            merged = sorted(stack + _idle.get(key, []), key=lambda item: item[0])
+            drop = len(merged) - min(len(merged), IMAP_POOL_MAX_IDLE_PER_ACCOUNT)
+            surplus.extend(mailbox for _, mailbox in merged[:drop])
+            _idle[key] = merged[drop:]
+        total = sum(len(stack) for stack in _idle.values())
+    for mailbox in surplus:
+        _close(mailbox)
+    return total
+
+
+def close_imap_pool() -> None:
+    with _lock:
+        stacks = list(_idle.values())
+        _idle.clear()
+    for stack in stacks:
+        for _, mailbox in stack:
+            _close(mailbox)
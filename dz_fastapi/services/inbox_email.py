@@ -37,7 +37,7 @@ from email.header import decode_header
 from typing import Dict, List, Optional, Tuple
 
 import aiofiles
-from imap_tools import AND, MailboxLoginError
+from imap_tools import MailboxLoginError
 
 try:
     from imap_tools.errors import MailboxFolderSelectError
@@ -71,6 +71,15 @@ from dz_fastapi.services.email import (
     _FetchedAttachment,
     _FetchedInboxMessage,
 )
+from dz_fastapi.services.mailbox_sync import (
+    ensure_full_message,
+    find_stored_message,
+    load_mail_message,
+    mailbox_account_key,
+    prune_mail_store,
+    received_since,
+    sync_folder,
+)
 from dz_fastapi.services.runtime_memory import trim_process_memory
 
 logger = logging.getLogger("dz_fastapi")
@@ -96,13 +105,9 @@ def _bounded_env_int(
     return max(minimum, min(value, maximum))
 
 
-# Scan many lightweight headers, but download only a small batch of full
-# messages. Price-list attachments can be hundreds of megabytes in total.
-INBOX_IMAP_HEADER_SCAN_LIMIT = _bounded_env_int(
-    "INBOX_IMAP_HEADER_SCAN_LIMIT",
-    500,
-    maximum=5000,
-)
+# Письма докачивает общий mailbox_sync, а за один проход в память
+# разбирается лишь небольшая пачка: вложения с прайсами бывают по
+# сотне мегабайт.
 INBOX_IMAP_FULL_FETCH_LIMIT = _bounded_env_int(
     "INBOX_IMAP_FULL_FETCH_LIMIT",
     5,
@@ -352,6 +357,20 @@ async def _build_attachment_info_for_message(
     return att_info
 
 
+def _inbox_message_from_mail(msg, folder: str) -> _FetchedInboxMessage:
+    return _FetchedInboxMessage(
+        uid=str(msg.uid) if msg.uid else None,
+        from_=msg.from_ or "",
+        subject=_decode_subject(msg.subject or ""),
+        attachments=[
+            _FetchedAttachment(filename=att.filename, payload=att.payload)
+            for att in (msg.attachments or [])
+        ],
+        date=getattr(msg, "date", None),
+        folder_name=folder,
+    )
+
+
 def _fetch_inbox_message_by_uid_imap_sync(
     *,
     host: str,
@@ -362,38 +381,35 @@ def _fetch_inbox_message_by_uid_imap_sync(
     port: int,
 ) -> Optional[_FetchedInboxMessage]:
     """
-    Загружает одно письмо из IMAP по UID в указанной папке.
+    Загружает одно письмо по UID в указанной папке: сначала из хранилища
+    mailbox_sync, иначе с IMAP-сервера (с сохранением в хранилище).
     Возвращает None если письмо не найдено или возникла ошибка.
     """
+    account_key = mailbox_account_key(host, email)
     try:
-        with _create_mailbox(host, port, True).login(
-            email, password
-        ) as mailbox:
-            mailbox.folder.set(folder)
-            raw_messages = list(
-                mailbox.fetch(
-                    f"UID {uid}:{uid}",
-                    mark_seen=False,
-                )
-            )
-            if not raw_messages:
-                return None
-            msg = raw_messages[-1]
-            attachments = [
-                _FetchedAttachment(
-                    filename=att.filename,
-                    payload=att.payload,
-                )
-                for att in (msg.attachments or [])
-            ]
-            return _FetchedInboxMessage(
-                uid=str(msg.uid) if msg.uid else str(uid),
-                from_=msg.from_ or "",
-                subject=_decode_subject(msg.subject or ""),
-                attachments=attachments,
-                date=getattr(msg, "date", None),
-                folder_name=folder,
-            )
+        entry = find_stored_message(account_key, folder, uid)
+        if entry is None or entry.is_partial:
+            # Письмо не скачано или прайсовая синхронизация сохранила
+            # только его заголовок — докачиваем целиком.
+            with _create_mailbox(host, port, True).login(
+                email, password
+            ) as mailbox:
+                if entry is None:
+                    entries = sync_folder(
+                        mailbox,
+                        account_key=account_key,
+                        folder=folder,
+                        extra_uids=[int(uid)],
+                    )
+                    entry = next(
+                        (item for item in entries if str(item.uid) == str(uid)),
+                        None,
+                    )
+                if entry is not None:
+                    entry = ensure_full_message(mailbox, entry)
+        if entry is None:
+            return None
+        return _inbox_message_from_mail(load_mail_message(entry), folder)
     except Exception as exc:
         logger.warning(
             "Failed to fetch IMAP message by UID: "
@@ -502,12 +518,14 @@ def _fetch_inbox_imap_sync(
     port: int = 993,
     since_date: Optional[date] = None,
     known_uids: Optional[set[str]] = None,
-    header_limit: int = INBOX_IMAP_HEADER_SCAN_LIMIT,
     full_fetch_limit: int = INBOX_IMAP_FULL_FETCH_LIMIT,
 ) -> List[_FetchedInboxMessage]:
     """
     Синхронная загрузка писем из IMAP-папки за последние N дней.
     Запускается через asyncio.to_thread.
+
+    Новые письма докачивает общий mailbox_sync; из хранилища читаются
+    только ещё не сохранённые в InboxEmail (known_uids), свежие первыми.
     """
     if since_date is None:
         since_date = date.today()
@@ -517,95 +535,41 @@ def _fetch_inbox_imap_sync(
     try:
         mb = _create_mailbox(host, port, True).login(email, password)
         with mb as mailbox:
-            mailbox.folder.set(folder)
-            headers = []
-            header_attempts = (
-                (AND(date_gte=since_date, all=True), "date_gte"),
-                ("ALL", "all"),
+            entries = sync_folder(
+                mailbox,
+                account_key=mailbox_account_key(host, email),
+                folder=folder,
+                since_date=since_date,
             )
-            for criteria, label in header_attempts:
-                try:
-                    headers = list(
-                        mailbox.fetch(
-                            criteria,
-                            charset="utf-8",
-                            mark_seen=False,
-                            reverse=True,
-                            headers_only=True,
-                            limit=header_limit,
-                        )
-                    )
-                    break
-                except Exception as header_error:
-                    logger.warning(
-                        "IMAP header fetch failed for %s folder=%s mode=%s: %s",
-                        email,
-                        folder,
-                        label,
-                        header_error,
-                    )
-
-            candidate_uids: list[str] = []
-            for header in headers:
-                uid = str(header.uid) if getattr(header, "uid", None) else ""
-                if not uid or uid in known_uids:
-                    continue
-                candidate_uids.append(uid)
-                if len(candidate_uids) >= full_fetch_limit:
-                    break
+            recent = received_since(entries, since_date)
+            candidates = [
+                entry for entry in reversed(recent) if str(entry.uid) not in known_uids
+            ][:full_fetch_limit]
 
             logger.info(
-                "IMAP inbox batch prepared: email=%s folder=%s headers=%s "
+                "IMAP inbox batch prepared: email=%s folder=%s indexed=%s "
                 "known_uids=%s full_fetch=%s",
                 email,
                 folder,
-                len(headers),
+                len(recent),
                 len(known_uids),
-                len(candidate_uids),
+                len(candidates),
             )
 
-            for uid in candidate_uids:
+            for entry in candidates:
                 try:
-                    msg = next(
-                        iter(
-                            mailbox.fetch(
-                                f"UID {uid}",
-                                mark_seen=False,
-                                limit=1,
-                            )
-                        ),
-                        None,
-                    )
-                except Exception as full_fetch_error:
+                    # Большие прайсы проиндексированы без тела.
+                    msg = load_mail_message(ensure_full_message(mailbox, entry))
+                except (OSError, LookupError) as read_error:
                     logger.warning(
-                        "IMAP full message fetch failed for %s folder=%s "
-                        "uid=%s: %s",
+                        "Stored IMAP message is unreadable for %s folder=%s uid=%s: %s",
                         email,
                         folder,
-                        uid,
-                        full_fetch_error,
+                        entry.uid,
+                        read_error,
                     )
                     continue
-                if msg is None:
-                    continue
-                attachments = []
-                for att in msg.attachments:
-                    attachments.append(
-                        _FetchedAttachment(
-                            filename=att.filename,
-                            payload=att.payload,
-                        )
-                    )
-                result.append(
-                    _FetchedInboxMessage(
-                        uid=str(msg.uid) if msg.uid else None,
-                        from_=msg.from_ or "",
-                        subject=_decode_subject(msg.subject or ""),
-                        attachments=attachments,
-                        date=msg.date,
-                        folder_name=folder,
-                    )
-                )
+                result.append(_inbox_message_from_mail(msg, folder))
     except MailboxLoginError as e:
         logger.error("IMAP login failed for %s: %s", email, e)
     except Exception as e:
@@ -3578,14 +3542,21 @@ async def cleanup_inbox_emails(
         session=session,
         cutoff=cutoff,
     )
+    try:
+        mail_store_deleted = await asyncio.to_thread(prune_mail_store)
+    except OSError as exc:
+        mail_store_deleted = 0
+        logger.warning("Не удалось очистить хранилище писем: %s", exc)
     logger.info(
         "Удалено %d устаревших писем из InboxEmail, "
         "%d файлов вложений с диска. "
-        "Дополнительно удалено сиротских файлов: %d, папок: %d",
+        "Дополнительно удалено сиротских файлов: %d, папок: %d, "
+        "писем из хранилища IMAP: %d",
         deleted,
         files_deleted,
         orphan_files_deleted,
         orphan_dirs_deleted,
+        mail_store_deleted,
     )
     return deleted
 
@@ -21,8 +21,6 @@ from dz_fastapi.models.brand import Brand
 from dz_fastapi.models.partner import PriceList, PriceListAutoPartAssociation
 from dz_fastapi.services.autopurchase import (
     AUTOPURCHASE_DEMAND_WINDOWS,
-    _calculate_in_stock_days,
-    _calculate_snapshot_sales,
     _load_customer_order_requested_by_oem_windows,
     _resolve_autopurchase_provider_config,
     _summarize_snapshot_rows,
@@ -33,6 +31,7 @@ from dz_fastapi.services.placed_orders import (
     _load_tracking_history_rows_for_oems,
     _normalize_oem,
 )
+from dz_fastapi.services.snapshot_matrix import SnapshotMatrix
 
 logger = logging.getLogger("dz_fastapi")
 
@@ -247,18 +246,13 @@ async def get_inventory_control_dashboard(
         normalized_oem_numbers=normalized_oem_numbers,
         history_rows_by_oem=history_by_oem,
     )
-    snapshot_demand_by_window = {
-        days: _calculate_snapshot_sales(
-            snapshots, normalized_oem_numbers, days=days
-        )
-        for days in AUTOPURCHASE_DEMAND_WINDOWS
-    }
-    in_stock_days_by_window = {
-        days: _calculate_in_stock_days(
-            snapshots, normalized_oem_numbers, days=days
-        )
-        for days in AUTOPURCHASE_DEMAND_WINDOWS
-    }
+    snapshot_matrix = SnapshotMatrix(snapshots, normalized_oem_numbers)
+    snapshot_demand_by_window = snapshot_matrix.sales_by_window(
+        AUTOPURCHASE_DEMAND_WINDOWS
+    )
+    in_stock_days_by_window = snapshot_matrix.in_stock_days_by_window(
+        AUTOPURCHASE_DEMAND_WINDOWS
+    )
     customer_requested_by_window = (
         await _load_customer_order_requested_by_oem_windows(
             session, normalized_oem_numbers, windows=AUTOPURCHASE_DEMAND_WINDOWS
@@ -13,6 +13,11 @@ Use-case functions (public API of this module):
                                     all stock rows that have no lot yet
   dispatch_stock_order(...)       — FIFO shipment for a stock order
   get_lots_for_autopart(...)      — query lots for a given autopart
+  get_stock_availability(...)     — physical / reserved / wave-reserved /
+                                    available for many (autopart, location)
+                                    keys in one grouped query
+  create_reserves(...)            — create several reserves with one
+                                    availability check
 
 Internal helpers (prefixed with _):
   _apply_stock_delta(...)         — low-level: update StockByLocation + create
@@ -34,10 +39,12 @@ Invariants enforced by this module:
 from __future__ import annotations
 
 import logging
+from collections import defaultdict
+from dataclasses import dataclass
 from decimal import ROUND_HALF_UP, Decimal
-from typing import Optional
+from typing import Iterable, Optional
 
-from sqlalchemy import asc, func, select
+from sqlalchemy import asc, func, literal, or_, select, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload, selectinload
 
@@ -101,6 +108,7 @@ from dz_fastapi.services.marking_codes import (
     return_marking_codes_from_customer,
     return_marking_codes_to_supplier,
 )
+from dz_fastapi.services.shipment_profit import apply_shipment_profit
 from dz_fastapi.services.stock_order_packages import assert_stock_order_packing_ready
 
 logger = logging.getLogger(__name__)
@@ -110,6 +118,13 @@ DEFAULT_WAREHOUSE_COMMENT = "Склад по умолчанию для вход
 RECEIVING_LOCATION_CODE = "RECEIVING"
 UNIT_COST_PRECISION = Decimal("0.0001")
 MONEY_PRECISION = Decimal("0.01")
+# Статусы производственных волн, закрепляющих за собой партии.
+WAVE_RESERVING_STATUSES = (
+    ProductionWaveStatus.PLANNED,
+    ProductionWaveStatus.IN_PROGRESS,
+)
+# Сколько autopart_id уходит в один запрос get_stock_availability.
+AVAILABILITY_QUERY_CHUNK = 5000
 
 
 def _to_decimal(value) -> Decimal | None:
@@ -731,12 +746,7 @@ async def _consume_fifo(
                     )
                     .where(
                         ProductionWaveAllocation.stock_lot_id.in_([lot.id for lot in lots]),
-                        ProductionWave.status.in_(
-                            (
-                                ProductionWaveStatus.PLANNED,
-                                ProductionWaveStatus.IN_PROGRESS,
-                            )
-                        ),
+                        ProductionWave.status.in_(WAVE_RESERVING_STATUSES),
                     )
                     .group_by(ProductionWaveAllocation.stock_lot_id)
                 )
@@ -2048,6 +2058,160 @@ async def get_lots_for_autopart(
 # ═══════════════════════════════════════════════════════════════════════════════
 
 
+AvailabilityKey = tuple[int, Optional[int]]
+
+
+@dataclass(frozen=True, slots=True)
+class StockAvailability:
+    """Остатки по ключу (autopart_id, storage_location_id)."""
+
+    physical: int = 0
+    reserved: int = 0
+    wave_reserved: int = 0
+
+    @property
+    def available(self) -> int:
+        """Свободно = физический − резервы − закреплённое волнами."""
+        return max(0, self.physical - self.reserved - self.wave_reserved)
+
+    @property
+    def shippable(self) -> int:
+        """Можно списать FIFO: резервы под заказ отгрузку не блокируют."""
+        return max(0, self.physical - self.wave_reserved)
+
+    def __add__(self, other: "StockAvailability") -> "StockAvailability":
+        return StockAvailability(
+            physical=self.physical + other.physical,
+            reserved=self.reserved + other.reserved,
+            wave_reserved=self.wave_reserved + other.wave_reserved,
+        )
+
+
+async def get_stock_availability(
+    session: AsyncSession,
+    keys: Iterable[AvailabilityKey],
+    *,
+    warehouse_id: Optional[int] = None,
+) -> dict[AvailabilityKey, StockAvailability]:
+    """Остатки для множества ключей (autopart_id, storage_location_id).
+
+    storage_location_id=None — сумма по всем ячейкам (и резервам без
+    ячейки), как у одиночных get_*_quantity. warehouse_id ограничивает
+    ячейки одним складом. Физический остаток, ACTIVE-резервы и
+    закреплённое производственными волнами считаются одним UNION ALL с
+    группировкой по (запчасть, ячейка) — по запросу на
+    AVAILABILITY_QUERY_CHUNK запчастей.
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}
+    autopart_ids = sorted({int(autopart_id) for autopart_id, _ in keys})
+    by_location: dict[AvailabilityKey, StockAvailability] = {}
+    for offset in range(0, len(autopart_ids), AVAILABILITY_QUERY_CHUNK):
+        chunk = autopart_ids[offset:offset + AVAILABILITY_QUERY_CHUNK]
+        physical = select(
+            StockByLocation.autopart_id.label("autopart_id"),
+            StockByLocation.storage_location_id.label("storage_location_id"),
+            StockByLocation.quantity.label("physical"),
+            literal(0).label("reserved"),
+            literal(0).label("wave_reserved"),
+        ).where(StockByLocation.autopart_id.in_(chunk))
+        reserved = (
+            select(
+                StockReserve.autopart_id,
+                StockReserve.storage_location_id,
+                literal(0),
+                StockReserve.quantity,
+                literal(0),
+            ).where(
+                StockReserve.autopart_id.in_(chunk),
+                StockReserve.status == ReserveStatus.ACTIVE,
+            )
+        )
+        wave_reserved = (
+            select(
+                StockLot.autopart_id,
+                StockLot.storage_location_id,
+                literal(0),
+                literal(0),
+                ProductionWaveAllocation.planned_quantity
+                - ProductionWaveAllocation.consumed_quantity,
+            )
+            .join(
+                ProductionWaveAllocation,
+                ProductionWaveAllocation.stock_lot_id == StockLot.id,
+            )
+            .join(
+                ProductionWaveItem,
+                ProductionWaveItem.id == ProductionWaveAllocation.wave_item_id,
+            )
+            .join(ProductionWave, ProductionWave.id == ProductionWaveItem.wave_id)
+            .where(
+                StockLot.autopart_id.in_(chunk),
+                ProductionWave.status.in_(WAVE_RESERVING_STATUSES),
+            )
+        )
+        if warehouse_id is not None:
+            physical = physical.join(
+                StorageLocation,
+                StorageLocation.id == StockByLocation.storage_location_id,
+            ).where(StorageLocation.warehouse_id == warehouse_id)
+            reserved = reserved.outerjoin(
+                StorageLocation,
+                StorageLocation.id == StockReserve.storage_location_id,
+            ).where(
+                or_(
+                    StockReserve.storage_location_id.is_(None),
+                    StorageLocation.warehouse_id == warehouse_id,
+                )
+            )
+            wave_reserved = wave_reserved.join(
+                StorageLocation,
+                StorageLocation.id == StockLot.storage_location_id,
+            ).where(StorageLocation.warehouse_id == warehouse_id)
+        pieces = union_all(physical, reserved, wave_reserved).subquery("availability_pieces")
+        rows = await session.execute(
+            select(
+                pieces.c.autopart_id,
+                pieces.c.storage_location_id,
+                func.coalesce(func.sum(pieces.c.physical), 0),
+                func.coalesce(func.sum(pieces.c.reserved), 0),
+                func.coalesce(func.sum(pieces.c.wave_reserved), 0),
+            ).group_by(pieces.c.autopart_id, pieces.c.storage_location_id)
+        )
+        for autopart_id, location_id, physical_qty, reserved_qty, wave_qty in rows:
+            by_location[(int(autopart_id), location_id)] = StockAvailability(
+                physical=int(physical_qty or 0),
+                reserved=int(reserved_qty or 0),
+                wave_reserved=int(wave_qty or 0),
+            )
+
+    totals: dict[int, StockAvailability] = defaultdict(StockAvailability)
+    for (autopart_id, _), row in by_location.items():
+        totals[autopart_id] = totals[autopart_id] + row
+    result: dict[AvailabilityKey, StockAvailability] = {}
+    for autopart_id, location_id in keys:
+        if location_id is None:
+            result[(autopart_id, None)] = totals.get(int(autopart_id), StockAvailability())
+        else:
+            result[(autopart_id, location_id)] = by_location.get(
+                (int(autopart_id), location_id), StockAvailability()
+            )
+    return result
+
+
+def _expand_demand(
+    demand: dict[AvailabilityKey, int],
+) -> dict[AvailabilityKey, int]:
+    """Спрос по ячейке расходует и общий остаток запчасти."""
+    expanded: dict[AvailabilityKey, int] = defaultdict(int)
+    for (autopart_id, location_id), quantity in demand.items():
+        expanded[(autopart_id, location_id)] += quantity
+        if location_id is not None:
+            expanded[(autopart_id, None)] += quantity
+    return expanded
+
+
 async def get_reserved_quantity(
     session: AsyncSession,
     *,
@@ -2055,13 +2219,8 @@ async def get_reserved_quantity(
     storage_location_id: Optional[int] = None,
 ) -> int:
     """Сумма ACTIVE-резервов для запчасти (опционально по ячейке)."""
-    stmt = select(func.coalesce(func.sum(StockReserve.quantity), 0)).where(
-        StockReserve.autopart_id == autopart_id,
-        StockReserve.status == ReserveStatus.ACTIVE,
-    )
-    if storage_location_id is not None:
-        stmt = stmt.where(StockReserve.storage_location_id == storage_location_id)
-    return int((await session.execute(stmt)).scalar_one())
+    key = (autopart_id, storage_location_id)
+    return (await get_stock_availability(session, [key]))[key].reserved
 
 
 async def get_physical_quantity(
@@ -2071,12 +2230,8 @@ async def get_physical_quantity(
     storage_location_id: Optional[int] = None,
 ) -> int:
     """Физический остаток (сумма StockByLocation)."""
-    stmt = select(func.coalesce(func.sum(StockByLocation.quantity), 0)).where(
-        StockByLocation.autopart_id == autopart_id
-    )
-    if storage_location_id is not None:
-        stmt = stmt.where(StockByLocation.storage_location_id == storage_location_id)
-    return int((await session.execute(stmt)).scalar_one())
+    key = (autopart_id, storage_location_id)
+    return (await get_stock_availability(session, [key]))[key].physical
 
 
 async def get_available_quantity(
@@ -2085,18 +2240,53 @@ async def get_available_quantity(
     autopart_id: int,
     storage_location_id: Optional[int] = None,
 ) -> int:
-    """Свободный остаток = физический − зарезервированный."""
-    physical = await get_physical_quantity(
-        session,
-        autopart_id=autopart_id,
-        storage_location_id=storage_location_id,
-    )
-    reserved = await get_reserved_quantity(
-        session,
-        autopart_id=autopart_id,
-        storage_location_id=storage_location_id,
-    )
-    return max(0, physical - reserved)
+    """Свободный остаток = физический − резервы − закреплённое волнами."""
+    key = (autopart_id, storage_location_id)
+    return (await get_stock_availability(session, [key]))[key].available
+
+
+async def create_reserves(
+    session: AsyncSession,
+    rows: list[dict],
+) -> list[StockReserve]:
+    """Создать резервы, проверив свободный остаток одним запросом.
+
+    rows — словари с полями StockReserve (autopart_id, quantity,
+    storage_location_id, ...). Строки с одной запчастью суммируются:
+    резерв по ячейке уменьшает и общий свободный остаток запчасти.
+
+    Raises ValueError если доступного остатка недостаточно — тогда не
+    создаётся ни один резерв.
+    """
+    demand: dict[AvailabilityKey, int] = defaultdict(int)
+    for row in rows:
+        demand[(row["autopart_id"], row.get("storage_location_id"))] += int(row["quantity"])
+    demand = _expand_demand(demand)
+    availability = await get_stock_availability(session, demand)
+    for key, quantity in demand.items():
+        available = availability[key].available
+        if available < quantity:
+            raise ValueError(
+                f"Недостаточно свободного остатка: " f"доступно {available}, запрошено {quantity}"
+            )
+
+    reserves = [
+        StockReserve(
+            autopart_id=row["autopart_id"],
+            storage_location_id=row.get("storage_location_id"),
+            quantity=row["quantity"],
+            status=ReserveStatus.ACTIVE,
+            customer_order_item_id=row.get("customer_order_item_id"),
+            stock_order_item_id=row.get("stock_order_item_id"),
+            expires_at=row.get("expires_at"),
+            notes=row.get("notes"),
+            external_id=row.get("external_id"),
+        )
+        for row in rows
+    ]
+    session.add_all(reserves)
+    await session.flush()
+    return reserves
 
 
 async def create_reserve(
@@ -2115,29 +2305,21 @@ async def create_reserve(
 
     Raises ValueError если доступного остатка недостаточно.
     """
-    available = await get_available_quantity(
+    (reserve,) = await create_reserves(
         session,
-        autopart_id=autopart_id,
-        storage_location_id=storage_location_id,
-    )
-    if available < quantity:
-        raise ValueError(
-            f"Недостаточно свободного остатка: " f"доступно {available}, запрошено {quantity}"
-        )
-
-    reserve = StockReserve(
-        autopart_id=autopart_id,
-        storage_location_id=storage_location_id,
-        quantity=quantity,
-        status=ReserveStatus.ACTIVE,
-        customer_order_item_id=customer_order_item_id,
-        stock_order_item_id=stock_order_item_id,
-        expires_at=expires_at,
-        notes=notes,
-        external_id=external_id,
+        [
+            {
+                "autopart_id": autopart_id,
+                "quantity": quantity,
+                "storage_location_id": storage_location_id,
+                "customer_order_item_id": customer_order_item_id,
+                "stock_order_item_id": stock_order_item_id,
+                "expires_at": expires_at,
+                "notes": notes,
+                "external_id": external_id,
+            }
+        ],
     )
-    session.add(reserve)
-    await session.flush()
     return reserve
 
 
@@ -2202,6 +2384,24 @@ async def post_shipment_document(
         credit_check.to_detail() if credit_check is not None and credit_check.should_warn else None
     )
 
+    # Закреплённое волнами DragonZap проверяем сразу для всей накладной —
+    # один запрос вместо проверки внутри _consume_fifo строка за строкой.
+    fifo_demand: dict[AvailabilityKey, int] = defaultdict(int)
+    for item in doc.items:
+        if item.preferred_lot_id is None:
+            fifo_demand[(item.autopart_id, item.storage_location_id)] += int(item.quantity)
+    fifo_demand = _expand_demand(fifo_demand)
+    availability = await get_stock_availability(
+        session, fifo_demand, warehouse_id=doc.warehouse_id
+    )
+    for key, quantity in fifo_demand.items():
+        row = availability[key]
+        if row.wave_reserved and quantity > row.shippable:
+            raise ValueError(
+                "Свободного остатка недостаточно: часть партий закреплена за "
+                "производственной волной DragonZap"
+            )
+
     movements_created = 0
     reserves_released = 0
     lot_ids: list[int] = []
@@ -2321,6 +2521,7 @@ async def post_shipment_document(
     if linked_stock_order is not None:
         linked_stock_order.status = STOCK_ORDER_STATUS.DISPATCHED
     await session.flush()
+    await apply_shipment_profit(session, doc.id, sign=1)
     from dz_fastapi.services.one_c_outbox import enqueue_shipment_event
 
     await enqueue_shipment_event(session, doc.id)
@@ -2357,6 +2558,8 @@ async def unpost_shipment_document(
         raise ValueError(f"Накладная {doc_id} не найдена")
     if doc.status != ShipmentDocumentStatus.POSTED:
         raise ValueError(f"Накладная в статусе «{doc.status}» — отменить нельзя")
+    # Вклад в свод прибыли вычитаем, пока списания по партиям на месте.
+    await apply_shipment_profit(session, doc.id, sign=-1)
 
     movements_created = 0
 
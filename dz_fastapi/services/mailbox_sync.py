@@ -0,0 +1,815 @@
+"""
+Общая инкрементальная синхронизация IMAP-ящиков.
+
+Прайсы (email.get_emails и скачивание прайса поставщика), inbox, заказы
+клиентов и ответы поставщиков раньше каждый сам пересматривал заголовки
+и заново скачивал письма целиком — 20-мегабайтное письмо с прайсом
+уходило с сервера по три-четыре раза за утро. Теперь каждый потребитель
+на своём соединении вызывает sync_folder(): движок докачивает только
+письма с UID выше курсора (ящик, папка), кладёт сырое письмо один раз
+в контентно-адресуемое хранилище и возвращает индекс заголовков.
+Тело письма потребитель читает из хранилища, а не с сервера.
+
+Состояние на диске (MAILBOX_STORE_DIR):
+  objects/ab/<sha256>.eml    — сырые письма, одно на уникальное содержимое;
+  cursors/<sha1>.json        — UIDVALIDITY, последний UID, нижняя граница
+                               окна дат и индекс заголовков папки.
+Смена UIDVALIDITY сбрасывает курсор и индекс папки; уже скачанные
+письма остаются в хранилище и переиспользуются по хэшу.
+
+Прайсовые потребители синхронизируют с full_body_max_bytes: большие
+письма с вложениями индексируются по заголовку и BODYSTRUCTURE без тела,
+а нужное вложение потом качается отдельно — download_part() тянет одну
+MIME-часть (BODY.PEEK[n]) кусками прямо в файл.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import quopri
+import re
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from datetime import date, datetime, timedelta
+from email.header import decode_header, make_header
+from email.utils import decode_rfc2231
+from typing import Iterable, Optional
+from urllib.parse import unquote
+
+from imap_tools import AND, MailMessage
+
+logger = logging.getLogger("dz_fastapi")
+
+MAILBOX_STORE_DIR = os.getenv("MAILBOX_STORE_DIR", "uploads/mail_store")
+# Писем за один UID FETCH.
+MAILBOX_SYNC_FETCH_BATCH = max(1, int(os.getenv("MAILBOX_SYNC_FETCH_BATCH", "20")))
+# Не больше стольких новых писем за один вызов; берутся самые свежие.
+MAILBOX_SYNC_MAX_NEW_MESSAGES = max(
+    1, int(os.getenv("MAILBOX_SYNC_MAX_NEW_MESSAGES", "500"))
+)
+# Пауза между повторами SEARCH: [UNAVAILABLE] у Yandex/Mail.ru часто
+# проходит со второй-третьей попытки.
+MAILBOX_SYNC_SEARCH_RETRY_DELAY_SEC = max(
+    0.0, float(os.getenv("MAILBOX_SYNC_SEARCH_RETRY_DELAY_SEC", "1.5"))
+)
+# Письма больше этого размера при синхронизации с full_body_max_bytes
+# индексируются без тела, по заголовку и BODYSTRUCTURE.
+MAILBOX_SYNC_FULL_BODY_MAX_BYTES = max(
+    0, int(os.getenv("MAILBOX_SYNC_FULL_BODY_MAX_BYTES", str(2 * 1024 * 1024)))
+)
+# Кусок потоковой загрузки MIME-части: BODY.PEEK[n]<offset.length>.
+MAILBOX_PART_CHUNK_BYTES = max(
+    4096, int(os.getenv("MAILBOX_PART_CHUNK_BYTES", str(1024 * 1024)))
+)
+# Индекс и письма старше этого срока удаляет prune_mail_store().
+MAILBOX_STORE_RETENTION_DAYS = max(
+    1, int(os.getenv("MAILBOX_STORE_RETENTION_DAYS", "14"))
+)
+
+_FETCH_PARTS = "(UID INTERNALDATE BODY.PEEK[])"
+_LIST_PARTS = "(UID INTERNALDATE)"
+_STRUCTURE_PARTS = "(UID RFC822.SIZE BODYSTRUCTURE)"
+_HEADER_PARTS = "(UID INTERNALDATE BODY.PEEK[HEADER])"
+_UID_RE = re.compile(rb"UID\s+(\d+)")
+_INTERNALDATE_RE = re.compile(rb'INTERNALDATE\s+"([^"]+)"')
+_SIZE_RE = re.compile(rb"RFC822\.SIZE\s+(\d+)")
+_LITERAL_SIZE_RE = re.compile(rb"\{\d+\}$")
+_SECTION_RE = re.compile(
+    rb'BODY\[([^\]]*)\](?:<\d+>)?\s+(?:\x00(\d+)\x00|"((?:[^"\\]|\\.)*)"|NIL)'
+)
+_SEXP_TOKEN_RE = re.compile(
+    rb'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|\x00(\d+)\x00|([^\s()"]+))'
+)
+_HEADER_END_RE = re.compile(rb"\r?\n\r?\n")
+
+_locks_guard = threading.Lock()
+_folder_locks: dict[str, threading.Lock] = {}
+
+
+@dataclass
+class StoredMessage:
+    uid: int
+    # None — письмо проиндексировано без тела (см. parts).
+    sha256: Optional[str]
+    size: int
+    from_: str
+    subject: str
+    date: Optional[datetime]
+    internal_date: Optional[datetime]
+    folder_name: str
+    account_key: str = ""
+    header_sha256: Optional[str] = None
+    # Вложения по BODYSTRUCTURE: section, filename, encoding, size.
+    parts: list[dict] = field(default_factory=list)
+
+    @property
+    def received_at(self) -> Optional[datetime]:
+        return self.internal_date or self.date
+
+    @property
+    def is_partial(self) -> bool:
+        return self.sha256 is None
+
+
+@dataclass
+class _FetchItem:
+    uid: int
+    internal_date: Optional[datetime]
+    size: Optional[int]
+    bodystructure: Optional[list]
+    # BODY[<section>] -> данные; "" — письмо целиком.
+    sections: dict[str, Optional[bytes]]
+
+
+def mailbox_account_key(host: str, login: str) -> str:
+    return f"{str(login or '').strip().lower()}@{str(host or '').strip().lower()}"
+
+
+def _folder_lock(account_key: str, folder: str) -> threading.Lock:
+    key = f"{account_key}|{folder}"
+    with _locks_guard:
+        lock = _folder_locks.get(key)
+        if lock is None:
+            lock = _folder_locks[key] = threading.Lock()
+        return lock
+
+
+def _object_path(sha256: str) -> str:
+    return os.path.join(MAILBOX_STORE_DIR, "objects", sha256[:2], f"{sha256}.eml")
+
+
+def _cursor_path(account_key: str, folder: str) -> str:
+    digest = hashlib.sha1(f"{account_key}|{folder}".encode("utf-8")).hexdigest()
+    return os.path.join(MAILBOX_STORE_DIR, "cursors", f"{digest}.json")
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def store_raw_message(raw: bytes) -> str:
+    """Кладёт письмо в хранилище, если его там ещё нет. Возвращает sha256."""
+    sha256 = hashlib.sha256(raw).hexdigest()
+    path = _object_path(sha256)
+    if not os.path.exists(path):
+        _atomic_write(path, raw)
+    return sha256
+
+
+def read_raw_message(sha256: str) -> bytes:
+    with open(_object_path(sha256), "rb") as handle:
+        return handle.read()
+
+
+def load_mail_message(entry: StoredMessage) -> MailMessage:
+    """MailMessage из хранилища — с UID и folder_name, как после fetch."""
+    if entry.sha256 is None:
+        raise ValueError(
+            f"Message uid={entry.uid} is indexed without body, call ensure_full_message()"
+        )
+    raw = read_raw_message(entry.sha256)
+    msg = MailMessage([(f"{entry.uid} (UID {entry.uid} ".encode(), raw)])
+    setattr(msg, "folder_name", entry.folder_name)
+    return msg
+
+
+def _empty_state(uidvalidity: Optional[int]) -> dict:
+    return {"uidvalidity": uidvalidity, "last_uid": 0, "since": None, "messages": {}}
+
+
+def _load_state(account_key: str, folder: str) -> dict:
+    path = _cursor_path(account_key, folder)
+    try:
+        with open(path, "rb") as handle:
+            state = json.loads(handle.read())
+    except FileNotFoundError:
+        return _empty_state(None)
+    except (OSError, ValueError) as exc:
+        logger.warning("Mailbox cursor %s is unreadable, resync: %s", path, exc)
+        return _empty_state(None)
+    state.setdefault("messages", {})
+    return state
+
+
+def _save_state(account_key: str, folder: str, state: dict) -> None:
+    state["account"] = account_key
+    state["folder"] = folder
+    _atomic_write(
+        _cursor_path(account_key, folder),
+        json.dumps(state, ensure_ascii=False).encode("utf-8"),
+    )
+
+
+def _parse_iso(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _entry_from_state(uid: str, item: dict, folder: str, account_key: str) -> StoredMessage:
+    return StoredMessage(
+        uid=int(uid),
+        sha256=item.get("sha256"),
+        size=int(item.get("size") or 0),
+        from_=item.get("from") or "",
+        subject=item.get("subject") or "",
+        date=_parse_iso(item.get("date")),
+        internal_date=_parse_iso(item.get("internal_date")),
+        folder_name=folder,
+        account_key=account_key,
+        header_sha256=item.get("header_sha256"),
+        parts=list(item.get("parts") or []),
+    )
+
+
+def _parse_internal_date(meta: bytes) -> Optional[datetime]:
+    match = _INTERNALDATE_RE.search(meta)
+    if not match:
+        return None
+    try:
+        return datetime.strptime(
+            match.group(1).decode().strip(), "%d-%b-%Y %H:%M:%S %z"
+        )
+    except ValueError:
+        return None
+
+
+def _group_fetch_data(data: list) -> list[tuple[bytes, list[bytes]]]:
+    """
+    Склеивает ответ UID FETCH imaplib по письмам: метаданные с метками
+    литералов \\x00<n>\\x00 и сами литералы. Литерал приходит кортежем
+    (b'... {size}', данные); строка после кортежа — хвост того же письма,
+    у части серверов с UID: b' UID 5)'.
+    """
+    grouped: list[tuple[bytes, list[bytes]]] = []
+    meta = b""
+    literals: list[bytes] = []
+    in_message = False
+    for item in data or []:
+        if isinstance(item, tuple):
+            if not in_message:
+                meta, literals, in_message = b"", [], True
+            meta += _LITERAL_SIZE_RE.sub(b"", item[0]) + b"\x00%d\x00" % len(literals)
+            literals.append(item[1])
+        elif isinstance(item, bytes):
+            if in_message:
+                grouped.append((meta + item, literals))
+                in_message = False
+            else:
+                grouped.append((item, []))
+    if in_message:
+        grouped.append((meta, literals))
+    return grouped
+
+
+def _unquote(value: bytes) -> str:
+    return re.sub(rb"\\(.)", rb"\1", value).decode("utf-8", errors="replace")
+
+
+def _parse_sexp(text: bytes, pos: int, literals: list[bytes]) -> tuple[object, int]:
+    """Одно s-выражение IMAP (список, строка, литерал, NIL) с позиции pos."""
+    stack: list[list] = [[]]
+    while True:
+        match = _SEXP_TOKEN_RE.match(text, pos)
+        if match is None:
+            raise ValueError(f"Unexpected IMAP data at {pos}")
+        pos = match.end()
+        if match.group(1):
+            stack.append([])
+            continue
+        if match.group(2):
+            if len(stack) == 1:
+                raise ValueError("Unbalanced IMAP list")
+            value: object = stack.pop()
+        elif match.group(3) is not None:
+            value = _unquote(match.group(3))
+        elif match.group(4) is not None:
+            value = literals[int(match.group(4))].decode("utf-8", errors="replace")
+        else:
+            atom = match.group(5).decode("ascii", errors="replace")
+            value = None if atom.upper() == "NIL" else atom
+        stack[-1].append(value)
+        if len(stack) == 1:
+            return value, pos
+
+
+def _parse_fetch_items(data: list) -> list[_FetchItem]:
+    items: list[_FetchItem] = []
+    for meta, literals in _group_fetch_data(data):
+        uid_match = _UID_RE.search(meta)
+        if uid_match is None:
+            continue
+        size_match = _SIZE_RE.search(meta)
+        structure = None
+        structure_at = meta.find(b"BODYSTRUCTURE")
+        if structure_at >= 0:
+            try:
+                structure, _ = _parse_sexp(meta, structure_at + len(b"BODYSTRUCTURE"), literals)
+            except (ValueError, IndexError) as exc:
+                logger.warning("Unparsable BODYSTRUCTURE for uid=%s: %s", uid_match.group(1), exc)
+        sections: dict[str, Optional[bytes]] = {}
+        for match in _SECTION_RE.finditer(meta):
+            section = match.group(1).decode("ascii", errors="replace").upper()
+            if match.group(2) is not None:
+                sections[section] = literals[int(match.group(2))]
+            elif match.group(3) is not None:
+                sections[section] = match.group(3)
+            else:
+                sections[section] = None
+        items.append(
+            _FetchItem(
+                uid=int(uid_match.group(1)),
+                internal_date=_parse_internal_date(meta),
+                size=int(size_match.group(1)) if size_match else None,
+                bodystructure=structure if isinstance(structure, list) else None,
+                sections=sections,
+            )
+        )
+    return items
+
+
+def _fetch(mailbox, uids: Iterable, parts: str) -> list[_FetchItem]:
+    sequence = ",".join(str(uid) for uid in uids)
+    status, data = mailbox.client.uid("FETCH", sequence, parts)
+    if status != "OK":
+        raise RuntimeError(f"UID FETCH {sequence} {parts} failed: {status} {data}")
+    return _parse_fetch_items(data)
+
+
+def _param_dict(value) -> dict[str, str]:
+    if not isinstance(value, list):
+        return {}
+    return {
+        str(key).lower(): str(item)
+        for key, item in zip(value[::2], value[1::2])
+        if key is not None and item is not None
+    }
+
+
+def _decode_filename(params: dict[str, str]) -> Optional[str]:
+    for name in ("filename", "name"):
+        extended = sorted(
+            (key, value) for key, value in params.items() if key.startswith(f"{name}*")
+        )
+        if extended:
+            # RFC 2231: filename*0*=utf-8''%D0%9F..., filename*1*=...
+            charset, _, text = decode_rfc2231("".join(value for _, value in extended))
+            return unquote(text, encoding=charset or "utf-8", errors="replace")
+        if params.get(name):
+            try:
+                return str(make_header(decode_header(params[name])))
+            except Exception:
+                return params[name]
+    return None
+
+
+def _attachment_parts(structure: list, section: str = "") -> list[dict]:
+    """Части с именем файла из BODYSTRUCTURE, с номерами секций для BODY[n]."""
+    if structure and isinstance(structure[0], list):
+        parts: list[dict] = []
+        index = 0
+        for child in structure:
+            if not isinstance(child, list):
+                break
+            index += 1
+            parts.extend(
+                _attachment_parts(child, f"{section}.{index}" if section else str(index))
+            )
+        return parts
+    if len(structure) < 7:
+        return []
+    maintype = str(structure[0] or "").lower()
+    subtype = str(structure[1] or "").lower()
+    if maintype == "message" and subtype == "rfc822":
+        # Вложенное письмо целиком не разбираем.
+        return []
+    extension_at = 7 + (1 if maintype == "text" else 0)
+    disposition = structure[extension_at + 1] if len(structure) > extension_at + 1 else None
+    disposition_params = (
+        _param_dict(disposition[1])
+        if isinstance(disposition, list) and len(disposition) > 1
+        else {}
+    )
+    filename = _decode_filename(disposition_params) or _decode_filename(
+        _param_dict(structure[2])
+    )
+    if not filename:
+        return []
+    size = str(structure[6] or "")
+    return [
+        {
+            "section": section or "1",
+            "filename": filename,
+            "content_type": f"{maintype}/{subtype}",
+            "encoding": str(structure[5] or "7bit").lower(),
+            "size": int(size) if size.isdigit() else 0,
+        }
+    ]
+
+
+def _list_uids_after(mailbox, last_uid: int) -> list[tuple[int, Optional[datetime]]]:
+    """
+    UID и INTERNALDATE писем с UID > last_uid. Через UID FETCH, а не
+    SEARCH: у Yandex/Mail.ru SEARCH регулярно отвечает [UNAVAILABLE].
+    """
+    # Диапазон n:* при n > максимального UID возвращает последнее письмо.
+    return [
+        (item.uid, item.internal_date)
+        for item in _fetch(mailbox, [f"{int(last_uid) + 1}:*"], _LIST_PARTS)
+        if item.uid > last_uid
+    ]
+
+
+def _search_uids_since(mailbox, since_date: date) -> list[int]:
+    for attempt in range(3):
+        try:
+            return [int(uid) for uid in mailbox.uids(AND(date_gte=since_date), charset=None)]
+        except Exception as exc:
+            logger.warning(
+                "IMAP SEARCH SINCE %s failed (attempt %s): %s", since_date, attempt + 1, exc
+            )
+            if attempt < 2:
+                time.sleep(MAILBOX_SYNC_SEARCH_RETRY_DELAY_SEC * (attempt + 1))
+    # SEARCH недоступен — перечисляем все UID и фильтруем даты локально.
+    return [
+        uid
+        for uid, internal_date in _list_uids_after(mailbox, 0)
+        if internal_date is None or internal_date.date() >= since_date
+    ]
+
+
+def _folder_status(mailbox, folder: str) -> dict:
+    try:
+        return mailbox.folder.status(folder, ["UIDVALIDITY", "UIDNEXT"])
+    except Exception as exc:
+        logger.warning("IMAP STATUS failed for folder=%s: %s", folder, exc)
+        return {}
+
+
+def _header_fields(raw: bytes) -> tuple[str, str, Optional[datetime]]:
+    match = _HEADER_END_RE.search(raw)
+    header_block = raw[: match.end()] if match else raw
+    header = MailMessage.from_bytes(header_block)
+    msg_date = header.date
+    if msg_date is not None and msg_date.year <= 1900:
+        msg_date = None
+    return header.from_ or "", header.subject or "", msg_date
+
+
+def _index_item(header_source: bytes, internal_date: Optional[datetime]) -> dict:
+    from_, subject, msg_date = _header_fields(header_source)
+    return {
+        "from": from_,
+        "subject": subject,
+        "date": msg_date.isoformat() if msg_date else None,
+        "internal_date": internal_date.isoformat() if internal_date else None,
+    }
+
+
+def _download(
+    mailbox,
+    uids: list[int],
+    state: dict,
+    account_key: str,
+    folder: str,
+    full_body_max_bytes: Optional[int],
+) -> int:
+    stored = 0
+    messages = state["messages"]
+    for start in range(0, len(uids), MAILBOX_SYNC_FETCH_BATCH):
+        batch = uids[start:][:MAILBOX_SYNC_FETCH_BATCH]
+        large: dict[int, tuple[int, list[dict]]] = {}
+        if full_body_max_bytes is not None:
+            for item in _fetch(mailbox, batch, _STRUCTURE_PARTS):
+                if not item.size or item.size <= full_body_max_bytes:
+                    continue
+                parts = _attachment_parts(item.bodystructure) if item.bodystructure else []
+                if parts:
+                    large[item.uid] = (item.size, parts)
+
+        small = [uid for uid in batch if uid not in large]
+        for item in _fetch(mailbox, small, _FETCH_PARTS) if small else []:
+            raw = item.sections.get("")
+            if raw is None:
+                continue
+            entry = _index_item(raw, item.internal_date)
+            entry.update(sha256=store_raw_message(raw), size=len(raw))
+            messages[str(item.uid)] = entry
+            stored += 1
+        for item in _fetch(mailbox, list(large), _HEADER_PARTS) if large else []:
+            header = item.sections.get("HEADER")
+            if header is None or item.uid not in large:
+                continue
+            size, parts = large[item.uid]
+            entry = _index_item(header, item.internal_date)
+            entry.update(
+                sha256=None,
+                header_sha256=store_raw_message(header),
+                size=size,
+                parts=parts,
+            )
+            messages[str(item.uid)] = entry
+            stored += 1
+        # Индекс сохраняем после каждой пачки: таймаут посреди большой
+        # загрузки не заставит качать уже сохранённые письма заново.
+        _save_state(account_key, folder, state)
+    return stored
+
+
+def sync_folder(
+    mailbox,
+    *,
+    account_key: str,
+    folder: str,
+    since_date: Optional[date] = None,
+    extra_uids: Iterable[int] = (),
+    full_body_max_bytes: Optional[int] = None,
+) -> list[StoredMessage]:
+    """
+    Докачивает в хранилище новые письма папки и возвращает её индекс,
+    отсортированный по UID. mailbox — залогиненный imap_tools.MailBox.
+
+    Новые письма — UID выше курсора. Если окно since_date шире уже
+    покрытого, письма окна докачиваются (SEARCH SINCE). extra_uids
+    докачиваются явно, например для восстановления старых импортов.
+    Письма больше full_body_max_bytes с вложениями индексируются без
+    тела (is_partial). Письма на сервере не помечаются прочитанными.
+    """
+    with _folder_lock(account_key, folder):
+        mailbox.folder.set(folder)
+        # STATUS до поиска: письмо, пришедшее после, получит UID >= UIDNEXT
+        # и попадёт в следующую синхронизацию.
+        folder_status = _folder_status(mailbox, folder)
+        uidvalidity = folder_status.get("UIDVALIDITY")
+        state = _load_state(account_key, folder)
+        if uidvalidity is not None and state.get("uidvalidity") != uidvalidity:
+            if state.get("uidvalidity") is not None:
+                logger.warning(
+                    "UIDVALIDITY changed for %s folder=%s: %s -> %s, cursor reset",
+                    account_key,
+                    folder,
+                    state.get("uidvalidity"),
+                    uidvalidity,
+                )
+            state = _empty_state(uidvalidity)
+        messages = state["messages"]
+        last_uid = int(state.get("last_uid") or 0)
+
+        candidates: set[int] = set()
+        scanned_all = False
+        if last_uid:
+            candidates.update(uid for uid, _ in _list_uids_after(mailbox, last_uid))
+        covered_since = _parse_iso(state.get("since"))
+        if since_date is not None and (
+            covered_since is None or since_date < covered_since.date()
+        ):
+            candidates.update(_search_uids_since(mailbox, since_date))
+            state["since"] = datetime.combine(since_date, datetime.min.time()).isoformat()
+            scanned_all = not last_uid
+        elif not last_uid and since_date is None:
+            candidates.update(uid for uid, _ in _list_uids_after(mailbox, 0))
+            scanned_all = True
+        candidates.update(int(uid) for uid in extra_uids if int(uid) > 0)
+
+        pending = sorted(
+            (uid for uid in candidates if str(uid) not in messages), reverse=True
+        )
+        if len(pending) > MAILBOX_SYNC_MAX_NEW_MESSAGES:
+            logger.warning(
+                "Mailbox sync %s folder=%s: %s new messages, fetching newest %s",
+                account_key,
+                folder,
+                len(pending),
+                MAILBOX_SYNC_MAX_NEW_MESSAGES,
+            )
+            pending = pending[:MAILBOX_SYNC_MAX_NEW_MESSAGES]
+        stored = (
+            _download(mailbox, pending, state, account_key, folder, full_body_max_bytes)
+            if pending
+            else 0
+        )
+
+        # Курсор двигается только после успешной загрузки всех пачек.
+        new_last_uid = max([last_uid, *candidates])
+        if scanned_all and folder_status.get("UIDNEXT"):
+            # Пустое окно тоже фиксирует курсор, иначе следующий вызов
+            # не узнает, с какого UID искать новые письма.
+            new_last_uid = max(new_last_uid, int(folder_status["UIDNEXT"]) - 1)
+        state["last_uid"] = new_last_uid
+        _save_state(account_key, folder, state)
+        logger.info(
+            "Mailbox sync %s folder=%s: last_uid=%s new=%s indexed=%s",
+            account_key,
+            folder,
+            state["last_uid"],
+            stored,
+            len(messages),
+        )
+        return sorted(
+            (
+                _entry_from_state(uid, item, folder, account_key)
+                for uid, item in messages.items()
+            ),
+            key=lambda entry: entry.uid,
+        )
+
+
+def received_since(entries: Iterable[StoredMessage], since_date: date) -> list[StoredMessage]:
+    result = []
+    for entry in entries:
+        received_at = entry.received_at
+        if received_at is None or received_at.date() >= since_date:
+            result.append(entry)
+    return result
+
+
+def find_stored_message(account_key: str, folder: str, uid) -> Optional[StoredMessage]:
+    """Письмо из индекса по UID без обращения к серверу."""
+    state = _load_state(account_key, folder)
+    item = state["messages"].get(str(uid).strip())
+    if item is None:
+        return None
+    sha256 = item.get("sha256") or item.get("header_sha256")
+    if not sha256 or not os.path.exists(_object_path(sha256)):
+        return None
+    return _entry_from_state(str(uid).strip(), item, folder, account_key)
+
+
+def ensure_full_message(mailbox, entry: StoredMessage) -> StoredMessage:
+    """Докачивает тело письма, проиндексированного без него."""
+    if entry.sha256 is not None:
+        return entry
+    with _folder_lock(entry.account_key, entry.folder_name):
+        mailbox.folder.set(entry.folder_name)
+        raw = next(
+            (
+                item.sections.get("")
+                for item in _fetch(mailbox, [entry.uid], _FETCH_PARTS)
+                if item.uid == entry.uid
+            ),
+            None,
+        )
+        if raw is None:
+            raise LookupError(f"IMAP message uid={entry.uid} is gone from {entry.folder_name}")
+        sha256 = store_raw_message(raw)
+        state = _load_state(entry.account_key, entry.folder_name)
+        item = state["messages"].get(str(entry.uid))
+        if item is not None:
+            item.update(sha256=sha256, size=len(raw))
+            _save_state(entry.account_key, entry.folder_name, state)
+    return replace(entry, sha256=sha256, size=len(raw))
+
+
+class _PartDecoder:
+    """Потоковое декодирование Content-Transfer-Encoding по кускам."""
+
+    def __init__(self, encoding: str):
+        self.encoding = (encoding or "").lower()
+        self.tail = b""
+
+    def feed(self, data: bytes) -> bytes:
+        if self.encoding == "base64":
+            buffer = self.tail + re.sub(rb"[^A-Za-z0-9+/=]", b"", data)
+            cut = len(buffer) // 4 * 4
+            self.tail = buffer[cut:]
+            return base64.b64decode(buffer[:cut])
+        if self.encoding == "quoted-printable":
+            buffer = self.tail + data
+            cut = buffer.rfind(b"\n") + 1
+            self.tail = buffer[cut:]
+            return quopri.decodestring(buffer[:cut]) if cut else b""
+        return data
+
+    def flush(self) -> bytes:
+        tail, self.tail = self.tail, b""
+        if not tail:
+            return b""
+        if self.encoding == "base64":
+            return base64.b64decode(tail + b"=" * (-len(tail) % 4))
+        if self.encoding == "quoted-printable":
+            return quopri.decodestring(tail)
+        return tail
+
+
+def download_part(
+    mailbox,
+    entry: StoredMessage,
+    part: dict,
+    path: str,
+    chunk_size: Optional[int] = None,
+) -> int:
+    """
+    Качает одну MIME-часть письма (BODY.PEEK[section]<offset.length>)
+    кусками по chunk_size, декодирует и пишет в path. В памяти держится
+    один кусок, а не всё вложение. Возвращает число записанных байт.
+    """
+    chunk_size = chunk_size or MAILBOX_PART_CHUNK_BYTES
+    section = str(part["section"])
+    decoder = _PartDecoder(part.get("encoding") or "")
+    mailbox.folder.set(entry.folder_name)
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    written = 0
+    offset = 0
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            while True:
+                chunk = b""
+                for item in _fetch(
+                    mailbox, [entry.uid], f"(UID BODY.PEEK[{section}]<{offset}.{chunk_size}>)"
+                ):
+                    if item.uid == entry.uid:
+                        chunk = item.sections.get(section.upper()) or b""
+                decoded = decoder.feed(chunk)
+                handle.write(decoded)
+                written += len(decoded)
+                offset += len(chunk)
+                if len(chunk) < chunk_size:
+                    break
+            decoded = decoder.flush()
+            handle.write(decoded)
+            written += len(decoded)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return written
+
+
+def prune_mail_store(now: Optional[datetime] = None) -> int:
+    """
+    Убирает из индексов письма старше MAILBOX_STORE_RETENTION_DAYS и
+    удаляет файлы, на которые не ссылается ни один индекс. Возвращает
+    число удалённых файлов.
+    """
+    cutoff = (now or datetime.now()) - timedelta(days=MAILBOX_STORE_RETENTION_DAYS)
+    cursors_dir = os.path.join(MAILBOX_STORE_DIR, "cursors")
+    referenced: set[str] = set()
+    if os.path.isdir(cursors_dir):
+        for name in os.listdir(cursors_dir):
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(cursors_dir, name), "rb") as handle:
+                try:
+                    state = json.loads(handle.read())
+                except ValueError:
+                    continue
+            account_key = state.get("account")
+            folder = state.get("folder")
+            if not account_key or folder is None:
+                continue
+            with _folder_lock(account_key, folder):
+                state = _load_state(account_key, folder)
+                kept = {}
+                for uid, item in state["messages"].items():
+                    received_at = _parse_iso(item.get("internal_date") or item.get("date"))
+                    if received_at is not None and received_at.replace(tzinfo=None) < cutoff:
+                        continue
+                    kept[uid] = item
+                if len(kept) != len(state["messages"]):
+                    state["messages"] = kept
+                    since = _parse_iso(state.get("since"))
+                    if since is None or since < cutoff:
+                        state["since"] = cutoff.replace(
+                            hour=0, minute=0, second=0, microsecond=0
+                        ).isoformat()
+                    _save_state(account_key, folder, state)
+                for item in kept.values():
+                    referenced.update(
+                        sha256
+                        for sha256 in (item.get("sha256"), item.get("header_sha256"))
+                        if sha256
+                    )
+
+    removed = 0
+    objects_dir = os.path.join(MAILBOX_STORE_DIR, "objects")
+    if not os.path.isdir(objects_dir):
+        return removed
+    for prefix in os.listdir(objects_dir):
+        prefix_dir = os.path.join(objects_dir, prefix)
+        for name in os.listdir(prefix_dir):
+            if name.endswith(".eml") and name[:-4] not in referenced:
+                os.remove(os.path.join(prefix_dir, name))
+                removed += 1
+        if not os.listdir(prefix_dir):
+            os.rmdir(prefix_dir)
+    return removed
@@ -0,0 +1,168 @@
+"""Поиск автозапчастей по части OEM номера.
+
+В PostgreSQL подстрочный ILIKE обслуживает GIN-индекс pg_trgm по
+AutoPart.oem_number (номер хранится уже нормализованным —
+preprocess_oem_number), поэтому фильтр остаётся обычным ILIKE.
+
+Для других СУБД (SQLite в локальных тестах) работает n-граммный индекс в
+памяти процесса: триграмма → отсортированный массив позиций, кандидаты —
+пересечение списков, затем проверка подстроки. Индекс перечитывается по
+TTL и после flush, добавившего или изменившего AutoPart через ORM.
+
+Ранжирование совпадений одно для обоих путей: точное, по началу номера,
+по вхождению.
+"""
+
+import logging
+import os
+import time
+from itertools import chain
+from typing import Iterable, Optional
+
+import numpy as np
+from sqlalchemy import case, event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from dz_fastapi.models.autopart import AutoPart
+
+logger = logging.getLogger("dz_fastapi")
+
+OEM_NGRAM_SIZE = 3
+# Через сколько секунд n-граммный индекс перечитывается из БД.
+OEM_NGRAM_INDEX_TTL_SEC = max(0, int(os.getenv("OEM_NGRAM_INDEX_TTL_SEC", "300")))
+_BUILD_PARTITION_ROWS = 100_000
+
+
+def oem_match_rank(column, normalized_oem: str):
+    """0 — точное совпадение, 1 — номер начинается с запроса, 2 — вхождение."""
+    return case(
+        (column == normalized_oem, 0),
+        (column.ilike(f"{normalized_oem}%"), 1),
+        else_=2,
+    )
+
+
+def _rank_key(oem: str, query: str) -> tuple[int, str]:
+    if oem == query:
+        return 0, oem
+    if oem.startswith(query):
+        return 1, oem
+    return 2, oem
+
+
+class OemNgramIndex:
+    def __init__(self, n: int = OEM_NGRAM_SIZE):
+        self.n = n
+        self.clear()
+
+    def clear(self) -> None:
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._oems: list[str] = []
+        self._postings: dict[str, np.ndarray] = {}
+        self._built_at: Optional[float] = None
+        self._stale = True
+
+    def __len__(self) -> int:
+        return len(self._oems)
+
+    @property
+    def is_fresh(self) -> bool:
+        if self._stale or self._built_at is None:
+            return False
+        return time.monotonic() - self._built_at < OEM_NGRAM_INDEX_TTL_SEC
+
+    def mark_stale(self) -> None:
+        self._stale = True
+
+    def _grams(self, value: str) -> set[str]:
+        return {value[pos:pos + self.n] for pos in range(len(value) - self.n + 1)}
+
+    def load(self, autopart_ids: Iterable[int], oem_numbers: Iterable[str]) -> None:
+        self.clear()
+        self._ids = np.asarray(list(autopart_ids), dtype=np.int64)
+        self._oems = [str(value or "").upper() for value in oem_numbers]
+        postings: dict[str, list[int]] = {}
+        for position, oem in enumerate(self._oems):
+            for gram in self._grams(oem):
+                postings.setdefault(gram, []).append(position)
+        # Позиции добавлялись по возрастанию — массивы уже отсортированы.
+        self._postings = {
+            gram: np.asarray(positions, dtype=np.int32) for gram, positions in postings.items()
+        }
+        self._built_at = time.monotonic()
+        self._stale = False
+
+    def _candidates(self, query: str) -> Iterable[int]:
+        if len(query) < self.n:
+            # Запрос короче n-граммы — индекс не помогает, просматриваем всё.
+            return range(len(self._oems))
+        lists = []
+        for gram in self._grams(query):
+            posting = self._postings.get(gram)
+            if posting is None:
+                return ()
+            lists.append(posting)
+        lists.sort(key=len)
+        candidates = lists[0]
+        for posting in lists[1:]:
+            candidates = np.intersect1d(candidates, posting, assume_unique=True)
+            if not len(candidates):
+                break
+        return candidates.tolist()
+
+    def search(self, normalized_oem: str, limit: Optional[int] = None) -> list[int]:
+        """autopart_id с query внутри OEM, по рангу совпадения и номеру."""
+        query = normalized_oem.upper()
+        if not query:
+            return []
+        matches = [
+            (_rank_key(self._oems[position], query), position)
+            for position in self._candidates(query)
+            if query in self._oems[position]
+        ]
+        matches.sort()
+        if limit is not None:
+            matches = matches[:limit]
+        return [int(self._ids[position]) for _, position in matches]
+
+    async def build(self, session: AsyncSession) -> None:
+        started = time.perf_counter()
+        ids: list[int] = []
+        oems: list[str] = []
+        stream = await session.stream(
+            select(AutoPart.id, AutoPart.oem_number).execution_options(
+                yield_per=_BUILD_PARTITION_ROWS
+            )
+        )
+        async for partition in stream.partitions(_BUILD_PARTITION_ROWS):
+            for autopart_id, oem in partition:
+                ids.append(autopart_id)
+                oems.append(oem)
+        self.load(ids, oems)
+        logger.info(
+            "OEM n-gram index built: autoparts=%s grams=%s in %.2fs",
+            len(self._oems),
+            len(self._postings),
+            time.perf_counter() - started,
+        )
+
+
+oem_ngram_index = OemNgramIndex()
+
+
+async def partial_oem_filter(session: AsyncSession, normalized_oem: str):
+    """Условие WHERE «OEM содержит normalized_oem» для текущей СУБД."""
+    if session.get_bind().dialect.name == "postgresql":
+        return AutoPart.oem_number.ilike(f"%{normalized_oem}%")
+    if not oem_ngram_index.is_fresh:
+        await oem_ngram_index.build(session)
+    return AutoPart.id.in_(oem_ngram_index.search(normalized_oem))
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_oem_ngram_index(session: Session, _flush_context) -> None:
+    if oem_ngram_index._built_at is None or oem_ngram_index._stale:
+        return
+    if any(isinstance(obj, AutoPart) for obj in chain(session.new, session.dirty)):
+        oem_ngram_index.mark_stale()
@@ -0,0 +1,169 @@
+"""Пробуждение релея очередей (EmailOutbox, TelegramOutbox) по NOTIFY.
+
+Постановка в очередь делает pg_notify в своей транзакции — уведомление
+уходит при commit. Процесс API держит одно отдельное asyncpg-соединение
+с LISTEN на каналы очередей; long-poll claim ждёт уведомления вместо
+того, чтобы релей каждые N секунд делал SKIP LOCKED-выборку по пустой
+очереди.
+
+Без PostgreSQL (или если LISTEN-соединение не поднялось) ожидание идёт
+короткими повторными claim раз в OUTBOX_LONG_POLL_FALLBACK_SEC.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger("dz_fastapi")
+
+EMAIL_OUTBOX_CHANNEL = "email_outbox"
+TELEGRAM_OUTBOX_CHANNEL = "telegram_outbox"
+_CHANNELS = (EMAIL_OUTBOX_CHANNEL, TELEGRAM_OUTBOX_CHANNEL)
+
+# Верхняя граница ожидания long-poll claim.
+OUTBOX_LONG_POLL_MAX_SEC = max(0, int(os.getenv("OUTBOX_LONG_POLL_MAX_SEC", "55")))
+# Шаг повторного claim, когда LISTEN недоступен.
+OUTBOX_LONG_POLL_FALLBACK_SEC = max(
+    0.5, float(os.getenv("OUTBOX_LONG_POLL_FALLBACK_SEC", "2"))
+)
+# Пауза перед повторной попыткой поднять LISTEN-соединение.
+_LISTEN_RETRY_SEC = 30.0
+
+T = TypeVar("T")
+
+
+async def notify_outbox(session: AsyncSession, channel: str) -> None:
+    """NOTIFY в текущей транзакции: слушатели узнают о записи после commit."""
+    if session.get_bind().dialect.name != "postgresql":
+        return
+    await session.execute(text("SELECT pg_notify(:channel, '')"), {"channel": channel})
+
+
+class OutboxListener:
+    def __init__(self):
+        self._connection = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiters: dict[str, set[asyncio.Future]] = {}
+        self._lock: Optional[asyncio.Lock] = None
+        self._failed_at: Optional[float] = None
+
+    @property
+    def is_listening(self) -> bool:
+        return self._connection is not None and not self._connection.is_closed()
+
+    def _on_notify(self, _connection, _pid, channel: str, _payload: str) -> None:
+        for future in self._waiters.pop(channel, set()):
+            if not future.done():
+                future.set_result(None)
+
+    def _on_terminate(self, _connection) -> None:
+        logger.warning("Outbox LISTEN connection closed")
+        self._connection = None
+        # Разбудить ждущих: без LISTEN они перейдут на повторные claim.
+        for channel in list(self._waiters):
+            self._on_notify(None, None, channel, "")
+
+    async def ensure(self, session: AsyncSession) -> bool:
+        """Поднять LISTEN-соединение к той же БД, что и session."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Соединение и ожидания привязаны к циклу событий, в котором
+            # созданы; в новом цикле (перезапуск, тесты) начинаем заново.
+            self._connection = None
+            self._waiters = {}
+            self._lock = None
+            self._loop = loop
+        if self.is_listening:
+            return True
+        bind = session.get_bind()
+        if bind.dialect.name != "postgresql":
+            return False
+        if self._failed_at is not None and time.monotonic() - self._failed_at < _LISTEN_RETRY_SEC:
+            return False
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.is_listening:
+                return True
+            dsn = bind.url.set(drivername="postgresql").render_as_string(hide_password=False)
+            try:
+                connection = await asyncpg.connect(dsn)
+                for channel in _CHANNELS:
+                    await connection.add_listener(channel, self._on_notify)
+                connection.add_termination_listener(self._on_terminate)
+            except Exception as exc:
+                logger.warning("Outbox LISTEN unavailable, falling back to polling: %s", exc)
+                self._failed_at = time.monotonic()
+                return False
+            self._connection = connection
+            self._failed_at = None
+            logger.info("Outbox LISTEN connection started: channels=%s", ",".join(_CHANNELS))
+            return True
+
+    def waiter(self, channel: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(channel, set()).add(future)
+        return future
+
+    def discard(self, channel: str, future: asyncio.Future) -> None:
+        self._waiters.get(channel, set()).discard(future)
+        if not future.done():
+            future.cancel()
+
+    async def close(self) -> None:
+        connection, self._connection = self._connection, None
+        if self._loop is not asyncio.get_running_loop():
+            # Цикл, в котором открыто соединение, уже закрыт.
+            return
+        if connection is not None and not connection.is_closed():
+            connection.remove_termination_listener(self._on_terminate)
+            await connection.close()
+
+
+outbox_listener = OutboxListener()
+
+
+async def claim_with_long_poll(
+    session: AsyncSession,
+    *,
+    channel: str,
+    claim: Callable[[], Awaitable[list[T]]],
+    wait_seconds: float,
+) -> list[T]:
+    """
+    claim(); если очередь пуста — ждать NOTIFY канала до wait_seconds и
+    повторить. Ожидание регистрируется до claim, поэтому запись,
+    закоммиченная между пустым claim и началом ожидания, не теряется.
+    """
+    wait_seconds = min(float(wait_seconds or 0), OUTBOX_LONG_POLL_MAX_SEC)
+    if wait_seconds <= 0:
+        return await claim()
+    deadline = time.monotonic() + wait_seconds
+    while True:
+        listening = await outbox_listener.ensure(session)
+        future = outbox_listener.waiter(channel) if listening else None
+        try:
+            rows = await claim()
+            remaining = deadline - time.monotonic()
+            if rows or remaining <= 0:
+                return rows
+            if future is None:
+                await asyncio.sleep(min(OUTBOX_LONG_POLL_FALLBACK_SEC, remaining))
+                continue
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout=remaining)
+            except asyncio.TimeoutError:
+                return []
+        finally:
+            if future is not None:
+                outbox_listener.discard(channel, future)
+
+
+async def close_outbox_listener() -> None:
+    await outbox_listener.close()
@@ -5,9 +5,11 @@ import os
 from datetime import date, datetime, timedelta
 from decimal import ROUND_HALF_UP, Decimal
 from math import ceil, sqrt
-from typing import Any, Optional
+from typing import Any, Iterable, Optional
 
+import numpy as np
 from sqlalchemy import delete, func, literal, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import aliased
 
@@ -31,6 +33,7 @@ from dz_fastapi.models.partner import (
     ProviderPriceListConfig,
     SupplierOrder,
     SupplierOrderItem,
+    TrackingAbcXyz,
 )
 from dz_fastapi.models.user import User
 from dz_fastapi.services.crosses import load_bidirectional_cross_members
@@ -48,6 +51,19 @@ from dz_fastapi.services.order_status_mapping import (
 logger = logging.getLogger("dz_fastapi")
 
 TRACKING_HISTORY_DAYS = 365
+# Сколько OEM читается/пишется одним запросом TrackingAbcXyz.
+TRACKING_ABC_XYZ_CHUNK = 1000
+_TRACKING_ABC_XYZ_COLUMNS = (
+    "series_month",
+    "monthly_qty",
+    "annual_ordered_qty",
+    "active_months",
+    "monthly_cv",
+    "xyz_class",
+    "market_qty",
+    "cumulative_share_pct",
+    "abc_class",
+)
 SITE_TERMINAL_STATUSES = {
     TYPE_STATUS_ORDER.SHIPPED,
     TYPE_STATUS_ORDER.REFUSAL,
@@ -1985,6 +2001,71 @@ def _build_draft_purchase_order(
     }
 
 
+def _abc_xyz_months() -> list[str]:
+    """Ключи «YYYY-MM» двенадцати месяцев, заканчивающихся текущим."""
+    current_month = date.today().replace(day=1)
+    months: list[str] = []
+    year = current_month.year
+    month = current_month.month
+    for offset in range(11, -1, -1):
+        y = year
+        m = month - offset
+        while m <= 0:
+            m += 12
+            y -= 1
+        months.append(f"{y:04d}-{m:02d}")
+    return months
+
+
+def _classify_xyz(series: list[int]) -> tuple[Optional[float], Optional[str]]:
+    """CV помесячного ряда и класс XYZ (None — заказов не было)."""
+    if not series or sum(series) <= 0:
+        return None, None
+    mean_value = sum(series) / len(series)
+    variance = sum((value - mean_value) ** 2 for value in series) / len(series)
+    monthly_cv = round(sqrt(variance) / mean_value, 2)
+    if monthly_cv <= 0.5:
+        return monthly_cv, "X"
+    if monthly_cv <= 1.0:
+        return monthly_cv, "Y"
+    return monthly_cv, "Z"
+
+
+def _classify_abc(
+    *,
+    cumulative_before: int,
+    group_qty: int,
+    total_market_qty: int,
+) -> tuple[Optional[float], Optional[str]]:
+    """Накопленная доля рынка (%) и класс ABC."""
+    if total_market_qty <= 0 or group_qty <= 0:
+        return None, None
+    cumulative_share = (cumulative_before + group_qty) / total_market_qty
+    cumulative_share_pct = round(cumulative_share * 100, 1)
+    if cumulative_share <= 0.8:
+        return cumulative_share_pct, "A"
+    if cumulative_share <= 0.95:
+        return cumulative_share_pct, "B"
+    return cumulative_share_pct, "C"
+
+
+def _abc_xyz_result(
+    series: list[int],
+    *,
+    cumulative_share_pct: Optional[float],
+    abc_class: Optional[str],
+) -> dict[str, Any]:
+    monthly_cv, xyz_class = _classify_xyz(series)
+    return {
+        "abc_class": abc_class,
+        "xyz_class": xyz_class,
+        "annual_ordered_qty": sum(series),
+        "monthly_cv": monthly_cv,
+        "active_months": sum(1 for value in series if value > 0),
+        "cumulative_share_pct": cumulative_share_pct,
+    }
+
+
 async def _compute_abc_xyz(
     session: AsyncSession,
     *,
@@ -1999,23 +2080,41 @@ async def _compute_abc_xyz(
     if not group_oems:
         return None
 
+    months = _abc_xyz_months()
+    classified = await _load_tracking_abc_xyz_rows(session, group_oems)
+    if classified is not None:
+        series = [0] * len(months)
+        group_qty = 0
+        for row in classified.values():
+            series = [total + int(value) for total, value in zip(series, row.monthly_qty)]
+            group_qty += int(row.market_qty or 0)
+        total_market_qty, cumulative_before = (
+            await session.execute(
+                select(
+                    func.coalesce(func.sum(TrackingAbcXyz.market_qty), 0),
+                    func.coalesce(
+                        func.sum(TrackingAbcXyz.market_qty).filter(
+                            TrackingAbcXyz.market_qty > group_qty
+                        ),
+                        0,
+                    ),
+                )
+            )
+        ).one()
+        cumulative_share_pct, abc_class = _classify_abc(
+            cumulative_before=int(cumulative_before),
+            group_qty=group_qty,
+            total_market_qty=int(total_market_qty),
+        )
+        return _abc_xyz_result(
+            series,
+            cumulative_share_pct=cumulative_share_pct,
+            abc_class=abc_class,
+        )
+
     cutoff = tracking_history_cutoff()
     cutoff_date = cutoff.date()
-    monthly_qty: dict[str, int] = {}
-    current_month = date.today().replace(day=1)
-    months: list[str] = []
-    year = current_month.year
-    month = current_month.month
-    for offset in range(11, -1, -1):
-        y = year
-        m = month - offset
-        while m <= 0:
-            m += 12
-            y -= 1
-        months.append(f"{y:04d}-{m:02d}")
-        monthly_qty[f"{y:04d}-{m:02d}"] = 0
-
-    annual_ordered_qty = 0
+    monthly_qty = {month_key: 0 for month_key in months}
     for row in history_rows:
         dt = row.get("created_at")
         normalized_row_oem = _normalize_oem(row.get("oem_number"))
@@ -2027,53 +2126,20 @@ async def _compute_abc_xyz(
             continue
         month_key = dt.strftime("%Y-%m")
         if month_key in monthly_qty:
-            qty = int(row.get("ordered_quantity") or 0)
-            monthly_qty[month_key] += qty
-            annual_ordered_qty += qty
-
-    series = [monthly_qty[month_key] for month_key in months]
-    active_months = sum(1 for value in series if value > 0)
-    xyz_class: Optional[str] = None
-    monthly_cv: Optional[float] = None
-    if series and annual_ordered_qty > 0:
-        mean_value = sum(series) / len(series)
-        if mean_value > 0:
-            variance = sum((value - mean_value) ** 2 for value in series) / len(series)
-            std_dev = sqrt(variance)
-            monthly_cv = round(std_dev / mean_value, 2)
-            if monthly_cv <= 0.5:
-                xyz_class = "X"
-            elif monthly_cv <= 1.0:
-                xyz_class = "Y"
-            else:
-                xyz_class = "Z"
+            monthly_qty[month_key] += int(row.get("ordered_quantity") or 0)
 
     qty_by_oem = await _load_tracking_market_qty_by_oem(session, cutoff=cutoff)
-
-    total_market_qty = sum(qty_by_oem.values())
-    abc_class: Optional[str] = None
-    cumulative_share_pct: Optional[float] = None
     group_qty = sum(qty_by_oem.get(oem, 0) for oem in group_oems)
-    if total_market_qty > 0 and group_qty > 0:
-        sorted_values = sorted(qty_by_oem.values(), reverse=True)
-        cumulative_before = sum(value for value in sorted_values if value > group_qty)
-        cumulative_share = (cumulative_before + group_qty) / total_market_qty
-        cumulative_share_pct = round(cumulative_share * 100, 1)
-        if cumulative_share <= 0.8:
-            abc_class = "A"
-        elif cumulative_share <= 0.95:
-            abc_class = "B"
-        else:
-            abc_class = "C"
-
-    return {
-        "abc_class": abc_class,
-        "xyz_class": xyz_class,
-        "annual_ordered_qty": annual_ordered_qty,
-        "monthly_cv": monthly_cv,
-        "active_months": active_months,
-        "cumulative_share_pct": cumulative_share_pct,
-    }
+    cumulative_share_pct, abc_class = _classify_abc(
+        cumulative_before=sum(value for value in qty_by_oem.values() if value > group_qty),
+        group_qty=group_qty,
+        total_market_qty=sum(qty_by_oem.values()),
+    )
+    return _abc_xyz_result(
+        [monthly_qty[month_key] for month_key in months],
+        cumulative_share_pct=cumulative_share_pct,
+        abc_class=abc_class,
+    )
 
 
 async def _compute_single_oem_abc_xyz_batch(
@@ -2091,26 +2157,35 @@ async def _compute_single_oem_abc_xyz_batch(
     if not normalized_unique_oems:
         return {}
 
+    months = _abc_xyz_months()
+    classified = await _load_tracking_abc_xyz_rows(session, normalized_unique_oems)
+    if classified is not None:
+        result: dict[str, dict[str, Any]] = {}
+        for oem_number in normalized_unique_oems:
+            row = classified.get(oem_number)
+            if row is None:
+                result[oem_number] = _abc_xyz_result(
+                    [0] * len(months),
+                    cumulative_share_pct=None,
+                    abc_class=None,
+                )
+                continue
+            result[oem_number] = {
+                "abc_class": row.abc_class,
+                "xyz_class": row.xyz_class,
+                "annual_ordered_qty": int(row.annual_ordered_qty or 0),
+                "monthly_cv": row.monthly_cv,
+                "active_months": int(row.active_months or 0),
+                "cumulative_share_pct": row.cumulative_share_pct,
+            }
+        return result
+
     cutoff = tracking_history_cutoff()
     cutoff_date = cutoff.date()
-    current_month = date.today().replace(day=1)
-    months: list[str] = []
-    year = current_month.year
-    month = current_month.month
-    for offset in range(11, -1, -1):
-        y = year
-        m = month - offset
-        while m <= 0:
-            m += 12
-            y -= 1
-        months.append(f"{y:04d}-{m:02d}")
-
     monthly_qty_by_oem: dict[str, dict[str, int]] = {
         oem: {month_key: 0 for month_key in months}
         for oem in normalized_unique_oems
     }
-    annual_ordered_qty_by_oem = {oem: 0 for oem in normalized_unique_oems}
-
     for oem_number in normalized_unique_oems:
         monthly_qty = monthly_qty_by_oem[oem_number]
         for row in history_rows_by_oem.get(oem_number, []):
@@ -2118,72 +2193,226 @@ async def _compute_single_oem_abc_xyz_batch(
             if not dt or dt.date() < cutoff_date:
                 continue
             month_key = dt.strftime("%Y-%m")
-            if month_key not in monthly_qty:
-                continue
-            qty = int(row.get("ordered_quantity") or 0)
-            monthly_qty[month_key] += qty
-            annual_ordered_qty_by_oem[oem_number] += qty
+            if month_key in monthly_qty:
+                monthly_qty[month_key] += int(row.get("ordered_quantity") or 0)
 
     qty_by_oem = await _load_tracking_market_qty_by_oem(session, cutoff=cutoff)
 
     total_market_qty = sum(qty_by_oem.values())
     sorted_values = sorted(qty_by_oem.values(), reverse=True)
     cumulative_before_cache: dict[int, int] = {}
-    result: dict[str, dict[str, Any]] = {}
+    result = {}
 
     for oem_number in normalized_unique_oems:
-        series = [
-            monthly_qty_by_oem[oem_number][month_key]
-            for month_key in months
-        ]
-        annual_ordered_qty = annual_ordered_qty_by_oem[oem_number]
-        active_months = sum(1 for value in series if value > 0)
-        xyz_class: Optional[str] = None
-        monthly_cv: Optional[float] = None
-        if series and annual_ordered_qty > 0:
-            mean_value = sum(series) / len(series)
-            if mean_value > 0:
-                variance = sum((value - mean_value) ** 2 for value in series) / len(
-                    series
-                )
-                std_dev = sqrt(variance)
-                monthly_cv = round(std_dev / mean_value, 2)
-                if monthly_cv <= 0.5:
-                    xyz_class = "X"
-                elif monthly_cv <= 1.0:
-                    xyz_class = "Y"
-                else:
-                    xyz_class = "Z"
-
         group_qty = qty_by_oem.get(oem_number, 0)
-        abc_class: Optional[str] = None
-        cumulative_share_pct: Optional[float] = None
-        if total_market_qty > 0 and group_qty > 0:
-            cumulative_before = cumulative_before_cache.get(group_qty)
-            if cumulative_before is None:
-                cumulative_before = sum(
-                    value for value in sorted_values if value > group_qty
-                )
-                cumulative_before_cache[group_qty] = cumulative_before
-            cumulative_share = (cumulative_before + group_qty) / total_market_qty
-            cumulative_share_pct = round(cumulative_share * 100, 1)
-            if cumulative_share <= 0.8:
-                abc_class = "A"
-            elif cumulative_share <= 0.95:
-                abc_class = "B"
-            else:
-                abc_class = "C"
+        cumulative_before = cumulative_before_cache.get(group_qty)
+        if cumulative_before is None:
+            cumulative_before = sum(
+                value for value in sorted_values if value > group_qty
+            )
+            cumulative_before_cache[group_qty] = cumulative_before
+        cumulative_share_pct, abc_class = _classify_abc(
+            cumulative_before=cumulative_before,
+            group_qty=group_qty,
+            total_market_qty=total_market_qty,
+        )
+        result[oem_number] = _abc_xyz_result(
+            [monthly_qty_by_oem[oem_number][month_key] for month_key in months],
+            cumulative_share_pct=cumulative_share_pct,
+            abc_class=abc_class,
+        )
 
-        result[oem_number] = {
-            "abc_class": abc_class,
-            "xyz_class": xyz_class,
-            "annual_ordered_qty": annual_ordered_qty,
-            "monthly_cv": monthly_cv,
-            "active_months": active_months,
+    return result
+
+
+async def _load_tracking_abc_xyz_rows(
+    session: AsyncSession,
+    normalized_oem_numbers: Iterable[str],
+) -> Optional[dict[str, TrackingAbcXyz]]:
+    """
+    Строки TrackingAbcXyz для OEM. None — таблица не пересчитана за
+    текущий месяц (ряды сдвинуты), тогда классификацию считают по сырой
+    истории.
+    """
+    series_month = date.today().replace(day=1)
+    fresh_key = f"tracking_abc_xyz_fresh:{series_month.isoformat()}"
+    fresh = session.info.get(fresh_key)
+    if fresh is None:
+        fresh = (
+            await session.execute(
+                select(TrackingAbcXyz.id)
+                .where(TrackingAbcXyz.series_month == series_month)
+                .limit(1)
+            )
+        ).first() is not None
+        session.info[fresh_key] = fresh
+    if not fresh:
+        return None
+
+    oems = sorted(set(normalized_oem_numbers))
+    rows: dict[str, TrackingAbcXyz] = {}
+    for offset in range(0, len(oems), TRACKING_ABC_XYZ_CHUNK):
+        chunk = oems[offset:offset + TRACKING_ABC_XYZ_CHUNK]
+        for row in (
+            await session.execute(
+                select(TrackingAbcXyz).where(TrackingAbcXyz.oem_number.in_(chunk))
+            )
+        ).scalars():
+            rows[row.oem_number] = row
+    return rows
+
+
+async def refresh_tracking_abc_xyz(session: AsyncSession) -> dict[str, int]:
+    """
+    Пересчитать TrackingAbcXyz по истории заказов за TRACKING_HISTORY_DAYS.
+
+    Помесячные объёмы и объём за окно по каждому OEM — один GROUP BY в
+    БД на источник; ABC-ранжирование — по отсортированному массиву.
+    Пишутся только изменившиеся строки, OEM без заказов в окне удаляются.
+    Без commit.
+    """
+    cutoff = tracking_history_cutoff()
+    months = _abc_xyz_months()
+    month_index = {month_key: index for index, month_key in enumerate(months)}
+    series_month = date.today().replace(day=1)
+
+    supplier_month = func.to_char(func.timezone("UTC", SupplierOrder.created_at), "YYYY-MM")
+    site_month = func.to_char(func.timezone("UTC", Order.created_at), "YYYY-MM")
+    statements = (
+        select(
+            func.upper(SupplierOrderItem.oem_number),
+            supplier_month,
+            func.sum(SupplierOrderItem.quantity),
+        )
+        .select_from(SupplierOrderItem)
+        .join(
+            SupplierOrder,
+            SupplierOrder.id == SupplierOrderItem.supplier_order_id,
+        )
+        .where(
+            SupplierOrder.source_type == ORDER_TRACKING_SOURCE.SEARCH_OFFERS.value,
+            SupplierOrder.created_at >= cutoff,
+            SupplierOrderItem.oem_number.is_not(None),
+        )
+        .group_by(func.upper(SupplierOrderItem.oem_number), supplier_month),
+        select(
+            func.upper(OrderItem.oem_number),
+            site_month,
+            func.sum(OrderItem.quantity),
+        )
+        .select_from(OrderItem)
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(
+            Order.source_type == ORDER_TRACKING_SOURCE.DRAGONZAP_SEARCH.value,
+            Order.created_at >= cutoff,
+            OrderItem.oem_number.is_not(None),
+        )
+        .group_by(func.upper(OrderItem.oem_number), site_month),
+    )
+    series_by_oem: dict[str, list[int]] = {}
+    market_qty_by_oem: dict[str, int] = {}
+    for stmt in statements:
+        # Месяц в UTC — как strftime у datetime из asyncpg в расчёте по
+        # сырой истории (_compute_abc_xyz).
+        for oem_value, row_month, qty in await session.execute(stmt):
+            normalized = _normalize_oem(oem_value)
+            if not normalized:
+                continue
+            qty = int(qty or 0)
+            market_qty_by_oem[normalized] = market_qty_by_oem.get(normalized, 0) + qty
+            series = series_by_oem.setdefault(normalized, [0] * len(months))
+            index = month_index.get(row_month)
+            if index is not None:
+                series[index] += qty
+
+    oems = sorted(market_qty_by_oem)
+    oem_qty = np.asarray([market_qty_by_oem[oem] for oem in oems], dtype=np.int64)
+    market_values = np.sort(oem_qty)
+    # suffix_sum[i] — сумма market_values[i:]; значения строго больше q
+    # начинаются с searchsorted(q, side="right").
+    suffix_sum = np.append(np.cumsum(market_values[::-1])[::-1], 0)
+    cumulative_before = suffix_sum[
+        np.searchsorted(market_values, oem_qty, side="right")
+    ].tolist()
+    total_market_qty = int(market_values.sum())
+
+    desired: dict[str, dict[str, Any]] = {}
+    for oem, before in zip(oems, cumulative_before):
+        market_qty = market_qty_by_oem[oem]
+        cumulative_share_pct, abc_class = _classify_abc(
+            cumulative_before=int(before),
+            group_qty=market_qty,
+            total_market_qty=total_market_qty,
+        )
+        series = series_by_oem[oem]
+        metrics = _abc_xyz_result(
+            series,
+            cumulative_share_pct=cumulative_share_pct,
+            abc_class=abc_class,
+        )
+        desired[oem] = {
+            "oem_number": oem,
+            "series_month": series_month,
+            "monthly_qty": series,
+            "annual_ordered_qty": metrics["annual_ordered_qty"],
+            "active_months": metrics["active_months"],
+            "monthly_cv": metrics["monthly_cv"],
+            "xyz_class": metrics["xyz_class"],
+            "market_qty": market_qty,
             "cumulative_share_pct": cumulative_share_pct,
+            "abc_class": abc_class,
         }
 
-    return result
+    existing = {
+        row.oem_number: row
+        for row in (
+            await session.execute(
+                select(
+                    TrackingAbcXyz.oem_number,
+                    *(
+                        getattr(TrackingAbcXyz, column)
+                        for column in _TRACKING_ABC_XYZ_COLUMNS
+                    ),
+                )
+            )
+        ).all()
+    }
+    changed = [
+        values
+        for oem, values in desired.items()
+        if oem not in existing
+        or any(
+            getattr(existing[oem], column) != values[column]
+            for column in _TRACKING_ABC_XYZ_COLUMNS
+        )
+    ]
+    removed = sorted(set(existing) - set(desired))
+
+    now = now_moscow()
+    for offset in range(0, len(changed), TRACKING_ABC_XYZ_CHUNK):
+        chunk = [
+            {**values, "updated_at": now}
+            for values in changed[offset:offset + TRACKING_ABC_XYZ_CHUNK]
+        ]
+        stmt = pg_insert(TrackingAbcXyz).values(chunk)
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[TrackingAbcXyz.oem_number],
+                set_={
+                    column: stmt.excluded[column]
+                    for column in (*_TRACKING_ABC_XYZ_COLUMNS, "updated_at")
+                },
+            )
+        )
+    for offset in range(0, len(removed), TRACKING_ABC_XYZ_CHUNK):
+        await session.execute(
+            delete(TrackingAbcXyz).where(
+                TrackingAbcXyz.oem_number.in_(removed[offset:offset + TRACKING_ABC_XYZ_CHUNK])
+            )
+        )
+    await session.flush()
+    session.info[f"tracking_abc_xyz_fresh:{series_month.isoformat()}"] = bool(desired)
+    return {"oems": len(desired), "updated": len(changed), "removed": len(removed)}
 
 
 async def _load_tracking_market_qty_by_oem(
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 import re
@@ -38,6 +39,7 @@ from dz_fastapi.models.price_control import (
 )
 from dz_fastapi.services.inventory_stock import ensure_default_warehouse
 from dz_fastapi.services.process import _apply_source_filters, _apply_source_markups, assign_brand
+from dz_fastapi.services.site_offers import get_site_offers, site_request_slot
 from dz_fastapi.services.utils import normalize_markup
 
 logger = logging.getLogger("dz_fastapi")
@@ -58,6 +60,10 @@ BRAND_ALIASES = {
 SITE_HISTORY_PROVIDER_NAME = "Сайт Dragonzap"
 SITE_HISTORY_PRICELIST_ID = 0
 SITE_HISTORY_PRICE_STEP = Decimal("0.01")
+# Сколько позиций контроля цен одновременно ждут ответов сайта.
+PRICE_CONTROL_SITE_PARALLELISM = max(
+    1, int(os.getenv("PRICE_CONTROL_SITE_PARALLELISM", "8"))
+)
 
 
 @dataclass
@@ -601,13 +607,14 @@ def _is_related_brand(candidate: str, requested: str) -> bool:
 async def _fetch_site_offers_with_brand_fallback(
     client: DZSiteClient, oem: str, brand: str
 ) -> list[dict]:
-    direct_offers = await client.get_offers(
-        oem=oem, brand=brand, without_cross=True
+    direct_offers = await get_site_offers(
+        client, oem=oem, brand=brand, without_cross=True
     )
     if direct_offers:
         return direct_offers
 
-    brands_raw = await client.get_brands(oem=oem)
+    async with site_request_slot(client):
+        brands_raw = await client.get_brands(oem=oem)
     site_brands = _extract_brand_values(brands_raw)
     related_brands = [
         b for b in site_brands if _is_related_brand(b, brand) and b != brand
@@ -630,22 +637,22 @@ async def _fetch_site_offers_with_brand_fallback(
         )
 
     for candidate_brand in related_brands:
-        candidate_offers = await client.get_offers(
-            oem=oem, brand=candidate_brand, without_cross=True
+        candidate_offers = await get_site_offers(
+            client, oem=oem, brand=candidate_brand, without_cross=True
         )
         if candidate_offers:
             return candidate_offers
 
     # Last fallback: include crosses if strict search returned nothing.
-    direct_with_cross = await client.get_offers(
-        oem=oem, brand=brand, without_cross=False
+    direct_with_cross = await get_site_offers(
+        client, oem=oem, brand=brand, without_cross=False
     )
     if direct_with_cross:
         return direct_with_cross
 
     for candidate_brand in related_brands:
-        candidate_with_cross = await client.get_offers(
-            oem=oem, brand=candidate_brand, without_cross=False
+        candidate_with_cross = await get_site_offers(
+            client, oem=oem, brand=candidate_brand, without_cross=False
         )
         if candidate_with_cross:
             return candidate_with_cross
@@ -653,6 +660,51 @@ async def _fetch_site_offers_with_brand_fallback(
     return []
 
 
+async def _load_item_site_offers(
+    client: DZSiteClient,
+    semaphore: asyncio.Semaphore,
+    *,
+    oem: str,
+    brand: str,
+    query_oem: str,
+    query_brands: list[str],
+    is_dz_remap: bool,
+) -> tuple[list[dict], bool, list[dict] | None]:
+    """
+    Предложения сайта для одной позиции контроля цен: поиск по брендам
+    и, для DZ-ремапа, прямой поиск DZ для коэффициента клиента.
+    Возвращает (raw_offers, is_dz_remap, dz_direct_offers).
+    """
+    async with semaphore:
+        try:
+            raw_offers = await _fetch_site_offers_for_brands(
+                client=client, oem=query_oem, brands=query_brands
+            )
+        except Exception as exc:
+            logger.warning("Site offers failed for %s: %s", oem, exc)
+            return [], False, None
+        if not is_dz_remap:
+            return raw_offers, False, None
+        dz_oem = preprocess_oem_number(str(oem or ""))
+        dz_brand = str(brand or "").strip().upper()
+        try:
+            dz_direct_offers = await get_site_offers(
+                client, oem=dz_oem, brand=dz_brand, without_cross=True
+            )
+            if not dz_direct_offers:
+                dz_direct_offers = await get_site_offers(
+                    client, oem=dz_oem, brand=dz_brand, without_cross=False
+                )
+        except Exception as exc:
+            logger.warning(
+                "Site offers failed for DZ direct coef %s: %s",
+                oem,
+                exc,
+            )
+            dz_direct_offers = None
+        return raw_offers, True, dz_direct_offers
+
+
 def _offer_row_from_series(row: pd.Series) -> OfferRow:
     return OfferRow(
         autopart_id=int(row.get("autopart_id")),
@@ -707,10 +759,8 @@ async def _build_current_offers(
                 source.provider_config_id,
             )
             continue
-        associations = await crud_pricelist.fetch_pricelist_data(
-            latest_pl.id, session
-        )
-        if not associations:
+        df = await crud_pricelist.get_pricelist_frame(latest_pl.id, session)
+        if df.empty:
             logger.debug(
                 "Price control source skipped (empty pricelist rows): "
                 "config=%s provider_config=%s pricelist_id=%s",
@@ -719,9 +769,6 @@ async def _build_current_offers(
                 latest_pl.id,
             )
             continue
-        df = await crud_pricelist.transform_to_dataframe(
-            associations=associations, session=session
-        )
         source_rows_before_filters = len(df)
         df = _apply_source_filters(df, source)
         if df.empty:
@@ -1159,7 +1206,15 @@ async def run_price_control(
         api_key=key,
         verify_ssl=False,
     ) as client:
-        for oem, brand, selected_provider_config_id in selected_items:
+        # Запросы к сайту идут параллельно (PRICE_CONTROL_SITE_PARALLELISM
+        # позиций, лимиты хоста — в site_offers), а разбор ответов ниже —
+        # по порядку позиций: от него зависит бегущий коэффициент клиента.
+        site_semaphore = asyncio.Semaphore(PRICE_CONTROL_SITE_PARALLELISM)
+        item_offers: list[OfferRow | None] = []
+        site_tasks: dict[int, asyncio.Task] = {}
+        for index, (oem, brand, selected_provider_config_id) in enumerate(
+            selected_items
+        ):
             item_key = _normalize_key(oem, brand)
             offer = None
             if selected_provider_config_id is not None:
@@ -1168,15 +1223,8 @@ async def run_price_control(
                 )
             if not offer:
                 offer = offers.get(item_key)
+            item_offers.append(offer)
             if not offer:
-                recommendations.append(
-                    {
-                        "oem": oem,
-                        "brand": brand,
-                        "missing_in_pricelist": True,
-                        "missing_competitor": True,
-                    }
-                )
                 continue
             try:
                 (
@@ -1194,244 +1242,260 @@ async def run_price_control(
                 )
                 if expanded_query_brands:
                     query_brands = expanded_query_brands
-                raw_offers = await _fetch_site_offers_for_brands(
-                    client=client, oem=query_oem, brands=query_brands
-                )
             except Exception as exc:
                 logger.warning("Site offers failed for %s: %s", oem, exc)
-                raw_offers = []
-                is_dz_remap = False
-
-            competitor_offers = []
-            own_site_offer = None
-            for raw in raw_offers or []:
-                normalized = _normalize_offer(raw)
-                if not normalized:
+                continue
+            site_tasks[index] = asyncio.create_task(
+                _load_item_site_offers(
+                    client,
+                    site_semaphore,
+                    oem=oem,
+                    brand=brand,
+                    query_oem=query_oem,
+                    query_brands=query_brands,
+                    is_dz_remap=is_dz_remap,
+                )
+            )
+
+        try:
+            for index, (oem, brand, _) in enumerate(selected_items):
+                offer = item_offers[index]
+                if not offer:
+                    recommendations.append(
+                        {
+                            "oem": oem,
+                            "brand": brand,
+                            "missing_in_pricelist": True,
+                            "missing_competitor": True,
+                        }
+                    )
                     continue
-                if _matches_our_offer(
-                    raw, config.our_offer_field, config.our_offer_match
-                ):
-                    if (
-                        own_site_offer is None
-                        or normalized["price"] < own_site_offer["price"]
+                site_task = site_tasks.pop(index, None)
+                if site_task is None:
+                    raw_offers, is_dz_remap, dz_direct_offers = [], False, None
+                else:
+                    (
+                        raw_offers,
+                        is_dz_remap,
+                        dz_direct_offers,
+                    ) = await site_task
+
+                competitor_offers = []
+                own_site_offer = None
+                for raw in raw_offers or []:
+                    normalized = _normalize_offer(raw)
+                    if not normalized:
+                        continue
+                    if _matches_our_offer(
+                        raw, config.our_offer_field, config.our_offer_match
                     ):
-                        own_site_offer = normalized
-                    continue
-                if config.min_stock is not None and (
-                    normalized["qty"] < int(config.min_stock)
-                ):
-                    continue
-                if config.max_delivery_days is not None:
-                    max_delivery = normalized.get("max_delivery_day")
-                    if max_delivery is not None and (
-                        max_delivery > int(config.max_delivery_days)
+                        if (
+                            own_site_offer is None
+                            or normalized["price"] < own_site_offer["price"]
+                        ):
+                            own_site_offer = normalized
+                        continue
+                    if config.min_stock is not None and (
+                        normalized["qty"] < int(config.min_stock)
                     ):
                         continue
-                competitor_offers.append(normalized)
-
-            if is_dz_remap:
-                try:
-                    dz_direct_offers = await client.get_offers(
-                        oem=preprocess_oem_number(str(oem or "")),
-                        brand=str(brand or "").strip().upper(),
-                        without_cross=True,
-                    )
-                    if not dz_direct_offers:
-                        dz_direct_offers = await client.get_offers(
-                            oem=preprocess_oem_number(str(oem or "")),
-                            brand=str(brand or "").strip().upper(),
-                            without_cross=False,
-                        )
+                    if config.max_delivery_days is not None:
+                        max_delivery = normalized.get("max_delivery_day")
+                        if max_delivery is not None and (
+                            max_delivery > int(config.max_delivery_days)
+                        ):
+                            continue
+                    competitor_offers.append(normalized)
+
+                if is_dz_remap and dz_direct_offers is not None:
                     own_site_offer_direct = _pick_own_offer(
-                        raw_offers=dz_direct_offers or [],
+                        raw_offers=dz_direct_offers,
                         field=config.our_offer_field,
                         match_value=config.our_offer_match,
                     )
                     if own_site_offer_direct:
                         own_site_offer = own_site_offer_direct
-                except Exception as exc:
-                    logger.warning(
-                        "Site offers failed for DZ direct coef %s: %s",
-                        oem,
-                        exc,
-                    )
 
-            competitor_offers.sort(key=lambda x: x["price"])
-            best = competitor_offers[0] if competitor_offers else None
-            own_site_price = (
-                own_site_offer["price"] if own_site_offer else None
-            )
-            if (
-                record_site_history_for_dz
-                and is_dz_remap
-                and offer.autopart_id
-                and best
-                and best.get("price") is not None
-            ):
-                try:
-                    if site_history_provider is None:
-                        site_history_provider = (
-                            await _get_site_history_provider(session)
+                competitor_offers.sort(key=lambda x: x["price"])
+                best = competitor_offers[0] if competitor_offers else None
+                own_site_price = (
+                    own_site_offer["price"] if own_site_offer else None
+                )
+                if (
+                    record_site_history_for_dz
+                    and is_dz_remap
+                    and offer.autopart_id
+                    and best
+                    and best.get("price") is not None
+                ):
+                    try:
+                        if site_history_provider is None:
+                            site_history_provider = (
+                                await _get_site_history_provider(session)
+                            )
+                        saved = await _record_site_history_price(
+                            session=session,
+                            provider=site_history_provider,
+                            autopart_id=int(offer.autopart_id),
+                            price=float(best["price"]),
+                            quantity=int(best.get("qty") or 0),
+                            created_at=run_created_at,
                         )
-                    saved = await _record_site_history_price(
-                        session=session,
-                        provider=site_history_provider,
-                        autopart_id=int(offer.autopart_id),
-                        price=float(best["price"]),
-                        quantity=int(best.get("qty") or 0),
-                        created_at=run_created_at,
+                        if saved:
+                            site_history_saved += 1
+                    except Exception as exc:
+                        logger.warning(
+                            "Price control site history save failed "
+                            "for %s/%s: %s",
+                            oem,
+                            brand,
+                            exc,
+                        )
+                row_client_coef = None
+                if (
+                    own_site_price is not None
+                    and own_site_price > 0
+                    and offer.price is not None
+                    and offer.price > 0
+                ):
+                    raw_coef = offer.price / own_site_price
+                    if CLIENT_COEF_MIN <= raw_coef <= CLIENT_COEF_MAX:
+                        row_client_coef = raw_coef
+                        client_coef_observations.append(raw_coef)
+                        observed_running = _median(
+                            (recent_coef_history + client_coef_observations)[
+                                -CLIENT_COEF_HISTORY_SIZE:
+                            ]
+                        )
+                        if observed_running is not None:
+                            running_client_coef = _coerce_client_coef(
+                                observed_running
+                            )
+
+                source_cfg = source_map.get(offer.provider_config_id)
+                min_markup = (
+                    float(source_cfg.min_markup_pct or 0.0) if source_cfg else 0.0
+                )
+                cost_price = _calc_cost_price(offer, config)
+                min_allowed = _min_allowed_price(cost_price, min_markup)
+
+                competitor_price = best["price"] if best else None
+                target_price = None
+                effective_coef = None
+                if competitor_price is not None:
+                    delta_raw = float(config.delta_pct or 0.0)
+                    delta = min(max(delta_raw, 0.0), 100.0) / 100.0
+                    target_site_price = competitor_price * (1 - delta)
+                    effective_coef = _coerce_client_coef(
+                        row_client_coef
+                        if row_client_coef is not None
+                        else running_client_coef
                     )
-                    if saved:
-                        site_history_saved += 1
-                except Exception as exc:
-                    logger.warning(
-                        "Price control site history save failed "
-                        "for %s/%s: %s",
+                    target_price = target_site_price * effective_coef
+                    logger.debug(
+                        "Price control calc: oem=%s brand=%s query_oem=%s "
+                        "query_brands=%s competitor=%s own_site=%s row_coef=%s "
+                        "running_coef=%s target=%s",
                         oem,
                         brand,
-                        exc,
+                        query_oem,
+                        ",".join(query_brands),
+                        competitor_price,
+                        own_site_price,
+                        row_client_coef,
+                        running_client_coef,
+                        target_price,
                     )
-            row_client_coef = None
-            if (
-                own_site_price is not None
-                and own_site_price > 0
-                and offer.price is not None
-                and offer.price > 0
-            ):
-                raw_coef = offer.price / own_site_price
-                if CLIENT_COEF_MIN <= raw_coef <= CLIENT_COEF_MAX:
-                    row_client_coef = raw_coef
-                    client_coef_observations.append(raw_coef)
-                    observed_running = _median(
-                        (recent_coef_history + client_coef_observations)[
-                            -CLIENT_COEF_HISTORY_SIZE:
-                        ]
-                    )
-                    if observed_running is not None:
-                        running_client_coef = _coerce_client_coef(
-                            observed_running
-                        )
-
-            source_cfg = source_map.get(offer.provider_config_id)
-            min_markup = (
-                float(source_cfg.min_markup_pct or 0.0) if source_cfg else 0.0
-            )
-            cost_price = _calc_cost_price(offer, config)
-            min_allowed = _min_allowed_price(cost_price, min_markup)
-
-            competitor_price = best["price"] if best else None
-            target_price = None
-            effective_coef = None
-            if competitor_price is not None:
-                delta_raw = float(config.delta_pct or 0.0)
-                delta = min(max(delta_raw, 0.0), 100.0) / 100.0
-                target_site_price = competitor_price * (1 - delta)
-                effective_coef = _coerce_client_coef(
-                    row_client_coef
-                    if row_client_coef is not None
-                    else running_client_coef
-                )
-                target_price = target_site_price * effective_coef
-                logger.debug(
-                    "Price control calc: oem=%s brand=%s query_oem=%s "
-                    "query_brands=%s competitor=%s own_site=%s row_coef=%s "
-                    "running_coef=%s target=%s",
-                    oem,
-                    brand,
-                    query_oem,
-                    ",".join(query_brands),
-                    competitor_price,
-                    own_site_price,
-                    row_client_coef,
-                    running_client_coef,
-                    target_price,
-                )
 
-            is_cheapest = (
-                competitor_price is not None
-                and offer.price <= competitor_price
-            )
-            below_cost = target_price is not None and target_price < cost_price
-            below_min_markup = (
-                target_price is not None and target_price < min_allowed
-            )
-            missing_competitor = competitor_price is None
-            suggested_action = "keep"
-            if (
-                target_price is not None
-                and not below_cost
-                and not below_min_markup
-            ):
-                if offer.price > target_price:
-                    suggested_action = "lower"
-                elif offer.price < target_price:
-                    suggested_action = "raise"
-
-            recommendations.append(
-                {
-                    "provider_config_id": offer.provider_config_id,
-                    "autopart_id": offer.autopart_id,
-                    "oem": oem,
-                    "brand": brand,
-                    "name": offer.name,
-                    "our_price": offer.price,
-                    "competitor_price": competitor_price,
-                    "competitor_qty": best["qty"] if best else None,
-                    "competitor_supplier": (
-                        best["supplier_name"] if best else None
-                    ),
-                    "competitor_min_delivery": (
-                        best["min_delivery_day"] if best else None
-                    ),
-                    "competitor_max_delivery": (
-                        best["max_delivery_day"] if best else None
-                    ),
-                    "target_price": target_price,
-                    "effective_client_coef": effective_coef,
-                    "effective_client_pct": _percent_from_multiplier(
-                        effective_coef
-                    ),
-                    "cost_price": cost_price,
-                    "min_allowed_price": min_allowed,
-                    "is_cheapest": is_cheapest,
-                    "below_cost": below_cost,
-                    "below_min_markup": below_min_markup,
-                    "missing_competitor": missing_competitor,
-                    "missing_in_pricelist": False,
-                    "suggested_action": suggested_action,
-                }
-            )
-            if competitor_price is not None:
-                individual_multiplier = _individual_multiplier(
-                    offer.provider_id
+                is_cheapest = (
+                    competitor_price is not None
+                    and offer.price <= competitor_price
                 )
-                base_multiplier = (
-                    general_multiplier
-                    * individual_multiplier
-                    * (
-                        own_multiplier
-                        if offer.is_own_price
-                        else third_multiplier
-                    )
+                below_cost = target_price is not None and target_price < cost_price
+                below_min_markup = (
+                    target_price is not None and target_price < min_allowed
                 )
-                required_markup = None
+                missing_competitor = competitor_price is None
+                suggested_action = "keep"
                 if (
-                    offer.base_price
-                    and offer.base_price > 0
-                    and base_multiplier > 0
+                    target_price is not None
+                    and not below_cost
+                    and not below_min_markup
                 ):
-                    required_markup = target_price / (
-                        offer.base_price * base_multiplier
-                    )
-                    if required_markup <= 0:
-                        required_markup = None
-                source_reco_stats[offer.provider_config_id].append(
+                    if offer.price > target_price:
+                        suggested_action = "lower"
+                    elif offer.price < target_price:
+                        suggested_action = "raise"
+
+                recommendations.append(
                     {
+                        "provider_config_id": offer.provider_config_id,
+                        "autopart_id": offer.autopart_id,
+                        "oem": oem,
+                        "brand": brand,
+                        "name": offer.name,
                         "our_price": offer.price,
                         "competitor_price": competitor_price,
-                        "required_markup": required_markup,
+                        "competitor_qty": best["qty"] if best else None,
+                        "competitor_supplier": (
+                            best["supplier_name"] if best else None
+                        ),
+                        "competitor_min_delivery": (
+                            best["min_delivery_day"] if best else None
+                        ),
+                        "competitor_max_delivery": (
+                            best["max_delivery_day"] if best else None
+                        ),
+                        "target_price": target_price,
+                        "effective_client_coef": effective_coef,
+                        "effective_client_pct": _percent_from_multiplier(
+                            effective_coef
+                        ),
+                        "cost_price": cost_price,
+                        "min_allowed_price": min_allowed,
+                        "is_cheapest": is_cheapest,
+                        "below_cost": below_cost,
+                        "below_min_markup": below_min_markup,
+                        "missing_competitor": missing_competitor,
+                        "missing_in_pricelist": False,
+                        "suggested_action": suggested_action,
                     }
                 )
+                if competitor_price is not None:
+                    individual_multiplier = _individual_multiplier(
+                        offer.provider_id
+                    )
+                    base_multiplier = (
+                        general_multiplier
+                        * individual_multiplier
+                        * (
+                            own_multiplier
+                            if offer.is_own_price
+                            else third_multiplier
+                        )
+                    )
+                    required_markup = None
+                    if (
+                        offer.base_price
+                        and offer.base_price > 0
+                        and base_multiplier > 0
+                    ):
+                        required_markup = target_price / (
+                            offer.base_price * base_multiplier
+                        )
+                        if required_markup <= 0:
+                            required_markup = None
+                    source_reco_stats[offer.provider_config_id].append(
+                        {
+                            "our_price": offer.price,
+                            "competitor_price": competitor_price,
+                            "required_markup": required_markup,
+                        }
+                    )
+
+        finally:
+            for task in site_tasks.values():
+                task.cancel()
 
     await crud_price_control_reco.create_many(
         session=session, run_id=run.id, rows=recommendations
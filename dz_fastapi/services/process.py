@@ -1,5 +1,4 @@
 import asyncio
-import copy
 import hashlib
 import logging
 import os
@@ -8,18 +7,22 @@ from datetime import date, datetime
 from functools import partial
 from io import BytesIO
 from pathlib import Path
+from types import SimpleNamespace
 from typing import Any, Dict, List, Optional
 
 import numpy as np
 import pandas as pd
 from fastapi import HTTPException
 from libarchive import memory_reader
-from openpyxl import Workbook
+from openpyxl import Workbook, load_workbook
 from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ERROR_CODES
 from openpyxl.styles import Alignment, Font, PatternFill
-from sqlalchemy import func, insert, select, text
+from sqlalchemy import func, insert
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy import select, text
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import aliased
+from sqlalchemy.orm import aliased, selectinload
 
 from dz_fastapi.analytics.price_history import analyze_new_pricelist
 from dz_fastapi.core.constants import (
@@ -78,7 +81,7 @@ from dz_fastapi.crud.partner import (
 from dz_fastapi.crud.price_control import crud_customer_pricelist_override
 from dz_fastapi.models.autopart import AutoPart, preprocess_oem_number
 from dz_fastapi.models.brand import Brand
-from dz_fastapi.models.cross import AutoPartCross
+from dz_fastapi.models.cross import AutoPartCross, AutoPartCrossClusterMember
 from dz_fastapi.models.partner import (
     Customer,
     CustomerPriceList,
@@ -86,6 +89,7 @@ from dz_fastapi.models.partner import (
     CustomerPriceListExportRow,
     CustomerPriceListPublicationRule,
     CustomerPriceListPublishedAlias,
+    PriceList,
     PriceListAutoPartAssociation,
     Provider,
     ProviderPriceListConfig,
@@ -97,6 +101,7 @@ from dz_fastapi.schemas.partner import (
     CustomerPriceListResponse,
     PriceListCreate,
 )
+from dz_fastapi.services.cpu_pool import run_cpu_bound
 from dz_fastapi.services.email import (
     EMAIL_NAME,
     EMAIL_TRANSPORT,
@@ -131,6 +136,27 @@ DEFAULT_CUSTOMER_PRICELIST_OUTBOX_EMAIL = (
 CUSTOMER_PRICELIST_ARTIFACT_ROOT = Path(
     os.getenv("CUSTOMER_PRICELIST_ARTIFACT_ROOT", "uploads/customer_pricelists")
 )
+# Потоковая загрузка прайсов поставщиков: xlsx читается пачками строк,
+# пачки сразу схлопываются до уникальных позиций, а в базу позиции
+# пишутся пачками того же размера. В памяти остаются только уникальные
+# позиции, без DataFrame и payload на весь файл (csv и xls читаются целиком).
+PROVIDER_PRICELIST_STREAMING_ENABLED = str(
+    os.getenv("PROVIDER_PRICELIST_STREAMING_ENABLED", "0")
+).strip().lower() in {"1", "true", "yes", "on"}
+PROVIDER_PRICELIST_STREAM_CHUNK_ROWS = max(
+    1000,
+    int(os.getenv("PROVIDER_PRICELIST_STREAM_CHUNK_ROWS", "20000")),
+)
+CSV_ENCODINGS = [
+    "utf-8-sig",
+    "utf-8",
+    "cp1251",
+    "windows-1251",
+    "koi8-r",
+    "cp866",
+    "latin1",
+]
+CSV_SEPARATORS = [",", ";", "\t", "|"]
 
 CUSTOMER_PRICELIST_PIPELINE_DEFAULT = [
     "source_filters",
@@ -351,23 +377,47 @@ def _build_customer_pricelist_attachment_bytes(
     return attachment_bytes
 
 
+def _deduplicate_pricelist_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Схлопывает дубли Бренд+Артикул (без учёта регистра и пробелов по краям).
+    Остаются текстовые поля первой строки, а цена, количество и кратность —
+    последней строки с минимальной ценой: при равной цене выигрывает
+    более поздняя строка файла. Порядок — по первому появлению позиции.
+    """
+    if df.empty:
+        return df.reset_index(drop=True)
+    df = df.reset_index(drop=True)
+    brand_key = (
+        df["brand"].astype(str).str.strip().str.lower()
+        if "brand" in df.columns
+        else pd.Series("", index=df.index)
+    )
+    oem_key = df["oem_number"].astype(str).str.strip().str.lower()
+    codes = (
+        pd.DataFrame({"brand": brand_key, "oem": oem_key})
+        .groupby(["brand", "oem"], sort=False)
+        .ngroup()
+        .to_numpy()
+    )
+    first_positions = np.flatnonzero(~pd.Series(codes).duplicated().to_numpy())
+    prices = df["price"].to_numpy(dtype=float)
+    min_prices = pd.Series(prices).groupby(codes).transform("min").to_numpy()
+    is_min = prices == min_prices
+    winner_positions = (
+        pd.Series(np.flatnonzero(is_min)).groupby(codes[is_min]).max().to_numpy()
+    )
+
+    result = df.iloc[first_positions].reset_index(drop=True)
+    for column in ("price", "quantity", "multiplicity"):
+        if column in df.columns:
+            result[column] = df[column].to_numpy()[winner_positions]
+    return result
+
+
 def deduplicate_autoparts_data(autoparts_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    unique_map = {}
-    for row in autoparts_data:
-        key = (
-            row.get("brand", "").strip().lower(),
-            row["oem_number"].strip().lower(),
-        )
-        if key not in unique_map:
-            unique_map[key] = copy.deepcopy(row)
-        else:
-            if unique_map[key]["price"] < row["price"]:
-                continue
-            unique_map[key]["quantity"] = row["quantity"]
-            unique_map[key]["price"] = row["price"]
-            if "multiplicity" in row:
-                unique_map[key]["multiplicity"] = row.get("multiplicity")
-    return list(unique_map.values())
+    if not autoparts_data:
+        return []
+    return _deduplicate_pricelist_frame(pd.DataFrame(autoparts_data)).to_dict(orient="records")
 
 
 def extract_first_file_from_archive(file_content: bytes) -> (str, bytes):
@@ -731,6 +781,93 @@ def _collapse_duplicate_rows(
     )
 
 
+def _orm_column_snapshot(obj) -> SimpleNamespace:
+    """
+    Копия колонок ORM-объекта без сессии и связей: её можно передать
+    в пул процессов, в отличие от самой модели.
+    """
+    return SimpleNamespace(
+        **{attr.key: getattr(obj, attr.key) for attr in sa_inspect(obj).mapper.column_attrs}
+    )
+
+
+def build_customer_pricelist_frame(
+    source_frames: list[dict[str, Any]],
+    config,
+    *,
+    overrides: dict[int, float] | None = None,
+    excluded_supplier_positions: dict | None = None,
+    prefer_min_price: bool = True,
+) -> tuple[pd.DataFrame, list[dict[str, Any]]]:
+    """
+    Pandas-ядро сборки прайса клиента: фильтры и наценки источников,
+    ручные цены, исключения и сворачивание дублей.
+
+    Функция чистая и выполняется в пуле процессов (run_cpu_bound), поэтому
+    принимает только сериализуемые данные: кадры источников и снимки
+    конфигурации/источников (_orm_column_snapshot). Элемент source_frames —
+    {"frame", "source", "pricelist_id", "dragonzap_mode"}; source=None
+    означает прайс, выбранный вручную (request.items), к нему применяется
+    общая наценка без фильтров источника.
+    """
+    combined_data = []
+    source_filter_summary: list[dict[str, Any]] = []
+    for job in source_frames:
+        df = job["frame"]
+        source = job.get("source")
+        if source is None:
+            combined_data.append(
+                crud_customer_pricelist.apply_coefficient(df, config, apply_general_markup=True)
+            )
+            continue
+
+        source_rows_before = len(df)
+        dragonzap_mode = job.get("dragonzap_mode") or "normal"
+        df = _apply_source_filters(df, source, dragonzap_mode=dragonzap_mode)
+        source_filter_summary.append(
+            {
+                "source_id": int(source.id),
+                "provider_config_id": int(source.provider_config_id),
+                "pricelist_id": int(job["pricelist_id"]),
+                "rows_before": source_rows_before,
+                "rows_after": len(df),
+                "excluded": max(source_rows_before - len(df), 0),
+                "transform_only": int(
+                    df.get("__transform_only", pd.Series(dtype=bool))
+                    .fillna(False)
+                    .astype(bool)
+                    .sum()
+                ),
+                "dragonzap_mode": dragonzap_mode,
+            }
+        )
+        if df.empty:
+            continue
+
+        df = crud_customer_pricelist.apply_coefficient(df, config, apply_general_markup=False)
+        df = _apply_source_markups(df, config, source)
+        combined_data.append(df)
+
+    if combined_data:
+        final_df = pd.concat(combined_data, ignore_index=True)
+    else:
+        final_df = pd.DataFrame()
+    if final_df.empty:
+        return final_df, source_filter_summary
+
+    if overrides:
+        final_df = apply_price_overrides(final_df, overrides)
+    for provider_id, excluded_autoparts in (excluded_supplier_positions or {}).items():
+        excluded_autoparts = [int(v) for v in (excluded_autoparts or []) if str(v).isdigit()]
+        final_df = position_exclude(
+            provider_id=provider_id,
+            excluded_autoparts=excluded_autoparts,
+            df=final_df,
+        )
+    final_df = _collapse_duplicate_rows(final_df, prefer_min_price=prefer_min_price)
+    return final_df, source_filter_summary
+
+
 def _collapse_duplicate_excel_rows(df_excel: pd.DataFrame) -> pd.DataFrame:
     if df_excel.empty:
         return df_excel
@@ -1029,6 +1166,22 @@ async def _build_dragonzap_cross_alias_records(
     for source_id, target_id in edge_rows:
         if source_id is not None and target_id is not None:
             union(int(source_id), int(target_id))
+    # Кластеры кроссов: DZ-члены одного кластера — взаимные кроссы.
+    cluster_rows = (
+        await session.execute(
+            select(
+                AutoPartCrossClusterMember.cluster_id,
+                AutoPartCrossClusterMember.autopart_id,
+            )
+            .join(AutoPart, AutoPart.id == AutoPartCrossClusterMember.autopart_id)
+            .join(Brand, Brand.id == AutoPart.brand_id)
+            .where(func.upper(Brand.name) == "DRAGONZAP")
+        )
+    ).all()
+    cluster_anchor: dict[int, int] = {}
+    for cluster_id, autopart_id in cluster_rows:
+        anchor = cluster_anchor.setdefault(int(cluster_id), int(autopart_id))
+        union(anchor, int(autopart_id))
     for seed_id in seed_ids:
         find(seed_id)
 
@@ -1302,18 +1455,8 @@ def _sync_dragonzap_alias_prices(
 
 
 def open_csv(file: bytes) -> pd.DataFrame:
-    encodings = [
-        "utf-8-sig",
-        "utf-8",
-        "cp1251",
-        "windows-1251",
-        "koi8-r",
-        "cp866",
-        "latin1",
-    ]
-    separators = [",", ";", "\t", "|"]
-    for encoding in encodings:
-        for sep in separators:
+    for encoding in CSV_ENCODINGS:
+        for sep in CSV_SEPARATORS:
             try:
                 df = pd.read_csv(
                     BytesIO(file),
@@ -1372,19 +1515,82 @@ def process_download_pricelist(file_extension: str, file_content: bytes) -> pd.D
         raise HTTPException(status_code=400, detail=f"Invalid format file:{e}")
 
 
-def _prepare_pricelist_data(
+def _excel_cell_value(value: Any) -> Any:
+    # Те же преобразования, что делает pandas.read_excel для openpyxl.
+    if value is None or value == "":
+        return None
+    if isinstance(value, str) and value in ERROR_CODES:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _iter_xlsx_frames(file_content: bytes, chunk_rows: int):
+    workbook = load_workbook(
+        BytesIO(file_content),
+        read_only=True,
+        data_only=True,
+        keep_links=False,
+    )
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()
+        rows: list[tuple] = []
+        for row in sheet.iter_rows(values_only=True):
+            rows.append(tuple(_excel_cell_value(value) for value in row))
+            if len(rows) >= chunk_rows:
+                yield pd.DataFrame(rows, dtype=object)
+                rows = []
+        if rows:
+            yield pd.DataFrame(rows, dtype=object)
+    finally:
+        workbook.close()
+
+
+def iter_pricelist_frames(
     file_extension: str,
     file_content: bytes,
-    start_row: int,
+    chunk_rows: int | None = None,
+):
+    """
+    Потоковый аналог process_download_pricelist: отдаёт сырые DataFrame
+    по chunk_rows строк (колонки — номера, как при header=None).
+    xlsx читается openpyxl в read-only режиме; csv и старый xls
+    (не больше 65к строк) читаются целиком и режутся на пачки.
+    """
+    chunk_rows = chunk_rows or PROVIDER_PRICELIST_STREAM_CHUNK_ROWS
+    if file_extension in ["zip", "rar"]:
+        file_extension, file_content = extract_first_file_from_archive(file_content)
+        logger.debug(f"Extracted file extension: {file_extension}")
+
+    if file_extension == "xlsx":
+        yield from _iter_xlsx_frames(file_content, chunk_rows)
+    elif file_extension == "xls":
+        df = pd.read_excel(BytesIO(file_content), header=None, engine="xlrd")
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start: start + chunk_rows]
+    elif file_extension == "csv":
+        # csv разбирается целиком через open_csv: типы колонок pandas
+        # выводит по всему файлу, как в обычной загрузке (0123 -> 123).
+        df = open_csv(file_content)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start: start + chunk_rows]
+    else:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type: {file_extension}",
+        )
+
+
+def _pricelist_columns(
     oem_col: int,
     brand_col: Optional[int],
     name_col: Optional[int],
     multiplicity_col: Optional[int],
     qty_col: int,
     price_col: int,
-):
-    df = process_download_pricelist(file_extension=file_extension, file_content=file_content)
-    data_df = df.iloc[start_row:]
+) -> dict[str, int]:
     required_columns = {
         "oem_number": oem_col,
         "brand": brand_col,
@@ -1393,12 +1599,10 @@ def _prepare_pricelist_data(
         "quantity": qty_col,
         "price": price_col,
     }
-    required_columns = {k: v for k, v in required_columns.items() if v is not None}
+    return {k: v for k, v in required_columns.items() if v is not None}
 
-    data_df = data_df.loc[:, list(required_columns.values())]
-    data_df.columns = list(required_columns.keys())
 
-    total_rows = len(data_df)
+def _clean_pricelist_frame(data_df: pd.DataFrame) -> pd.DataFrame:
     data_df.dropna(subset=["oem_number", "quantity", "price"], inplace=True)
     data_df["oem_number"] = (
         data_df["oem_number"].astype(str).str.strip().apply(preprocess_oem_number)
@@ -1442,23 +1646,158 @@ def _prepare_pricelist_data(
     logger.debug(
         f"Removed {before_count - after_count} " f"rows due to exceeding price {MAX_PRICE}"
     )
-    data_df = data_df[data_df["price"] >= 0]
+    return data_df[data_df["price"] >= 0]
+
+
+def _prepare_pricelist_data(
+    file_extension: str,
+    file_content: bytes,
+    start_row: int,
+    oem_col: int,
+    brand_col: Optional[int],
+    name_col: Optional[int],
+    multiplicity_col: Optional[int],
+    qty_col: int,
+    price_col: int,
+    provider_filters: dict | None = None,
+):
+    df = process_download_pricelist(file_extension=file_extension, file_content=file_content)
+    data_df = df.iloc[start_row:]
+    required_columns = _pricelist_columns(
+        oem_col, brand_col, name_col, multiplicity_col, qty_col, price_col
+    )
+
+    data_df = data_df.loc[:, list(required_columns.values())]
+    data_df.columns = list(required_columns.keys())
+
+    total_rows = len(data_df)
+    data_df = _clean_pricelist_frame(data_df)
     clean_rows = len(data_df)
 
-    autoparts_data = data_df.to_dict(orient="records")
-    deduplicated_data = deduplicate_autoparts_data(autoparts_data)
-    dedup_rows = len(deduplicated_data)
-    del autoparts_data
-    del data_df
+    data_df = _deduplicate_pricelist_frame(data_df)
+    return _finish_prepared_pricelist(data_df, total_rows, clean_rows, provider_filters)
 
+
+def _finish_prepared_pricelist(
+    data_df: pd.DataFrame,
+    total_rows: int,
+    clean_rows: int,
+    provider_filters: dict | None,
+):
+    """Фильтры конфигурации поставщика и переход от DataFrame к строкам."""
+    dedup_rows = len(data_df)
+    data_df = _apply_provider_filters(data_df, provider_filters)
     stats = {
         "rows_total": int(total_rows),
         "rows_clean": int(clean_rows),
         "rows_deduplicated": int(dedup_rows),
         "rows_removed": int(max(total_rows - clean_rows, 0)),
         "rows_dedup_removed": int(max(clean_rows - dedup_rows, 0)),
+        "rows_after_filters": int(len(data_df)),
     }
-    return deduplicated_data, stats
+    return data_df.to_dict(orient="records"), stats
+
+
+def iter_prepared_pricelist_chunks(
+    file_extension: str,
+    file_content: bytes,
+    start_row: int,
+    oem_col: int,
+    brand_col: Optional[int],
+    name_col: Optional[int],
+    multiplicity_col: Optional[int],
+    qty_col: int,
+    price_col: int,
+    chunk_rows: int | None = None,
+):
+    """
+    Читает файл пачками и отдаёт очищенный DataFrame каждой пачки
+    вместе со счётчиками rows_total/rows_clean. Дубли не схлопываются:
+    это делает _prepare_streamed_pricelist_data по всему файлу.
+    """
+    required_columns = _pricelist_columns(
+        oem_col, brand_col, name_col, multiplicity_col, qty_col, price_col
+    )
+    column_indexes = list(required_columns.values())
+    offset = 0
+    columns_checked = False
+    for raw_df in iter_pricelist_frames(file_extension, file_content, chunk_rows):
+        chunk_len = len(raw_df)
+        skip = max(start_row - offset, 0)
+        offset += chunk_len
+        if skip >= chunk_len:
+            continue
+        if not columns_checked:
+            for column_index in column_indexes:
+                if column_index not in raw_df.columns:
+                    raise KeyError(column_index)
+            columns_checked = True
+        data_df = raw_df.iloc[skip:].reindex(columns=column_indexes)
+        data_df.columns = list(required_columns.keys())
+        total_rows = len(data_df)
+        data_df = _clean_pricelist_frame(data_df)
+        yield data_df, {
+            "rows_total": int(total_rows),
+            "rows_clean": int(len(data_df)),
+        }
+
+
+def _prepare_streamed_pricelist_data(
+    file_extension: str,
+    file_content: bytes,
+    start_row: int,
+    oem_col: int,
+    brand_col: Optional[int],
+    name_col: Optional[int],
+    multiplicity_col: Optional[int],
+    qty_col: int,
+    price_col: int,
+    chunk_rows: int | None = None,
+    provider_filters: dict | None = None,
+):
+    """
+    Потоковый аналог _prepare_pricelist_data с тем же результатом:
+    пачки сразу схлопываются и копятся уже без дублей, поэтому в памяти
+    нет сырого DataFrame на весь файл. Накопленное пересхлопывается,
+    когда хвост пачек догоняет его по размеру, — это сохраняет правило
+    «первая строка + последняя минимальная цена» между пачками.
+    """
+    unique_df = pd.DataFrame()
+    pending: list[pd.DataFrame] = []
+    pending_rows = 0
+    total_rows = 0
+    clean_rows = 0
+    for chunk_df, chunk_stats in iter_prepared_pricelist_chunks(
+        file_extension,
+        file_content,
+        start_row,
+        oem_col,
+        brand_col,
+        name_col,
+        multiplicity_col,
+        qty_col,
+        price_col,
+        chunk_rows=chunk_rows,
+    ):
+        total_rows += chunk_stats["rows_total"]
+        clean_rows += chunk_stats["rows_clean"]
+        if chunk_df.empty:
+            continue
+        chunk_df = _deduplicate_pricelist_frame(chunk_df)
+        pending.append(chunk_df)
+        pending_rows += len(chunk_df)
+        if pending_rows >= len(unique_df):
+            unique_df = _deduplicate_pricelist_frame(
+                pd.concat([unique_df, *pending] if len(unique_df) else pending)
+            )
+            pending = []
+            pending_rows = 0
+    if pending:
+        unique_df = _deduplicate_pricelist_frame(
+            pd.concat([unique_df, *pending] if len(unique_df) else pending)
+        )
+    del pending
+    return _finish_prepared_pricelist(unique_df, total_rows, clean_rows, provider_filters)
 
 
 def _normalize_exclude_positions(exclude_positions):
@@ -1475,44 +1814,55 @@ def _normalize_exclude_positions(exclude_positions):
     return normalized
 
 
-def _apply_provider_filters(items, provider_list_conf):
-    if not items:
-        return items
-    min_price = provider_list_conf.min_price
-    max_price = provider_list_conf.max_price
-    min_quantity = provider_list_conf.min_quantity
-    max_quantity = provider_list_conf.max_quantity
-    exclude_positions = _normalize_exclude_positions(provider_list_conf.exclude_positions)
-
-    filtered = []
-    removed = 0
-    for item in items:
-        price = float(item.get("price", 0))
-        quantity = int(item.get("quantity", 0))
-        brand = str(item.get("brand", "")).strip().upper()
-        oem = str(item.get("oem_number", "")).strip().upper()
+def _provider_filter_settings(provider_list_conf) -> dict:
+    """Снимок фильтров конфигурации для подготовки прайса в потоке."""
+    return {
+        "min_price": provider_list_conf.min_price,
+        "max_price": provider_list_conf.max_price,
+        "min_quantity": provider_list_conf.min_quantity,
+        "max_quantity": provider_list_conf.max_quantity,
+        "exclude_positions": _normalize_exclude_positions(
+            provider_list_conf.exclude_positions
+        ),
+    }
 
-        if min_price is not None and price < min_price:
-            removed += 1
-            continue
-        if max_price is not None and price > max_price:
-            removed += 1
-            continue
-        if min_quantity is not None and quantity < min_quantity:
-            removed += 1
-            continue
-        if max_quantity is not None and quantity > max_quantity:
-            removed += 1
-            continue
-        if exclude_positions and (brand, oem) in exclude_positions:
-            removed += 1
-            continue
 
-        filtered.append(item)
+def _apply_provider_filters(df: pd.DataFrame, provider_filters: dict | None) -> pd.DataFrame:
+    if df.empty or not provider_filters:
+        return df
+    min_price = provider_filters.get("min_price")
+    max_price = provider_filters.get("max_price")
+    min_quantity = provider_filters.get("min_quantity")
+    max_quantity = provider_filters.get("max_quantity")
+    exclude_positions = provider_filters.get("exclude_positions")
+
+    price = df["price"].astype(float)
+    # Количество сравнивается целой частью, как int() в ручной загрузке.
+    quantity = np.trunc(df["quantity"].astype(float))
+    keep = pd.Series(True, index=df.index)
+    if min_price is not None:
+        keep &= price >= float(min_price)
+    if max_price is not None:
+        keep &= price <= float(max_price)
+    if min_quantity is not None:
+        keep &= quantity >= int(min_quantity)
+    if max_quantity is not None:
+        keep &= quantity <= int(max_quantity)
+    if exclude_positions and "brand" in df.columns:
+        # Anti-join по ключу (БРЕНД, АРТИКУЛ) против списка исключений.
+        position_keys = pd.MultiIndex.from_arrays(
+            [
+                df["brand"].astype(str).str.strip().str.upper(),
+                df["oem_number"].astype(str).str.strip().str.upper(),
+            ]
+        )
+        keep &= ~position_keys.isin(list(exclude_positions))
 
+    removed = int((~keep).sum())
     if removed:
         logger.debug(f"Removed {removed} items by provider filters")
-    return filtered
+        return df[keep.to_numpy()].reset_index(drop=True)
+    return df
 
 
 def parse_exclude_positions_file(file_extension, file_content):
@@ -1536,6 +1886,32 @@ def parse_exclude_positions_file(file_extension, file_content):
     return items
 
 
+def _build_pricelist_payload_row(item: dict) -> dict:
+    try:
+        return {
+            "autopart": {
+                "oem_number": item["oem_number"],
+                "brand": item.get("brand"),
+                "name": item.get("name"),
+            },
+            "quantity": int(item["quantity"]),
+            "price": float(item["price"]),
+            "multiplicity": int(item.get("multiplicity") or 1),
+        }
+    except KeyError as ke:
+        logger.error(f"Missing key in item: {ke}")
+        raise HTTPException(status_code=400, detail=f"Missing key in item: {ke}")
+
+
+async def _iter_pricelist_payload_chunks(items: list[dict], chunk_rows: int):
+    # payload строится по пачке, а не сразу на весь прайс
+    for start in range(0, len(items), chunk_rows):
+        yield [
+            _build_pricelist_payload_row(item)
+            for item in items[start: start + chunk_rows]
+        ]
+
+
 async def process_provider_pricelist(
     provider: Provider,
     file_content: bytes,
@@ -1554,6 +1930,7 @@ async def process_provider_pricelist(
     include_autoparts_response: bool = True,
     enforce_anomaly_guard: bool = True,
     source_filename: str | None = None,
+    streaming: bool | None = None,
 ):
     logger.debug(
         f"Зашли в process_provider_pricelist "
@@ -1563,6 +1940,8 @@ async def process_provider_pricelist(
     )
     if not provider_list_conf:
         raise HTTPException(status_code=404, detail="Configuration not transferred")
+    if streaming is None:
+        streaming = PROVIDER_PRICELIST_STREAMING_ENABLED
 
     if session.get_bind().dialect.name == "postgresql":
         lock_key = 4_450_000_000 + int(provider_list_conf.id)
@@ -1593,18 +1972,26 @@ async def process_provider_pricelist(
         if None in (start_row, oem_col, qty_col, price_col):
             raise HTTPException(status_code=400, detail="Missing required parameters.")
 
+    read_params = {
+        "file_extension": file_extension,
+        "file_content": file_content,
+        "start_row": start_row,
+        "oem_col": oem_col,
+        "brand_col": brand_col,
+        "name_col": name_col,
+        "multiplicity_col": multiplicity_col,
+        "qty_col": qty_col,
+        "price_col": price_col,
+    }
+
+    prepare_pricelist_data = (
+        _prepare_streamed_pricelist_data if streaming else _prepare_pricelist_data
+    )
     try:
         deduplicated_data, stats = await asyncio.to_thread(
-            _prepare_pricelist_data,
-            file_extension,
-            file_content,
-            start_row,
-            oem_col,
-            brand_col,
-            name_col,
-            multiplicity_col,
-            qty_col,
-            price_col,
+            prepare_pricelist_data,
+            **read_params,
+            provider_filters=_provider_filter_settings(provider_list_conf),
         )
     except KeyError as e:
         raise HTTPException(status_code=422, detail=f"Invalid column indices provided: {e}")
@@ -1612,13 +1999,11 @@ async def process_provider_pricelist(
         logger.error(f"Error during data cleaning: {e}")
         raise HTTPException(status_code=400, detail="Error during data cleaning.")
 
-    deduplicated_data = _apply_provider_filters(deduplicated_data, provider_list_conf)
-    stats["rows_after_filters"] = int(len(deduplicated_data))
     logger.info(
         "Prepared provider pricelist payload: provider_id=%s "
         "config_id=%s rows_total=%s rows_clean=%s "
         "rows_deduplicated=%s rows_removed=%s "
-        "rows_dedup_removed=%s rows_after_filters=%s",
+        "rows_dedup_removed=%s rows_after_filters=%s streaming=%s",
         provider.id,
         provider_list_conf.id,
         stats.get("rows_total"),
@@ -1627,6 +2012,7 @@ async def process_provider_pricelist(
         stats.get("rows_removed"),
         stats.get("rows_dedup_removed"),
         stats.get("rows_after_filters"),
+        streaming,
     )
 
     if enforce_anomaly_guard:
@@ -1655,36 +2041,33 @@ async def process_provider_pricelist(
         autoparts=[],
     )
 
-    # Передаём строки прайса обычными dict-ами: построение и валидация
-    # десятков тысяч вложенных pydantic-моделей с последующим model_dump()
-    # занимали десятки секунд CPU прямо в event loop.
-    autoparts_payload: list[dict] = []
-    for item in deduplicated_data:
-        try:
-            autoparts_payload.append(
-                {
-                    "autopart": {
-                        "oem_number": item["oem_number"],
-                        "brand": item.get("brand"),
-                        "name": item.get("name"),
-                    },
-                    "quantity": int(item["quantity"]),
-                    "price": float(item["price"]),
-                    "multiplicity": int(item.get("multiplicity") or 1),
-                }
+    try:
+        if streaming:
+            # Ответ со всеми позициями собрал бы в памяти весь прайс,
+            # поэтому потоковая загрузка его не строит.
+            pricelist = await crud_pricelist.create_from_chunks(
+                obj_in=pricelist_in,
+                session=session,
+                chunks=_iter_pricelist_payload_chunks(
+                    deduplicated_data, PROVIDER_PRICELIST_STREAM_CHUNK_ROWS
+                ),
+                include_autoparts_response=False,
             )
-        except KeyError as ke:
-            logger.error(f"Missing key in item: {ke}")
-            raise HTTPException(status_code=400, detail=f"Missing key in item: {ke}")
+        else:
+            # Передаём строки прайса обычными dict-ами: построение и валидация
+            # десятков тысяч вложенных pydantic-моделей с последующим model_dump()
+            # занимали десятки секунд CPU прямо в event loop.
+            autoparts_payload = [
+                _build_pricelist_payload_row(item) for item in deduplicated_data
+            ]
+            pricelist = await crud_pricelist.create(
+                obj_in=pricelist_in,
+                session=session,
+                include_autoparts_response=include_autoparts_response,
+                autoparts_payload=autoparts_payload,
+            )
+            del autoparts_payload
 
-    # Create the price list
-    try:
-        pricelist = await crud_pricelist.create(
-            obj_in=pricelist_in,
-            session=session,
-            include_autoparts_response=include_autoparts_response,
-            autoparts_payload=autoparts_payload,
-        )
         await handle_provider_pricelist_watch(
             session=session,
             provider=provider,
@@ -1692,10 +2075,15 @@ async def process_provider_pricelist(
             pricelist_id=pricelist.id,
             items=deduplicated_data,
         )
-        # Получили Pydantic-ответ с .id
-        created_id = pricelist.id
-        # А теперь достаём полноценный ORM-объект (со всеми relationships)
-        pl_orm = await crud_pricelist.get(session=session, obj_id=created_id)
+        # analyze_new_pricelist нужны только поставщик и конфигурация:
+        # позиции прайса (selectin в crud_pricelist.get) не загружаем.
+        pl_orm = (
+            await session.execute(
+                select(PriceList)
+                .options(selectinload(PriceList.provider))
+                .where(PriceList.id == pricelist.id)
+            )
+        ).scalar_one()
 
         await analyze_new_pricelist(pl_orm, session=session)
         if return_stats:
@@ -2404,7 +2792,6 @@ async def process_customer_pricelist(
     if delivery_mode not in {"auto", "draft", "send"}:
         raise ValueError("delivery_mode must be auto, draft or send")
 
-    combined_data = []
     dz_expand_enabled = False
     pipeline_v2 = _customer_pricelist_v2_enabled(config)
     pipeline_order = customer_pricelist_pipeline(config)
@@ -2412,21 +2799,15 @@ async def process_customer_pricelist(
         _customer_pricelist_setting(config, "DZ_ORIGINAL_TRANSFORM_ENABLED", False)
     )
     source_pricelist_ids: list[int] = []
-    source_filter_summary: list[dict[str, Any]] = []
+    source_frames: list[dict[str, Any]] = []
 
     if request.items:
         for pricelist_id in request.items:
-            associations = await crud_pricelist.fetch_pricelist_data(pricelist_id, session)
-            if not associations:
+            df = await crud_pricelist.get_pricelist_frame(pricelist_id, session)
+            if df.empty:
                 continue
-
-            df = await crud_pricelist.transform_to_dataframe(
-                associations=associations, session=session
-            )
             logger.debug(_dataframe_summary(df, "customer_pricelist_source_df"))
-
-            df = crud_customer_pricelist.apply_coefficient(df, config, apply_general_markup=True)
-            combined_data.append(df)
+            source_frames.append({"frame": df, "source": None, "pricelist_id": pricelist_id})
     else:
         sources = await crud_customer_pricelist_source.get_by_config_id(
             config_id=config.id, session=session
@@ -2449,85 +2830,48 @@ async def process_customer_pricelist(
             if not latest_pl:
                 continue
 
-            associations = await crud_pricelist.fetch_pricelist_data(latest_pl.id, session)
-            if not associations:
+            # Кадр источника общий для всех клиентов с этим поставщиком.
+            df = await crud_pricelist.get_pricelist_frame(latest_pl.id, session)
+            if df.empty:
                 continue
             source_pricelist_ids.append(int(latest_pl.id))
-
-            df = await crud_pricelist.transform_to_dataframe(
-                associations=associations, session=session
-            )
             logger.debug(_dataframe_summary(df, "customer_pricelist_latest_df"))
 
-            source_rows_before = len(df)
             source_settings = source.additional_filters or {}
             dragonzap_mode = str(source_settings.get("DRAGONZAP_MODE") or "").strip().lower()
             if pipeline_v2 and transform_enabled and not dragonzap_mode:
                 dragonzap_mode = "auto"
-            df = _apply_source_filters(
-                df,
-                source,
-                dragonzap_mode=dragonzap_mode or "normal",
-            )
-            source_filter_summary.append(
+            source_frames.append(
                 {
-                    "source_id": int(source.id),
-                    "provider_config_id": int(source.provider_config_id),
+                    "frame": df,
+                    "source": _orm_column_snapshot(source),
                     "pricelist_id": int(latest_pl.id),
-                    "rows_before": source_rows_before,
-                    "rows_after": len(df),
-                    "excluded": max(source_rows_before - len(df), 0),
-                    "transform_only": int(
-                        df.get("__transform_only", pd.Series(dtype=bool))
-                        .fillna(False)
-                        .astype(bool)
-                        .sum()
-                    ),
                     "dragonzap_mode": dragonzap_mode or "normal",
                 }
             )
-            if df.empty:
-                continue
 
-            df = crud_customer_pricelist.apply_coefficient(df, config, apply_general_markup=False)
-            df = _apply_source_markups(df, config, source)
-            combined_data.append(df)
-
-    if combined_data:
-        final_df = pd.concat(combined_data, ignore_index=True)
-    else:
-        final_df = pd.DataFrame()
-
-    logger.debug(_dataframe_summary(final_df, "customer_pricelist_final_df"))
-    if not final_df.empty:
-        overrides = await crud_customer_pricelist_override.get_for_config(
+    overrides = (
+        await crud_customer_pricelist_override.get_for_config(
             session=session, config_id=config.id
         )
-        if overrides:
-            final_df = apply_price_overrides(final_df, overrides)
-    # Apply exclusions
+        if source_frames
+        else {}
+    )
+    # Фильтры, наценки и сворачивание дублей — чистый pandas. В потоке
+    # они держали GIL и тормозили весь процесс, поэтому считаем в пуле
+    # процессов; запросы к БД остаются в event loop.
+    final_df, source_filter_summary = await run_cpu_bound(
+        build_customer_pricelist_frame,
+        source_frames,
+        _orm_column_snapshot(config),
+        overrides=overrides,
+        excluded_supplier_positions=request.excluded_supplier_positions,
+        prefer_min_price=bool(getattr(config, "collapse_duplicates_by_min_price", True)),
+    )
+    del source_frames
+    logger.debug(_dataframe_summary(final_df, "customer_pricelist_final_df"))
 
     if not final_df.empty:
-        if request.excluded_supplier_positions:
-            for (
-                provider_id,
-                excluded_autoparts,
-            ) in request.excluded_supplier_positions.items():
-                excluded_autoparts = [
-                    int(v) for v in (excluded_autoparts or []) if str(v).isdigit()
-                ]
-                final_df = position_exclude(
-                    provider_id=provider_id,
-                    excluded_autoparts=excluded_autoparts,
-                    df=final_df,
-                )
-        # Сворачивание дубликатов на больших прайсах — чистый CPU (pandas),
-        # выносим из event loop.
-        final_df = await asyncio.to_thread(
-            _collapse_duplicate_rows,
-            final_df,
-            prefer_min_price=bool(getattr(config, "collapse_duplicates_by_min_price", True)),
-        )
         if pipeline_v2:
             physical_records = final_df.to_dict("records")
             direct_output_records = [dict(row) for row in physical_records]
@@ -2591,7 +2935,8 @@ async def process_customer_pricelist(
                     and "before" in price_control_stages
                 ):
                     direct_output_records, price_changes["before"] = (
-                        _apply_benchmark_floor_records(
+                        await run_cpu_bound(
+                            _apply_benchmark_floor_records,
                             direct_output_records,
                             benchmark_prices,
                             multiplier=price_multiplier,
@@ -2612,12 +2957,15 @@ async def process_customer_pricelist(
                         row["__row_type"] = "automatic_cross"
                         row["__origin_type"] = "dragonzap_source"
                 elif pipeline_step == "dragonzap_transform" and transform_enabled:
-                    direct_output_records = _transform_dragonzap_records(
+                    direct_output_records = await run_cpu_bound(
+                        _transform_dragonzap_records,
                         direct_output_records,
                         keep_source=keep_dragonzap,
                     )
                     transformed_crosses = (
-                        _transform_dragonzap_records(raw_cross_records, keep_source=False)
+                        await run_cpu_bound(
+                            _transform_dragonzap_records, raw_cross_records, keep_source=False
+                        )
                         if transform_crosses
                         else []
                     )
@@ -2648,11 +2996,13 @@ async def process_customer_pricelist(
                             )
                         ),
                     }
-                    direct_output_records = _apply_product_labels(
+                    direct_output_records = await run_cpu_bound(
+                        _apply_product_labels,
                         direct_output_records,
                         **label_kwargs,
                     )
-                    dragonzap_alias_records = _apply_product_labels(
+                    dragonzap_alias_records = await run_cpu_bound(
+                        _apply_product_labels,
                         dragonzap_alias_records,
                         **label_kwargs,
                     )
@@ -2661,14 +3011,16 @@ async def process_customer_pricelist(
                     and price_control_enabled
                     and "after" in price_control_stages
                 ):
-                    direct_output_records, direct_changed = _apply_benchmark_floor_records(
+                    direct_output_records, direct_changed = await run_cpu_bound(
+                        _apply_benchmark_floor_records,
                         direct_output_records,
                         benchmark_prices,
                         multiplier=price_multiplier,
                         rounding_step=price_rounding,
                         stage="after",
                     )
-                    dragonzap_alias_records, alias_changed = _apply_benchmark_floor_records(
+                    dragonzap_alias_records, alias_changed = await run_cpu_bound(
+                        _apply_benchmark_floor_records,
                         dragonzap_alias_records,
                         benchmark_prices,
                         multiplier=price_multiplier,
@@ -2693,7 +3045,7 @@ async def process_customer_pricelist(
                         *({**row, "__output_group": "direct"} for row in direct_output_records),
                         *({**row, "__output_group": "alias"} for row in dragonzap_alias_records),
                     ]
-                    combined_output = _collapse_output_records(combined_output)
+                    combined_output = await run_cpu_bound(_collapse_output_records, combined_output)
                     direct_output_records = [
                         row for row in combined_output if row.get("__output_group") == "direct"
                     ]
@@ -2848,12 +3200,9 @@ async def process_customer_pricelist(
             benchmark_pricelist_id = pricelist_ids[-1]
         else:
             benchmark_pricelist_id = benchmark_pricelist.id
-        benchmark_associations = await crud_pricelist.fetch_pricelist_data(
+        df_diller = await crud_pricelist.get_pricelist_frame(
             benchmark_pricelist_id, session
         )
-        df_diller = await crud_pricelist.transform_to_dataframe(
-            associations=benchmark_associations, session=session
-        )
         logger.debug(_dataframe_summary(df_diller, "zzap_diller_df"))
         df_diller_rename = df_diller.rename(
             columns={
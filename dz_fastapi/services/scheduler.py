@@ -19,6 +19,7 @@ from dz_fastapi.core.constants import (
     CONFIG_DATA_PROVIDER,
     CUSTOMER,
     CUSTOMER_IN,
+    PRICE_HISTORY_RETENTION_DAYS,
     PROVIDER_IN,
 )
 from dz_fastapi.core.scheduler_settings import SCHEDULER_SETTING_DEFAULTS
@@ -70,6 +71,7 @@ from dz_fastapi.services.diadoc_documents import sync_diadoc_incoming_documents
 from dz_fastapi.services.diadoc_integration import get_diadoc_client_for_session
 from dz_fastapi.services.diadoc_status import refresh_diadoc_outgoing_statuses
 from dz_fastapi.services.email import get_emails
+from dz_fastapi.services.imap_pool import IMAP_POOL_KEEPALIVE_SEC, keepalive_imap_pool
 from dz_fastapi.services.inbox_email import cleanup_inbox_emails, fetch_and_store_emails
 from dz_fastapi.services.monitoring import (
     build_snapshot_payload,
@@ -202,6 +204,10 @@ DIADOC_OUTBOUND_STATUS_MINUTES = _env_int_with_min(
 PRICE_PROVIDER_PROCESS_PARALLELISM = _env_int_with_min(
     "PRICE_PROVIDER_PROCESS_PARALLELISM", 1, min_value=1, max_value=4
 )
+# Сколько клиентских прайсов по расписанию формируется одновременно.
+CUSTOMER_PRICELIST_SEND_PARALLELISM = _env_int_with_min(
+    "CUSTOMER_PRICELIST_SEND_PARALLELISM", 2, min_value=1, max_value=8
+)
 AUTOPURCHASE_QUEUE_POLL_SECONDS = _env_int_with_min(
     "AUTOPURCHASE_QUEUE_POLL_SECONDS", 15, min_value=5, max_value=300
 )
@@ -1019,6 +1025,16 @@ def start_scheduler(app: FastAPI):
         replace_existing=True,
     )
 
+    # Пул IMAP-соединений: NOOP по простаивающим, закрытие мёртвых.
+    scheduler.add_job(
+        func=keepalive_imap_pool_task,
+        trigger="interval",
+        id="imap_pool_keepalive",
+        name="Keep pooled IMAP connections alive",
+        seconds=IMAP_POOL_KEEPALIVE_SEC,
+        replace_existing=True,
+    )
+
     scheduler.start()
     logger.info("Scheduler started.")
     return scheduler
@@ -1920,6 +1936,139 @@ async def _mark_scheduler_ran(session: AsyncSession, setting, when: datetime) ->
     await session.commit()
 
 
+async def _send_pending_customer_pricelists(
+    async_session_factory,
+    pending: list[tuple],
+    trace,
+) -> None:
+    """
+    Формирует и отправляет прайсы по конфигам из pending, не больше
+    CUSTOMER_PRICELIST_SEND_PARALLELISM одновременно. Конфиги независимы:
+    у каждого своя сессия, а общие кадры прайсов поставщиков берутся из
+    кэша процесса. Время каждого конфига пишется в trace.details.
+    """
+    success_count = 0
+    error_count = 0
+    memory_samples = []
+    config_timings = []
+    skipped_for_memory = []
+    stopped_for_memory = False
+    sem = asyncio.Semaphore(CUSTOMER_PRICELIST_SEND_PARALLELISM)
+    started_at = time.perf_counter()
+
+    async def _send_one(config_id: int, customer) -> None:
+        nonlocal success_count, error_count, stopped_for_memory
+        async with sem:
+            if stopped_for_memory:
+                skipped_for_memory.append(config_id)
+                return
+            rss_before = process_rss_mb()
+            config_started_at = time.perf_counter()
+            status = "success"
+            request = CustomerPriceListCreate(
+                customer_id=customer.id,
+                config_id=config_id,
+                items=[],
+            )
+            try:
+                async with async_session_factory() as session:
+                    await process_customer_pricelist(
+                        customer=customer,
+                        request=request,
+                        session=session,
+                        include_autoparts_response=False,
+                    )
+                success_count += 1
+            except Exception as exc:
+                status = "error"
+                error_count += 1
+                logger.error(
+                    "Error in send_scheduled_customer_pricelists_task " "for config %s: %s",
+                    config_id,
+                    exc,
+                    exc_info=True,
+                )
+                try:
+                    async with async_session_factory() as err_session:
+                        await _notify_scheduler_issue(
+                            err_session,
+                            subject="Ошибка регламента отправки прайсов клиентам",
+                            text=(
+                                "Ошибка при автоматической отправке прайса "
+                                f"клиенту для config_id={config_id}.\n"
+                                f"Текст ошибки: {exc}"
+                            ),
+                        )
+                except Exception as notify_exc:
+                    logger.error(
+                        "Failed to send error notification for config %s: %s",
+                        config_id,
+                        notify_exc,
+                    )
+            finally:
+                config_timings.append(
+                    {
+                        "config_id": config_id,
+                        "status": status,
+                        "started_offset_seconds": round(
+                            config_started_at - started_at, 3
+                        ),
+                        "seconds": round(time.perf_counter() - config_started_at, 3),
+                    }
+                )
+                trim_process_memory(
+                    logger,
+                    context=("send_scheduled_customer_pricelists_task " f"config_id={config_id}"),
+                )
+                rss_after = process_rss_mb()
+                memory_samples.append(
+                    {
+                        "config_id": config_id,
+                        "rss_before_mb": (round(rss_before, 1) if rss_before is not None else None),
+                        "rss_after_mb": (round(rss_after, 1) if rss_after is not None else None),
+                    }
+                )
+            if (
+                rss_after is not None
+                and rss_after >= CUSTOMER_PRICELIST_RSS_SOFT_LIMIT_MB
+                and not stopped_for_memory
+            ):
+                stopped_for_memory = True
+                trace.details["__trace_status"] = "error"
+                trace.details["error"] = (
+                    "Остановлена очередь клиентских прайсов: RSS scheduler "
+                    f"{rss_after:.1f} MB достиг безопасного лимита "
+                    f"{CUSTOMER_PRICELIST_RSS_SOFT_LIMIT_MB} MB."
+                )
+                logger.critical(trace.details["error"])
+                try:
+                    async with async_session_factory() as err_session:
+                        await _notify_scheduler_issue(
+                            err_session,
+                            subject=("Остановлена рассылка прайсов: высокая память"),
+                            text=trace.details["error"],
+                        )
+                except Exception as notify_exc:
+                    logger.error(
+                        "Failed to notify about customer pricelist memory " "limit: %s",
+                        notify_exc,
+                    )
+
+    await asyncio.gather(
+        *(_send_one(config_id, customer) for config_id, customer in pending)
+    )
+    trace.details["parallelism"] = CUSTOMER_PRICELIST_SEND_PARALLELISM
+    trace.details["elapsed_seconds"] = round(time.perf_counter() - started_at, 3)
+    trace.details["config_timings"] = config_timings
+    trace.details["success_count"] = success_count
+    trace.details["error_count"] = error_count
+    trace.details["memory_samples"] = memory_samples
+    trace.details["stopped_for_memory"] = stopped_for_memory
+    trace.details["skipped_for_memory"] = skipped_for_memory
+    if error_count > 0:
+        trace.details["__trace_status"] = "error"
+
+
 async def send_scheduled_customer_pricelists_task(app: FastAPI):
     """
     Проверяет расписания customer pricelist configs и отправляет,
@@ -2009,92 +2158,7 @@ async def send_scheduled_customer_pricelists_task(app: FastAPI):
                 )
             return
 
-        success_count = 0
-        error_count = 0
-        memory_samples = []
-        stopped_for_memory = False
-        for config_id, customer in pending:
-            rss_before = process_rss_mb()
-            request = CustomerPriceListCreate(
-                customer_id=customer.id,
-                config_id=config_id,
-                items=[],
-            )
-            try:
-                async with async_session_factory() as session:
-                    await process_customer_pricelist(
-                        customer=customer,
-                        request=request,
-                        session=session,
-                        include_autoparts_response=False,
-                    )
-                success_count += 1
-            except Exception as exc:
-                error_count += 1
-                logger.error(
-                    "Error in send_scheduled_customer_pricelists_task " "for config %s: %s",
-                    config_id,
-                    exc,
-                    exc_info=True,
-                )
-                try:
-                    async with async_session_factory() as err_session:
-                        await _notify_scheduler_issue(
-                            err_session,
-                            subject="Ошибка регламента отправки прайсов клиентам",
-                            text=(
-                                "Ошибка при автоматической отправке прайса "
-                                f"клиенту для config_id={config_id}.\n"
-                                f"Текст ошибки: {exc}"
-                            ),
-                        )
-                except Exception as notify_exc:
-                    logger.error(
-                        "Failed to send error notification for config %s: %s",
-                        config_id,
-                        notify_exc,
-                    )
-            finally:
-                trim_process_memory(
-                    logger,
-                    context=("send_scheduled_customer_pricelists_task " f"config_id={config_id}"),
-                )
-                rss_after = process_rss_mb()
-                memory_samples.append(
-                    {
-                        "config_id": config_id,
-                        "rss_before_mb": (round(rss_before, 1) if rss_before is not None else None),
-                        "rss_after_mb": (round(rss_after, 1) if rss_after is not None else None),
-                    }
-                )
-            if rss_after is not None and rss_after >= CUSTOMER_PRICELIST_RSS_SOFT_LIMIT_MB:
-                stopped_for_memory = True
-                trace.details["__trace_status"] = "error"
-                trace.details["error"] = (
-                    "Остановлена очередь клиентских прайсов: RSS scheduler "
-                    f"{rss_after:.1f} MB достиг безопасного лимита "
-                    f"{CUSTOMER_PRICELIST_RSS_SOFT_LIMIT_MB} MB."
-                )
-                logger.critical(trace.details["error"])
-                try:
-                    async with async_session_factory() as err_session:
-                        await _notify_scheduler_issue(
-                            err_session,
-                            subject=("Остановлена рассылка прайсов: высокая память"),
-                            text=trace.details["error"],
-                        )
-                except Exception as notify_exc:
-                    logger.error(
-                        "Failed to notify about customer pricelist memory " "limit: %s",
-                        notify_exc,
-                    )
-                break
-        trace.details["success_count"] = success_count
-        trace.details["error_count"] = error_count
-        trace.details["memory_samples"] = memory_samples
-        trace.details["stopped_for_memory"] = stopped_for_memory
-        if error_count > 0:
-            trace.details["__trace_status"] = "error"
+        await _send_pending_customer_pricelists(async_session_factory, pending, trace)
 
 
 async def price_control_run_task(app: FastAPI):
@@ -2171,7 +2235,11 @@ async def price_control_run_task(app: FastAPI):
                 )
 
 
-async def process_new_provider_emails(session: AsyncSession, app: FastAPI):
+async def process_new_provider_emails(
+    session: AsyncSession,
+    app: FastAPI,
+    trace_details: dict | None = None,
+):
     """
     Обрабатывает все новые письма за сегодня,
     скачивая файлы для провайдеров и далее
@@ -2179,7 +2247,7 @@ async def process_new_provider_emails(session: AsyncSession, app: FastAPI):
     """
     logger.info("Начинаем обработку писем провайдеров...")
     start_time = time.perf_counter()
-    downloaded = await get_emails(session=session)
+    downloaded = await get_emails(session=session, trace_details=trace_details)
 
     email_time = time.perf_counter()
     logger.info(f"get_emails() выполнена за {email_time - start_time:.2f} секунд")
@@ -2361,7 +2429,9 @@ async def download_price_provider_task(app: FastAPI):
                     logger.info(f"Created initial provider with id: {provider.id}")
                 trace.details["provider_id"] = getattr(provider, "id", None)
                 trace.details["provider_name"] = getattr(provider, "name", None)
-                email_summary = await process_new_provider_emails(session, app)
+                email_summary = await process_new_provider_emails(
+                    session, app, trace_details=trace.details
+                )
                 trace.details["email_processing_summary"] = email_summary
                 if email_summary.get("stopped_for_memory"):
                     trace.details["__trace_status"] = "error"
@@ -2523,18 +2593,23 @@ async def check_provider_pricelist_staleness_task(app: FastAPI):
                 .where(ProviderPriceListConfig.is_active.is_(True))
             )
             configs = (await session.execute(stmt)).scalars().all()
+            # Даты последних прайсов всех конфигураций — одним запросом,
+            # а не отдельным SELECT на каждую конфигурацию.
+            last_dates = dict(
+                (
+                    await session.execute(
+                        select(PriceList.provider_config_id, func.max(PriceList.date))
+                        .where(PriceList.provider_config_id.in_([c.id for c in configs]))
+                        .group_by(PriceList.provider_config_id)
+                    )
+                ).all()
+            )
 
             for config in configs:
                 threshold = config.max_days_without_update or 3
                 if threshold <= 0:
                     continue
-                last_price_stmt = (
-                    select(PriceList.date)
-                    .where(PriceList.provider_config_id == config.id)
-                    .order_by(PriceList.date.desc())
-                    .limit(1)
-                )
-                last_date = (await session.execute(last_price_stmt)).scalar()
+                last_date = last_dates.get(config.id)
                 if not last_date:
                     continue
                 days_diff = (now.date() - last_date).days
@@ -2845,7 +2920,6 @@ async def auto_refuse_supplier_items_task(app: FastAPI):
 
 # ── Cleanup накапливаемых таблиц ─────────────────────────────────────────────
 
-PRICE_HISTORY_RETENTION_DAYS = int(os.getenv("PRICE_HISTORY_RETENTION_DAYS", "365"))
 APP_NOTIFICATION_RETENTION_DAYS = int(os.getenv("APP_NOTIFICATION_RETENTION_DAYS", "7"))
 METRIC_SNAPSHOT_RETENTION_DAYS = int(os.getenv("METRIC_SNAPSHOT_RETENTION_DAYS", "60"))
 PRICE_CHECK_LOG_RETENTION_DAYS = int(os.getenv("PRICE_CHECK_LOG_RETENTION_DAYS", "30"))
@@ -2975,6 +3049,14 @@ async def cleanup_metric_snapshots_task(app: FastAPI):
             await session.rollback()
 
 
+async def keepalive_imap_pool_task():
+    try:
+        alive = await asyncio.to_thread(keepalive_imap_pool)
+        logger.debug("IMAP pool keepalive: %s idle connections", alive)
+    except Exception as exc:
+        logger.warning("IMAP pool keepalive failed: %s", exc)
+
+
 async def cleanup_misc_logs_task(app: FastAPI):
     """Очищает служебные логи и старые IGNORED/закрытые SupplierOrderMessage."""
     from dz_fastapi.models.partner import SupplierOrderMessage, SupplierReceipt
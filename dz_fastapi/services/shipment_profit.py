@@ -0,0 +1,375 @@
+"""Дневной свод валовой прибыли по проведённым отгрузкам.
+
+ShipmentProfitDaily хранит выручку, себестоимость и количества по ключу
+(день по Москве, клиент, поставщик партии, бренд, запчасть).
+post_shipment_document прибавляет вклад накладной, unpost_shipment_document
+вычитает его; вклад считается одним агрегирующим запросом по строкам и
+FIFO-списаниям накладной. Отчёт по валовой прибыли — GROUP BY по своду;
+неполные крайние дни периода (date_from/date_to со временем) добираются
+тем же агрегирующим запросом напрямую по накладным.
+"""
+
+import logging
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Optional
+
+from sqlalchemy import (
+    Date,
+    case,
+    cast,
+    delete,
+    func,
+    literal,
+    literal_column,
+    null,
+    select,
+    union_all,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dz_fastapi.core.time import MOSCOW_TZ
+from dz_fastapi.models.autopart import AutoPart
+from dz_fastapi.models.brand import Brand
+from dz_fastapi.models.inventory import (
+    ShipmentDocument,
+    ShipmentDocumentItem,
+    ShipmentDocumentItemLotAllocation,
+    ShipmentDocumentStatus,
+    ShipmentProfitDaily,
+)
+from dz_fastapi.models.partner import Customer, Provider
+
+logger = logging.getLogger("dz_fastapi")
+
+_KEY_COLUMNS = ("day", "customer_id", "provider_id", "brand_id", "autopart_id")
+_SUM_COLUMNS = (
+    "quantity",
+    "revenue_total",
+    "cost_total",
+    "costed_quantity",
+    "uncosted_quantity",
+)
+_ZERO = Decimal("0.00")
+
+
+def shipment_profit_source(*conditions):
+    """
+    Вклад проведённых накладных (с доп. условиями по ShipmentDocument) в
+    разрезе ключа свода. Списания по партиям дают поставщика и
+    себестоимость; остаток строки без списаний идёт без поставщика как
+    неоценённый — так же считал прежний отчёт по ORM-графам.
+    """
+    doc = ShipmentDocument
+    item = ShipmentDocumentItem
+    allocation = ShipmentDocumentItemLotAllocation
+    day = cast(
+        func.timezone(MOSCOW_TZ.key, func.coalesce(doc.posted_at, doc.doc_date)),
+        Date,
+    )
+    where = (doc.status == ShipmentDocumentStatus.POSTED, *conditions)
+    customer_key = func.coalesce(doc.customer_id, 0)
+    brand_key = func.coalesce(AutoPart.brand_id, 0)
+    costed = allocation.total_cost_price.is_not(None)
+
+    allocated = (
+        select(
+            day.label("day"),
+            customer_key.label("customer_id"),
+            func.coalesce(allocation.provider_id, 0).label("provider_id"),
+            brand_key.label("brand_id"),
+            item.autopart_id.label("autopart_id"),
+            allocation.quantity.label("quantity"),
+            (item.price * allocation.quantity).label("revenue_total"),
+            allocation.total_cost_price.label("cost_total"),
+            case((costed, allocation.quantity), else_=0).label("costed_quantity"),
+            case((costed, 0), else_=allocation.quantity).label("uncosted_quantity"),
+        )
+        .select_from(doc)
+        .join(item, item.document_id == doc.id)
+        .join(allocation, allocation.shipment_document_item_id == item.id)
+        .outerjoin(AutoPart, AutoPart.id == item.autopart_id)
+        .where(allocation.quantity > 0, *where)
+    )
+
+    allocated_per_item = (
+        select(
+            allocation.shipment_document_item_id.label("item_id"),
+            func.sum(allocation.quantity).label("quantity"),
+        )
+        .where(allocation.quantity > 0)
+        .group_by(allocation.shipment_document_item_id)
+        .subquery("allocated_per_item")
+    )
+    remainder = item.quantity - func.coalesce(allocated_per_item.c.quantity, 0)
+    unallocated = (
+        select(
+            day.label("day"),
+            customer_key.label("customer_id"),
+            literal(0).label("provider_id"),
+            brand_key.label("brand_id"),
+            item.autopart_id.label("autopart_id"),
+            remainder.label("quantity"),
+            (item.price * remainder).label("revenue_total"),
+            cast(null(), allocation.total_cost_price.type).label("cost_total"),
+            literal(0).label("costed_quantity"),
+            remainder.label("uncosted_quantity"),
+        )
+        .select_from(doc)
+        .join(item, item.document_id == doc.id)
+        .outerjoin(allocated_per_item, allocated_per_item.c.item_id == item.id)
+        .outerjoin(AutoPart, AutoPart.id == item.autopart_id)
+        .where(remainder > 0, *where)
+    )
+
+    pieces = union_all(allocated, unallocated).subquery("profit_pieces")
+    return (
+        select(
+            *(pieces.c[name] for name in _KEY_COLUMNS),
+            func.sum(pieces.c.quantity).label("quantity"),
+            func.coalesce(func.sum(pieces.c.revenue_total), 0).label("revenue_total"),
+            func.coalesce(func.sum(pieces.c.cost_total), 0).label("cost_total"),
+            func.sum(pieces.c.costed_quantity).label("costed_quantity"),
+            func.sum(pieces.c.uncosted_quantity).label("uncosted_quantity"),
+        )
+        .group_by(*(pieces.c[name] for name in _KEY_COLUMNS))
+        .subquery("shipment_profit_source")
+    )
+
+
+async def apply_shipment_profit(session: AsyncSession, doc_id: int, *, sign: int) -> int:
+    """
+    Прибавить (sign=1, после проведения) или вычесть (sign=-1, до отмены,
+    пока накладная ещё POSTED) вклад накладной в свод. Без commit.
+    """
+    source = shipment_profit_source(ShipmentDocument.id == doc_id)
+    rows = (await session.execute(select(source))).mappings().all()
+    if not rows:
+        return 0
+    values = [
+        {
+            **{name: row[name] for name in _KEY_COLUMNS},
+            **{name: sign * (row[name] or 0) for name in _SUM_COLUMNS},
+        }
+        for row in rows
+    ]
+    stmt = pg_insert(ShipmentProfitDaily)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_shipment_profit_daily_key",
+        set_={
+            name: getattr(ShipmentProfitDaily, name) + getattr(stmt.excluded, name)
+            for name in _SUM_COLUMNS
+        },
+    )
+    await session.execute(stmt, values)
+    if sign < 0:
+        await session.execute(
+            delete(ShipmentProfitDaily).where(
+                ShipmentProfitDaily.day.in_({row["day"] for row in rows}),
+                ShipmentProfitDaily.quantity <= 0,
+            )
+        )
+    return len(values)
+
+
+async def rebuild_shipment_profit_rollup(
+    session: AsyncSession, *, day_from: Optional[date] = None
+) -> int:
+    """Пересобрать свод целиком (или начиная с day_from) из накладных. Без commit."""
+    source = shipment_profit_source()
+    select_stmt = select(source)
+    clear_stmt = delete(ShipmentProfitDaily)
+    if day_from is not None:
+        select_stmt = select_stmt.where(source.c.day >= day_from)
+        clear_stmt = clear_stmt.where(ShipmentProfitDaily.day >= day_from)
+    await session.execute(clear_stmt)
+    result = await session.execute(
+        pg_insert(ShipmentProfitDaily).from_select(
+            [*_KEY_COLUMNS, *_SUM_COLUMNS], select_stmt
+        )
+    )
+    return int(result.rowcount or 0)
+
+
+def _moscow(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=MOSCOW_TZ)
+    return value.astimezone(MOSCOW_TZ)
+
+
+def _midnight(day_value: date) -> datetime:
+    return datetime.combine(day_value, time.min, tzinfo=MOSCOW_TZ)
+
+
+def split_report_window(
+    date_from: Optional[datetime], date_to: Optional[datetime]
+) -> tuple[Optional[tuple[Optional[date], Optional[date]]], list[tuple]]:
+    """
+    Период отчёта (posted_at в [date_from, date_to]) → диапазон полных дней
+    для свода (None — полных дней нет; границы None — без ограничения) и
+    окна неполных крайних дней, которые считаются прямо по накладным.
+    """
+    first_day = last_day = None
+    if date_from is not None:
+        date_from = _moscow(date_from)
+        first_day = date_from.date()
+        if date_from != _midnight(first_day):
+            first_day += timedelta(days=1)
+    if date_to is not None:
+        date_to = _moscow(date_to)
+        last_day = date_to.date()
+        if date_to < _midnight(last_day + timedelta(days=1)) - timedelta(microseconds=1):
+            last_day -= timedelta(days=1)
+    if first_day is not None and last_day is not None and first_day > last_day:
+        return None, [(date_from, date_to)]
+    windows = []
+    if date_from is not None and date_from != _midnight(first_day):
+        windows.append((date_from, _midnight(first_day) - timedelta(microseconds=1)))
+    if date_to is not None and last_day < date_to.date():
+        windows.append((_midnight(last_day + timedelta(days=1)), date_to))
+    return (first_day, last_day), windows
+
+
+async def collect_shipment_profit_rows(
+    session: AsyncSession,
+    *,
+    period: str,
+    group_by_customer: bool,
+    group_by_provider: bool,
+    group_by_brand: bool,
+    group_by_autopart: bool,
+    customer_id: Optional[int],
+    provider_id: Optional[int],
+    autopart_id: Optional[int],
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+) -> list[dict[str, Any]]:
+    """
+    Строки отчёта по валовой прибыли: суммы по выбранным разрезам и
+    периодам (day/month/all) плюс названия клиентов, поставщиков, брендов
+    и запчастей. Прибыль и маржу считает вызывающий код.
+    """
+    day_range, windows = split_report_window(date_from, date_to)
+    enabled = {
+        "customer_id": group_by_customer,
+        "provider_id": group_by_provider,
+        "brand_id": group_by_brand,
+        "autopart_id": group_by_autopart,
+    }
+
+    def grouped(source, *conditions):
+        if period == "day":
+            period_expr = source.c.day
+        elif period == "month":
+            period_expr = cast(func.date_trunc("month", source.c.day), Date)
+        else:
+            period_expr = None
+        group_exprs = [period_expr] if period_expr is not None else []
+        key_exprs = [
+            (period_expr if period_expr is not None else literal_column("NULL")).label(
+                "period_start"
+            )
+        ]
+        for name, is_enabled in enabled.items():
+            if is_enabled:
+                group_exprs.append(source.c[name])
+                key_exprs.append(source.c[name].label(name))
+            else:
+                key_exprs.append(literal_column("0").label(name))
+        filters = list(conditions)
+        if customer_id is not None:
+            filters.append(source.c.customer_id == customer_id)
+        if provider_id is not None:
+            filters.append(source.c.provider_id == provider_id)
+        if autopart_id is not None:
+            filters.append(source.c.autopart_id == autopart_id)
+        return (
+            select(
+                *key_exprs,
+                *(func.sum(source.c[name]).label(name) for name in _SUM_COLUMNS),
+            )
+            .where(*filters)
+            .group_by(*group_exprs)
+        )
+
+    statements = []
+    if day_range is not None:
+        rollup = ShipmentProfitDaily.__table__
+        first_day, last_day = day_range
+        day_filters = []
+        if first_day is not None:
+            day_filters.append(rollup.c.day >= first_day)
+        if last_day is not None:
+            day_filters.append(rollup.c.day <= last_day)
+        statements.append(grouped(rollup, *day_filters))
+    for window_start, window_end in windows:
+        statements.append(
+            grouped(
+                shipment_profit_source(
+                    ShipmentDocument.posted_at >= window_start,
+                    ShipmentDocument.posted_at <= window_end,
+                )
+            )
+        )
+
+    merged: dict[tuple, dict[str, Any]] = {}
+    for stmt in statements:
+        for row in (await session.execute(stmt)).mappings():
+            key = (row["period_start"], *(row[name] for name in enabled))
+            target = merged.setdefault(
+                key,
+                {
+                    "period_start": row["period_start"],
+                    **{name: row[name] or None for name in enabled},
+                    "quantity": 0,
+                    "revenue_total": _ZERO,
+                    "cost_total": _ZERO,
+                    "costed_quantity": 0,
+                    "uncosted_quantity": 0,
+                },
+            )
+            target["quantity"] += int(row["quantity"] or 0)
+            target["revenue_total"] += Decimal(str(row["revenue_total"] or 0))
+            target["cost_total"] += Decimal(str(row["cost_total"] or 0))
+            target["costed_quantity"] += int(row["costed_quantity"] or 0)
+            target["uncosted_quantity"] += int(row["uncosted_quantity"] or 0)
+
+    rows = [row for row in merged.values() if row["quantity"] > 0]
+    await _attach_names(session, rows)
+    for row in rows:
+        if row["period_start"] is not None:
+            row["period_start"] = _midnight(row["period_start"])
+    return rows
+
+
+async def _attach_names(session: AsyncSession, rows: list[dict[str, Any]]) -> None:
+    """Названия для ключей строк — по запросу на каждый справочник."""
+
+    async def names(model, column, ids):
+        ids = {value for value in ids if value}
+        if not ids:
+            return {}
+        result = await session.execute(select(model.id, column).where(model.id.in_(ids)))
+        return dict(result.all())
+
+    customers = await names(Customer, Customer.name, (row["customer_id"] for row in rows))
+    providers = await names(Provider, Provider.name, (row["provider_id"] for row in rows))
+    autopart_ids = {row["autopart_id"] for row in rows if row["autopart_id"]}
+    autoparts = {}
+    if autopart_ids:
+        result = await session.execute(
+            select(AutoPart.id, AutoPart.oem_number, AutoPart.name, Brand.name)
+            .outerjoin(Brand, Brand.id == AutoPart.brand_id)
+            .where(AutoPart.id.in_(autopart_ids))
+        )
+        autoparts = {row[0]: row[1:] for row in result.all()}
+    brands = await names(Brand, Brand.name, (row["brand_id"] for row in rows))
+    for row in rows:
+        oem, name, brand = autoparts.get(row["autopart_id"], (None, None, None))
+        row["customer_name"] = customers.get(row["customer_id"])
+        row["provider_name"] = providers.get(row["provider_id"])
+        row["brand_name"] = brands.get(row["brand_id"])
+        row["autopart_oem"] = oem
+        row["autopart_name"] = name
+        row["autopart_brand"] = brand
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any
+from urllib.parse import urlsplit
+
+logger = logging.getLogger("dz_fastapi")
+
+# Общий кэш ответов get_offers сайта: контроль цен, автозакупка и
+# проверка watchlist за несколько минут спрашивают одни и те же OEM.
+# Каждый вызывающий задаёт допустимый возраст ответа сам (max_age_sec).
+SITE_OFFERS_CACHE_TTL_SEC = max(0, int(os.getenv("SITE_OFFERS_CACHE_TTL_SEC", "600")))
+SITE_OFFERS_CACHE_MAX_ENTRIES = max(
+    0, int(os.getenv("SITE_OFFERS_CACHE_MAX_ENTRIES", "20000"))
+)
+# Одновременных запросов к одному хосту сайта.
+SITE_OFFERS_MAX_IN_FLIGHT = max(1, int(os.getenv("SITE_OFFERS_MAX_IN_FLIGHT", "4")))
+# Не больше стольких запросов в секунду к одному хосту; 0 — без ограничения.
+SITE_OFFERS_RATE_PER_SEC = max(0.0, float(os.getenv("SITE_OFFERS_RATE_PER_SEC", "5")))
+
+_offers_cache: OrderedDict[tuple[str, str, bool], tuple[float, list[dict]]] = OrderedDict()
+_inflight: dict[tuple[str, str, bool], asyncio.Future] = {}
+_host_limits: dict[str, "_HostLimit"] = {}
+
+
+class _HostLimit:
+    """Семафор и интервал между запросами к одному хосту в рамках event loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.semaphore = asyncio.Semaphore(SITE_OFFERS_MAX_IN_FLIGHT)
+        self.lock = asyncio.Lock()
+        self.next_slot = 0.0
+
+    async def wait_turn(self) -> None:
+        if SITE_OFFERS_RATE_PER_SEC <= 0:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + 1.0 / SITE_OFFERS_RATE_PER_SEC
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def _client_host(client) -> str:
+    base_url = str(getattr(client, "base_url", "") or "")
+    return urlsplit(base_url).netloc or base_url
+
+
+@asynccontextmanager
+async def site_request_slot(client):
+    """Слот для запроса к сайту: лимит одновременных запросов и частоты."""
+    loop = asyncio.get_running_loop()
+    host = _client_host(client)
+    limit = _host_limits.get(host)
+    if limit is None or limit.loop is not loop:
+        limit = _HostLimit(loop)
+        _host_limits[host] = limit
+    async with limit.semaphore:
+        await limit.wait_turn()
+        yield
+
+
+def _cache_key(oem: str, brand: str, without_cross: bool) -> tuple[str, str, bool]:
+    return (
+        str(oem or "").strip().upper(),
+        str(brand or "").strip().upper(),
+        bool(without_cross),
+    )
+
+
+def _cached_offers(key: tuple[str, str, bool], max_age_sec: float) -> list[dict] | None:
+    entry = _offers_cache.get(key)
+    if entry is None:
+        return None
+    created_at, offers = entry
+    if time.monotonic() - created_at >= max_age_sec:
+        return None
+    _offers_cache.move_to_end(key)
+    return [dict(item) for item in offers]
+
+
+def clear_site_offers_cache() -> None:
+    _offers_cache.clear()
+
+
+async def get_site_offers(
+    client,
+    *,
+    oem: str,
+    brand: str,
+    without_cross: bool,
+    max_age_sec: float | None = None,
+) -> list[dict[str, Any]]:
+    """
+    client.get_offers с общим TTL-кэшем по (oem, brand, without_cross).
+    Одновременные запросы одного ключа ждут один ответ сайта; ошибки
+    не кэшируются и пробрасываются вызывающему.
+    """
+    if max_age_sec is None:
+        max_age_sec = SITE_OFFERS_CACHE_TTL_SEC
+    key = _cache_key(oem, brand, without_cross)
+    if max_age_sec > 0:
+        cached = _cached_offers(key, max_age_sec)
+        if cached is not None:
+            return cached
+        pending = _inflight.get(key)
+        if pending is not None and pending.get_loop() is asyncio.get_running_loop():
+            try:
+                offers = await asyncio.shield(pending)
+            except Exception:
+                # Запрос в другой задаче упал — пробуем сами.
+                offers = None
+            if offers is not None:
+                return [dict(item) for item in offers]
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        async with site_request_slot(client):
+            raw_offers = await client.get_offers(
+                oem=oem,
+                brand=brand,
+                without_cross=without_cross,
+            )
+        offers = [item for item in (raw_offers or []) if isinstance(item, dict)]
+    except BaseException as exc:
+        if isinstance(exc, Exception):
+            future.set_exception(exc)
+            future.exception()
+        else:
+            future.cancel()
+        raise
+    finally:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+    future.set_result(offers)
+
+    if SITE_OFFERS_CACHE_MAX_ENTRIES > 0:
+        _offers_cache[key] = (time.monotonic(), [dict(item) for item in offers])
+        _offers_cache.move_to_end(key)
+        while len(_offers_cache) > SITE_OFFERS_CACHE_MAX_ENTRIES:
+            _offers_cache.popitem(last=False)
+    return [dict(item) for item in offers]
@@ -0,0 +1,125 @@
+"""Матрица снапшотов нашего прайса для расчёта спроса автозаказа.
+
+Снапшоты (см. _summarize_snapshot_rows) укладываются в int-матрицы
+«снапшот × OEM»: остатки и поступления между соседними снапшотами.
+Продажи, дни наличия по всем окнам и текущая серия отсутствия считаются
+векторно за один проход — результаты совпадают с
+_calculate_snapshot_sales, _calculate_in_stock_days и
+_estimate_consecutive_stockout_days, которые обходят пары снапшотов ×
+OEM в Python.
+"""
+
+from __future__ import annotations
+
+from datetime import date
+from typing import Any, Iterable, Optional
+
+import numpy as np
+
+from dz_fastapi.core.time import now_moscow
+
+
+class SnapshotMatrix:
+    def __init__(
+        self,
+        snapshots: list[dict[str, Any]],
+        normalized_oem_numbers: list[str],
+        *,
+        received_qty_by_oem_and_date: Optional[dict[str, dict[date, int]]] = None,
+        today: Optional[date] = None,
+    ):
+        self.oem_numbers = list(normalized_oem_numbers)
+        self.today = today or now_moscow().date()
+        column_by_oem = {oem: column for column, oem in enumerate(self.oem_numbers)}
+        self.dates = np.asarray(
+            [snapshot["pricelist_date"].toordinal() for snapshot in snapshots],
+            dtype=np.int64,
+        )
+        self.qty = np.zeros((len(snapshots), len(self.oem_numbers)), dtype=np.int64)
+        for row, snapshot in enumerate(snapshots):
+            for oem, qty in snapshot["qty_by_oem"].items():
+                column = column_by_oem.get(oem)
+                if column is not None:
+                    self.qty[row, column] = int(qty or 0)
+
+        # received[i] — поступления в интервале (dates[i-1], dates[i]].
+        self.received = np.zeros_like(self.qty)
+        if len(snapshots) > 1:
+            for oem, per_date in (received_qty_by_oem_and_date or {}).items():
+                column = column_by_oem.get(oem)
+                if column is None or not per_date:
+                    continue
+                received_dates = np.fromiter(
+                    (received_date.toordinal() for received_date in per_date),
+                    dtype=np.int64,
+                    count=len(per_date),
+                )
+                quantities = np.fromiter(
+                    per_date.values(), dtype=np.int64, count=len(per_date)
+                )
+                rows = np.searchsorted(self.dates, received_dates, side="left")
+                inside = (rows > 0) & (rows < len(snapshots))
+                np.add.at(self.received[:, column], rows[inside], quantities[inside])
+
+    def _cutoffs(self, windows: Iterable[int]) -> tuple[list[int], np.ndarray]:
+        windows = [int(days) for days in windows]
+        today = self.today.toordinal()
+        return windows, np.asarray([today - days for days in windows], dtype=np.int64)
+
+    def _by_window(
+        self, windows: list[int], values: np.ndarray
+    ) -> dict[int, dict[str, int]]:
+        return {
+            days: dict(zip(self.oem_numbers, values[index].tolist()))
+            for index, days in enumerate(windows)
+        }
+
+    def sales_by_window(self, windows: Iterable[int]) -> dict[int, dict[str, int]]:
+        """Продажи по снапшотам: Σ max(prev + поступило − curr, 0) по парам окна."""
+        windows, cutoffs = self._cutoffs(windows)
+        if len(self.dates) < 2:
+            return self._by_window(
+                windows, np.zeros((len(windows), len(self.oem_numbers)), dtype=np.int64)
+            )
+        sold = np.maximum(self.qty[:-1] + self.received[1:] - self.qty[1:], 0)
+        # Пара входит в окно, если её правый снапшот не раньше cutoff.
+        in_window = (self.dates[1:][None, :] >= cutoffs[:, None]).astype(np.int64)
+        return self._by_window(windows, in_window @ sold)
+
+    def in_stock_days_by_window(
+        self, windows: Iterable[int]
+    ) -> dict[int, dict[str, int]]:
+        """Сколько дней окна товар был в наличии (остаток снапшота > 0)."""
+        windows, cutoffs = self._cutoffs(windows)
+        if not len(self.dates):
+            return self._by_window(
+                windows, np.zeros((len(windows), len(self.oem_numbers)), dtype=np.int64)
+            )
+        # Интервал i: от снапшота i до следующего (последний — до сегодня).
+        starts = self.dates
+        ends = np.append(self.dates[1:], self.today.toordinal())
+        spans = np.maximum(
+            ends[None, :] - np.maximum(starts[None, :], cutoffs[:, None]), 0
+        )
+        in_stock = spans @ (self.qty > 0).astype(np.int64)
+        limits = np.asarray(windows, dtype=np.int64)[:, None]
+        return self._by_window(windows, np.minimum(in_stock, limits))
+
+    def consecutive_stockout_days(self) -> dict[str, int]:
+        """Дней с начала текущей серии снапшотов без остатка до последнего."""
+        if not len(self.dates):
+            return {oem: 0 for oem in self.oem_numbers}
+        positive = self.qty > 0
+        count = len(self.dates)
+        last_positive = np.where(
+            positive.any(axis=0),
+            count - 1 - np.argmax(positive[::-1], axis=0),
+            -1,
+        )
+        first_empty = np.minimum(last_positive + 1, count - 1)
+        days = np.where(
+            last_positive == count - 1,
+            0,
+            self.dates[-1] - self.dates[first_empty],
+        )
+        return dict(zip(self.oem_numbers, np.maximum(days, 0).tolist()))
@@ -17,6 +17,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from dz_fastapi.core.constants import get_upload_dir
 from dz_fastapi.core.time import now_moscow
 from dz_fastapi.models.partner import TELEGRAM_OUTBOX_STATUS, TelegramOutbox
+from dz_fastapi.services.outbox_notify import (
+    TELEGRAM_OUTBOX_CHANNEL,
+    claim_with_long_poll,
+    notify_outbox,
+)
 
 MAX_SEND_ATTEMPTS = 5
 DEFAULT_CLAIM_LEASE_SECONDS = 300
@@ -57,6 +62,7 @@ async def enqueue_telegram_message(
         attempts=0,
     )
     session.add(row)
+    await notify_outbox(session, TELEGRAM_OUTBOX_CHANNEL)
     if commit:
         await session.commit()
         await session.refresh(row)
@@ -104,6 +110,7 @@ async def enqueue_telegram_document(
     )
     session.add(row)
     try:
+        await notify_outbox(session, TELEGRAM_OUTBOX_CHANNEL)
         if commit:
             await session.commit()
             await session.refresh(row)
@@ -140,6 +147,24 @@ async def claim_pending_telegram_outbox(
     worker: str,
     limit: int = 25,
     lease_seconds: int = DEFAULT_CLAIM_LEASE_SECONDS,
+    wait_seconds: float = 0,
+) -> list[TelegramOutbox]:
+    return await claim_with_long_poll(
+        session,
+        channel=TELEGRAM_OUTBOX_CHANNEL,
+        claim=lambda: _claim_pending_telegram_outbox_once(
+            session, worker=worker, limit=limit, lease_seconds=lease_seconds
+        ),
+        wait_seconds=wait_seconds,
+    )
+
+
+async def _claim_pending_telegram_outbox_once(
+    session: AsyncSession,
+    *,
+    worker: str,
+    limit: int,
+    lease_seconds: int,
 ) -> list[TelegramOutbox]:
     now = now_moscow()
     cutoff = now - timedelta(seconds=max(30, int(lease_seconds)))
@@ -17,6 +17,7 @@ from dz_fastapi.models.notification import AppNotificationLevel
 from dz_fastapi.models.partner import Provider
 from dz_fastapi.services.inventory_stock import ensure_default_warehouse
 from dz_fastapi.services.notifications import notify_admin_all
+from dz_fastapi.services.site_offers import get_site_offers
 
 logger = logging.getLogger("dz_fastapi")
 SITE_PROVIDER_NAME = "Сайт Dragonzap"
@@ -269,8 +270,8 @@ async def check_watchlist_site(session):
     ) as client:
         for item in watch_items:
             try:
-                offers = await client.get_offers(
-                    oem=item.oem, brand=item.brand, without_cross=True
+                offers = await get_site_offers(
+                    client, oem=item.oem, brand=item.brand, without_cross=True
                 )
             except Exception as e:
                 logger.error(f"DZ search failed for {item.oem}: {e}")
@@ -0,0 +1,37 @@
+import argparse
+import asyncio
+import logging
+
+from dz_fastapi.core.db import get_async_session
+from dz_fastapi.crud.partner import crud_pricelist
+
+logger = logging.getLogger('dz_fastapi')
+logging.basicConfig(level=logging.INFO)
+
+
+async def main(provider_config_id: int | None) -> None:
+    session_factory = get_async_session()
+    async with session_factory() as session:
+        rows = await crud_pricelist.backfill_price_state(
+            session=session,
+            provider_config_id=provider_config_id,
+        )
+        await session.commit()
+        logger.info('AutoPartPriceState backfilled: %s rows', rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=(
+            'Build AutoPartPriceState (last known provider price per '
+            'pricelist config) from AutoPartPriceHistory'
+        )
+    )
+    parser.add_argument(
+        '--config-id',
+        type=int,
+        default=None,
+        help='Only this provider pricelist config. Default: all configs.',
+    )
+    args = parser.parse_args()
+    asyncio.run(main(provider_config_id=args.config_id))
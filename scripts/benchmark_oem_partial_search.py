@@ -0,0 +1,167 @@
+"""Задержка поиска по части OEM: полный просмотр против n-граммного индекса.
+
+Скрипт генерирует N синтетических нормализованных OEM и измеряет
+задержку подстрочного поиска (с ранжированием точное/начало/вхождение)
+линейным просмотром и OemNgramIndex. Результаты сверяются.
+
+С --database то же сравнение идёт в PostgreSQL: временная таблица с N
+номерами, ILIKE '%…%' без индекса и с GIN-индексом pg_trgm. Транзакция
+откатывается — база остаётся без изменений.
+
+Пример:
+    python scripts/benchmark_oem_partial_search.py --rows 1000000 --queries 200
+    python scripts/benchmark_oem_partial_search.py --rows 1000000 --database
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+from dz_fastapi.core.base import AutoPart  # noqa: F401  регистрирует модели
+from dz_fastapi.core.db import get_async_session
+from dz_fastapi.services.oem_search import OemNgramIndex, _rank_key
+
+_ALPHABET = np.array(list("ABCDEFGHJKLMNPRSTUVWXYZ0123456789"))
+
+
+def _build_oems(rows: int) -> list[str]:
+    rng = np.random.default_rng(42)
+    lengths = rng.integers(8, 15, size=rows)
+    chars = _ALPHABET[rng.integers(0, len(_ALPHABET), size=(rows, 14))]
+    return ["".join(chars[idx, :length]) for idx, length in enumerate(lengths)]
+
+
+def _build_queries(oems: list[str], count: int) -> list[str]:
+    rng = np.random.default_rng(7)
+    queries = []
+    for idx in rng.integers(0, len(oems), size=count):
+        oem = oems[int(idx)]
+        size = int(rng.integers(4, 9))
+        start = int(rng.integers(0, max(len(oem) - size, 0) + 1))
+        queries.append(oem[start:start + size])
+    return queries
+
+
+def _linear_search(ids: list[int], oems: list[str], query: str) -> list[int]:
+    matches = sorted(
+        (_rank_key(oem, query), position)
+        for position, oem in enumerate(oems)
+        if query in oem
+    )
+    return [ids[position] for _, position in matches]
+
+
+def _latency(func, queries: list[str]) -> tuple[float, float, list]:
+    timings = []
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(func(query))
+        timings.append(time.perf_counter() - started)
+    return (
+        float(np.percentile(timings, 50)) * 1000,
+        float(np.percentile(timings, 95)) * 1000,
+        results,
+    )
+
+
+def run_in_memory(rows: int, queries_count: int) -> None:
+    oems = _build_oems(rows)
+    ids = list(range(1, rows + 1))
+    queries = _build_queries(oems, queries_count)
+
+    index = OemNgramIndex()
+    started = time.perf_counter()
+    index.load(ids, oems)
+    build_time = time.perf_counter() - started
+
+    # Линейный просмотр медленный — меряем его на части запросов.
+    sample = queries[: max(1, min(len(queries), 20))]
+    scan_p50, scan_p95, expected = _latency(
+        lambda query: _linear_search(ids, oems, query), sample
+    )
+    index_p50, index_p95, results = _latency(index.search, queries)
+    assert results[: len(sample)] == expected, "результаты расходятся"
+    print(
+        f"in-memory rows={rows:,} build={build_time:.1f}s "
+        f"scan p50={scan_p50:.1f}ms p95={scan_p95:.1f}ms | "
+        f"ngram p50={index_p50:.2f}ms p95={index_p95:.2f}ms"
+    )
+
+
+async def _db_latency(session, queries: list[str]) -> tuple[float, float]:
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        await session.execute(
+            text(
+                "SELECT id FROM bench_oem WHERE oem_number ILIKE :pattern "
+                "ORDER BY CASE WHEN oem_number = :query THEN 0 "
+                "WHEN oem_number ILIKE :prefix THEN 1 ELSE 2 END, oem_number"
+            ),
+            {"pattern": f"%{query}%", "query": query, "prefix": f"{query}%"},
+        )
+        timings.append(time.perf_counter() - started)
+    return (
+        float(np.percentile(timings, 50)) * 1000,
+        float(np.percentile(timings, 95)) * 1000,
+    )
+
+
+async def run_database(rows: int, queries_count: int) -> None:
+    oems = _build_oems(rows)
+    queries = _build_queries(oems, queries_count)
+    session_factory = get_async_session()
+    async with session_factory() as session:
+        try:
+            await session.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            await session.execute(
+                text(
+                    "CREATE TEMP TABLE bench_oem (id serial PRIMARY KEY, oem_number text) "
+                    "ON COMMIT DROP"
+                )
+            )
+            chunk = 50_000
+            for start in range(0, rows, chunk):
+                await session.execute(
+                    text("INSERT INTO bench_oem (oem_number) SELECT unnest(CAST(:oems AS text[]))"),
+                    {"oems": oems[start:start + chunk]},
+                )
+            await session.execute(text("ANALYZE bench_oem"))
+            scan_p50, scan_p95 = await _db_latency(session, queries)
+
+            started = time.perf_counter()
+            await session.execute(
+                text(
+                    "CREATE INDEX bench_oem_trgm ON bench_oem "
+                    "USING gin (oem_number gin_trgm_ops)"
+                )
+            )
+            await session.execute(text("ANALYZE bench_oem"))
+            build_time = time.perf_counter() - started
+            index_p50, index_p95 = await _db_latency(session, queries)
+        finally:
+            await session.rollback()
+    print(
+        f"postgres rows={rows:,} index build={build_time:.1f}s "
+        f"seqscan p50={scan_p50:.1f}ms p95={scan_p95:.1f}ms | "
+        f"pg_trgm p50={index_p50:.1f}ms p95={index_p95:.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument(
+        "--database",
+        action="store_true",
+        help="Также замерить ILIKE в PostgreSQL без индекса и с pg_trgm.",
+    )
+    args = parser.parse_args()
+    run_in_memory(args.rows, args.queries)
+    if args.database:
+        asyncio.run(run_database(args.rows, args.queries))
@@ -0,0 +1,126 @@
+"""Сравнение записи прайса: executemany INSERT против COPY.
+
+Скрипт создаёт во временной транзакции синтетический прайс
+(бренд, поставщик, N автозапчастей), затем пишет N строк
+PriceListAutoPartAssociation и AutoPartPriceHistory обоими способами
+и откатывает всё в конце — база остаётся без изменений.
+
+Пример:
+    python scripts/benchmark_pricelist_bulk_write.py --rows 200000
+"""
+
+import argparse
+import asyncio
+import time
+from decimal import Decimal
+
+from sqlalchemy import text
+
+from dz_fastapi.core.base import (
+    AutoPartPriceHistory,
+    Brand,
+    PriceList,
+    PriceListAutoPartAssociation,
+    Provider,
+)
+from dz_fastapi.core.db import get_async_session
+from dz_fastapi.core.time import now_moscow
+from dz_fastapi.crud.bulk import bulk_insert_rows
+
+
+async def _prepare_fixture(session, rows: int) -> tuple[int, int, list[int]]:
+    brand = Brand(name="BENCHBRAND")
+    provider = Provider(
+        name="Bench provider",
+        type_prices="Wholesale",
+    )
+    session.add_all([brand, provider])
+    await session.flush()
+    autopart_ids = (
+        await session.execute(
+            text(
+                "INSERT INTO autopart (brand_id, oem_number, name, barcode) "
+                "SELECT :brand_id, 'BENCH' || g, 'Bench part', 'BENCH-' || g "
+                "FROM generate_series(1, :rows) AS g RETURNING id"
+            ),
+            {"brand_id": brand.id, "rows": rows},
+        )
+    ).scalars().all()
+    return int(brand.id), int(provider.id), [int(value) for value in autopart_ids]
+
+
+def _build_rows(pricelist_id: int, provider_id: int, autopart_ids: list[int]):
+    created_at = now_moscow()
+    associations = []
+    history = []
+    for index, autopart_id in enumerate(autopart_ids):
+        price = Decimal(100 + index % 5000) + Decimal("0.50")
+        quantity = 1 + index % 40
+        associations.append(
+            {
+                "pricelist_id": pricelist_id,
+                "autopart_id": autopart_id,
+                "quantity": quantity,
+                "price": price,
+                "multiplicity": 1,
+            }
+        )
+        history.append(
+            {
+                "autopart_id": autopart_id,
+                "provider_id": provider_id,
+                "provider_config_id": None,
+                "pricelist_id": pricelist_id,
+                "created_at": created_at,
+                "price": price,
+                "quantity": quantity,
+            }
+        )
+    return associations, history
+
+
+async def _measure(session, provider_id: int, autopart_ids: list[int], use_copy: bool):
+    savepoint = await session.begin_nested()
+    pricelist = PriceList(provider_id=provider_id, date=now_moscow().date())
+    session.add(pricelist)
+    await session.flush()
+    associations, history = _build_rows(int(pricelist.id), provider_id, autopart_ids)
+
+    started = time.perf_counter()
+    await bulk_insert_rows(
+        session, PriceListAutoPartAssociation, associations, use_copy=use_copy
+    )
+    await bulk_insert_rows(session, AutoPartPriceHistory, history, use_copy=use_copy)
+    elapsed = time.perf_counter() - started
+
+    await savepoint.rollback()
+    return elapsed
+
+
+async def main(rows: int, repeat: int) -> None:
+    session_factory = get_async_session()
+    async with session_factory() as session:
+        try:
+            _, provider_id, autopart_ids = await _prepare_fixture(session, rows)
+            print(f"Synthetic pricelist: {len(autopart_ids)} rows")
+            for mode, use_copy in (("executemany", False), ("copy", True)):
+                timings = [
+                    await _measure(session, provider_id, autopart_ids, use_copy)
+                    for _ in range(repeat)
+                ]
+                best = min(timings)
+                print(
+                    f"{mode:12s} best={best:.2f}s "
+                    f"rows/s={2 * len(autopart_ids) / best:,.0f} "
+                    f"runs={', '.join(f'{value:.2f}' for value in timings)}"
+                )
+        finally:
+            await session.rollback()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
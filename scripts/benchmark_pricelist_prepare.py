@@ -0,0 +1,128 @@
+"""Сравнение подготовки прайса: построчные dict-циклы против DataFrame.
+
+Скрипт генерирует очищенный прайс поставщика (~10% дублей Бренд+Артикул,
+список исключённых позиций) и измеряет схлопывание дублей и фильтры
+конфигурации двумя способами: прежним циклом по строкам-словарям и
+векторными _deduplicate_pricelist_frame/_apply_provider_filters.
+Результаты обоих способов сверяются. База данных не нужна.
+
+Пример:
+    python scripts/benchmark_pricelist_prepare.py --rows 50000 200000 1000000
+"""
+
+import argparse
+import copy
+import time
+
+import numpy as np
+import pandas as pd
+
+from dz_fastapi.services.process import (
+    _apply_provider_filters,
+    _deduplicate_pricelist_frame,
+)
+
+
+def _build_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    unique = max(int(rows * 0.9), 1)
+    position = rng.integers(0, unique, size=rows)
+    return pd.DataFrame(
+        {
+            "oem_number": [f"OEM{value:07d}" for value in position],
+            "brand": [f"Brand {value % 300}" for value in position],
+            "name": "Деталь",
+            "quantity": rng.integers(0, 60, size=rows).astype(float),
+            "price": rng.integers(1, 20_000, size=rows).astype(float),
+            "multiplicity": 1,
+        }
+    )
+
+
+def _filters(df: pd.DataFrame) -> dict:
+    excluded = df.sample(n=min(len(df), 2_000), random_state=1)
+    return {
+        "min_price": 100,
+        "max_price": 15_000,
+        "min_quantity": 1,
+        "max_quantity": None,
+        "exclude_positions": {
+            (str(brand).strip().upper(), str(oem).strip().upper())
+            for brand, oem in zip(excluded["brand"], excluded["oem_number"])
+        },
+    }
+
+
+def _rowwise(records: list[dict], filters: dict) -> list[dict]:
+    """Прежняя реализация: словарь уникальных позиций и цикл фильтров."""
+    unique_map: dict = {}
+    for row in records:
+        key = (
+            row.get("brand", "").strip().lower(),
+            row["oem_number"].strip().lower(),
+        )
+        if key not in unique_map:
+            unique_map[key] = copy.deepcopy(row)
+        elif unique_map[key]["price"] >= row["price"]:
+            unique_map[key]["quantity"] = row["quantity"]
+            unique_map[key]["price"] = row["price"]
+            unique_map[key]["multiplicity"] = row.get("multiplicity")
+
+    filtered = []
+    for item in unique_map.values():
+        price = float(item.get("price", 0))
+        quantity = int(item.get("quantity", 0))
+        if filters["min_price"] is not None and price < filters["min_price"]:
+            continue
+        if filters["max_price"] is not None and price > filters["max_price"]:
+            continue
+        if filters["min_quantity"] is not None and quantity < filters["min_quantity"]:
+            continue
+        key = (
+            str(item.get("brand", "")).strip().upper(),
+            str(item.get("oem_number", "")).strip().upper(),
+        )
+        if key in filters["exclude_positions"]:
+            continue
+        filtered.append(item)
+    return filtered
+
+
+def _vectorized(df: pd.DataFrame, filters: dict) -> list[dict]:
+    df = _apply_provider_filters(_deduplicate_pricelist_frame(df), filters)
+    return df.to_dict(orient="records")
+
+
+def _best(func, repeat: int) -> tuple[float, list[dict]]:
+    timings = []
+    result: list[dict] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main(rows_list: list[int], repeat: int) -> None:
+    for rows in rows_list:
+        df = _build_frame(rows)
+        filters = _filters(df)
+        # Прежний путь начинался с to_dict — включаем его в замер.
+        rowwise_time, expected = _best(
+            lambda: _rowwise(df.to_dict(orient="records"), filters), repeat
+        )
+        vector_time, result = _best(lambda: _vectorized(df, filters), repeat)
+        assert result == expected, "результаты расходятся"
+        print(
+            f"rows={rows:>9,} kept={len(result):>9,} "
+            f"rowwise={rowwise_time:.2f}s vectorized={vector_time:.2f}s "
+            f"speedup={rowwise_time / vector_time:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[50_000, 200_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
@@ -9,6 +9,8 @@
 Цикл:
   1. передать X-Email-Relay-Token  — сервисная авторизация;
   2. POST /email-outbox/claim      — атомарно забрать письма к отправке;
+     с long_poll_seconds сервер держит запрос на пустой очереди и
+     отвечает сразу после постановки письма (LISTEN/NOTIFY);
   3. отправить через SMTP с нужного from-адреса;
   4. POST /email-outbox/{id}/mark-sent  или  /mark-error;
   5. таким же образом обработать /telegram-outbox через Telegram Bot API.
@@ -31,6 +33,7 @@ import os
 import smtplib
 import socket
 import sys
+import threading
 import time
 from email.header import Header
 from email.mime.application import MIMEApplication
@@ -48,6 +51,11 @@ class RelayConfig:
         self.api_base_url = str(data["api_base_url"]).rstrip("/")
         self.relay_api_token = str(data["relay_api_token"]).strip()
         self.poll_interval_seconds = int(data.get("poll_interval_seconds", 30))
+        # Long-poll claim: сколько сервер ждёт новых записей на пустой
+        # очереди. 0 — прежний опрос раз в poll_interval_seconds.
+        self.long_poll_seconds = max(
+            0, min(int(data.get("long_poll_seconds", 25)), 60)
+        )
         self.batch_limit = int(data.get("batch_limit", 25))
         self.verify_tls = bool(data.get("verify_tls", True))
         self.request_timeout = int(data.get("request_timeout_seconds", 30))
@@ -109,14 +117,16 @@ class ApiClient:
     def _url(self, path: str) -> str:
         return f"{self.config.api_base_url}{path}"
 
-    def _request_with_transport_retry(self, method: str, path: str, **kwargs):
+    def _request_with_transport_retry(
+        self, method: str, path: str, *, extra_timeout: int = 0, **kwargs
+    ):
         attempts = 3
         for attempt in range(1, attempts + 1):
             try:
                 return self.session.request(
                     method,
                     self._url(path),
-                    timeout=self.config.request_timeout,
+                    timeout=self.config.request_timeout + extra_timeout,
                     **kwargs,
                 )
             except (requests.ConnectionError, requests.Timeout) as exc:
@@ -166,7 +176,9 @@ class ApiClient:
                 "worker": self.config.worker_id,
                 "limit": self.config.batch_limit,
                 "lease_seconds": self.config.claim_lease_seconds,
+                "wait_seconds": self.config.long_poll_seconds,
             },
+            extra_timeout=self.config.long_poll_seconds,
         )
         if resp.status_code == 404:
             logger.warning(
@@ -201,7 +213,9 @@ class ApiClient:
                 "worker": self.config.worker_id,
                 "limit": self.config.batch_limit,
                 "lease_seconds": self.config.claim_lease_seconds,
+                "wait_seconds": self.config.long_poll_seconds,
             },
+            extra_timeout=self.config.long_poll_seconds,
         )
         if resp.status_code == 404:
             logger.warning(
@@ -329,11 +343,12 @@ def save_copy_to_sent(
 
 
 def process_once(client: ApiClient, config: RelayConfig,
-                 dry_run: bool = False) -> int:
+                 dry_run: bool = False) -> tuple[int, int]:
+    """Один claim и отправка. Возвращает (захвачено, отправлено)."""
     # dry-run только смотрит (pending, без захвата); рабочий цикл — claim.
     items = client.pending() if dry_run else client.claim()
     if not items:
-        return 0
+        return 0, 0
     logger.info("Получено писем к отправке: %d", len(items))
     sent = 0
     for item in items:
@@ -398,7 +413,7 @@ def process_once(client: ApiClient, config: RelayConfig,
                 client.mark_error(outbox_id, str(exc), retry=True)
             except Exception:  # noqa: BLE001
                 logger.exception("Не удалось отметить ошибку #%s", outbox_id)
-    return sent
+    return len(items), sent
 
 
 class TelegramSendError(RuntimeError):
@@ -484,14 +499,14 @@ def process_telegram_once(
     client: ApiClient,
     config: RelayConfig,
     dry_run: bool = False,
-) -> int:
+) -> tuple[int, int]:
     if not config.telegram_enabled:
-        return 0
+        return 0, 0
     items = (
         client.telegram_pending() if dry_run else client.telegram_claim()
     )
     if not items:
-        return 0
+        return 0, 0
     logger.info("Получено Telegram-сообщений к отправке: %d", len(items))
     sent = 0
     for item in items:
@@ -536,7 +551,7 @@ def process_telegram_once(
                     "Не удалось отметить ошибку Telegram #%s",
                     outbox_id,
                 )
-    return sent
+    return len(items), sent
 
 
 def main() -> int:
@@ -564,14 +579,33 @@ def main() -> int:
         process_telegram_once(client, config, dry_run=args.dry_run)
         return 0
 
-    logger.info(
-        "Релей запущен. Опрос каждые %d c. Ctrl+C для остановки.",
-        config.poll_interval_seconds,
-    )
+    if config.long_poll_seconds:
+        logger.info(
+            "Релей запущен. Long-poll до %d c. Ctrl+C для остановки.",
+            config.long_poll_seconds,
+        )
+    else:
+        logger.info(
+            "Релей запущен. Опрос каждые %d c. Ctrl+C для остановки.",
+            config.poll_interval_seconds,
+        )
+    if config.telegram_enabled:
+        # Свой поток и своё HTTP-соединение: long-poll писем не должен
+        # задерживать Telegram-очередь.
+        threading.Thread(
+            target=run_loop,
+            args=(ApiClient(config), config, process_telegram_once),
+            name="telegram-relay",
+            daemon=True,
+        ).start()
+    run_loop(client, config, process_once)
+
+
+def run_loop(client: ApiClient, config: RelayConfig, process) -> None:
     while True:
+        started = time.monotonic()
         try:
-            process_once(client, config)
-            process_telegram_once(client, config)
+            claimed, sent = process(client, config)
         except requests.RequestException as exc:
             logger.warning(
                 "Сервер временно недоступен после повторных попыток: %s. "
@@ -579,8 +613,21 @@ def main() -> int:
                 exc,
                 config.poll_interval_seconds,
             )
+            claimed, sent = 0, 0
         except Exception:  # noqa: BLE001
             logger.exception("Непредвиденная ошибка в цикле релея")
+            claimed, sent = 0, 0
+        if claimed and sent == claimed:
+            # Пачка ушла целиком — сразу за следующей.
+            continue
+        if (
+            not claimed
+            and config.long_poll_seconds
+            and time.monotonic() - started >= 1
+        ):
+            # Сервер уже подержал запрос — ждать дополнительно незачем.
+            continue
+        # Ошибки отправки, недоступный сервер или сервер без long-poll.
         time.sleep(config.poll_interval_seconds)
 
 
@@ -0,0 +1,52 @@
+import argparse
+import asyncio
+import logging
+
+from dz_fastapi.core.db import get_async_session
+from dz_fastapi.services.cross_import import migrate_import_edges_to_clusters
+
+logger = logging.getLogger('dz_fastapi')
+logging.basicConfig(level=logging.INFO)
+
+
+async def main(apply_changes: bool, delete_edges: bool) -> None:
+    session_factory = get_async_session()
+    async with session_factory() as session:
+        summary = await migrate_import_edges_to_clusters(
+            session,
+            dry_run=not apply_changes,
+            delete_edges=delete_edges,
+        )
+        logger.info('Cross edges to clusters: %s', summary)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=(
+            'Convert bidirectional 1C-import AutoPartCross edges into '
+            'cross clusters (linear storage)'
+        )
+    )
+    parser.add_argument(
+        '--apply',
+        action='store_true',
+        help=(
+            'Persist changes. '
+            'Without this flag the script runs in dry-run mode.'
+        ),
+    )
+    parser.add_argument(
+        '--delete-edges',
+        action='store_true',
+        help=(
+            'Delete converted edges. Without it clusters live alongside '
+            'the edge table.'
+        ),
+    )
+    args = parser.parse_args()
+    asyncio.run(
+        main(
+            apply_changes=bool(args.apply),
+            delete_edges=bool(args.delete_edges),
+        )
+    )
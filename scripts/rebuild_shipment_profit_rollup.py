@@ -0,0 +1,37 @@
+import argparse
+import asyncio
+import logging
+from datetime import date
+
+from dz_fastapi.core.base import Base  # noqa: F401  регистрирует модели
+from dz_fastapi.core.db import get_async_session
+from dz_fastapi.services.shipment_profit import rebuild_shipment_profit_rollup
+
+logger = logging.getLogger('dz_fastapi')
+logging.basicConfig(level=logging.INFO)
+
+
+async def main(day_from: date | None) -> None:
+    session_factory = get_async_session()
+    async with session_factory() as session:
+        rows = await rebuild_shipment_profit_rollup(session, day_from=day_from)
+        await session.commit()
+        logger.info('Shipment profit rollup rebuilt: rows=%s from=%s', rows, day_from)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=(
+            'Rebuild the daily shipment profit rollup (ShipmentProfitDaily) '
+            'from posted shipment documents'
+        )
+    )
+    parser.add_argument(
+        '--from',
+        dest='day_from',
+        type=date.fromisoformat,
+        default=None,
+        help='Rebuild only days starting from YYYY-MM-DD (default: everything).',
+    )
+    args = parser.parse_args()
+    asyncio.run(main(day_from=args.day_from))
@@ -1,5 +1,12 @@
+import imaplib
 import logging
+import re
 import tempfile
+from datetime import datetime, timedelta, timezone
+from email import message_from_bytes, policy
+from email.header import Header
+from email.message import EmailMessage
+from email.utils import format_datetime
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
 
@@ -24,8 +31,13 @@ from dz_fastapi.core.base import (
 from dz_fastapi.core.config import settings
 from dz_fastapi.core.constants import get_max_file_size, get_upload_dir
 from dz_fastapi.core.db import Base, get_async_session, get_session
+from dz_fastapi.crud.pricelist_frame_cache import pricelist_frame_cache
 from dz_fastapi.main import app
 from dz_fastapi.models.user import User, UserRole, UserStatus
+from dz_fastapi.services import cpu_pool, mailbox_sync
+from dz_fastapi.services.cross_graph import cross_graph_index
+from dz_fastapi.services.imap_pool import close_imap_pool
+from dz_fastapi.services.site_offers import clear_site_offers_cache
 
 logger = logging.getLogger("dz_fastapi")
 
@@ -138,6 +150,279 @@ def _patch_email_validator(monkeypatch):
     monkeypatch.setattr(partner_mod, "validate_email", patched_validate)
 
 
+@pytest.fixture(autouse=True)
+def _clear_pricelist_frame_cache():
+    """База пересоздаётся в каждом тесте, и id прайсов повторяются."""
+    pricelist_frame_cache.invalidate()
+    yield
+    pricelist_frame_cache.invalidate()
+
+
+@pytest.fixture(autouse=True)
+def _cpu_bound_in_thread(monkeypatch):
+    """Тесты подменяют функции сборки прайса — в пуле процессов их не видно."""
+    monkeypatch.setattr(cpu_pool, "CPU_POOL_WORKERS", 0)
+
+
+@pytest.fixture(autouse=True)
+def _clear_site_offers_cache():
+    """Фейковые клиенты сайта в тестах отвечают по-разному на одни OEM."""
+    clear_site_offers_cache()
+    yield
+    clear_site_offers_cache()
+
+
+@pytest.fixture(autouse=True)
+def _mail_store_in_tmp(monkeypatch, tmp_path):
+    """Хранилище писем mailbox_sync у каждого теста своё."""
+    monkeypatch.setattr(mailbox_sync, "MAILBOX_STORE_DIR", str(tmp_path / "mail_store"))
+
+
+@pytest.fixture(autouse=True)
+def _clear_cross_graph_index():
+    """Индекс кроссов процесса строится по БД конкретного теста."""
+    cross_graph_index.clear()
+    yield
+    cross_graph_index.clear()
+
+
+@pytest.fixture(autouse=True)
+def _close_imap_pool():
+    """Соединения из пула не должны переживать фейковый сервер теста."""
+    close_imap_pool()
+    yield
+    close_imap_pool()
+
+
+class FakeImapServer:
+    """
+    Тестовый IMAP-сервер вместо настоящего ящика: папки с UIDVALIDITY,
+    письма по UID и ответы client.uid("FETCH"/…) в формате imaplib.
+    mailbox() подставляется вместо _create_mailbox потребителей.
+    """
+
+    def __init__(self):
+        self.folders: dict[str, dict] = {}
+        self.body_fetches: list[int] = []
+        # (uid, section, offset) запросов BODY.PEEK[n]<offset.length>.
+        self.part_fetches: list[tuple[int, str, int]] = []
+        self.flagged: list[tuple[str, str, tuple, bool]] = []
+        self.search_fails = False
+        self.logins = 0
+        # Сессии с номером меньше этого сервер закрыл (drop_sessions).
+        self.alive_from = 0
+
+    def _folder(self, name: str) -> dict:
+        return self.folders.setdefault(
+            name, {"uidvalidity": 1, "uidnext": 1, "messages": {}}
+        )
+
+    def add_message(
+        self,
+        folder: str = "INBOX",
+        *,
+        from_: str = "supplier@example.com",
+        subject: str = "",
+        received_at: datetime | None = None,
+        attachments: tuple = (),
+        body: str = "",
+    ) -> int:
+        received_at = received_at or datetime.now(timezone(timedelta(hours=3)))
+        if received_at.tzinfo is None:
+            received_at = received_at.replace(tzinfo=timezone(timedelta(hours=3)))
+        message = EmailMessage()
+        message["From"] = from_
+        message["To"] = "mailbox@example.com"
+        message["Subject"] = subject
+        message["Date"] = format_datetime(received_at)
+        message.set_content(body or subject or "body")
+        for filename, payload in attachments:
+            message.add_attachment(
+                payload,
+                maintype="application",
+                subtype="octet-stream",
+                filename=filename,
+            )
+        state = self._folder(folder)
+        uid = state["uidnext"]
+        state["uidnext"] += 1
+        state["messages"][uid] = (message.as_bytes(), received_at)
+        return uid
+
+    def reset_uidvalidity(self, folder: str, uidvalidity: int) -> None:
+        """Сервер перенумеровал папку: UID начинаются заново."""
+        state = self._folder(folder)
+        messages = [state["messages"][uid] for uid in sorted(state["messages"])]
+        state.update(uidvalidity=uidvalidity, uidnext=1, messages={})
+        for raw, received_at in messages:
+            state["messages"][state["uidnext"]] = (raw, received_at)
+            state["uidnext"] += 1
+
+    def drop_sessions(self) -> None:
+        """Сервер закрыл открытые сессии: NOOP и FETCH в них падают."""
+        self.alive_from = self.logins + 1
+
+    def mailbox(self, *_args, **_kwargs) -> "_FakeMailBox":
+        return _FakeMailBox(self)
+
+
+class _FakeImapFolder:
+    def __init__(self, mailbox: "_FakeMailBox"):
+        self.mailbox = mailbox
+        self.current = None
+
+    def set(self, folder: str) -> None:
+        self.current = folder
+        self.mailbox.server._folder(folder)
+
+    def status(self, folder: str, options=None) -> dict:
+        state = self.mailbox.server._folder(folder)
+        return {"UIDVALIDITY": state["uidvalidity"], "UIDNEXT": state["uidnext"]}
+
+
+class _FakeImapClient:
+    def __init__(self, mailbox: "_FakeMailBox"):
+        self.mailbox = mailbox
+
+    def _selected_uids(self, sequence: str) -> list[int]:
+        messages = self.mailbox.selected()["messages"]
+        max_uid = max(messages, default=0)
+        selected: set[int] = set()
+        for part in sequence.split(","):
+            start, _, end = part.partition(":")
+            low = int(start)
+            high = low if not end else (max_uid if end == "*" else int(end))
+            low, high = min(low, high), max(low, high)
+            selected.update(uid for uid in messages if low <= uid <= high)
+        return sorted(selected)
+
+    def noop(self):
+        if self.mailbox.dropped:
+            raise imaplib.IMAP4.abort("socket error: EOF")
+        return "OK", [b"NOOP completed"]
+
+    def uid(self, command: str, sequence: str, parts: str):
+        assert command == "FETCH"
+        if self.mailbox.dropped:
+            raise imaplib.IMAP4.abort("socket error: EOF")
+        messages = self.mailbox.selected()["messages"]
+        data: list = []
+        for index, uid in enumerate(self._selected_uids(sequence), start=1):
+            raw, received_at = messages[uid]
+            meta = f"{index} (UID {uid}"
+            if "INTERNALDATE" in parts:
+                meta += f' INTERNALDATE "{received_at.strftime("%d-%b-%Y %H:%M:%S %z")}"'
+            if "RFC822.SIZE" in parts:
+                meta += f" RFC822.SIZE {len(raw)}"
+            if "BODYSTRUCTURE" in parts:
+                message = message_from_bytes(raw, policy=policy.default)
+                meta += f" BODYSTRUCTURE {_fake_bodystructure(message)}"
+            section = re.search(r"BODY\.PEEK\[([^\]]*)\](?:<(\d+)\.(\d+)>)?", parts)
+            if section is None:
+                data.append(f"{meta})".encode())
+                continue
+            name, offset, length = section.groups()
+            if name == "":
+                self.mailbox.server.body_fetches.append(uid)
+                content = raw
+            elif name == "HEADER":
+                content = raw[: raw.index(b"\n\n") + 2]
+            else:
+                content = _fake_section(message_from_bytes(raw, policy=policy.default), name)
+            if offset is not None:
+                self.mailbox.server.part_fetches.append((uid, name, int(offset)))
+                content = content[int(offset):][: int(length)]
+                name = f"{name}]<{offset}>"
+            else:
+                name = f"{name}]"
+            data.append((f"{meta} BODY[{name} {{{len(content)}}}".encode(), content))
+            data.append(b")")
+        return "OK", data or [None]
+
+
+def _fake_quote(value: str) -> str:
+    if not value.isascii():
+        value = Header(value, "utf-8").encode()
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _fake_bodystructure(part) -> str:
+    if part.is_multipart():
+        children = "".join(_fake_bodystructure(child) for child in part.get_payload())
+        return f'({children} "{part.get_content_subtype()}" ("boundary" "b") NIL NIL NIL)'
+    payload = part.get_payload(decode=False).encode("utf-8", "surrogateescape")
+    filename = part.get_filename()
+    disposition = (
+        f'("{part.get_content_disposition()}" ("filename" {_fake_quote(filename)}))'
+        if filename
+        else "NIL"
+    )
+    lines = f" {payload.count(b'\n')}" if part.get_content_maintype() == "text" else ""
+    return (
+        f'("{part.get_content_maintype()}" "{part.get_content_subtype()}" NIL NIL NIL '
+        f'"{part.get("Content-Transfer-Encoding", "7bit")}" {len(payload)}{lines} '
+        f"NIL {disposition} NIL NIL)"
+    )
+
+
+def _fake_section(message, section: str) -> bytes:
+    part = message
+    for index in section.split("."):
+        if part.is_multipart():
+            part = part.get_payload()[int(index) - 1]
+    return part.get_payload(decode=False).encode("utf-8", "surrogateescape")
+
+
+class _FakeMailBox:
+    def __init__(self, server: FakeImapServer):
+        self.server = server
+        self.folder = _FakeImapFolder(self)
+        self.client = _FakeImapClient(self)
+        self.session = None
+
+    @property
+    def dropped(self) -> bool:
+        return self.session is not None and self.session < self.server.alive_from
+
+    def login(self, *_args, **_kwargs):
+        self.server.logins += 1
+        self.session = self.server.logins
+        return self
+
+    def logout(self):
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        return False
+
+    def selected(self) -> dict:
+        return self.server._folder(self.folder.current)
+
+    def uids(self, criteria, charset=None) -> list[str]:
+        if self.server.search_fails:
+            raise RuntimeError("[UNAVAILABLE] UID SEARCH Backend error.")
+        since = re.search(r"SINCE (\d{1,2}-\w{3}-\d{4})", str(criteria))
+        since_date = datetime.strptime(since.group(1), "%d-%b-%Y").date() if since else None
+        return [
+            str(uid)
+            for uid, (_, received_at) in sorted(self.selected()["messages"].items())
+            if since_date is None or received_at.date() >= since_date
+        ]
+
+    def flag(self, uid_list, flag_set, value):
+        uids = (uid_list,) if isinstance(uid_list, str) else tuple(uid_list)
+        for uid in uids:
+            self.server.flagged.append((self.folder.current, str(uid), tuple(flag_set), value))
+
+
+@pytest.fixture
+def fake_imap_server() -> FakeImapServer:
+    return FakeImapServer()
+
+
 @pytest_asyncio.fixture
 async def created_providers(test_session: AsyncSession) -> list[Provider]:
     providers_data = [
@@ -4,6 +4,7 @@ from decimal import Decimal
 
 import pytest
 from httpx import ASGITransport, AsyncClient
+from sqlalchemy import insert
 
 from dz_fastapi.api.deps import get_current_user
 from dz_fastapi.crud.autopart import crud_autopart
@@ -76,6 +77,86 @@ async def test_create_autopart_uses_fallback_for_barcode_collision(
     assert second.barcode != first.barcode
 
 
+@pytest.mark.asyncio
+async def test_bulk_create_from_price_matches_per_row_creation(test_session):
+    short_brand = Brand(name="A")
+    long_brand = Brand(name="AB")
+    test_session.add_all([short_brand, long_brand])
+    await test_session.commit()
+    await test_session.refresh(short_brand)
+    await test_session.refresh(long_brand)
+    existing = await crud_autopart.create_autopart(
+        AutoPartCreate(brand_id=short_brand.id, oem_number="BC", name="First"),
+        short_brand,
+        test_session,
+    )
+
+    resolved = await crud_autopart.bulk_create_from_price(
+        [
+            (short_brand, {"oem_number": "BC", "name": "dup", "brand": None}),
+            (long_brand, {"oem_number": "C", "name": "деталь haval", "brand": None}),
+            (long_brand, {"oem_number": "NEW1", "name": "new", "multiplicity": 4}),
+            (long_brand, {"oem_number": "NONAME", "name": None}),
+        ],
+        test_session,
+    )
+    await test_session.commit()
+
+    assert set(resolved) == {
+        ("BC", short_brand.id),
+        ("C", long_brand.id),
+        ("NEW1", long_brand.id),
+    }
+    assert resolved[("BC", short_brand.id)] == existing.id
+    created = await test_session.get(AutoPart, resolved[("C", long_brand.id)])
+    assert created.name == "Деталь HAVAL"
+    # Штрихкод "ABC" уже занят — как и при создании по одной, берём запасной.
+    assert created.barcode.startswith("ABC~")
+    assert created.purchase_price == Decimal("0")
+    assert created.comment == ""
+    new_part = await test_session.get(AutoPart, resolved[("NEW1", long_brand.id)])
+    assert new_part.multiplicity == 4
+    assert new_part.barcode == "ABNEW1"
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_from_price_falls_back_on_barcode_collision(
+    test_session, monkeypatch
+):
+    brand = Brand(name="COLL")
+    test_session.add(brand)
+    await test_session.commit()
+    await test_session.refresh(brand)
+    original_assign = crud_autopart._assign_price_barcodes
+
+    async def _assign_and_steal_barcode(rows, brand_names, session):
+        await original_assign(rows, brand_names, session)
+        # Параллельный импорт занял штрихкод после проверки: пакетный
+        # INSERT упадёт на уникальности barcode, а не на (brand, oem).
+        await session.execute(
+            insert(AutoPart).values(dict(rows[0], oem_number="TAKEN"))
+        )
+
+    monkeypatch.setattr(
+        crud_autopart, "_assign_price_barcodes", _assign_and_steal_barcode
+    )
+    resolved = await crud_autopart.bulk_create_from_price(
+        [
+            (brand, {"oem_number": "X1", "name": "first"}),
+            (brand, {"oem_number": "X2", "name": "second"}),
+        ],
+        test_session,
+    )
+    await test_session.commit()
+
+    assert set(resolved) == {("X1", brand.id), ("X2", brand.id)}
+    first = await test_session.get(AutoPart, resolved[("X1", brand.id)])
+    second = await test_session.get(AutoPart, resolved[("X2", brand.id)])
+    assert first.oem_number == "X1"
+    assert first.barcode.startswith("COLLX1~")
+    assert second.barcode == "COLLX2"
+
+
 @pytest.mark.asyncio
 async def test_create_autopart(test_session, created_brand: Brand):
     payload = TEST_AUTOPART
@@ -1,12 +1,15 @@
+import random
 from datetime import date, timedelta
 
 from dz_fastapi.core.time import now_moscow
 from dz_fastapi.services.autopurchase import (
+    AUTOPURCHASE_DEMAND_WINDOWS,
     _apply_recovery_mode,
     _blend_average_daily_horizons,
     _brand_matches_allowed,
     _build_autopurchase_draft,
     _calculate_in_stock_days,
+    _calculate_snapshot_sales,
     _compute_availability_adjusted_daily,
     _estimate_consecutive_stockout_days,
     _evaluate_autopurchase_auto_send_gate,
@@ -21,6 +24,7 @@ from dz_fastapi.services.autopurchase import (
     _select_best_site_supplier_by_lead_time,
     _select_best_site_supplier_by_price,
 )
+from dz_fastapi.services.snapshot_matrix import SnapshotMatrix
 
 
 def test_select_best_site_supplier_by_price_ignores_non_positive_qty():
@@ -413,6 +417,63 @@ def test_calculate_in_stock_days_counts_only_positive_spans():
     assert in_stock["OEM1"] == 15
 
 
+def test_snapshot_matrix_matches_per_oem_snapshot_functions():
+    rng = random.Random(20261017)
+    today = now_moscow().date()
+    oems = [f"OEM{index}" for index in range(40)]
+    snapshot_dates = sorted(
+        today - timedelta(days=rng.randint(0, 400)) for _ in range(60)
+    )
+    snapshots = [
+        {
+            "pricelist_date": snapshot_date,
+            "qty_by_oem": {
+                oem: rng.choice((0, 0, -1, 1, 2, 5, 10))
+                for oem in oems
+                if rng.random() < 0.8
+            },
+        }
+        for snapshot_date in snapshot_dates
+    ]
+    # Последний снапшот с серией нулей у части позиций.
+    snapshots.append(
+        {"pricelist_date": today, "qty_by_oem": {oem: 0 for oem in oems[:10]}}
+    )
+    received = {
+        oem: {
+            today - timedelta(days=rng.randint(0, 420)): rng.randint(1, 6)
+            for _ in range(rng.randint(0, 8))
+        }
+        for oem in oems[::2]
+    }
+    # Поставка на дату снапшота относится к паре, где она правая граница.
+    received[oems[1]] = {snapshot_dates[5]: 7}
+
+    matrix = SnapshotMatrix(
+        snapshots, oems, received_qty_by_oem_and_date=received, today=today
+    )
+    sales = matrix.sales_by_window(AUTOPURCHASE_DEMAND_WINDOWS)
+    in_stock = matrix.in_stock_days_by_window(AUTOPURCHASE_DEMAND_WINDOWS)
+    for days in AUTOPURCHASE_DEMAND_WINDOWS:
+        assert sales[days] == _calculate_snapshot_sales(
+            snapshots,
+            oems,
+            days=days,
+            received_qty_by_oem_and_date=received,
+        )
+        assert in_stock[days] == _calculate_in_stock_days(snapshots, oems, days=days)
+    assert matrix.consecutive_stockout_days() == {
+        oem: _estimate_consecutive_stockout_days(snapshots, oem_number=oem)
+        for oem in oems
+    }
+
+    empty = SnapshotMatrix([], oems, today=today)
+    assert empty.sales_by_window([30])[30] == _calculate_snapshot_sales([], oems, days=30)
+    assert empty.in_stock_days_by_window([30])[30] == _calculate_in_stock_days(
+        [], oems, days=30
+    )
+
+
 def test_get_target_cover_days_differentiated_by_abc():
     assert _get_target_cover_days("A") == 45
     assert _get_target_cover_days("B") == 30
@@ -0,0 +1,176 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dz_fastapi.core.time import now_moscow
+from dz_fastapi.crud import bulk as bulk_crud
+from dz_fastapi.models.autopart import AutoPart, AutoPartPriceHistory
+from dz_fastapi.models.brand import Brand
+from dz_fastapi.models.partner import PriceList, PriceListAutoPartAssociation, Provider
+
+
+async def _create_autoparts(session: AsyncSession, brand: Brand, count: int) -> list[int]:
+    autoparts = [
+        AutoPart(
+            brand_id=brand.id,
+            oem_number=f"BULK{idx:03d}",
+            name=f"Bulk part {idx}",
+            barcode=f"BULK-{idx:03d}",
+        )
+        for idx in range(count)
+    ]
+    session.add_all(autoparts)
+    await session.flush()
+    return [autopart.id for autopart in autoparts]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("use_copy", [False, True])
+async def test_bulk_insert_rows_writes_same_rows_with_copy_and_executemany(
+    created_providers: list[Provider],
+    created_brand: Brand,
+    test_session: AsyncSession,
+    use_copy: bool,
+    monkeypatch,
+):
+    connection = await test_session.connection()
+    if use_copy and connection.dialect.driver != "asyncpg":
+        pytest.skip("COPY доступен только через asyncpg")
+    copy_results = []
+    original_copy_rows = bulk_crud.copy_rows
+
+    async def _spy_copy_rows(session, model, rows, columns=None):
+        result = await original_copy_rows(session, model, rows, columns)
+        copy_results.append(result)
+        return result
+
+    monkeypatch.setattr(bulk_crud, "copy_rows", _spy_copy_rows)
+    provider = created_providers[0]
+    autopart_ids = await _create_autoparts(test_session, created_brand, 5)
+    pricelist = PriceList(provider_id=provider.id)
+    test_session.add(pricelist)
+    await test_session.flush()
+    created_at = now_moscow()
+
+    associations = [
+        {
+            "pricelist_id": pricelist.id,
+            "autopart_id": autopart_id,
+            "quantity": idx + 1,
+            "price": Decimal("10.50") + idx,
+            "multiplicity": 1,
+        }
+        for idx, autopart_id in enumerate(autopart_ids)
+    ]
+    history = [
+        {
+            "autopart_id": autopart_id,
+            "provider_id": provider.id,
+            "provider_config_id": None,
+            "pricelist_id": pricelist.id,
+            "created_at": created_at,
+            "price": Decimal("10.50") + idx,
+            "quantity": idx + 1,
+        }
+        for idx, autopart_id in enumerate(autopart_ids)
+    ]
+
+    await bulk_crud.bulk_insert_rows(
+        test_session, PriceListAutoPartAssociation, associations, use_copy=use_copy
+    )
+    await bulk_crud.bulk_insert_rows(
+        test_session, AutoPartPriceHistory, history, use_copy=use_copy
+    )
+    await test_session.commit()
+    assert copy_results == ([True, True] if use_copy else [])
+
+    stored_assoc = (
+        await test_session.execute(
+            select(
+                PriceListAutoPartAssociation.autopart_id,
+                PriceListAutoPartAssociation.quantity,
+                PriceListAutoPartAssociation.price,
+            )
+            .where(PriceListAutoPartAssociation.pricelist_id == pricelist.id)
+            .order_by(PriceListAutoPartAssociation.autopart_id)
+        )
+    ).all()
+    assert [tuple(row) for row in stored_assoc] == [
+        (row["autopart_id"], row["quantity"], row["price"]) for row in associations
+    ]
+    stored_history = (
+        await test_session.execute(
+            select(AutoPartPriceHistory.id, AutoPartPriceHistory.price).where(
+                AutoPartPriceHistory.pricelist_id == pricelist.id
+            )
+        )
+    ).all()
+    assert len(stored_history) == len(history)
+    assert all(row.id is not None for row in stored_history)
+
+
+@pytest.mark.asyncio
+async def test_bulk_insert_rows_uses_copy_only_for_large_batches(
+    test_session: AsyncSession,
+    monkeypatch,
+):
+    calls = []
+
+    async def _fake_copy_rows(session, model, rows, columns=None):
+        calls.append(len(rows))
+        return False
+
+    monkeypatch.setattr(bulk_crud, "copy_rows", _fake_copy_rows)
+    monkeypatch.setattr(bulk_crud, "BULK_COPY_MIN_ROWS", 3)
+    rows = [{"name": f"BULKBRAND{idx}"} for idx in range(5)]
+
+    assert await bulk_crud.bulk_insert_rows(test_session, Brand, rows[:2]) == 2
+    assert calls == []
+    # COPY недоступен (например, SQLite) — остаётся обычный INSERT.
+    assert await bulk_crud.bulk_insert_rows(test_session, Brand, rows[2:]) == 3
+    assert calls == [3]
+    total = (await test_session.execute(select(Brand.id))).scalars().all()
+    assert len(total) == 5
+
+
+@pytest.mark.asyncio
+async def test_bulk_insert_rows_falls_back_to_insert_for_column_defaults(
+    created_providers: list[Provider],
+    created_brand: Brand,
+    test_session: AsyncSession,
+):
+    provider = created_providers[0]
+    autopart_ids = await _create_autoparts(test_session, created_brand, 3)
+    pricelist = PriceList(provider_id=provider.id)
+    test_session.add(pricelist)
+    await test_session.flush()
+
+    # multiplicity не передан: COPY записал бы NULL вместо default=1.
+    rows = [
+        {
+            "pricelist_id": pricelist.id,
+            "autopart_id": autopart_id,
+            "quantity": 1,
+            "price": Decimal("5.00"),
+        }
+        for autopart_id in autopart_ids
+    ]
+    assert bulk_crud._copy_columns(PriceListAutoPartAssociation, rows) is None
+    assert await bulk_crud.copy_rows(test_session, PriceListAutoPartAssociation, rows) is False
+    # Разный набор ключей в строках тоже не подходит для COPY.
+    mixed = [dict(row, multiplicity=2) for row in rows[:2]] + rows[2:]
+    assert bulk_crud._copy_columns(PriceListAutoPartAssociation, mixed) is None
+
+    await bulk_crud.bulk_insert_rows(
+        test_session, PriceListAutoPartAssociation, rows, use_copy=True
+    )
+    multiplicities = (
+        await test_session.execute(
+            select(PriceListAutoPartAssociation.multiplicity).where(
+                PriceListAutoPartAssociation.pricelist_id == pricelist.id
+            )
+        )
+    ).scalars().all()
+    assert multiplicities == [1, 1, 1]
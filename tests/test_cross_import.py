@@ -1,4 +1,19 @@
-from dz_fastapi.services.cross_import import _is_junk_oem, _normalize_oem, group_rows_by_identifier
+import pytest
+from sqlalchemy import select
+
+from dz_fastapi.models.autopart import AutoPart
+from dz_fastapi.models.brand import Brand
+from dz_fastapi.models.cross import AutoPartCross, AutoPartCrossClusterMember
+from dz_fastapi.services import crosses
+from dz_fastapi.services.cross_import import (
+    CROSS_IMPORT_COMMENT,
+    _is_junk_oem,
+    _normalize_oem,
+    group_rows_by_identifier,
+    import_crosses_from_file,
+    migrate_import_edges_to_clusters,
+)
+from dz_fastapi.services.crosses import resolve_bidirectional_cross_component_ids
 
 
 def test_group_rows_by_identifier_groups_and_normalizes():
@@ -40,3 +55,91 @@ def test_is_junk_oem():
 def test_normalize_oem_uppercases_and_strips():
     assert _normalize_oem(" dz12-34/5 ") == _normalize_oem("DZ12345")
     assert _normalize_oem(None) == ""
+
+
+@pytest.mark.asyncio
+async def test_import_stores_group_as_cluster_and_readers_resolve_it(test_session):
+    brand = Brand(name="CLUSTER")
+    test_session.add(brand)
+    await test_session.flush()
+    parts = [
+        AutoPart(name=f"Part {oem}", brand_id=brand.id, oem_number=oem)
+        for oem in ("CL0001", "CL0002", "CL0003", "CL0004")
+    ]
+    test_session.add_all(parts)
+    await test_session.flush()
+    await test_session.commit()
+    content = (
+        "Идентификатор;Номер\n"
+        "g1;CL0001\ng1;CL0002\ng1;CL0003\ng1;CL0004\ng1;MISSING01\n"
+    ).encode()
+
+    preview = await import_crosses_from_file(
+        test_session, content=content, filename="crosses.csv", dry_run=True
+    )
+    assert (preview["clusters_created"], preview["cluster_members_added"]) == (1, 4)
+    result = await import_crosses_from_file(
+        test_session, content=content, filename="crosses.csv", dry_run=False
+    )
+
+    # Группа из 4 позиций — 4 строки членства вместо 12 рёбер.
+    assert result["crosses_created"] == 0
+    assert result["cluster_members_added"] == 4
+    members = (
+        await test_session.execute(select(AutoPartCrossClusterMember.autopart_id))
+    ).scalars().all()
+    assert sorted(members) == sorted(part.id for part in parts)
+    assert (await test_session.execute(select(AutoPartCross))).first() is None
+
+    expected = {part.id for part in parts}
+    assert await resolve_bidirectional_cross_component_ids(
+        test_session, seed_autopart_ids=[parts[0].id]
+    ) == expected
+    # Обход по БД (есть незакоммиченные изменения) видит тот же кластер,
+    # исключённая позиция клику не разрывает.
+    assert await crosses._resolve_component_ids_from_db(
+        test_session, seed_autopart_ids=[parts[0].id], excluded_ids={parts[1].id}
+    ) == expected - {parts[1].id}
+
+    again = await import_crosses_from_file(
+        test_session, content=content, filename="crosses.csv", dry_run=False
+    )
+    assert (again["clusters_created"], again["cluster_members_added"]) == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_migrate_import_edges_to_clusters(test_session):
+    brand = Brand(name="EDGES")
+    test_session.add(brand)
+    await test_session.flush()
+    parts = [
+        AutoPart(name=f"Part {oem}", brand_id=brand.id, oem_number=oem)
+        for oem in ("ED0001", "ED0002", "ED0003")
+    ]
+    test_session.add_all(parts)
+    await test_session.flush()
+    for left, right in ((parts[0], parts[1]), (parts[1], parts[2])):
+        for src, dst in ((left, right), (right, left)):
+            test_session.add(
+                AutoPartCross(
+                    source_autopart_id=src.id,
+                    cross_brand_id=brand.id,
+                    cross_oem_number=dst.oem_number,
+                    cross_autopart_id=dst.id,
+                    is_bidirectional=True,
+                    comment=CROSS_IMPORT_COMMENT,
+                )
+            )
+    await test_session.commit()
+
+    summary = await migrate_import_edges_to_clusters(
+        test_session, dry_run=False, delete_edges=True
+    )
+
+    assert (summary["clusters_created"], summary["edges_deleted"]) == (1, 4)
+    assert (await test_session.execute(select(AutoPartCross))).first() is None
+    assert await resolve_bidirectional_cross_component_ids(
+        test_session, seed_autopart_ids=[parts[2].id]
+    ) == {part.id for part in parts}
+    rerun = await migrate_import_edges_to_clusters(test_session, dry_run=False)
+    assert rerun["clusters_created"] == 0
@@ -1,11 +1,17 @@
+import numpy as np
 import pytest
 from sqlalchemy import select
 
 from dz_fastapi.models.autopart import AutoPart
 from dz_fastapi.models.brand import Brand
 from dz_fastapi.models.cross import AutoPartCross
+from dz_fastapi.services import crosses
+from dz_fastapi.services.cross_graph import CrossGraphIndex, cross_graph_index
 from dz_fastapi.services.crosses import (
+    delete_cross_relation,
+    get_cross_row,
     load_bidirectional_cross_members,
+    resolve_bidirectional_cross_component_ids,
     save_cross_relation,
     sync_automatic_oem_crosses,
 )
@@ -214,3 +220,114 @@ async def test_load_bidirectional_cross_members_resolves_transitive_group(
         (part_b.id, "B123"),
         (part_c.id, "C123"),
     }
+
+
+def test_cross_graph_index_components_and_exclusions():
+    index = CrossGraphIndex()
+    index.load_edges(
+        np.array([1, 2, 3, 10, 5], dtype=np.int64),
+        np.array([2, 3, 4, 11, 5], dtype=np.int64),
+    )
+
+    assert index.component_ids([1], set()) == {1, 2, 3, 4}
+    assert index.component_id(4) == index.component_id(1)
+    assert index.component_id(5) is None
+    # Исключённая позиция разрывает цепочку 1-2-3-4.
+    assert index.component_ids([1], {3}) == {1, 2}
+    assert index.component_ids([99], set()) == {99}
+
+    index.add_edge(4, 10)
+    assert index.component_ids([11], set()) == {1, 2, 3, 4, 10, 11}
+    assert index.component_ids([11], {4}) == {10, 11}
+
+
+def test_cross_graph_index_clusters_are_cliques():
+    index = CrossGraphIndex()
+    index.load_edges(
+        np.array([1], dtype=np.int64),
+        np.array([2], dtype=np.int64),
+        np.array([7, 7, 7, 8, 8], dtype=np.int64),
+        np.array([2, 20, 21, 30, 31], dtype=np.int64),
+    )
+
+    assert index.component_ids([1], set()) == {1, 2, 20, 21}
+    # Исключённый член кластера не разрывает связь остальных.
+    assert index.component_ids([21], {2}) == {20, 21}
+    assert index.component_ids([30], set()) == {30, 31}
+
+    index.add_cluster(8, [31, 40])
+    assert index.component_ids([40], {31}) == {30, 40}
+
+
+@pytest.mark.asyncio
+async def test_cross_components_come_from_index_kept_in_sync_on_commit(
+    test_session,
+    monkeypatch,
+):
+    brand = Brand(name="GRAPH")
+    test_session.add(brand)
+    await test_session.flush()
+    parts = [
+        AutoPart(name=f"Part {oem}", brand_id=brand.id, oem_number=oem)
+        for oem in ("G1", "G2", "G3")
+    ]
+    test_session.add_all(parts)
+    await test_session.flush()
+    part_1, part_2, part_3 = parts
+    await save_cross_relation(
+        test_session,
+        source_autopart=part_1,
+        cross_brand_id=brand.id,
+        cross_oem_number="G2",
+    )
+    await test_session.commit()
+
+    builds = []
+    real_build = cross_graph_index.build
+
+    async def counting_build(session):
+        builds.append(1)
+        await real_build(session)
+
+    async def forbidden_db_walk(*_args, **_kwargs):
+        raise AssertionError("component must come from the index")
+
+    monkeypatch.setattr(cross_graph_index, "build", counting_build)
+    monkeypatch.setattr(crosses, "_resolve_component_ids_from_db", forbidden_db_walk)
+
+    seed = [part_1.id]
+    assert await resolve_bidirectional_cross_component_ids(
+        test_session, seed_autopart_ids=seed
+    ) == {part_1.id, part_2.id}
+
+    # Новое ребро попадает в индекс после commit, без перестройки.
+    await save_cross_relation(
+        test_session,
+        source_autopart=part_2,
+        cross_brand_id=brand.id,
+        cross_oem_number="G3",
+    )
+    await test_session.commit()
+    assert await resolve_bidirectional_cross_component_ids(
+        test_session, seed_autopart_ids=seed
+    ) == {part_1.id, part_2.id, part_3.id}
+    assert len(builds) == 1
+
+    # Удаление помечает индекс устаревшим — он перестраивается.
+    cross = await get_cross_row(
+        test_session,
+        source_autopart_id=part_2.id,
+        cross_brand_id=brand.id,
+        cross_oem_number="G3",
+    )
+    await delete_cross_relation(
+        test_session,
+        cross=cross,
+        source_brand_id=brand.id,
+        source_oem_number="G2",
+    )
+    await test_session.commit()
+    assert await resolve_bidirectional_cross_component_ids(
+        test_session, seed_autopart_ids=seed
+    ) == {part_1.id, part_2.id}
+    assert len(builds) == 2
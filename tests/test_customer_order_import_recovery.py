@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 import pytest
 
 from dz_fastapi.models.email_account import EmailAccount
@@ -12,46 +14,61 @@ from dz_fastapi.services.customer_orders import _fetch_order_messages, _is_resum
 
 
 @pytest.mark.asyncio
-async def test_fetch_order_messages_combines_new_and_recovery_uids(monkeypatch):
-    captured = {}
-
-    class FakeFolder:
-        def set(self, folder):
-            captured["folder"] = folder
-
-    class FakeMailbox:
-        folder = FakeFolder()
-
-        def login(self, email, password):
-            return self
-
-        def fetch(self, criteria, **kwargs):
-            captured["criteria"] = criteria
-            return []
-
-        def logout(self):
-            return None
+async def test_fetch_order_messages_combines_new_and_recovery_uids(
+    monkeypatch, fake_imap_server
+):
+    now = customer_order_service.now_moscow()
+    old_uids = [
+        fake_imap_server.add_message(
+            from_="client@example.com",
+            subject=f"Старый заказ {idx}",
+            received_at=now - timedelta(days=30),
+        )
+        for idx in range(3)
+    ]
+    seen_uid = fake_imap_server.add_message(from_="client@example.com", subject="Заказ")
+    new_uid = fake_imap_server.add_message(from_="client@example.com", subject="Новый заказ")
+    other_uid = fake_imap_server.add_message(from_="spam@example.com", subject="Реклама")
+    monkeypatch.setattr(customer_order_service, "_create_mailbox", fake_imap_server.mailbox)
 
-    monkeypatch.setattr(
-        customer_order_service,
-        "_create_mailbox",
-        lambda *args, **kwargs: FakeMailbox(),
+    messages = await _fetch_order_messages(
+        "imap.example.com",
+        "orders@example.com",
+        "password",
+        "INBOX",
+        now.date(),
+        False,
+        last_uid=seen_uid,
+        additional_uids={old_uids[0], old_uids[2]},
     )
 
+    assert [message.uid for message in messages] == [
+        str(old_uids[0]),
+        str(old_uids[2]),
+        str(new_uid),
+        str(other_uid),
+    ]
+    assert {message.folder_name for message in messages} == {"INBOX"}
+    # Старое письмо вне окна, не запрошенное явно, не скачивается.
+    assert old_uids[1] not in fake_imap_server.body_fetches
+    assert fake_imap_server.flagged == []
+
+    fake_imap_server.body_fetches.clear()
     messages = await _fetch_order_messages(
         "imap.example.com",
         "orders@example.com",
         "password",
         "INBOX",
-        customer_order_service.now_moscow().date(),
-        False,
-        last_uid=1300,
-        additional_uids={1210, 1205},
+        now.date(),
+        True,
+        allowed_senders={"client@example.com"},
     )
 
-    assert messages == []
-    assert captured["folder"] == "INBOX"
-    assert captured["criteria"] == "UID 1205,1210,1301:*"
+    assert [message.subject for message in messages] == ["Заказ", "Новый заказ"]
+    assert fake_imap_server.body_fetches == []
+    assert fake_imap_server.flagged == [
+        ("INBOX", str(uid), ("\\Seen",), True) for uid in (seen_uid, new_uid, other_uid)
+    ]
 
 
 @pytest.mark.asyncio
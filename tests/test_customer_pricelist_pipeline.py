@@ -1,3 +1,4 @@
+import os
 from datetime import date
 from types import SimpleNamespace
 
@@ -22,6 +23,7 @@ from dz_fastapi.models.partner import (
     ProviderPriceListConfig,
 )
 from dz_fastapi.schemas.partner import CustomerPriceListCreate
+from dz_fastapi.services import cpu_pool
 from dz_fastapi.services import process as process_service
 from dz_fastapi.services.process import (
     CUSTOMER_PRICELIST_PIPELINE_DEFAULT,
@@ -161,6 +163,120 @@ def test_pipeline_order_is_complete_and_respects_required_dependencies():
     assert result[-1] == "quality_control"
 
 
+def _kernel_inputs():
+    config = SimpleNamespace(
+        id=1,
+        customer_id=1,
+        general_markup=10,
+        own_price_list_markup=1.0,
+        third_party_markup=1.0,
+        individual_markups={},
+        default_filters={},
+        brand_filters=[],
+        category_filter=[],
+        price_intervals=[],
+        position_filters=[],
+        supplier_quantity_filters=[],
+        additional_filters={},
+        own_filters={},
+        other_filters={},
+        supplier_filters={},
+        collapse_duplicates_by_min_price=True,
+    )
+
+    def _source(source_id: int, markup: float) -> SimpleNamespace:
+        return SimpleNamespace(
+            id=source_id,
+            provider_config_id=source_id,
+            markup=markup,
+            brand_markups={},
+            mask_price_quantity=False,
+            brand_filters={},
+            position_filters={},
+            min_price=None,
+            max_price=None,
+            min_quantity=None,
+            max_quantity=None,
+            additional_filters={},
+        )
+
+    def _frame(provider_id: int, prices: list[float]) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                "autopart_id": [provider_id * 10 + idx for idx in range(len(prices))],
+                "provider_id": provider_id,
+                "provider_config_id": provider_id,
+                "is_own_price": False,
+                "brand_id": 74,
+                "brand": "GEELY",
+                "oem_number": [f"106400{idx}" for idx in range(len(prices))],
+                "name": "Деталь",
+                "price": prices,
+                "quantity": 3,
+            }
+        )
+
+    source_frames = [
+        {
+            "frame": _frame(1, [100.0, 200.0, 300.0]),
+            "source": _source(1, 1.0),
+            "pricelist_id": 11,
+            "dragonzap_mode": "normal",
+        },
+        {
+            "frame": _frame(2, [90.0, 250.0]),
+            "source": _source(2, 1.2),
+            "pricelist_id": 12,
+            "dragonzap_mode": "normal",
+        },
+    ]
+    return source_frames, config
+
+
+def test_pricelist_build_kernel_collapses_sources_with_overrides_and_exclusions():
+    source_frames, config = _kernel_inputs()
+
+    result, summary = process_service.build_customer_pricelist_frame(
+        source_frames,
+        config,
+        overrides={12: 50.0},
+        excluded_supplier_positions={1: [11]},
+    )
+
+    prices = dict(zip(result["oem_number"], result["price"]))
+    # 1064000: 100*1.1 у первого против 90*1.1*1.2 у второго.
+    assert prices["1064000"] == pytest.approx(110.0)
+    # Позиция 11 исключена у поставщика 1, остаётся предложение второго.
+    assert prices["1064001"] == pytest.approx(250 * 1.1 * 1.2)
+    # Ручная цена заменяет цену после наценок.
+    assert prices["1064002"] == pytest.approx(50.0)
+    assert [item["rows_after"] for item in summary] == [3, 2]
+
+
+@pytest.mark.asyncio
+async def test_pricelist_build_kernel_runs_in_process_pool(monkeypatch):
+    source_frames, config = _kernel_inputs()
+    expected, expected_summary = process_service.build_customer_pricelist_frame(
+        source_frames, config, overrides={12: 50.0}
+    )
+
+    monkeypatch.setattr(cpu_pool, "CPU_POOL_WORKERS", 1)
+    try:
+        result, summary = await cpu_pool.run_cpu_bound(
+            process_service.build_customer_pricelist_frame,
+            source_frames,
+            config,
+            overrides={12: 50.0},
+        )
+        worker_pid = await cpu_pool.run_cpu_bound(os.getpid)
+    finally:
+        cpu_pool.shutdown_cpu_pool()
+
+    assert worker_pid != os.getpid()
+    pd.testing.assert_frame_equal(result, expected)
+    assert summary == expected_summary
+
+
 @pytest.mark.asyncio
 async def test_v2_pipeline_transforms_filtered_dragonzap_into_original_draft(
     test_session: AsyncSession,
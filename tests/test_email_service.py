@@ -1,12 +1,18 @@
+import asyncio
 import base64
+import threading
+import time
 from datetime import date, datetime
 from types import SimpleNamespace
 
 import pytest
 
+from dz_fastapi.services import email as email_service
+from dz_fastapi.services import mailbox_sync
 from dz_fastapi.services.email import (
     GMAIL_API_SEND_URL,
     _attachment_name_matches_pattern,
+    _fetch_mailbox_messages,
     _price_email_since_date,
     _scheduled_price_email_since_date,
     build_email_delivery_kwargs,
@@ -301,6 +307,73 @@ async def test_get_emails_continues_after_account_fetch_error(monkeypatch):
     assert result == []
 
 
+@pytest.mark.asyncio
+async def test_get_emails_polls_accounts_in_parallel_and_records_latency(
+    monkeypatch,
+    fake_imap_server,
+):
+    accounts = [
+        SimpleNamespace(
+            id=idx,
+            email=f"prices{idx}@example.com",
+            transport="smtp",
+            imap_host="imap.example.com",
+            password="secret",
+            imap_folder="INBOX",
+            imap_additional_folders=["Prices"],
+            imap_port=993,
+        )
+        for idx in range(1, 5)
+    ]
+    in_flight = {"now": 0, "max": 0}
+    lock = threading.Lock()
+    real_fetch = email_service._fetch_mailbox_messages
+
+    def slow_fetch(*args):
+        with lock:
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        try:
+            time.sleep(0.05)
+            return real_fetch(*args)
+        finally:
+            with lock:
+                in_flight["now"] -= 1
+
+    async def fake_get_active_by_purpose(session, purpose):
+        return accounts
+
+    fake_imap_server.add_message(subject="Прайс")
+    monkeypatch.setattr(email_service, "PRICE_EMAIL_ACCOUNT_CONCURRENCY", 2)
+    monkeypatch.setattr(email_service, "_create_mailbox", fake_imap_server.mailbox)
+    monkeypatch.setattr(email_service, "_fetch_mailbox_messages", slow_fetch)
+    monkeypatch.setattr(
+        email_service.crud_email_account,
+        "get_active_by_purpose",
+        fake_get_active_by_purpose,
+    )
+
+    async def fake_get_by_email_incoming_price(session, email):
+        return None
+
+    monkeypatch.setattr(
+        email_service.crud_provider,
+        "get_by_email_incoming_price",
+        fake_get_by_email_incoming_price,
+    )
+    trace_details = {}
+
+    assert await get_emails(session=None, trace_details=trace_details) == []
+
+    assert in_flight["max"] == 2
+    # Две папки ящика читаются через одно соединение из пула.
+    assert fake_imap_server.logins == len(accounts)
+    stats = trace_details["mail_accounts"]
+    assert [item["account_id"] for item in stats] == [1, 2, 3, 4]
+    assert all(item["latency_ms"] >= 100 for item in stats)
+    assert all(item["messages"] == 1 and item["folders"] == 2 for item in stats)
+
+
 @pytest.mark.asyncio
 async def test_get_emails_uses_only_latest_message_per_provider_config(
     monkeypatch,
@@ -408,9 +481,10 @@ async def test_get_emails_uses_only_latest_message_per_provider_config(
 
 
 @pytest.mark.asyncio
-async def test_download_price_provider_uses_uid_fallback_on_search_error(
+async def test_download_price_provider_reads_store_when_search_is_unavailable(
     monkeypatch,
     tmp_path,
+    fake_imap_server,
 ):
     provider = SimpleNamespace(
         id=934,
@@ -423,68 +497,26 @@ async def test_download_price_provider_uses_uid_fallback_on_search_error(
         name_price="alyprice",
         file_url=None,
     )
-    recent_msg_date = datetime.now().replace(microsecond=0)
-
-    header_msg = SimpleNamespace(
-        uid="105",
-        from_="supplier@example.com",
+    fake_imap_server.add_message(
+        from_="other@example.com",
         subject="Остатки товаров",
-        attachments=[],
-        date=recent_msg_date,
-        headers={},
-        obj={},
+        attachments=[("alyprice_other.xls", b"other")],
     )
-    full_msg = SimpleNamespace(
-        uid="105",
+    price_uid = fake_imap_server.add_message(
         from_="supplier@example.com",
         subject="Остатки товаров",
-        attachments=[
-            SimpleNamespace(
-                filename="alyprice_new.xls",
-                payload=b"payload",
-            )
-        ],
-        date=recent_msg_date,
-        headers={"Subject": "Остатки товаров"},
-        obj={"Subject": "Остатки товаров"},
+        attachments=[("alyprice_new.xls", b"payload")],
+    )
+    fake_imap_server.add_message(
+        from_="supplier@example.com",
+        subject="Счёт",
+        attachments=[("invoice.pdf", b"pdf")],
     )
-    flagged = []
+    # SEARCH у Yandex отвечает [UNAVAILABLE]: письма всё равно находятся
+    # по индексу, собранному через UID FETCH.
+    fake_imap_server.search_fails = True
     updated_uids = []
 
-    class _FakeFolder:
-        def __init__(self):
-            self.current = None
-
-        def set(self, folder_name):
-            self.current = folder_name
-
-    class _FakeMailbox:
-        def __init__(self):
-            self.folder = _FakeFolder()
-
-        def login(self, *_args, **_kwargs):
-            return self
-
-        def __enter__(self):
-            return self
-
-        def __exit__(self, exc_type, exc, tb):
-            return False
-
-        def fetch(self, criteria, **kwargs):
-            criteria_text = str(criteria)
-            if kwargs.get("headers_only"):
-                return iter([header_msg])
-            if criteria_text.startswith("UID 105"):
-                return iter([full_msg])
-            raise Exception(
-                'Response status "OK" expected, but "NO" received. '
-                "Data: [b'[UNAVAILABLE] UID SEARCH Backend error.']"
-            )
-
-        def flag(self, uid, flags, value):
-            flagged.append((uid, tuple(flags), value))
-
     async def fake_get_last_uid(*_args, **_kwargs):
         return 0
 
@@ -497,13 +529,14 @@ async def test_download_price_provider_uses_uid_fallback_on_search_error(
     ):
         updated_uids.append((provider_id, uid, provider_config_id, folder))
 
+    monkeypatch.setattr(mailbox_sync, "MAILBOX_SYNC_SEARCH_RETRY_DELAY_SEC", 0)
     monkeypatch.setattr(
         "dz_fastapi.services.email.DOWNLOAD_FOLDER",
         str(tmp_path),
     )
     monkeypatch.setattr(
         "dz_fastapi.services.email._create_mailbox",
-        lambda *_args, **_kwargs: _FakeMailbox(),
+        fake_imap_server.mailbox,
     )
     monkeypatch.setattr(
         "dz_fastapi.services.email._get_last_uid_compat",
@@ -526,5 +559,77 @@ async def test_download_price_provider_uses_uid_fallback_on_search_error(
 
     assert filepath == str(tmp_path / "alyprice_new.xls")
     assert (tmp_path / "alyprice_new.xls").read_bytes() == b"payload"
-    assert flagged == [("105", ("\\Seen",), True)]
-    assert updated_uids == [(934, 105, 38, "INBOX")]
+    assert fake_imap_server.flagged == [("INBOX", str(price_uid), ("\\Seen",), True)]
+    assert updated_uids == [(934, price_uid, 38, "INBOX")]
+
+    # Повторное скачивание не тянет письма с сервера заново.
+    fake_imap_server.body_fetches.clear()
+    await download_price_provider(
+        provider=provider,
+        provider_conf=provider_conf,
+        session=None,
+        server_mail="imap.yandex.ru",
+        email_account="price@dragonzap.ru",
+        email_password="secret",
+        max_emails=10,
+        force=True,
+    )
+    assert fake_imap_server.body_fetches == []
+
+
+@pytest.mark.asyncio
+async def test_download_price_provider_fetches_only_matching_part_of_large_email(
+    monkeypatch,
+    tmp_path,
+    fake_imap_server,
+):
+    provider = SimpleNamespace(id=935, email_incoming_price="supplier@example.com")
+    provider_conf = SimpleNamespace(
+        id=39,
+        incoming_email_account_id=None,
+        name_mail="Остатки",
+        name_price="stock",
+        file_url=None,
+    )
+    payload = b"price-row;" * 50_000
+    price_uid = fake_imap_server.add_message(
+        subject="Остатки",
+        attachments=[("catalog.pdf", b"%PDF" * 20_000), ("stock.xlsx", payload)],
+    )
+
+    async def fake_get_last_uid(*_args, **_kwargs):
+        return 0
+
+    async def fake_set_last_uid(*_args, **_kwargs):
+        return None
+
+    monkeypatch.setattr("dz_fastapi.services.email.MAILBOX_SYNC_FULL_BODY_MAX_BYTES", 10_000)
+    monkeypatch.setattr(mailbox_sync, "MAILBOX_PART_CHUNK_BYTES", 64 * 1024)
+    monkeypatch.setattr("dz_fastapi.services.email.DOWNLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setattr("dz_fastapi.services.email._create_mailbox", fake_imap_server.mailbox)
+    monkeypatch.setattr("dz_fastapi.services.email._get_last_uid_compat", fake_get_last_uid)
+    monkeypatch.setattr("dz_fastapi.services.email._set_last_uid_compat", fake_set_last_uid)
+
+    filepath = await download_price_provider(
+        provider=provider,
+        provider_conf=provider_conf,
+        session=None,
+        server_mail="imap.yandex.ru",
+        email_account="price@dragonzap.ru",
+        email_password="secret",
+    )
+
+    assert (tmp_path / "stock.xlsx").read_bytes() == payload
+    assert filepath == str(tmp_path / "stock.xlsx")
+    # Письмо целиком не качалось: только BODYSTRUCTURE, заголовок и часть 3.
+    assert fake_imap_server.body_fetches == []
+    assert {(uid, section) for uid, section, _ in fake_imap_server.part_fetches} == {
+        (price_uid, "3")
+    }
+
+    # Плановый разбор ящика отдаёт вложение-ссылку, которое качается потом.
+    messages = _fetch_mailbox_messages("imap.yandex.ru", "price@dragonzap.ru", "secret", "INBOX")
+    (attachment,) = [att for att in messages[0].attachments if att.filename == "stock.xlsx"]
+    target = tmp_path / "scheduled" / "stock.xlsx"
+    await asyncio.to_thread(attachment.save_to, str(target))
+    assert target.read_bytes() == payload
@@ -0,0 +1,50 @@
+from dz_fastapi.services import imap_pool
+
+
+def _connect(server):
+    return lambda: server.mailbox().login("price@example.com", "secret")
+
+
+def _list_inbox(mailbox):
+    mailbox.folder.set("INBOX")
+    status, _ = mailbox.client.uid("FETCH", "1:*", "(UID INTERNALDATE)")
+    return status
+
+
+def test_connection_is_reused_between_calls(fake_imap_server):
+    key = imap_pool.imap_pool_key("price@example.com@imap.example.com", 993)
+    fake_imap_server.add_message(subject="Price")
+
+    for _ in range(3):
+        assert imap_pool.run_with_imap_connection(
+            key, _connect(fake_imap_server), _list_inbox
+        ) == "OK"
+
+    assert fake_imap_server.logins == 1
+
+
+def test_dropped_connection_is_replaced_and_call_retried(fake_imap_server):
+    key = imap_pool.imap_pool_key("price@example.com@imap.example.com", 993)
+    imap_pool.run_with_imap_connection(key, _connect(fake_imap_server), _list_inbox)
+
+    # Сервер закрыл сессию, пока соединение лежало в пуле.
+    fake_imap_server.drop_sessions()
+    status = imap_pool.run_with_imap_connection(key, _connect(fake_imap_server), _list_inbox)
+
+    assert status == "OK"
+    assert fake_imap_server.logins == 2
+    imap_pool.run_with_imap_connection(key, _connect(fake_imap_server), _list_inbox)
+    assert fake_imap_server.logins == 2
+
+
+def test_keepalive_pings_idle_connections_and_drops_dead(monkeypatch, fake_imap_server):
+    monkeypatch.setattr(imap_pool, "IMAP_POOL_NOOP_AFTER_SEC", 0)
+    key = imap_pool.imap_pool_key("price@example.com@imap.example.com", 993)
+    imap_pool.run_with_imap_connection(key, _connect(fake_imap_server), _list_inbox)
+
+    assert imap_pool.keepalive_imap_pool() == 1
+
+    fake_imap_server.drop_sessions()
+    assert imap_pool.keepalive_imap_pool() == 0
+    imap_pool.run_with_imap_connection(key, _connect(fake_imap_server), _list_inbox)
+    assert fake_imap_server.logins == 2
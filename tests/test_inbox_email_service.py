@@ -8,75 +8,47 @@ import pytest
 from dz_fastapi.services import inbox_email as inbox_email_service
 
 
-def test_fetch_inbox_imap_downloads_only_bounded_unknown_uids(monkeypatch):
-    header_messages = [
-        SimpleNamespace(uid="105"),
-        SimpleNamespace(uid="104"),
-        SimpleNamespace(uid="103"),
-    ]
-    full_messages = {
-        "104": SimpleNamespace(
-            uid="104",
-            from_="supplier@example.com",
-            subject="Price 104",
-            attachments=[
-                SimpleNamespace(filename="price.xlsx", payload=b"payload")
-            ],
-            date=datetime(2026, 8, 7, 8, 0),
-        ),
-        "103": SimpleNamespace(
-            uid="103",
-            from_="supplier@example.com",
-            subject="Price 103",
-            attachments=[],
-            date=datetime(2026, 8, 7, 7, 0),
-        ),
-    }
-    full_fetches = []
-
-    class FakeFolder:
-        def set(self, _folder):
-            return None
-
-    class FakeMailbox:
-        folder = FakeFolder()
-
-        def login(self, *_args):
-            return self
-
-        def __enter__(self):
-            return self
-
-        def __exit__(self, *_args):
-            return False
+def test_fetch_inbox_imap_reads_bounded_unknown_uids_from_store(
+    monkeypatch, fake_imap_server
+):
+    fake_imap_server.add_message(subject="Old", received_at=datetime(2026, 8, 1, 9, 0))
+    first_uid = fake_imap_server.add_message(
+        subject="Price 103", received_at=datetime(2026, 8, 7, 7, 0)
+    )
+    second_uid = fake_imap_server.add_message(
+        subject="Price 104",
+        received_at=datetime(2026, 8, 7, 8, 0),
+        attachments=[("price.xlsx", b"payload")],
+    )
+    known_uid = fake_imap_server.add_message(
+        subject="Price 105", received_at=datetime(2026, 8, 7, 9, 0)
+    )
+    monkeypatch.setattr(inbox_email_service, "_create_mailbox", fake_imap_server.mailbox)
+
+    def _fetch(known_uids):
+        return inbox_email_service._fetch_inbox_imap_sync(
+            "imap.example.com",
+            "prices@example.com",
+            "secret",
+            "INBOX",
+            since_date=date(2026, 8, 6),
+            known_uids=known_uids,
+            full_fetch_limit=1,
+        )
 
-        def fetch(self, criteria, **kwargs):
-            if kwargs.get("headers_only"):
-                return iter(header_messages)
-            uid = str(criteria).split()[-1]
-            full_fetches.append(uid)
-            return iter([full_messages[uid]])
+    messages = _fetch({str(known_uid)})
 
-    monkeypatch.setattr(
-        inbox_email_service,
-        "_create_mailbox",
-        lambda *_args, **_kwargs: FakeMailbox(),
-    )
+    # Письма вне окна дат не качаются; из хранилища разбирается одно
+    # самое свежее неизвестное письмо.
+    assert fake_imap_server.body_fetches == [first_uid, second_uid, known_uid]
+    assert [message.uid for message in messages] == [str(second_uid)]
+    assert messages[0].attachments[0].payload == b"payload"
 
-    messages = inbox_email_service._fetch_inbox_imap_sync(
-        "imap.example.com",
-        "prices@example.com",
-        "secret",
-        "INBOX",
-        since_date=date(2026, 8, 6),
-        known_uids={"105"},
-        header_limit=100,
-        full_fetch_limit=1,
-    )
+    fake_imap_server.body_fetches.clear()
+    messages = _fetch({str(known_uid), str(second_uid)})
 
-    assert full_fetches == ["104"]
-    assert [message.uid for message in messages] == ["104"]
-    assert messages[0].attachments[0].payload == b"payload"
+    assert fake_imap_server.body_fetches == []
+    assert [message.subject for message in messages] == ["Price 103"]
 
 
 def test_price_only_email_account_detection():
@@ -15,6 +15,7 @@ from dz_fastapi.models.inventory import (
     ShipmentDocumentItem,
     ShipmentDocumentItemLotAllocation,
     ShipmentDocumentStatus,
+    ShipmentProfitDaily,
     StockByLocation,
     StockDocument,
     StockDocumentItem,
@@ -30,7 +31,9 @@ from dz_fastapi.services.inventory_stock import (
     receive_stock,
     reconcile_stock_absolute,
     transfer_stock_with_lot_trace,
+    unpost_shipment_document,
 )
+from dz_fastapi.services.shipment_profit import rebuild_shipment_profit_rollup
 
 
 async def _lot_sum(
@@ -809,6 +812,102 @@ async def test_profit_report_export_returns_excel_workbook(
     assert len(response.content) > 1000
 
 
+@pytest.mark.asyncio
+async def test_profit_rollup_follows_post_and_unpost(
+    test_session: AsyncSession,
+    async_client,
+    created_autopart: AutoPart,
+    created_customers,
+    created_providers: list[Provider],
+):
+    receipt = SupplierReceipt(
+        provider_id=created_providers[0].id,
+        document_number="R-ROLLUP-DAILY",
+        document_date=date.today(),
+    )
+    receipt.items = [
+        SupplierReceiptItem(
+            autopart_id=created_autopart.id,
+            received_quantity=2,
+            price=Decimal("80.00"),
+        )
+    ]
+    test_session.add(receipt)
+    await test_session.flush()
+    await receive_stock(test_session, receipt=receipt, reverse=False)
+    lot = (
+        await test_session.execute(
+            select(StockLot).where(StockLot.source_receipt_id == receipt.id)
+        )
+    ).scalar_one()
+
+    shipment = ShipmentDocument(
+        status=ShipmentDocumentStatus.DRAFT,
+        customer_id=created_customers[0].id,
+    )
+    test_session.add(shipment)
+    await test_session.flush()
+    test_session.add(
+        ShipmentDocumentItem(
+            document_id=shipment.id,
+            autopart_id=created_autopart.id,
+            storage_location_id=lot.storage_location_id,
+            quantity=2,
+            price=Decimal("125.00"),
+        )
+    )
+    await test_session.flush()
+    await post_shipment_document(test_session, shipment.id)
+    await test_session.commit()
+
+    rollup = (
+        await test_session.execute(
+            select(ShipmentProfitDaily).where(
+                ShipmentProfitDaily.autopart_id == created_autopart.id
+            )
+        )
+    ).scalar_one()
+    assert rollup.customer_id == created_customers[0].id
+    assert rollup.provider_id == created_providers[0].id
+    assert (rollup.quantity, rollup.revenue_total, rollup.cost_total) == (
+        2,
+        Decimal("250.00"),
+        Decimal("160.00"),
+    )
+
+    # Полная пересборка даёт тот же свод, что и инкрементальный учёт.
+    assert await rebuild_shipment_profit_rollup(test_session) == 1
+    rebuilt = (
+        await test_session.execute(
+            select(ShipmentProfitDaily.quantity, ShipmentProfitDaily.cost_total)
+        )
+    ).one()
+    assert tuple(rebuilt) == (2, Decimal("160.00"))
+    await test_session.commit()
+
+    # Окно со временем внутри дня считается по накладным, а не по своду.
+    posted_at = (await test_session.get(ShipmentDocument, shipment.id)).posted_at
+    response = await async_client.get(
+        "/inventory/shipments/profit-report/",
+        params={
+            "period": "day",
+            "date_from": (posted_at - timedelta(minutes=1)).isoformat(),
+            "date_to": (posted_at + timedelta(minutes=1)).isoformat(),
+        },
+    )
+    assert response.status_code == 200
+    rows = response.json()
+    assert len(rows) == 1
+    assert rows[0]["gross_profit"] == "90.00"
+
+    await unpost_shipment_document(test_session, shipment.id)
+    await test_session.commit()
+    remaining = (
+        await test_session.execute(select(func.count()).select_from(ShipmentProfitDaily))
+    ).scalar_one()
+    assert remaining == 0
+
+
 @pytest.mark.asyncio
 async def test_list_shipments_supports_profit_drilldown_filters(
     test_session: AsyncSession,
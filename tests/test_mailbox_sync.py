@@ -0,0 +1,212 @@
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from dz_fastapi.services import mailbox_sync
+
+ACCOUNT = mailbox_sync.mailbox_account_key("imap.example.com", "Prices@Example.com")
+
+
+def _objects() -> list[Path]:
+    return sorted(Path(mailbox_sync.MAILBOX_STORE_DIR, "objects").rglob("*.eml"))
+
+
+def _sync(server, folder="INBOX", **kwargs):
+    return mailbox_sync.sync_folder(
+        server.mailbox(), account_key=ACCOUNT, folder=folder, **kwargs
+    )
+
+
+def test_sync_downloads_window_once_and_then_only_new_uids(fake_imap_server):
+    fake_imap_server.add_message(subject="Old", received_at=datetime(2026, 8, 1, 9, 0))
+    first = fake_imap_server.add_message(
+        subject="Price", received_at=datetime(2026, 8, 7, 9, 0)
+    )
+
+    entries = _sync(fake_imap_server, since_date=date(2026, 8, 6))
+
+    assert ACCOUNT == "prices@example.com@imap.example.com"
+    assert [(entry.uid, entry.subject) for entry in entries] == [(first, "Price")]
+    assert fake_imap_server.body_fetches == [first]
+
+    second = fake_imap_server.add_message(subject="Next")
+    fake_imap_server.body_fetches.clear()
+    entries = _sync(fake_imap_server, since_date=date(2026, 8, 6))
+
+    assert [entry.uid for entry in entries] == [first, second]
+    assert fake_imap_server.body_fetches == [second]
+    message = mailbox_sync.load_mail_message(entries[-1])
+    assert message.uid == str(second)
+    assert message.subject == "Next"
+    assert message.folder_name == "INBOX"
+
+    # Окно шире покрытого — докачиваются только письма окна.
+    fake_imap_server.body_fetches.clear()
+    entries = _sync(fake_imap_server, since_date=date(2026, 7, 30))
+    assert len(entries) == 3
+    assert fake_imap_server.body_fetches == [first - 1]
+
+
+def test_empty_window_still_sets_cursor(fake_imap_server):
+    fake_imap_server.add_message(subject="Old", received_at=datetime(2026, 8, 1, 9, 0))
+
+    assert _sync(fake_imap_server, since_date=date(2026, 8, 6)) == []
+    new_uid = fake_imap_server.add_message(subject="New")
+
+    entries = _sync(fake_imap_server, since_date=date(2026, 8, 6))
+    assert [entry.uid for entry in entries] == [new_uid]
+
+
+def test_uidvalidity_change_resets_cursor_and_reuses_stored_bodies(fake_imap_server):
+    for idx in range(3):
+        fake_imap_server.add_message(subject=f"Price {idx}", attachments=[("p.xlsx", b"x")])
+    since = date.today() - timedelta(days=1)
+    _sync(fake_imap_server, since_date=since)
+    stored_files = _objects()
+
+    fake_imap_server.reset_uidvalidity("INBOX", 77)
+    fake_imap_server.add_message(subject="Price 3", attachments=[("p.xlsx", b"x")])
+    fake_imap_server.body_fetches.clear()
+    entries = _sync(fake_imap_server, since_date=since)
+
+    # Курсор сброшен: папка перечитана, но одинаковое содержимое
+    # хранится одним файлом.
+    assert [entry.uid for entry in entries] == [1, 2, 3, 4]
+    assert sorted(fake_imap_server.body_fetches) == [1, 2, 3, 4]
+    assert len(_objects()) == len(stored_files) + 1
+    assert entries[3].subject == "Price 3"
+
+
+def test_identical_message_in_two_folders_is_stored_once(fake_imap_server):
+    received_at = datetime(2026, 8, 7, 9, 0)
+    fake_imap_server.add_message("INBOX", subject="Same", received_at=received_at)
+    fake_imap_server.add_message("Orders", subject="Same", received_at=received_at)
+
+    inbox = _sync(fake_imap_server, "INBOX", since_date=date(2026, 8, 7))
+    orders = _sync(fake_imap_server, "Orders", since_date=date(2026, 8, 7))
+
+    assert inbox[0].sha256 == orders[0].sha256
+    assert len(_objects()) == 1
+    assert mailbox_sync.find_stored_message(ACCOUNT, "Orders", orders[0].uid) == orders[0]
+    assert mailbox_sync.find_stored_message(ACCOUNT, "Orders", 999) is None
+
+
+def test_search_failure_falls_back_to_uid_listing(monkeypatch, fake_imap_server):
+    monkeypatch.setattr(mailbox_sync, "MAILBOX_SYNC_SEARCH_RETRY_DELAY_SEC", 0)
+    fake_imap_server.add_message(subject="Old", received_at=datetime(2026, 8, 1, 9, 0))
+    recent = fake_imap_server.add_message(subject="Recent", received_at=datetime(2026, 8, 7, 9, 0))
+    fake_imap_server.search_fails = True
+
+    entries = _sync(fake_imap_server, since_date=date(2026, 8, 6))
+
+    assert [entry.uid for entry in entries] == [recent]
+    assert entries[0].internal_date.date() == date(2026, 8, 7)
+
+
+def test_extra_uids_are_fetched_outside_window(fake_imap_server):
+    old = fake_imap_server.add_message(subject="Old", received_at=datetime(2026, 8, 1, 9, 0))
+    fake_imap_server.add_message(subject="Recent", received_at=datetime(2026, 8, 7, 9, 0))
+
+    entries = _sync(fake_imap_server, since_date=date(2026, 8, 6), extra_uids={old})
+
+    assert [entry.uid for entry in entries] == [old, old + 1]
+    recent = mailbox_sync.received_since(entries, date(2026, 8, 6))
+    assert [entry.subject for entry in recent] == ["Recent"]
+
+
+def test_parse_fetch_items_accepts_uid_after_literal():
+    data = [
+        (b'1 (INTERNALDATE "07-Aug-2026 09:00:00 +0300" BODY[] {3}', b"abc"),
+        b" UID 15)",
+        b'2 (UID 16 INTERNALDATE " 8-Aug-2026 10:00:00 +0300")',
+        None,
+    ]
+
+    parsed = mailbox_sync._parse_fetch_items(data)
+
+    assert [(item.uid, item.sections.get("")) for item in parsed] == [(15, b"abc"), (16, None)]
+    assert parsed[0].internal_date.day == 7
+    assert parsed[1].internal_date.day == 8
+
+
+def test_bodystructure_parts_decode_sections_and_filenames():
+    data = [
+        (
+            b'3 (UID 42 RFC822.SIZE 9000 BODYSTRUCTURE (("text" "plain" ("charset" "utf-8")'
+            b' NIL NIL "7bit" 10 1 NIL NIL NIL NIL)(("application" "octet-stream"'
+            b' ("name" "=?utf-8?B?0J/RgNCw0LnRgS54bHN4?=") NIL NIL "base64" 4000 NIL'
+            b' ("attachment" ("filename*" {29}',
+            b"utf-8''%D0%9E%D1%81%D1%82.csv",
+        ),
+        b') NIL NIL)("image" "png" NIL NIL NIL "base64" 30 NIL NIL NIL NIL) "mixed"'
+        b' ("boundary" "b2") NIL NIL NIL) "mixed" ("boundary" "b1") NIL NIL NIL))',
+    ]
+
+    (item,) = mailbox_sync._parse_fetch_items(data)
+    parts = mailbox_sync._attachment_parts(item.bodystructure)
+
+    assert (item.uid, item.size) == (42, 9000)
+    assert [(part["section"], part["filename"], part["encoding"]) for part in parts] == [
+        ("2.1", "Ост.csv", "base64")
+    ]
+    # Без disposition имя берётся из параметра name (RFC 2047).
+    single = mailbox_sync._parse_fetch_items(
+        [
+            b'1 (UID 1 BODYSTRUCTURE ("application" "vnd.ms-excel"'
+            b' ("name" "=?utf-8?B?0J/RgNCw0LnRgS54bHN4?=") NIL NIL "base64" 12 NIL NIL NIL NIL))'
+        ]
+    )[0]
+    assert mailbox_sync._attachment_parts(single.bodystructure)[0]["section"] == "1"
+    assert mailbox_sync._attachment_parts(single.bodystructure)[0]["filename"] == "Прайс.xlsx"
+
+
+def test_large_message_is_indexed_without_body_and_part_streams_to_disk(
+    fake_imap_server, tmp_path
+):
+    payload = bytes(range(256)) * 400
+    uid = fake_imap_server.add_message(
+        subject="Big price",
+        attachments=[("readme.txt", b"notes"), ("Прайс.xlsx", payload)],
+    )
+    entries = _sync(
+        fake_imap_server, since_date=date.today() - timedelta(days=1), full_body_max_bytes=1000
+    )
+
+    (entry,) = entries
+    assert entry.is_partial and entry.subject == "Big price"
+    assert fake_imap_server.body_fetches == []
+    assert [part["filename"] for part in entry.parts] == ["readme.txt", "Прайс.xlsx"]
+    assert mailbox_sync.find_stored_message(ACCOUNT, "INBOX", uid) == entry
+
+    target = tmp_path / "out" / "price.xlsx"
+    written = mailbox_sync.download_part(
+        fake_imap_server.mailbox(), entry, entry.parts[1], str(target), chunk_size=4096
+    )
+
+    assert written == len(payload)
+    assert target.read_bytes() == payload
+    # Качалась только вторая часть и кусками, не всё письмо.
+    assert {section for _, section, _ in fake_imap_server.part_fetches} == {"3"}
+    assert len(fake_imap_server.part_fetches) > 1
+
+    full = mailbox_sync.ensure_full_message(fake_imap_server.mailbox(), entry)
+    assert not full.is_partial
+    assert mailbox_sync.load_mail_message(full).attachments[1].payload == payload
+    assert mailbox_sync.find_stored_message(ACCOUNT, "INBOX", uid).sha256 == full.sha256
+
+
+def test_prune_drops_expired_entries_and_unreferenced_files(fake_imap_server):
+    now = datetime.now()
+    fake_imap_server.add_message(subject="Expired", received_at=now - timedelta(days=30))
+    fake_imap_server.add_message(subject="Fresh", received_at=now)
+    _sync(fake_imap_server, since_date=(now - timedelta(days=40)).date())
+    assert len(_objects()) == 2
+
+    removed = mailbox_sync.prune_mail_store(now=now)
+
+    assert removed == 1
+    assert len(_objects()) == 1
+    # Выпавшее из индекса старое письмо не качается повторно.
+    fake_imap_server.body_fetches.clear()
+    entries = _sync(fake_imap_server, since_date=(now - timedelta(days=3)).date())
+    assert [entry.subject for entry in entries] == ["Fresh"]
+    assert fake_imap_server.body_fetches == []
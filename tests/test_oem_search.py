@@ -0,0 +1,40 @@
+import numpy as np
+
+from dz_fastapi.services.oem_search import OemNgramIndex, _rank_key
+
+
+def test_ngram_index_ranks_exact_prefix_and_contains():
+    index = OemNgramIndex()
+    index.load(
+        [1, 2, 3, 4, 5],
+        ["XE4G1636", "E4G1636", "E4G163611091", "E4G16", "ABC123"],
+    )
+
+    # Точное, затем по началу номера, затем вхождение — как oem_match_rank.
+    assert index.search("E4G1636") == [2, 3, 1]
+    assert index.search("E4G1636", limit=2) == [2, 3]
+    # Триграммы есть, но подстроки нет.
+    assert index.search("E4G1637") == []
+    # Запрос короче триграммы — просмотр всех номеров.
+    assert index.search("E4") == [4, 2, 3, 1]
+    assert index.search("") == []
+
+
+def test_ngram_index_matches_linear_scan():
+    rng = np.random.default_rng(1)
+    alphabet = np.array(list("ABC0123"))
+    oems = ["".join(rng.choice(alphabet, size=int(rng.integers(4, 10)))) for _ in range(3000)]
+    ids = list(range(10, 10 + len(oems)))
+    index = OemNgramIndex()
+    index.load(ids, oems)
+
+    for query in ("A0", "B12", "C0A1", "0123", "AAAA"):
+        expected = [
+            ids[position]
+            for _, position in sorted(
+                (_rank_key(oem, query), position)
+                for position, oem in enumerate(oems)
+                if query in oem
+            )
+        ]
+        assert index.search(query) == expected
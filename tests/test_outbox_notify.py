@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from dz_fastapi.services import outbox_notify
+from dz_fastapi.services.email_outbox import claim_pending_outbox, enqueue_email
+from dz_fastapi.services.telegram_outbox import (
+    claim_pending_telegram_outbox,
+    enqueue_telegram_message,
+)
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def _close_outbox_listener():
+    yield
+    await outbox_notify.close_outbox_listener()
+
+
+@pytest.mark.asyncio
+async def test_long_poll_claim_wakes_up_on_enqueue(test_engine):
+    session_factory = sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def enqueue_later():
+        await asyncio.sleep(0.3)
+        async with session_factory() as session:
+            await enqueue_email(session, to_email="client@example.com", subject="Прайс")
+
+    async with session_factory() as session:
+        started = time.monotonic()
+        producer = asyncio.create_task(enqueue_later())
+        claimed = await claim_pending_outbox(session, worker="relay-1", wait_seconds=10)
+        elapsed = time.monotonic() - started
+        await producer
+
+    assert outbox_notify.outbox_listener.is_listening
+    assert [row.subject for row in claimed] == ["Прайс"]
+    assert claimed[0].claimed_by == "relay-1"
+    # Ответ пришёл по NOTIFY, а не по истечении ожидания.
+    assert elapsed < 3
+
+    async with session_factory() as session:
+        # Канал Telegram не будит ожидающих писем; пустая очередь
+        # отвечает пустым списком по таймауту.
+        await enqueue_telegram_message(session, chat_id="-1", text="Тест")
+        started = time.monotonic()
+        assert await claim_pending_outbox(session, worker="relay-1", wait_seconds=1) == []
+        assert time.monotonic() - started >= 0.9
+        claimed = await claim_pending_telegram_outbox(
+            session, worker="relay-1", wait_seconds=1
+        )
+        assert [row.text for row in claimed] == ["Тест"]
+
+
+@pytest.mark.asyncio
+async def test_long_poll_falls_back_to_repeated_claims_without_listen(
+    test_engine, monkeypatch
+):
+    session_factory = sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def no_listen(_session):
+        return False
+
+    monkeypatch.setattr(outbox_notify.outbox_listener, "ensure", no_listen)
+    monkeypatch.setattr(outbox_notify, "OUTBOX_LONG_POLL_FALLBACK_SEC", 0.1)
+
+    async def enqueue_later():
+        await asyncio.sleep(0.3)
+        async with session_factory() as session:
+            await enqueue_email(session, to_email="client@example.com", subject="Позже")
+
+    async with session_factory() as session:
+        producer = asyncio.create_task(enqueue_later())
+        claimed = await claim_pending_outbox(session, worker="relay-2", wait_seconds=5)
+        await producer
+
+    assert [row.subject for row in claimed] == ["Позже"]
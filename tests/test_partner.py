@@ -7,13 +7,15 @@ from types import SimpleNamespace
 import pandas as pd
 import pytest
 from httpx import ASGITransport, AsyncClient
-from sqlalchemy import func, select
+from sqlalchemy import delete, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from dz_fastapi.api import partner as partner_api
+from dz_fastapi.core.constants import PRICE_HISTORY_RETENTION_DAYS
+from dz_fastapi.core.time import now_moscow
 from dz_fastapi.crud.partner import crud_customer_pricelist, crud_pricelist, crud_provider
 from dz_fastapi.main import app
-from dz_fastapi.models.autopart import AutoPart, AutoPartPriceHistory
+from dz_fastapi.models.autopart import AutoPart, AutoPartPriceHistory, AutoPartPriceState
 from dz_fastapi.models.brand import Brand
 from dz_fastapi.models.cross import AutoPartCross
 from dz_fastapi.models.email_account import EmailAccount
@@ -1345,6 +1347,84 @@ async def test_price_history_records_on_quantity_change(
     assert count_3 == count_1 + 1
 
 
+async def _load_price_state(session: AsyncSession, provider_config_id: int):
+    rows = (
+        await session.execute(
+            select(
+                AutoPartPriceState.autopart_id,
+                AutoPartPriceState.price,
+                AutoPartPriceState.quantity,
+            ).where(AutoPartPriceState.provider_config_id == provider_config_id)
+        )
+    ).all()
+    return {row.autopart_id: (float(row.price), int(row.quantity)) for row in rows}
+
+
+@pytest.mark.asyncio
+async def test_price_state_follows_history_and_survives_retention(
+    created_providers: list[Provider],
+    created_pricelist_config: ProviderPriceListConfig,
+    created_brand: Brand,
+    test_session: AsyncSession,
+):
+    provider = created_providers[0]
+    config_id = created_pricelist_config.id
+
+    pricelist_1 = await _create_pricelist_for_history(
+        provider_id=provider.id,
+        provider_config_id=config_id,
+        brand_name=created_brand.name,
+        price=100.0,
+        quantity=10,
+        session=test_session,
+    )
+    autopart_id = pricelist_1.autoparts[0].autopart.id
+    assert await _load_price_state(test_session, config_id) == {autopart_id: (100.0, 10)}
+
+    await _create_pricelist_for_history(
+        provider_id=provider.id,
+        provider_config_id=config_id,
+        brand_name=created_brand.name,
+        price=95.5,
+        quantity=3,
+        session=test_session,
+    )
+    assert await _load_price_state(test_session, config_id) == {autopart_id: (95.5, 3)}
+
+    # Пересборка состояния из истории (scripts/backfill_autopart_price_state.py).
+    await test_session.execute(delete(AutoPartPriceState))
+    assert await crud_pricelist.backfill_price_state(test_session) == 1
+    await test_session.commit()
+    assert await _load_price_state(test_session, config_id) == {autopart_id: (95.5, 3)}
+
+    # Неизменная позиция, чьё последнее событие уходит из окна хранения
+    # истории, получает новое событие — иначе график после cleanup пуст.
+    await test_session.execute(
+        update(AutoPartPriceState).values(
+            updated_at=now_moscow() - timedelta(days=PRICE_HISTORY_RETENTION_DAYS + 1)
+        )
+    )
+    await test_session.commit()
+    await _create_pricelist_for_history(
+        provider_id=provider.id,
+        provider_config_id=config_id,
+        brand_name=created_brand.name,
+        price=95.5,
+        quantity=3,
+        session=test_session,
+    )
+    assert await _count_history(test_session, provider.id, config_id, autopart_id) == 3
+    await _create_pricelist_for_history(
+        provider_id=provider.id,
+        provider_config_id=config_id,
+        brand_name=created_brand.name,
+        price=95.5,
+        quantity=3,
+        session=test_session,
+    )
+    assert await _count_history(test_session, provider.id, config_id, autopart_id) == 3
+
+
 @pytest.mark.asyncio
 async def test_create_customer_pricelist_config(
     created_customers: Customer,
@@ -4,20 +4,25 @@ from zoneinfo import ZoneInfo
 
 import pandas as pd
 import pytest
+from sqlalchemy import select
 
 from dz_fastapi.analytics.price_history import (
     _get_previous_pricelist,
+    analyze_new_pricelist,
     build_pricelist_change_summary,
     build_pricelist_change_summary_by_ids,
     prepare_price_history_plot_data,
 )
+from dz_fastapi.api.dashboard import _load_pair_stats_batch
 from dz_fastapi.crud.partner import crud_pricelist
 from dz_fastapi.models.autopart import AutoPart
 from dz_fastapi.models.partner import (
     PriceList,
     PriceListAutoPartAssociation,
+    PriceListStats,
     ProviderPriceListConfig,
 )
+from dz_fastapi.schemas.partner import PriceListCreate
 
 
 @pytest.mark.asyncio
@@ -331,3 +336,70 @@ def test_prepare_price_history_plot_data_marks_stockout_points():
     )
     assert stockout_df.iloc[0]["quantity"] == 0
     assert step_df.iloc[-1]["quantity"] == 0
+
+
+def _payload(brand_name: str, prices: dict[str, float]) -> list[dict]:
+    return [
+        {
+            "autopart": {"oem_number": oem, "brand": brand_name, "name": oem},
+            "quantity": 5,
+            "price": price,
+            "multiplicity": 1,
+        }
+        for oem, price in prices.items()
+    ]
+
+
+@pytest.mark.asyncio
+async def test_pricelist_stats_written_at_import_match_dashboard_pairs(
+    test_session, created_providers, created_pricelist_config, created_brand
+):
+    provider = created_providers[0]
+    pricelist_in = PriceListCreate(
+        provider_id=provider.id,
+        provider_config_id=created_pricelist_config.id,
+        autoparts=[],
+    )
+    first = await crud_pricelist.create(
+        obj_in=pricelist_in,
+        session=test_session,
+        include_autoparts_response=False,
+        autoparts_payload=_payload(
+            created_brand.name,
+            {"ST001": 100, "ST002": 200, "ST003": 300, "ST004": 400},
+        ),
+    )
+    second = await crud_pricelist.create(
+        obj_in=pricelist_in,
+        session=test_session,
+        include_autoparts_response=False,
+        autoparts_payload=_payload(
+            created_brand.name,
+            {"ST001": 100, "ST002": 220, "ST003": 240, "ST005": 50},
+        ),
+    )
+
+    stats = (
+        await test_session.execute(
+            select(PriceListStats).where(PriceListStats.pricelist_id == second.id)
+        )
+    ).scalar_one()
+    assert stats.previous_pricelist_id == first.id
+    assert (stats.overlap_count, stats.added_count, stats.removed_count) == (3, 1, 1)
+    assert stats.changed_count == 2
+
+    # Те же числа, что считает дашборд сопоставлением двух прайсов.
+    pair_stats = await _load_pair_stats_batch(test_session, {(first.id, second.id)})
+    overlap, median_pct, changed_share_pct = pair_stats[(first.id, second.id)]
+    assert stats.overlap_count == overlap
+    assert stats.median_change_pct == pytest.approx(median_pct)
+    assert stats.changed_share_pct == changed_share_pct
+    # -20%, 0%, +10%
+    assert sum(stats.price_change_histogram["counts"]) == 3
+
+    pl_orm = await test_session.get(PriceList, second.id)
+    summary = await analyze_new_pricelist(pl_orm, session=test_session)
+    assert summary["previous_pricelist_id"] == first.id
+    assert summary["new_positions_count"] == 1
+    assert summary["removed_positions_count"] == 1
+    assert summary["median_change_pct"] == 0.0
@@ -0,0 +1,205 @@
+import asyncio
+
+import pandas as pd
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dz_fastapi.crud.partner import crud_pricelist
+from dz_fastapi.crud.pricelist_frame_cache import PriceListFrameCache, pricelist_frame_cache
+from dz_fastapi.models.autopart import AutoPart
+from dz_fastapi.models.brand import Brand
+from dz_fastapi.models.partner import (
+    PriceList,
+    PriceListAutoPartAssociation,
+    Provider,
+    ProviderPriceListConfig,
+)
+from dz_fastapi.schemas.partner import PriceListCreate
+
+
+def _frame(rows: int, config_id: int = 1) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "oem_number": [f"OEM{idx}" for idx in range(rows)],
+            "provider_config_id": [config_id] * rows,
+            "price": [100.0] * rows,
+        }
+    )
+
+
+def test_frame_cache_evicts_least_recently_used_by_rows():
+    cache = PriceListFrameCache(max_rows=10, ttl_sec=60)
+    cache.put(1, 1, _frame(4))
+    cache.put(2, 1, _frame(4))
+    assert cache.get(1) is not None
+    cache.put(3, 1, _frame(4))
+
+    # 12 строк > 10: вытесняется давно не использованный прайс 2.
+    assert cache.get(2) is None
+    assert cache.get(1) is not None
+    assert cache.get(3) is not None
+    # Кадр больше всего лимита не кэшируется вовсе.
+    cache.put(4, 1, _frame(11))
+    assert cache.get(4) is None
+    assert len(cache) == 2
+
+
+def test_frame_cache_invalidates_older_pricelists_of_config():
+    cache = PriceListFrameCache(max_rows=100, ttl_sec=60)
+    cache.put(1, 7, _frame(2, 7))
+    cache.put(2, 8, _frame(2, 8))
+    cache.put(3, 7, _frame(2, 7))
+
+    cache.invalidate(provider_config_id=7, keep_pricelist_id=3)
+
+    assert cache.get(1) is None
+    assert cache.get(2) is not None
+    assert cache.get(3) is not None
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_frame_cache_loads_once_for_concurrent_misses():
+    cache = PriceListFrameCache(max_rows=100, ttl_sec=60)
+    calls = 0
+
+    async def _loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return _frame(3)
+
+    frames = await asyncio.gather(*(cache.get_or_load(5, _loader) for _ in range(5)))
+
+    assert calls == 1
+    # Каждый получает свою копию: правка одного клиента не видна другим.
+    frames[0].loc[:, "price"] = 1.0
+    assert frames[1]["price"].tolist() == [100.0, 100.0, 100.0]
+    assert (await cache.get_or_load(5, _loader))["price"].tolist() == [100.0] * 3
+    assert calls == 1
+
+
+async def _create_pricelist(
+    session: AsyncSession,
+    provider: Provider,
+    config: ProviderPriceListConfig,
+    autoparts: list[AutoPart],
+    price: float,
+) -> PriceList:
+    pricelist = PriceList(provider_id=provider.id, provider_config_id=config.id)
+    session.add(pricelist)
+    await session.flush()
+    session.add_all(
+        [
+            PriceListAutoPartAssociation(
+                pricelist_id=pricelist.id,
+                autopart_id=autopart.id,
+                quantity=3,
+                price=price,
+            )
+            for autopart in autoparts
+        ]
+    )
+    await session.commit()
+    return pricelist
+
+
+@pytest.mark.asyncio
+async def test_get_pricelist_frame_reuses_cached_source_frame(
+    created_providers: list[Provider],
+    created_pricelist_config: ProviderPriceListConfig,
+    created_brand: Brand,
+    test_session: AsyncSession,
+    monkeypatch,
+):
+    autoparts = [
+        AutoPart(brand_id=created_brand.id, oem_number=f"FRAME{idx}", name=f"Part {idx}")
+        for idx in range(3)
+    ]
+    test_session.add_all(autoparts)
+    await test_session.commit()
+    pricelist = await _create_pricelist(
+        test_session, created_providers[0], created_pricelist_config, autoparts, 50.0
+    )
+
+    fetch_calls = []
+    original_fetch = crud_pricelist.fetch_pricelist_frame
+
+    async def _spy_fetch(pricelist_id, session, oem_numbers=None):
+        fetch_calls.append((pricelist_id, oem_numbers))
+        return await original_fetch(pricelist_id, session, oem_numbers=oem_numbers)
+
+    monkeypatch.setattr(crud_pricelist, "fetch_pricelist_frame", _spy_fetch)
+
+    first = await crud_pricelist.get_pricelist_frame(pricelist.id, test_session)
+    first["price"] = 0.0
+    second = await crud_pricelist.get_pricelist_frame(pricelist.id, test_session)
+    filtered = await crud_pricelist.get_pricelist_frame(
+        pricelist.id, test_session, oem_numbers={"frame1"}
+    )
+
+    assert fetch_calls == [(pricelist.id, None)]
+    assert sorted(second["oem_number"]) == ["FRAME0", "FRAME1", "FRAME2"]
+    assert second["price"].tolist() == [50.0, 50.0, 50.0]
+    assert filtered["oem_number"].tolist() == ["FRAME1"]
+    assert pricelist.id in pricelist_frame_cache._entries
+
+    # Новый прайс той же конфигурации вытесняет кадр прежнего.
+    await crud_pricelist.create(
+        obj_in=PriceListCreate(
+            provider_id=created_providers[0].id,
+            provider_config_id=created_pricelist_config.id,
+            autoparts=[],
+        ),
+        session=test_session,
+        include_autoparts_response=False,
+        autoparts_payload=[
+            {
+                "autopart": {
+                    "oem_number": "FRAME0",
+                    "brand": created_brand.name,
+                    "name": "Part 0",
+                },
+                "quantity": 1,
+                "price": 70.0,
+                "multiplicity": 1,
+            }
+        ],
+    )
+    assert pricelist.id not in pricelist_frame_cache._entries
+
+
+@pytest.mark.asyncio
+async def test_columnar_fetch_matches_orm_dataframe(
+    created_providers: list[Provider],
+    created_pricelist_config: ProviderPriceListConfig,
+    created_brand: Brand,
+    test_session: AsyncSession,
+):
+    autoparts = [
+        AutoPart(brand_id=created_brand.id, oem_number=f"COL{idx}", name=f"Part {idx}")
+        for idx in range(4)
+    ]
+    test_session.add_all(autoparts)
+    await test_session.commit()
+    pricelist = await _create_pricelist(
+        test_session, created_providers[0], created_pricelist_config, autoparts, 12.5
+    )
+
+    associations = await crud_pricelist.fetch_pricelist_data(pricelist.id, test_session)
+    expected = await crud_pricelist.transform_to_dataframe(
+        associations=associations, session=test_session
+    )
+    columnar = await crud_pricelist.fetch_pricelist_frame(pricelist.id, test_session)
+
+    def _sorted(df):
+        return df.sort_values("autopart_id").reset_index(drop=True)
+
+    pd.testing.assert_frame_equal(_sorted(columnar), _sorted(expected))
+    filtered = await crud_pricelist.fetch_pricelist_frame(
+        pricelist.id, test_session, oem_numbers=["col2"]
+    )
+    assert filtered["oem_number"].tolist() == ["COL2"]
+    missing = await crud_pricelist.fetch_pricelist_frame(pricelist.id + 100, test_session)
+    assert missing.empty
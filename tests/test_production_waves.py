@@ -343,3 +343,66 @@ async def test_scheduled_wave_is_planned_and_creates_labels(
         ).scalar_one()
     )
     assert labels_count == 3
+
+
+@pytest.mark.asyncio
+async def test_batch_availability_counts_reserves_and_wave_lots(
+    async_client: AsyncClient,
+    test_session: AsyncSession,
+):
+    warehouse, finished, material, _, source_lots = await _wave_scenario(
+        test_session,
+        requested_quantity=3,
+        available_quantities=(2, 5),
+    )
+    location_id = source_lots[0].storage_location_id
+    groups = await async_client.get("/inventory/production-groups")
+    assert groups.status_code == 200, groups.text
+    wave = await create_scheduled_production_wave(test_session, warehouse_id=warehouse.id)
+    assert wave.status == ProductionWaveStatus.PLANNED, wave.error_message
+    await test_session.commit()
+
+    reserved = await async_client.post(
+        "/inventory/reserves/",
+        json={
+            "autopart_id": material.id,
+            "storage_location_id": location_id,
+            "quantity": 3,
+        },
+    )
+    assert reserved.status_code == 201, reserved.text
+    over_reserved = await async_client.post(
+        "/inventory/reserves/",
+        json={"autopart_id": material.id, "quantity": 2},
+    )
+    assert over_reserved.status_code == 400, over_reserved.text
+    assert "доступно 1" in over_reserved.json()["detail"]
+
+    batch = await async_client.post(
+        "/inventory/available/batch/",
+        json={
+            "items": [
+                {"autopart_id": material.id, "storage_location_id": location_id},
+                {"autopart_id": finished.id},
+                {"autopart_id": material.id},
+            ]
+        },
+    )
+    assert batch.status_code == 200, batch.text
+    rows = batch.json()
+    assert [(row["autopart_id"], row["storage_location_id"]) for row in rows] == [
+        (material.id, location_id),
+        (finished.id, None),
+        (material.id, None),
+    ]
+    expected = {"physical": 7, "reserved": 3, "wave_reserved": 3, "available": 1}
+    assert {key: rows[0][key] for key in expected} == expected
+    assert {key: rows[2][key] for key in expected} == expected
+    assert rows[1]["physical"] == rows[1]["available"] == 0
+
+    single = await async_client.get(
+        "/inventory/available/",
+        params={"autopart_id": material.id},
+    )
+    assert single.status_code == 200, single.text
+    assert {key: single.json()[key] for key in expected} == expected
@@ -0,0 +1,301 @@
+import io
+
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dz_fastapi.models.autopart import AutoPart, AutoPartPriceHistory
+from dz_fastapi.models.brand import Brand
+from dz_fastapi.models.partner import (
+    PriceList,
+    PriceListAutoPartAssociation,
+    Provider,
+    ProviderPriceListConfig,
+)
+from dz_fastapi.services import process as process_service
+
+READ_PARAMS = {
+    "start_row": 1,
+    "oem_col": 0,
+    "brand_col": 1,
+    "name_col": 2,
+    "multiplicity_col": None,
+    "qty_col": 3,
+    "price_col": 4,
+}
+
+
+def _pricelist_rows(brand_name: str) -> list[list]:
+    rows = [["OEM", "Brand", "Name", "Qty", "Price"]]
+    for idx in range(25):
+        rows.append([f"SE{idx:04d}", brand_name, f"Деталь {idx}", 5 + idx, f"{100 + idx},50"])
+    # Дубли в другой пачке: дешевле — должен победить, дороже — игнорируется.
+    rows.append(["SE0001", brand_name, "Деталь 1", 7, "90"])
+    rows.append(["SE0002", brand_name, "Деталь 2", 9, "500"])
+    rows.append(["", brand_name, "Без номера", 1, "10"])
+    return rows
+
+
+def _csv_bytes(rows: list[list]) -> bytes:
+    return pd.DataFrame(rows).to_csv(header=False, index=False, sep=";").encode("cp1251")
+
+
+def _xlsx_bytes(rows: list[list]) -> bytes:
+    buffer = io.BytesIO()
+    pd.DataFrame(rows).to_excel(buffer, header=False, index=False)
+    return buffer.getvalue()
+
+
+def _prepare_streamed(file_extension: str, file_content: bytes, **params):
+    return process_service._prepare_streamed_pricelist_data(
+        file_extension=file_extension,
+        file_content=file_content,
+        chunk_rows=7,
+        **dict(READ_PARAMS, **params),
+    )
+
+
+@pytest.mark.parametrize(
+    "file_extension,builder",
+    [("csv", _csv_bytes), ("xlsx", _xlsx_bytes)],
+)
+def test_streamed_preparation_matches_whole_file_preparation(file_extension, builder):
+    file_content = builder(_pricelist_rows("TEST BRAND"))
+
+    expected, expected_stats = process_service._prepare_pricelist_data(
+        file_extension=file_extension,
+        file_content=file_content,
+        **READ_PARAMS,
+    )
+    streamed, streamed_stats = _prepare_streamed(file_extension, file_content)
+
+    # Дубли между пачками схлопываются так же, как в обычной загрузке.
+    assert streamed == expected
+    assert streamed_stats == expected_stats
+    assert streamed_stats["rows_total"] == 28
+    assert streamed_stats["rows_dedup_removed"] == 2
+    row = next(item for item in streamed if item["oem_number"] == "SE0001")
+    assert row["quantity"] == 7
+    assert row["price"] == pytest.approx(90.0)
+
+
+def test_streamed_csv_reads_numeric_oem_like_regular_import():
+    rows = [["OEM", "Brand", "Name", "Qty", "Price"]]
+    for idx in range(20):
+        rows.append([f"{idx + 1:05d}", "TEST BRAND", f"Деталь {idx}", 3, 100 + idx])
+    file_content = _csv_bytes(rows)
+
+    expected, _ = process_service._prepare_pricelist_data(
+        file_extension="csv",
+        file_content=file_content,
+        **READ_PARAMS,
+    )
+    streamed, _ = _prepare_streamed("csv", file_content)
+
+    assert streamed == expected
+    assert len(streamed) == 20
+
+
+def test_streamed_preparation_rejects_unknown_columns():
+    file_content = _csv_bytes(_pricelist_rows("TEST BRAND"))
+    with pytest.raises(KeyError):
+        _prepare_streamed("csv", file_content, price_col=12)
+
+
+def test_frame_deduplication_keeps_first_text_and_last_cheapest_values():
+    rows = [
+        {"oem_number": "A1", "brand": "Brand ", "name": "first", "quantity": 1, "price": 10.0},
+        {"oem_number": "a1", "brand": "brand", "name": "second", "quantity": 2, "price": 8.0},
+        {"oem_number": "B2", "brand": "Brand", "name": "other", "quantity": 5, "price": 3.0},
+        {"oem_number": "A1 ", "brand": "BRAND", "name": "third", "quantity": 3, "price": 8.0},
+        {"oem_number": "A1", "brand": "Brand", "name": "dear", "quantity": 9, "price": 20.0},
+    ]
+
+    result = process_service.deduplicate_autoparts_data(rows)
+
+    # При равной цене побеждает более поздняя строка, текст — от первой.
+    assert result == [
+        {"oem_number": "A1", "brand": "Brand ", "name": "first", "quantity": 3, "price": 8.0},
+        {"oem_number": "B2", "brand": "Brand", "name": "other", "quantity": 5, "price": 3.0},
+    ]
+
+
+def test_provider_filters_apply_limits_and_exclude_positions():
+    df = pd.DataFrame(
+        [
+            {"oem_number": "KEEP1", "brand": "Brand", "quantity": 3.5, "price": 50.0},
+            {"oem_number": "cheap", "brand": "Brand", "quantity": 5, "price": 5.0},
+            {"oem_number": "FEW", "brand": "Brand", "quantity": 2.5, "price": 50.0},
+            {"oem_number": " skip1 ", "brand": "brand", "quantity": 3, "price": 50.0},
+        ]
+    )
+    provider_filters = {
+        "min_price": 10,
+        "max_price": None,
+        "min_quantity": 3,
+        "max_quantity": 3,
+        "exclude_positions": {("BRAND", "SKIP1")},
+    }
+
+    result = process_service._apply_provider_filters(df, provider_filters)
+
+    # Количество сравнивается целой частью: 3.5 проходит max_quantity=3.
+    assert result["oem_number"].tolist() == ["KEEP1"]
+
+
+async def _upload_pricelist(
+    session: AsyncSession,
+    provider: Provider,
+    config: ProviderPriceListConfig,
+    file_content: bytes,
+    *,
+    streaming: bool,
+    enforce_anomaly_guard: bool = False,
+):
+    return await process_service.process_provider_pricelist(
+        provider=provider,
+        file_content=file_content,
+        file_extension="xlsx",
+        provider_list_conf=config,
+        use_stored_params=True,
+        start_row=None,
+        oem_col=None,
+        brand_col=None,
+        name_col=None,
+        multiplicity_col=None,
+        qty_col=None,
+        price_col=None,
+        session=session,
+        return_stats=True,
+        include_autoparts_response=False,
+        enforce_anomaly_guard=enforce_anomaly_guard,
+        streaming=streaming,
+    )
+
+
+async def _load_positions(session: AsyncSession, pricelist_id: int) -> dict[str, tuple]:
+    rows = (
+        await session.execute(
+            select(
+                AutoPart.oem_number,
+                PriceListAutoPartAssociation.price,
+                PriceListAutoPartAssociation.quantity,
+            )
+            .join(AutoPart, AutoPart.id == PriceListAutoPartAssociation.autopart_id)
+            .where(PriceListAutoPartAssociation.pricelist_id == pricelist_id)
+        )
+    ).all()
+    return {oem: (float(price), int(qty)) for oem, price, qty in rows}
+
+
+@pytest.mark.asyncio
+async def test_streaming_provider_pricelist_matches_regular_import(
+    created_providers: list[Provider],
+    created_pricelist_config: ProviderPriceListConfig,
+    created_brand: Brand,
+    test_session: AsyncSession,
+    monkeypatch,
+):
+    monkeypatch.setattr(process_service, "PROVIDER_PRICELIST_STREAM_CHUNK_ROWS", 7)
+    provider = created_providers[0]
+    file_content = _xlsx_bytes(_pricelist_rows(created_brand.name))
+
+    regular, regular_stats = await _upload_pricelist(
+        test_session, provider, created_pricelist_config, file_content, streaming=False
+    )
+    streamed, streamed_stats = await _upload_pricelist(
+        test_session, provider, created_pricelist_config, file_content, streaming=True
+    )
+
+    regular_positions = await _load_positions(test_session, regular.id)
+    streamed_positions = await _load_positions(test_session, streamed.id)
+    assert streamed_positions == regular_positions
+    assert streamed_positions["SE0001"] == (90.0, 7)
+    assert streamed_positions["SE0002"] == (102.5, 7)
+    assert streamed_stats == regular_stats
+
+    # Повторная загрузка того же файла не создаёт событий истории.
+    history_rows = (
+        await test_session.execute(
+            select(AutoPartPriceHistory.pricelist_id).where(
+                AutoPartPriceHistory.provider_config_id == created_pricelist_config.id
+            )
+        )
+    ).scalars().all()
+    assert set(history_rows) == {regular.id}
+    assert len(history_rows) == len(regular_positions)
+
+
+@pytest.mark.asyncio
+async def test_streaming_applies_filters_after_collapsing_duplicates(
+    created_providers: list[Provider],
+    created_pricelist_config: ProviderPriceListConfig,
+    created_brand: Brand,
+    test_session: AsyncSession,
+    monkeypatch,
+):
+    monkeypatch.setattr(process_service, "PROVIDER_PRICELIST_STREAM_CHUNK_ROWS", 7)
+    provider = created_providers[0]
+    created_pricelist_config.min_price = 10
+    rows = _pricelist_rows(created_brand.name)
+    # Цена выше фильтра в первой пачке и ниже фильтра в последней:
+    # после схлопывания побеждает дешёвая строка и позиция выпадает.
+    rows.insert(1, ["SE9999", created_brand.name, "Фильтр", 2, "50"])
+    rows.append(["SE9999", created_brand.name, "Фильтр", 2, "5"])
+    file_content = _xlsx_bytes(rows)
+
+    regular, regular_stats = await _upload_pricelist(
+        test_session, provider, created_pricelist_config, file_content, streaming=False
+    )
+    streamed, streamed_stats = await _upload_pricelist(
+        test_session, provider, created_pricelist_config, file_content, streaming=True
+    )
+
+    streamed_positions = await _load_positions(test_session, streamed.id)
+    assert "SE9999" not in streamed_positions
+    assert streamed_positions == await _load_positions(test_session, regular.id)
+    assert streamed_stats == regular_stats
+
+
+@pytest.mark.asyncio
+async def test_streaming_respects_anomaly_guard(
+    created_providers: list[Provider],
+    created_pricelist_config: ProviderPriceListConfig,
+    created_brand: Brand,
+    test_session: AsyncSession,
+    monkeypatch,
+):
+    monkeypatch.setattr(process_service, "PROVIDER_PRICELIST_STREAM_CHUNK_ROWS", 7)
+    provider = created_providers[0]
+    rows = _pricelist_rows(created_brand.name)
+
+    baseline, _ = await _upload_pricelist(
+        test_session,
+        provider,
+        created_pricelist_config,
+        _xlsx_bytes(rows),
+        streaming=True,
+        enforce_anomaly_guard=True,
+    )
+
+    # Из 25 позиций осталось 5 — загрузка должна быть заблокирована.
+    with pytest.raises(HTTPException) as exc_info:
+        await _upload_pricelist(
+            test_session,
+            provider,
+            created_pricelist_config,
+            _xlsx_bytes(rows[:6]),
+            streaming=True,
+            enforce_anomaly_guard=True,
+        )
+    assert exc_info.value.status_code == 409
+    pricelist_ids = (
+        await test_session.execute(
+            select(PriceList.id).where(
+                PriceList.provider_config_id == created_pricelist_config.id
+            )
+        )
+    ).scalars().all()
+    assert pricelist_ids == [baseline.id]
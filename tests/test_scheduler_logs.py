@@ -1,3 +1,5 @@
+import asyncio
+from contextlib import asynccontextmanager
 from datetime import timedelta
 from types import SimpleNamespace
 
@@ -11,6 +13,7 @@ from dz_fastapi.services.scheduler import (
     _close_stale_supplier_response_messages,
     _cron_minute_for_interval,
     _notify_scheduler_issue,
+    _send_pending_customer_pricelists,
     _should_run_scheduled_job,
     cleanup_misc_logs_task,
     download_price_provider_task,
@@ -25,7 +28,7 @@ def test_cron_interval_59_runs_once_per_hour():
 
 @pytest.mark.asyncio
 async def test_scheduler_logs_skip(async_client, test_session, monkeypatch):
-    async def fake_get_emails(session):
+    async def fake_get_emails(session, **_kwargs):
         return []
 
     monkeypatch.setattr(
@@ -51,7 +54,7 @@ async def test_provider_price_summary_keeps_provider_error_details(
     provider = SimpleNamespace(id=937, name="COSMOPART")
     provider_config = SimpleNamespace(id=41, name_price="Cosmo.xlsx")
 
-    async def fake_get_emails(*, session):
+    async def fake_get_emails(*, session, **_kwargs):
         return [(provider, "/tmp/Cosmo.xlsx", provider_config)]
 
     async def fake_process_one(item, app, sem):
@@ -93,7 +96,7 @@ async def test_provider_price_summary_separates_review_from_errors(
     provider = SimpleNamespace(id=937, name="COSMOPART")
     provider_config = SimpleNamespace(id=53, name_price="Cosmo CS")
 
-    async def fake_get_emails(*, session):
+    async def fake_get_emails(*, session, **_kwargs):
         return [(provider, "/tmp/Cosmo CS.xlsx", provider_config)]
 
     async def fake_process_one(item, app, sem):
@@ -357,3 +360,59 @@ async def test_should_run_scheduled_job_allows_watchlist_notify_catch_up(
 
     assert should_run is True
     assert resolved_setting is setting
+
+
+@pytest.mark.asyncio
+async def test_scheduled_customer_pricelists_run_with_bounded_parallelism(
+    monkeypatch,
+):
+    running = 0
+    max_running = 0
+    notified = []
+
+    async def fake_process_customer_pricelist(*, customer, request, **kwargs):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.02)
+        running -= 1
+        if request.config_id == 3:
+            raise RuntimeError("broken config")
+
+    async def fake_notify(session, *, subject, text):
+        notified.append(text)
+
+    @asynccontextmanager
+    async def fake_session_factory():
+        yield SimpleNamespace()
+
+    monkeypatch.setattr(
+        "dz_fastapi.services.scheduler.process_customer_pricelist",
+        fake_process_customer_pricelist,
+    )
+    monkeypatch.setattr(
+        "dz_fastapi.services.scheduler._notify_scheduler_issue",
+        fake_notify,
+    )
+    monkeypatch.setattr(
+        "dz_fastapi.services.scheduler.CUSTOMER_PRICELIST_SEND_PARALLELISM",
+        2,
+    )
+    pending = [
+        (config_id, SimpleNamespace(id=100 + config_id))
+        for config_id in range(1, 6)
+    ]
+    trace = SimpleNamespace(details={})
+
+    await _send_pending_customer_pricelists(fake_session_factory, pending, trace)
+
+    assert max_running == 2
+    assert trace.details["success_count"] == 4
+    assert trace.details["error_count"] == 1
+    assert trace.details["__trace_status"] == "error"
+    assert trace.details["parallelism"] == 2
+    timings = {item["config_id"]: item for item in trace.details["config_timings"]}
+    assert set(timings) == {1, 2, 3, 4, 5}
+    assert timings[3]["status"] == "error"
+    assert all(item["seconds"] > 0 for item in timings.values())
+    assert len(notified) == 1
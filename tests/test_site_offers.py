@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from dz_fastapi.services import site_offers
+
+
+class _FakeSiteClient:
+    base_url = "https://site.example/api"
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.calls: list[tuple[str, str, bool]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get_offers(self, oem, brand, without_cross=False):
+        self.calls.append((oem, brand, without_cross))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError("site down")
+            return [{"cost": "100", "qnt": "2", "oem": oem}, "garbage"]
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.mark.asyncio
+async def test_site_offers_are_shared_by_key_and_copied(monkeypatch):
+    monkeypatch.setattr(site_offers, "SITE_OFFERS_RATE_PER_SEC", 0)
+    client = _FakeSiteClient(delay=0.01)
+
+    results = await asyncio.gather(
+        *(
+            site_offers.get_site_offers(
+                client, oem=" abc1 ", brand="Geely", without_cross=True
+            )
+            for _ in range(5)
+        )
+    )
+    # Одновременные запросы одного ключа ждут один ответ сайта.
+    assert client.calls == [(" abc1 ", "Geely", True)]
+    assert all(result == [{"cost": "100", "qnt": "2", "oem": " abc1 "}] for result in results)
+
+    results[0][0]["cost"] = "1"
+    cached = await site_offers.get_site_offers(
+        client, oem="ABC1", brand="GEELY", without_cross=True
+    )
+    assert cached[0]["cost"] == "100"
+    assert len(client.calls) == 1
+
+    # Другой without_cross и нулевой допустимый возраст идут на сайт.
+    await site_offers.get_site_offers(client, oem="ABC1", brand="GEELY", without_cross=False)
+    await site_offers.get_site_offers(
+        client, oem="ABC1", brand="GEELY", without_cross=True, max_age_sec=0
+    )
+    assert len(client.calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_site_offers_limit_in_flight_and_do_not_cache_errors(monkeypatch):
+    monkeypatch.setattr(site_offers, "SITE_OFFERS_RATE_PER_SEC", 0)
+    monkeypatch.setattr(site_offers, "SITE_OFFERS_MAX_IN_FLIGHT", 2)
+    monkeypatch.setattr(site_offers, "_host_limits", {})
+    client = _FakeSiteClient(delay=0.01)
+
+    await asyncio.gather(
+        *(
+            site_offers.get_site_offers(
+                client, oem=f"OEM{idx}", brand="GEELY", without_cross=True
+            )
+            for idx in range(6)
+        )
+    )
+    assert len(client.calls) == 6
+    assert client.max_in_flight == 2
+
+    failing = _FakeSiteClient(fail=True)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            await site_offers.get_site_offers(
+                failing, oem="BAD", brand="GEELY", without_cross=True
+            )
+    assert len(failing.calls) == 2
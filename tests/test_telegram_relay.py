@@ -153,7 +153,7 @@ def test_local_relay_processes_telegram_queue(monkeypatch):
     )
     client = FakeClient()
 
-    assert process_telegram_once(client, config) == 1
+    assert process_telegram_once(client, config) == (1, 1)
     assert delivered == [7]
     assert client.sent_ids == [7]
     assert client.errors == []